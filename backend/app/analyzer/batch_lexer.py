@@ -0,0 +1,257 @@
+"""
+Módulo de análisis léxico por lotes para JWT.
+
+Valida millones de tokens con operaciones vectorizadas de NumPy en lugar de
+recorrer el autómata carácter por carácter. Los tokens se empaquetan en un
+buffer de bytes contiguo con un arreglo de offsets; cada byte se clasifica
+con una tabla de 256 entradas y la validez y posición de los puntos se
+calculan para todos los tokens a la vez.
+
+Los resultados son idénticos a los de JWTLexer.analyze, incluidos los
+rechazos por límites de recursos.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.analyzer.lexical_analyzer import JWTLexer
+from app.analyzer.limits import DEFAULT_LIMITS, LimitExceededError, ResourceLimits
+from app.analyzer.results import LexResult
+from app.services.metrics_service import metrics
+
+
+# Clases de carácter del autómata
+CLASS_BASE64 = 0
+CLASS_DOT = 1
+CLASS_OTHER = 2
+
+# Estado por token en BatchLexResult.status
+STATUS_VALID = 0
+STATUS_INVALID_FORMAT = 1
+STATUS_LIMIT_EXCEEDED = 2
+
+
+def _build_char_class_table() -> np.ndarray:
+    table = np.full(256, CLASS_OTHER, dtype=np.uint8)
+    lexer = JWTLexer()
+    for char in lexer.b_chars:
+        table[ord(char)] = CLASS_BASE64
+    for char in lexer.d_chars:
+        table[ord(char)] = CLASS_DOT
+    return table
+
+
+CHAR_CLASS_TABLE = _build_char_class_table()
+
+
+def pack_tokens(tokens: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Empaqueta una secuencia de tokens en un buffer UTF-8 contiguo.
+
+    Retorna (buffer, offsets) donde el token i ocupa buffer[offsets[i]:offsets[i + 1]].
+    """
+    joined = ''.join(tokens)
+    if joined.isascii():
+        lengths = np.fromiter(map(len, tokens), dtype=np.int64, count=len(tokens))
+        data = joined.encode('ascii')
+    else:
+        encoded = [token.encode('utf-8') for token in tokens]
+        lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+        data = b''.join(encoded)
+
+    offsets = np.zeros(len(tokens) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return np.frombuffer(data, dtype=np.uint8), offsets
+
+
+class BatchLexResult:
+    """
+    Resultado del análisis léxico de un lote.
+
+    Expone arreglos por token (valid, status, first_dot, second_dot) y
+    materializa bajo demanda el diccionario equivalente a JWTLexer.analyze.
+    """
+
+    def __init__(self, buffer, offsets, status, first_dot, second_dot, errors, overrides, tokens=None):
+        self.buffer = buffer
+        self.offsets = offsets
+        self.status = status
+        self.first_dot = first_dot
+        self.second_dot = second_dot
+        self._errors = errors
+        self._overrides = overrides
+        self._tokens = tokens
+
+    def __len__(self):
+        return len(self.status)
+
+    @property
+    def valid(self) -> np.ndarray:
+        return self.status == STATUS_VALID
+
+    @property
+    def valid_count(self) -> int:
+        return int(np.count_nonzero(self.status == STATUS_VALID))
+
+    def token(self, i: int) -> str:
+        if self._tokens is not None:
+            return self._tokens[i]
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return self.buffer[start:end].tobytes().decode('utf-8', errors='replace')
+
+    def result(self, i: int) -> Dict[str, Any]:
+        """Retorna el resultado del token i con el mismo formato que JWTLexer.analyze."""
+        return self.lex_result(i).to_dict()
+
+    def lex_result(self, i: int) -> LexResult:
+        """Retorna el resultado del token i como LexResult (igual que JWTLexer.lex)."""
+        if i in self._overrides:
+            return self._overrides[i]
+
+        status = self.status[i]
+        if status == STATUS_VALID:
+            token = self.token(i)
+            first, second = int(self.first_dot[i]), int(self.second_dot[i])
+            return LexResult(True, token[:first], token[first + 1:second], token[second + 1:])
+        if status == STATUS_LIMIT_EXCEEDED:
+            return LexResult(False, error=self._errors[i], error_type='LimitExceededError')
+        return LexResult(False, error='Invalid JWT format')
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        return [self.result(i) for i in range(len(self))]
+
+
+class BatchJWTLexer:
+    """
+    Analizador léxico vectorizado para lotes de JWT.
+
+    Acepta una lista de strings (analyze_batch) o un buffer ya empaquetado
+    con sus offsets (analyze_packed). Los tokens con bytes no ASCII, que no
+    pueden ser válidos, se delegan a JWTLexer para reproducir exactamente
+    su resultado (las longitudes de JWTLexer se miden en caracteres).
+    """
+
+    def __init__(self, limits: Optional[ResourceLimits] = None):
+        self.limits = limits or DEFAULT_LIMITS
+        self.lexer = JWTLexer(self.limits)
+
+    def analyze_batch(self, tokens: Sequence[str]) -> BatchLexResult:
+        buffer, offsets = pack_tokens(tokens)
+        return self.analyze_packed(buffer, offsets, tokens)
+
+    def analyze_packed(self, buffer: np.ndarray, offsets: np.ndarray,
+                       tokens: Optional[Sequence[str]] = None) -> BatchLexResult:
+        buffer = np.asarray(buffer, dtype=np.uint8)
+        offsets = np.asarray(offsets, dtype=np.int64)
+        starts = offsets[:-1]
+        ends = offsets[1:]
+        lengths = ends - starts
+        n = len(lengths)
+
+        classes = CHAR_CLASS_TABLE[buffer]
+        dot_pos = np.flatnonzero(classes == CLASS_DOT)
+        other_pos = np.flatnonzero(classes == CLASS_OTHER)
+        del classes
+
+        # Puntos y caracteres inválidos por token, sin recorrer token por token
+        dot_lo = np.searchsorted(dot_pos, starts)
+        dot_hi = np.searchsorted(dot_pos, ends)
+        dot_count = dot_hi - dot_lo
+        other_count = np.searchsorted(other_pos, ends) - np.searchsorted(other_pos, starts)
+
+        first_dot = np.full(n, -1, dtype=np.int64)
+        second_dot = np.full(n, -1, dtype=np.int64)
+        two_dots = np.flatnonzero(dot_count == 2)
+        first_dot[two_dots] = dot_pos[dot_lo[two_dots]] - starts[two_dots]
+        second_dot[two_dots] = dot_pos[dot_lo[two_dots] + 1] - starts[two_dots]
+
+        # Equivalente al autómata: b+ . b+ . b+
+        valid = (
+            (dot_count == 2) & (other_count == 0)
+            & (first_dot > 0) & (second_dot > first_dot + 1) & (second_dot < lengths - 1)
+        )
+        status = np.where(valid, STATUS_VALID, STATUS_INVALID_FORMAT).astype(np.uint8)
+
+        # Tokens con bytes no ASCII: nunca son válidos y se delegan al autómata
+        # original, que mide las longitudes en caracteres y no en bytes
+        non_ascii = np.zeros(n, dtype=bool)
+        high_pos = np.flatnonzero(buffer >= 0x80)
+        if len(high_pos):
+            non_ascii = (np.searchsorted(high_pos, ends) - np.searchsorted(high_pos, starts)) > 0
+
+        errors = self._apply_limits(lengths, starts, ends, dot_pos, dot_lo, dot_hi, non_ascii, status)
+
+        overrides = {}
+        for i in np.flatnonzero(non_ascii).tolist():
+            token = tokens[i] if tokens is not None else \
+                buffer[offsets[i]:offsets[i + 1]].tobytes().decode('utf-8', errors='replace')
+            result = self.lexer.lex(token)
+            overrides[i] = result
+            status[i] = STATUS_LIMIT_EXCEEDED if result.error_type == 'LimitExceededError' \
+                else STATUS_INVALID_FORMAT
+
+        first_dot[status != STATUS_VALID] = -1
+        second_dot[status != STATUS_VALID] = -1
+        return BatchLexResult(buffer, offsets, status, first_dot, second_dot, errors, overrides, tokens)
+
+    def _apply_limits(self, lengths, starts, ends, dot_pos, dot_lo, dot_hi, excluded, status) -> Dict[int, str]:
+        """
+        Aplica los mismos límites que ResourceLimits.check_token, en el mismo orden.
+
+        Marca los tokens rechazados en `status` y retorna sus mensajes de error.
+        """
+        limits = self.limits
+        errors: Dict[int, str] = {}
+        rejected: Dict[str, int] = {}
+
+        def record(i, limit, actual, maximum):
+            errors[i] = str(LimitExceededError(limit, actual, maximum))
+            rejected[limit] = rejected.get(limit, 0) + 1
+
+        def segment_fails(seg_lengths):
+            return (seg_lengths > limits.max_segment_length) | \
+                ((seg_lengths * 3) // 4 > limits.max_decoded_length)
+
+        def record_segment(i, seg_length):
+            if seg_length > limits.max_segment_length:
+                record(i, 'segment_length', seg_length, limits.max_segment_length)
+            else:
+                record(i, 'decoded_length', (seg_length * 3) // 4, limits.max_decoded_length)
+
+        over_token = (lengths > limits.max_token_length) & ~excluded
+        skipped = over_token | excluded
+        for i in np.flatnonzero(over_token).tolist():
+            record(i, 'token_length', int(lengths[i]), limits.max_token_length)
+
+        # Segmentos que terminan en un punto: comienzan tras el punto previo del mismo token
+        dot_token = np.searchsorted(ends, dot_pos, side='right')
+        seg_start = np.empty(len(dot_pos), dtype=np.int64)
+        if len(dot_pos):
+            seg_start[0] = starts[dot_token[0]]
+            same_token = dot_token[1:] == dot_token[:-1]
+            seg_start[1:] = np.where(same_token, dot_pos[:-1] + 1, starts[dot_token[1:]])
+        dot_seg_len = dot_pos - seg_start
+
+        # Último segmento de cada token
+        last_start = starts.copy()
+        has_dots = dot_hi > dot_lo
+        last_start[has_dots] = dot_pos[dot_hi[has_dots] - 1] + 1
+        last_seg_len = ends - last_start
+
+        first_failing = {}
+        failing_dots = np.flatnonzero(segment_fails(dot_seg_len) & ~skipped[dot_token])
+        if len(failing_dots):
+            tokens_with_failure, first_index = np.unique(dot_token[failing_dots], return_index=True)
+            for i, j in zip(tokens_with_failure.tolist(), failing_dots[first_index].tolist()):
+                first_failing[i] = int(dot_seg_len[j])
+        for i in np.flatnonzero(segment_fails(last_seg_len) & ~skipped).tolist():
+            first_failing.setdefault(i, int(last_seg_len[i]))
+        for i, seg_length in first_failing.items():
+            record_segment(i, seg_length)
+
+        if errors:
+            status[list(errors)] = STATUS_LIMIT_EXCEEDED
+        for limit, count in rejected.items():
+            metrics.inc('jwt_limit_rejections_total', count, limit=limit)
+        return errors
@@ -9,7 +9,25 @@ import json
 import base64
 import hmac
 import hashlib
-from typing import Dict, Any
+from functools import lru_cache
+from typing import Dict, Any, Optional, Tuple
+
+from app.analyzer.limits import DEFAULT_LIMITS, LimitExceededError, ResourceLimits
+from app.analyzer.results import CryptoResult
+from app.analyzer.revocation_list import RevocationList
+from app.services.metrics_service import instrument
+
+
+# Longitud en Base64URL (sin padding) de la firma de cada algoritmo y su función hash
+SIGNATURE_LENGTHS = {'HS256': 43, 'HS384': 64}
+DIGESTS = {'HS256': 'sha256', 'HS384': 'sha384'}
+
+BASE64URL_CHARS = frozenset('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_')
+# 43 caracteres codifican 258 bits: los 2 bits sobrantes del último deben ser cero,
+# de lo contrario dos firmas distintas decodificarían a los mismos bytes
+HS256_LAST_CHARS = frozenset('AEIMQUYcgkosw048')
+
+SIGNATURE_MISMATCH = 'La firma no coincide. El token puede haber sido alterado o la clave secreta es incorrecta.'
 
 
 def decode_base64url(encoded_string: str) -> str:
@@ -57,7 +75,118 @@ def sign_token(header_b64: str, payload_b64: str, algorithm: str, secret: str) -
     return signature_b64.rstrip('=')
 
 
-def verify_jwt_signature(jwt_token: str, secret: str) -> Dict[str, Any]:
+def _is_revoked(jwt_token: str, payload: Any, revocation_list: RevocationList) -> bool:
+    # Token completo y 'jti' (solo si es string)
+    jti = payload.get('jti') if isinstance(payload, dict) else None
+    return revocation_list.is_revoked(jwt_token, jti if isinstance(jti, str) else None)
+
+
+def check_revocation(result: Dict[str, Any], jwt_token: str,
+                     revocation_list: Optional[RevocationList]) -> Dict[str, Any]:
+    """
+    Aplica la lista de revocación a un resultado de verify_jwt_signature.
+
+    Se separa de la verificación para poder reutilizar un resultado de firma
+    cacheado y consultar igualmente la lista vigente.
+    """
+    if revocation_list is None or not result.get('valid'):
+        return result
+    if _is_revoked(jwt_token, result.get('payload'), revocation_list):
+        return {
+            'valid': False,
+            'algorithm': result.get('algorithm'),
+            'header': result.get('header'),
+            'error': 'El token fue revocado.',
+            'error_type': 'RevokedTokenError'
+        }
+    return result
+
+
+@lru_cache(maxsize=256)
+def _header_algorithm(header_b64: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Algoritmo del header Base64URL crudo, o el error que impide obtenerlo.
+
+    Los emisores repiten el mismo header en todos sus tokens, por lo que el
+    JSON se decodifica una vez por header distinto y el resto son búsquedas.
+    """
+    try:
+        header = json.loads(decode_base64url(header_b64))
+    except ValueError as e:
+        return None, f'Error al decodificar el header: {e}'
+    if not isinstance(header, dict) or 'alg' not in header:
+        return None, 'El header no contiene el claim "alg"'
+    algorithm = header['alg']
+    if not isinstance(algorithm, str) or algorithm not in SIGNATURE_LENGTHS:
+        return None, f'Algoritmo no soportado: {algorithm}. Solo se soportan HS256 y HS384.'
+    return algorithm, None
+
+
+@instrument('crypto_fast', size=lambda jwt_token, *args, **kwargs: len(jwt_token),
+            error_type=lambda r: None if r.valid else r.error_type or 'SignatureError')
+def verify_signature_fast(jwt_token: str, secret: str, limits: Optional[ResourceLimits] = None,
+                          revocation_list: Optional[RevocationList] = None,
+                          decode_payload: bool = False) -> CryptoResult:
+    """
+    Verificación rápida de la firma (solo sí/no).
+
+    A diferencia de verify_signature:
+        - el algoritmo se obtiene del segmento de header crudo (cacheado por header);
+        - la firma se rechaza sin calcular el HMAC si su longitud no corresponde
+          al algoritmo (43 caracteres para HS256, 64 para HS384);
+        - se comparan los bytes del digest con hmac.compare_digest, sin
+          re-codificar la firma recalculada;
+        - el payload se decodifica solo si decode_payload es True o hay lista de
+          revocación (para consultar su 'jti'). El resultado no incluye el header.
+    """
+    try:
+        (limits or DEFAULT_LIMITS).check_token(jwt_token)
+    except LimitExceededError as e:
+        return CryptoResult(False, error=str(e), error_type='LimitExceededError')
+
+    try:
+        first = jwt_token.find('.')
+        second = jwt_token.find('.', first + 1) if first >= 0 else -1
+        if second < 0 or jwt_token.find('.', second + 1) >= 0:
+            return CryptoResult(False, error='Formato de JWT inválido: debe tener 3 partes separadas por puntos')
+
+        algorithm, error = _header_algorithm(jwt_token[:first])
+        if error is not None:
+            return CryptoResult(False, error=error)
+
+        signature_b64 = jwt_token[second + 1:].rstrip('=')
+        expected_length = SIGNATURE_LENGTHS[algorithm]
+        if len(signature_b64) != expected_length:
+            return CryptoResult(
+                False, algorithm,
+                error=f'Longitud de firma inválida para {algorithm}: {len(signature_b64)} caracteres '
+                      f'(se esperaban {expected_length}).'
+            )
+        if not BASE64URL_CHARS.issuperset(signature_b64) or \
+                (algorithm == 'HS256' and signature_b64[-1] not in HS256_LAST_CHARS):
+            return CryptoResult(False, algorithm, error=SIGNATURE_MISMATCH)
+
+        signature = base64.urlsafe_b64decode(signature_b64 + '=' * (-len(signature_b64) % 4))
+        expected = hmac.digest(secret.encode('utf-8'), jwt_token[:second].encode('utf-8'), DIGESTS[algorithm])
+        if not hmac.compare_digest(signature, expected):
+            return CryptoResult(False, algorithm, error=SIGNATURE_MISMATCH)
+
+        payload = None
+        if decode_payload or revocation_list is not None:
+            try:
+                payload = json.loads(decode_base64url(jwt_token[first + 1:second]))
+            except ValueError as e:
+                return CryptoResult(False, error=f'Error al decodificar el payload: {e}')
+
+        if revocation_list is not None and _is_revoked(jwt_token, payload, revocation_list):
+            return CryptoResult(False, algorithm, error='El token fue revocado.', error_type='RevokedTokenError')
+        return CryptoResult(True, algorithm, payload=payload if decode_payload else None)
+    except Exception as e:
+        return CryptoResult(False, error=f'Error inesperado durante la verificación: {e}')
+
+
+def verify_jwt_signature(jwt_token: str, secret: str, limits: Optional[ResourceLimits] = None,
+                         revocation_list: Optional[RevocationList] = None) -> Dict[str, Any]:
     """
     Verifica la integridad criptográfica de un JWT.
     
@@ -67,6 +196,8 @@ def verify_jwt_signature(jwt_token: str, secret: str) -> Dict[str, Any]:
     Args:
         jwt_token: String con el JWT completo en formato header.payload.signature
         secret: Clave secreta para recalcular la firma
+        limits: Límites de recursos a aplicar antes de decodificar (opcional)
+        revocation_list: Lista de revocación a consultar tras validar la firma (opcional)
     
     Returns:
         Diccionario con:
@@ -75,16 +206,28 @@ def verify_jwt_signature(jwt_token: str, secret: str) -> Dict[str, Any]:
             - header: diccionario con el header decodificado
             - payload: diccionario con el payload decodificado
             - error: mensaje de error si la verificación falló
+            - error_type: 'LimitExceededError' si el token supera los límites,
+              'RevokedTokenError' si el token o su 'jti' están revocados
     """
+    return verify_signature(jwt_token, secret, limits, revocation_list).to_dict()
+
+
+@instrument('crypto', size=lambda jwt_token, *args, **kwargs: len(jwt_token),
+            error_type=lambda r: None if r.valid else r.error_type or 'SignatureError')
+def verify_signature(jwt_token: str, secret: str, limits: Optional[ResourceLimits] = None,
+                     revocation_list: Optional[RevocationList] = None) -> CryptoResult:
+    """Igual que verify_jwt_signature, pero retorna un CryptoResult (objeto con __slots__)."""
+    try:
+        (limits or DEFAULT_LIMITS).check_token(jwt_token)
+    except LimitExceededError as e:
+        return CryptoResult(False, error=str(e), error_type='LimitExceededError')
+
     try:
         # Separar el JWT en sus componentes
         parts = jwt_token.split('.')
         
         if len(parts) != 3:
-            return {
-                'valid': False,
-                'error': 'Formato de JWT inválido: debe tener 3 partes separadas por puntos'
-            }
+            return CryptoResult(False, error='Formato de JWT inválido: debe tener 3 partes separadas por puntos')
         
         header_b64, payload_b64, signature_b64 = parts
         
@@ -93,34 +236,24 @@ def verify_jwt_signature(jwt_token: str, secret: str) -> Dict[str, Any]:
             header_json = decode_base64url(header_b64)
             header = json.loads(header_json)
         except (ValueError, json.JSONDecodeError) as e:
-            return {
-                'valid': False,
-                'error': f'Error al decodificar el header: {e}'
-            }
+            return CryptoResult(False, error=f'Error al decodificar el header: {e}')
         
         # Validar que el header tenga el algoritmo
         if 'alg' not in header:
-            return {
-                'valid': False,
-                'error': 'El header no contiene el claim "alg"'
-            }
+            return CryptoResult(False, error='El header no contiene el claim "alg"')
         
         algorithm = header['alg']
         
         if algorithm not in ["HS256", "HS384"]:
-            return {
-                'valid': False,
-                'error': f'Algoritmo no soportado: {algorithm}. Solo se soportan HS256 y HS384.'
-            }
+            return CryptoResult(
+                False, error=f'Algoritmo no soportado: {algorithm}. Solo se soportan HS256 y HS384.'
+            )
         
         # Recalcular la firma
         try:
             recalculated_signature = sign_token(header_b64, payload_b64, algorithm, secret)
         except ValueError as e:
-            return {
-                'valid': False,
-                'error': str(e)
-            }
+            return CryptoResult(False, error=str(e))
         
         # Comparar firmas usando comparación segura (evita timing attacks)
         # Normalizar las firmas removiendo padding si es necesario
@@ -129,33 +262,23 @@ def verify_jwt_signature(jwt_token: str, secret: str) -> Dict[str, Any]:
         
         # Usar comparación segura de strings
         if not hmac.compare_digest(signature_normalized, recalculated_normalized):
-            return {
-                'valid': False,
-                'algorithm': algorithm,
-                'header': header,
-                'error': 'La firma no coincide. El token puede haber sido alterado o la clave secreta es incorrecta.'
-            }
+            return CryptoResult(
+                False, algorithm, header,
+                error=SIGNATURE_MISMATCH
+            )
         
         # Decodificar el payload para incluirlo en la respuesta
         try:
             payload_json = decode_base64url(payload_b64)
             payload = json.loads(payload_json)
         except (ValueError, json.JSONDecodeError) as e:
-            return {
-                'valid': False,
-                'error': f'Error al decodificar el payload: {e}'
-            }
+            return CryptoResult(False, error=f'Error al decodificar el payload: {e}')
         
-        return {
-            'valid': True,
-            'algorithm': algorithm,
-            'header': header,
-            'payload': payload
-        }
+        # Consultar la lista de revocación (token completo y 'jti')
+        if revocation_list is not None and _is_revoked(jwt_token, payload, revocation_list):
+            return CryptoResult(False, algorithm, header, error='El token fue revocado.',
+                                error_type='RevokedTokenError')
+        return CryptoResult(True, algorithm, header, payload)
         
     except Exception as e:
-        return {
-            'valid': False,
-            'error': f'Error inesperado durante la verificación: {e}'
-        }
-
+        return CryptoResult(False, error=f'Error inesperado durante la verificación: {e}')
@@ -6,7 +6,11 @@ Se aplica después del análisis léxico (Fase 1) y antes del análisis sintáct
 """
 
 import base64
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
+
+from app.analyzer.limits import DEFAULT_LIMITS, ResourceLimits
+from app.analyzer.results import DecodeResult, LexResult
+from app.services.metrics_service import instrument
 
 
 def decode_base64url(encoded_string: str) -> str:
@@ -28,12 +32,13 @@ def decode_base64url(encoded_string: str) -> str:
         raise ValueError(f"Error de decodificación Base64URL: {e}")
 
 
-def get_decoded_strings(lex_result: Dict[str, Any]) -> List[str]:
+def get_decoded_strings(lex_result: Dict[str, Any], limits: Optional[ResourceLimits] = None) -> List[str]:
     """
     Decodifica header y payload de Base64URL a JSON.
     
     Recibe el resultado del análisis léxico (con 'valid', 'header', 'payload')
     y retorna una lista [header_json, payload_json] para el análisis sintáctico.
+    Lanza LimitExceededError antes de decodificar si algún segmento supera los límites.
     """
     if not isinstance(lex_result, dict):
         raise ValueError("Error Léxico: La entrada debe ser un diccionario.")
@@ -47,14 +52,33 @@ def get_decoded_strings(lex_result: Dict[str, Any]) -> List[str]:
             "Se requieren los campos 'header' y 'payload'."
         )
     
+    header_b64 = lex_result['header']
+    payload_b64 = lex_result['payload']
+
+    if not isinstance(header_b64, str) or not isinstance(payload_b64, str):
+        raise ValueError("Error Léxico: 'header' y 'payload' deben ser strings.")
+
+    return list(_decode_segments(header_b64, payload_b64, limits))
+
+
+def decode_segments(lex_result: LexResult, limits: Optional[ResourceLimits] = None) -> DecodeResult:
+    """
+    Igual que get_decoded_strings, pero recibe un LexResult y retorna un DecodeResult.
+
+    El resultado se desempaqueta como (header_json, payload_json).
+    """
+    if not lex_result.valid:
+        raise ValueError("Error Léxico: El JWT no es válido según el análisis léxico.")
+    return _decode_segments(lex_result.header, lex_result.payload, limits)
+
+
+@instrument('decode', size=lambda header_b64, payload_b64, *args: len(header_b64) + len(payload_b64))
+def _decode_segments(header_b64: str, payload_b64: str, limits: Optional[ResourceLimits]) -> DecodeResult:
+    limits = limits or DEFAULT_LIMITS
+    limits.check_segment(header_b64)
+    limits.check_segment(payload_b64)
+
     try:
-        header_b64 = lex_result['header']
-        payload_b64 = lex_result['payload']
-        
-        decoded_header = decode_base64url(header_b64)
-        decoded_payload = decode_base64url(payload_b64)
-        
-        return [decoded_header, decoded_payload]
-        
+        return DecodeResult(decode_base64url(header_b64), decode_base64url(payload_b64))
     except ValueError as e:
-        raise ValueError(f"Error en la Fase 4 (Decodificación): {e}") from e
\ No newline at end of file
+        raise ValueError(f"Error en la Fase 4 (Decodificación): {e}") from e
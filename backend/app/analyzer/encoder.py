@@ -12,6 +12,7 @@ import hashlib
 from typing import Dict, Any
 from app.analyzer.syntactic_analyzer import analyze_syntax
 from app.analyzer.semantic_analyzer import SemanticAnalyzer
+from app.services.metrics_service import instrument
 
 
 def encode_base64url(data: str) -> str:
@@ -53,6 +54,7 @@ def sign_token(header_b64: str, payload_b64: str, algorithm: str, secret: str) -
     return signature_b64.rstrip('=')
 
 
+@instrument('encode')
 def encode_jwt(header: Dict[str, Any], payload: Dict[str, Any], secret: str = "secret") -> str:
     """
     Codifica y firma un JWT completo con validación sintáctica y semántica previa.
@@ -5,7 +5,11 @@ Valida el formato de un JWT usando un autómata finito y separa los tokens.
 Se aplica como primera fase del análisis de JWT antes de la decodificación.
 """
 
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+
+from app.analyzer.limits import DEFAULT_LIMITS, LimitExceededError, ResourceLimits
+from app.analyzer.results import LexResult
+from app.services.metrics_service import instrument
 
 
 class JWTLexer:
@@ -16,7 +20,9 @@ class JWTLexer:
     y separa los componentes. Se aplica como Fase 1 del análisis.
     """
 
-    def __init__(self):
+    def __init__(self, limits: Optional[ResourceLimits] = None):
+
+        self.limits = limits or DEFAULT_LIMITS
 
         self.b_chars = set('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_')
         self.d_chars = set('.')
@@ -49,13 +55,29 @@ class JWTLexer:
         else:
             return 'other'
 
-    def analyze(self, token: str) -> Dict[str, Any]:
+    def analyze(self, token: str, limits: Optional[ResourceLimits] = None) -> Dict[str, Any]:
         """
         Analiza un token JWT y valida su formato léxico.
         
         Recibe un string JWT y retorna un diccionario con 'valid', 'tokens',
         'header', 'payload', 'signature'. Se aplica como Fase 1 antes de la decodificación.
+        Los tokens que superan los límites de recursos se rechazan antes de recorrerlos.
+        """
+        return self.lex(token, limits).to_dict()
+
+    @instrument('lexical', size=lambda self, token, *args, **kwargs: len(token),
+                error_type=lambda r: None if r.valid else r.error_type or 'LexicalError')
+    def lex(self, token: str, limits: Optional[ResourceLimits] = None) -> LexResult:
         """
+        Igual que analyze, pero retorna un LexResult (objeto con __slots__).
+
+        Se usa en los pipelines internos, que no necesitan el diccionario.
+        """
+        try:
+            (limits or self.limits).check_token(token)
+        except LimitExceededError as e:
+            return LexResult(False, error=str(e), error_type='LimitExceededError')
+
         current_state = self.start_state
 
         for char in token:
@@ -71,18 +93,7 @@ class JWTLexer:
         isAccepted = current_state in self.final_state
 
         if isAccepted:
-            tokens = token.split('.')
-            return {
-                'valid': True, 
-                'tokens': tokens,
-                'header': tokens[0] if len(tokens) > 0 else '',
-                'payload': tokens[1] if len(tokens) > 1 else '',
-                'signature': tokens[2] if len(tokens) > 2 else ''
-            }
+            header, payload, signature = token.split('.')
+            return LexResult(True, header, payload, signature)
         else:
-            return {
-                'valid': False, 
-                'tokens': [],
-                'error': 'Invalid JWT format'
-            }
-
+            return LexResult(False, error='Invalid JWT format')
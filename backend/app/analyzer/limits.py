@@ -0,0 +1,138 @@
+"""
+Módulo de límites de recursos para el análisis de JWT.
+
+Define cotas configurables sobre el tamaño de las entradas (longitud del token,
+de cada segmento, tamaño decodificado, profundidad JSON, número de claims y
+tamaño del cuerpo HTTP). Cada límite se verifica antes de decodificar o parsear,
+de modo que una entrada hostil se rechaza en tiempo O(1) u O(límite).
+"""
+
+import os
+from typing import Any, Dict, Mapping, Optional
+
+from app.services.metrics_service import metrics
+
+
+class LimitExceededError(ValueError):
+    """Se lanza cuando una entrada supera alguno de los límites configurados."""
+
+    def __init__(self, limit: str, actual: int, maximum: int):
+        self.limit = limit
+        self.actual = actual
+        self.maximum = maximum
+        super().__init__(
+            f"ERROR_LIMITE_EXCEDIDO: '{limit}' = {actual} supera el máximo permitido ({maximum})."
+        )
+
+
+def reject(limit: str, actual: int, maximum: int):
+    """Contabiliza el rechazo en las métricas y lanza LimitExceededError."""
+    metrics.inc('jwt_limit_rejections_total', limit=limit)
+    raise LimitExceededError(limit, actual, maximum)
+
+
+class ResourceLimits:
+    """
+    Conjunto inmutable de límites de recursos.
+
+    Los valores por defecto pueden sobrescribirse con variables de entorno
+    (por ejemplo JWT_MAX_TOKEN_LENGTH) o con argumentos nombrados.
+    """
+
+    DEFAULTS: Dict[str, int] = {
+        'max_token_length': 16384,
+        'max_segment_length': 8192,
+        'max_decoded_length': 6144,
+        'max_json_depth': 32,
+        'max_claims': 100,
+        'max_content_length': 1024 * 1024,
+        # Cuerpo de POST /jobs: un lote de hasta JWT_JOB_MAX_TOKENS tokens
+        'max_job_content_length': 256 * 1024 * 1024,
+    }
+
+    __slots__ = tuple(DEFAULTS)
+
+    def __init__(self, **overrides: int):
+        unknown = set(overrides) - set(self.DEFAULTS)
+        if unknown:
+            raise ValueError(f"Límites desconocidos: {', '.join(sorted(unknown))}")
+        for name, default in self.DEFAULTS.items():
+            value = int(overrides.get(name, default))
+            if value <= 0:
+                raise ValueError(f"El límite '{name}' debe ser un entero positivo.")
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ResourceLimits es inmutable.")
+
+    def __repr__(self):
+        values = ', '.join(f"{name}={getattr(self, name)}" for name in self.DEFAULTS)
+        return f"ResourceLimits({values})"
+
+    @classmethod
+    def from_env(cls, environ: Optional[Mapping[str, str]] = None) -> 'ResourceLimits':
+        """
+        Construye los límites a partir de variables de entorno JWT_<LIMITE>.
+
+        MAX_CONTENT_LENGTH se lee sin prefijo para coincidir con la
+        configuración estándar de Flask.
+        """
+        environ = os.environ if environ is None else environ
+        overrides = {}
+        for name in cls.DEFAULTS:
+            env_name = name.upper() if name == 'max_content_length' else f"JWT_{name.upper()}"
+            if environ.get(env_name):
+                overrides[name] = int(environ[env_name])
+        return cls(**overrides)
+
+    def as_dict(self) -> Dict[str, int]:
+        return {name: getattr(self, name) for name in self.DEFAULTS}
+
+    def fingerprint(self) -> str:
+        """Representación estable de los límites, para claves de cache y ETags."""
+        return str(sorted(self.as_dict().items()))
+
+    def check_token(self, token: str) -> None:
+        """
+        Verifica la longitud total del token y la de cada segmento.
+
+        La longitud total se comprueba en O(1); los segmentos se recorren con
+        str.find, por lo que el costo está acotado por max_token_length.
+        """
+        length = len(token)
+        if length > self.max_token_length:
+            reject('token_length', length, self.max_token_length)
+
+        start = 0
+        while True:
+            end = token.find('.', start)
+            segment_end = length if end == -1 else end
+            self.check_segment_length(segment_end - start)
+            if end == -1:
+                break
+            start = end + 1
+
+    def check_segment_length(self, length: int) -> None:
+        """Verifica la longitud de un segmento Base64URL y su tamaño decodificado estimado."""
+        if length > self.max_segment_length:
+            reject('segment_length', length, self.max_segment_length)
+        # Cada 4 caracteres Base64 producen 3 bytes: se estima sin decodificar
+        decoded_length = (length * 3) // 4
+        if decoded_length > self.max_decoded_length:
+            reject('decoded_length', decoded_length, self.max_decoded_length)
+
+    def check_segment(self, segment: str) -> None:
+        self.check_segment_length(len(segment))
+
+    def check_decoded(self, text: str) -> None:
+        """Verifica el tamaño de un segmento ya decodificado (string JSON)."""
+        if len(text) > self.max_decoded_length:
+            reject('decoded_length', len(text), self.max_decoded_length)
+
+    def check_claims(self, claims: Any) -> None:
+        """Verifica el número de claims de un header o payload ya parseado."""
+        if isinstance(claims, dict) and len(claims) > self.max_claims:
+            reject('claim_count', len(claims), self.max_claims)
+
+
+DEFAULT_LIMITS = ResourceLimits()
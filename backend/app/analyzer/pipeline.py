@@ -0,0 +1,150 @@
+"""
+Módulo de análisis completo de un JWT.
+
+Encadena las fases léxica, de decodificación, sintáctica, semántica y
+(si se recibe una clave secreta) criptográfica sobre un token, deteniéndose
+en la primera que falla. Se aplica en los trabajos por lotes, donde cada
+token se analiza en el proceso sin pasar por la API.
+
+La profundidad (depth) indica la última fase a ejecutar: un triage que solo
+necesita saber si los tokens son léxicamente válidos usa depth='lexical' y
+no decodifica nada; 'semantic' responde "bien formado y vigente" sin
+calcular firmas. El resultado indica en 'phase' la fase que rechazó el token
+o la última ejecutada.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence
+
+from app.analyzer.batch_lexer import BatchJWTLexer
+from app.analyzer.crypto_verifier import verify_signature
+from app.analyzer.decoder_json import decode_segments
+from app.analyzer.lexical_analyzer import JWTLexer
+from app.analyzer.results import LexResult
+from app.analyzer.limits import DEFAULT_LIMITS, LimitExceededError, ResourceLimits
+from app.analyzer.semantic_analyzer import SemanticAnalyzer
+from app.analyzer.syntactic_analyzer import parse_syntax
+from app.analyzer.validation_policy import ValidationPolicy
+
+
+PHASES = ('lexical', 'decode', 'syntax', 'semantic', 'crypto')
+DEFAULT_DEPTH = 'crypto'
+
+_lexer = JWTLexer()
+_semantic = SemanticAnalyzer()
+
+
+class InvalidDepthError(ValueError):
+    """La profundidad de análisis pedida no es una de las fases."""
+
+    def __init__(self, depth: Any):
+        self.depth = depth
+        super().__init__(f"Profundidad de análisis inválida: {depth!r}. Valores posibles: {', '.join(PHASES)}.")
+
+
+def check_depth(depth: Optional[str]) -> str:
+    """Retorna la profundidad a usar (DEFAULT_DEPTH si es None) o lanza InvalidDepthError."""
+    if depth is None:
+        return DEFAULT_DEPTH
+    if depth not in PHASES:
+        raise InvalidDepthError(depth)
+    return depth
+
+
+def _new_result() -> Dict[str, Any]:
+    return {'valid': False, 'phase': 'lexical', 'error_type': None, 'error': None,
+            'header': None, 'payload': None}
+
+
+def _passed(result: Dict[str, Any], phase: str) -> Dict[str, Any]:
+    result['phase'] = phase
+    result['valid'] = True
+    return result
+
+
+def _lexical_failure(result: Dict[str, Any], lex_result: LexResult) -> Dict[str, Any]:
+    return _failure(result, 'lexical', lex_result.error_type or 'LexicalError', lex_result.error)
+
+
+def _failure(result: Dict[str, Any], phase: str, error_type: str, error: Any) -> Dict[str, Any]:
+    result['phase'] = phase
+    result['error_type'] = error_type
+    result['error'] = str(error)
+    return result
+
+
+def analyze_token(token: str, secret: Optional[str] = None, limits: Optional[ResourceLimits] = None,
+                  policy: Optional[ValidationPolicy] = None, revocation_list=None,
+                  depth: str = DEFAULT_DEPTH) -> Dict[str, Any]:
+    """
+    Analiza un token con las fases hasta depth (todas por defecto).
+
+    Retorna un diccionario con:
+        - valid: True si el token pasó todas las fases ejecutadas
+        - phase: última fase ejecutada (la que falló, si valid es False)
+        - error_type / error: tipo y mensaje del error (None si es válido)
+        - header / payload: diccionarios decodificados, si se llegó a obtenerlos
+
+    Los tipos de error coinciden con los códigos de columnar_export_service
+    (LexicalError, DecodeError, SyntaxError, errores semánticos, SignatureError...).
+    La detección de replay no se aplica: re-analizar un lote no debe
+    registrar sus 'jti' como usados. La fase criptográfica solo se ejecuta
+    si hay clave secreta.
+    """
+    stop = PHASES.index(check_depth(depth))
+    limits = limits or DEFAULT_LIMITS
+    result = _new_result()
+
+    # Las fases internas usan los resultados tipados (results.py), sin diccionarios intermedios
+    lex_result = _lexer.lex(token, limits)
+    if not lex_result.valid:
+        return _lexical_failure(result, lex_result)
+    if stop == 0:
+        return _passed(result, 'lexical')
+
+    try:
+        header_str, payload_str = decode_segments(lex_result, limits)
+    except LimitExceededError as e:
+        return _failure(result, 'decode', 'LimitExceededError', e)
+    except ValueError as e:
+        return _failure(result, 'decode', 'DecodeError', e)
+    if stop == 1:
+        return _passed(result, 'decode')
+
+    syntax = parse_syntax(header_str, payload_str, limits)
+    result['header'] = syntax.header
+    result['payload'] = syntax.payload
+    if not syntax.valid:
+        return _failure(result, 'syntax', syntax.error_type or 'SyntaxError', '; '.join(syntax.errors))
+    if stop == 2:
+        return _passed(result, 'syntax')
+
+    semantic = _semantic.check(syntax.header, syntax.payload, policy=policy)
+    if not semantic.valid:
+        return _failure(result, 'semantic', semantic.error_type, semantic.error)
+    if stop == 3 or secret is None:
+        return _passed(result, 'semantic')
+
+    crypto = verify_signature(token, secret, limits, revocation_list)
+    if not crypto.valid:
+        return _failure(result, 'crypto', crypto.error_type or 'SignatureError', crypto.error)
+    return _passed(result, 'crypto')
+
+
+def analyze_tokens(tokens: Sequence[str], secret: Optional[str] = None, limits: Optional[ResourceLimits] = None,
+                   policy: Optional[ValidationPolicy] = None, revocation_list=None,
+                   depth: str = DEFAULT_DEPTH) -> List[Dict[str, Any]]:
+    """
+    Analiza una lista de tokens con la misma clave; equivale a analyze_token por token.
+
+    Con depth='lexical' el lote completo se valida con BatchJWTLexer
+    (vectorizado) y solo se construye el detalle de los tokens rechazados.
+    """
+    if check_depth(depth) != 'lexical':
+        return [analyze_token(token, secret, limits, policy, revocation_list, depth) for token in tokens]
+
+    batch = BatchJWTLexer(limits or DEFAULT_LIMITS).analyze_batch(tokens)
+    valid = batch.valid.tolist()
+    return [
+        _passed(_new_result(), 'lexical') if valid[i] else _lexical_failure(_new_result(), batch.lex_result(i))
+        for i in range(len(tokens))
+    ]
@@ -0,0 +1,177 @@
+"""
+Módulo de detección de repetición (replay) de JWT por 'jti'.
+
+Hay dos modos, excluyentes:
+
+- Con verificación exacta (exact_check, en la aplicación una inserción con
+  _id único en la colección JTI_SEEN de MongoDB, con índice TTL): cada 'jti'
+  se registra una sola vez y la inserción decide. Es el modo para varios
+  workers: la repetición se detecta en cualquier proceso. Cuesta una
+  escritura por token con 'jti' y no usa filtros en memoria.
+
+- Sin verificación exacta: filtros de Bloom por worker, particionados por
+  tiempo de expiración. Cada partición cubre un intervalo de 'exp' y se
+  descarta completa cuando todos sus tokens ya expiraron, por lo que la
+  memoria se mantiene constante aunque el flujo sea de millones de tokens por
+  hora. Un acierto del filtro se cuenta como repetición (una fracción
+  false_positive_rate de los tokens nuevos se rechaza) y la detección es por
+  worker: una repetición que llega a otro proceso no se detecta.
+
+Un filtro de Bloom no puede delegar solo sus aciertos a MongoDB: el primer
+uso, decidido por el filtro, no quedaría registrado y la primera repetición
+parecería nueva. Por eso los modos no se combinan.
+
+En el modo de filtros, los tokens sin 'exp' (o con 'exp' más allá de la
+ventana) no tienen un intervalo estable: se asignan a uno de un conjunto fijo
+de filtros elegido por el hash del 'jti', de modo que una repetición cae
+siempre en el mismo filtro. Esos filtros se vacían al alcanzar su capacidad;
+desde entonces no se detectan las repeticiones de los 'jti' que contenían.
+"""
+
+import hashlib
+import math
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from app.services.metrics_service import metrics
+
+
+class BloomFilter:
+    """Filtro de Bloom sobre un bytearray, dimensionado por tasa de falsos positivos."""
+
+    __slots__ = ('size', 'hash_count', 'bits')
+
+    def __init__(self, capacity: int, false_positive_rate: float):
+        if capacity <= 0 or not 0 < false_positive_rate < 1:
+            raise ValueError("Se requiere capacity > 0 y 0 < false_positive_rate < 1.")
+        # m = -n ln p / (ln 2)^2 ; k = (m / n) ln 2
+        self.size = max(8, int(math.ceil(-capacity * math.log(false_positive_rate) / (math.log(2) ** 2))))
+        self.hash_count = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: bytes):
+        # Doble hashing (Kirsch-Mitzenmacher) a partir de un único digest
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key: bytes) -> None:
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: bytes) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.bits)
+
+
+class ReplayDetector:
+    """
+    Detector de 'jti' repetidos: registro exacto compartido o filtros de Bloom
+    por worker particionados por 'exp'.
+
+    Args:
+        partition_seconds: Ancho del intervalo de 'exp' cubierto por cada partición
+        max_window_seconds: Ventana máxima considerada; los tokens sin 'exp' o con
+            'exp' más lejano se asignan a los filtros por hash del 'jti' y se
+            registran de forma exacta hasta now + ventana
+        expected_per_partition: Número de tokens esperados por partición
+        false_positive_rate: Tasa de falsos positivos objetivo de cada partición
+        exact_check: Función opcional (jti, exp) -> bool que registra el 'jti' de
+            forma exacta y retorna True si era nuevo. Si se indica, decide
+            todos los tokens y no se usan filtros de Bloom.
+    """
+
+    def __init__(self, partition_seconds: int = 300, max_window_seconds: int = 86400,
+                 expected_per_partition: int = 100_000, false_positive_rate: float = 1e-4,
+                 exact_check: Optional[Callable[[str, int], bool]] = None):
+        self.partition_seconds = partition_seconds
+        self.max_window_seconds = max_window_seconds
+        self.expected_per_partition = expected_per_partition
+        self.false_positive_rate = false_positive_rate
+        self.exact_check = exact_check
+        self._partitions: Dict[int, BloomFilter] = {}
+        # Filtros de los tokens sin 'exp' estable: índice por hash del jti -> [filtro, inserciones]
+        self.unbounded_partitions = max(1, max_window_seconds // partition_seconds)
+        self._unbounded: Dict[int, list] = {}
+        self._lock = threading.Lock()
+
+    def _expire(self, now: int) -> None:
+        current = now // self.partition_seconds
+        for partition_id in [p for p in self._partitions if p < current]:
+            del self._partitions[partition_id]
+
+    def _bounded_exp(self, exp: Optional[int], now: int) -> Optional[int]:
+        """'exp' si es un entero dentro de la ventana; None si el token no tiene un intervalo estable."""
+        if type(exp) is not int or exp > now + self.max_window_seconds:
+            return None
+        return exp
+
+    def _filter(self, key: bytes, exp: Optional[int], now: int) -> BloomFilter:
+        # Se llama con el lock tomado
+        if exp is not None:
+            self._expire(now)
+            partition_id = exp // self.partition_seconds
+            bloom = self._partitions.get(partition_id)
+            if bloom is None:
+                bloom = self._partitions[partition_id] = BloomFilter(self.expected_per_partition,
+                                                                     self.false_positive_rate)
+            return bloom
+
+        # El índice depende solo del jti: una repetición cae en el mismo filtro en cualquier momento
+        index = int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'little') % self.unbounded_partitions
+        entry = self._unbounded.get(index)
+        if entry is None or entry[1] >= self.expected_per_partition:
+            if entry is not None:
+                metrics.inc('jwt_replay_filter_resets_total')
+            entry = self._unbounded[index] = [BloomFilter(self.expected_per_partition, self.false_positive_rate), 0]
+        entry[1] += 1
+        return entry[0]
+
+    def check_and_add(self, jti: str, exp: Optional[int] = None, now: Optional[int] = None) -> bool:
+        """
+        Registra un 'jti' y retorna True si ya había sido visto (replay).
+
+        Un token ya expirado nunca se registra: la validación de 'exp' lo rechaza.
+        """
+        now = int(time.time()) if now is None else now
+        if type(exp) is int and exp < now:
+            return False
+        bounded_exp = self._bounded_exp(exp, now)
+        # Retención del registro exacto: hasta 'exp', o la ventana máxima si no hay un 'exp' acotado
+        retain_until = bounded_exp if bounded_exp is not None else now + self.max_window_seconds
+
+        metrics.inc('jwt_replay_checks_total')
+        if self.exact_check is not None:
+            # La inserción única en el registro compartido decide, también entre workers
+            if self.exact_check(jti, retain_until):
+                return False
+            metrics.inc('jwt_replay_detected_total')
+            return True
+
+        key = jti.encode('utf-8')
+        with self._lock:
+            bloom = self._filter(key, bounded_exp, now)
+            if key not in bloom:
+                bloom.add(key)
+                return False
+
+        # Sin verificación exacta un acierto puede ser un falso positivo (false_positive_rate)
+        metrics.inc('jwt_replay_filter_hits_total')
+        metrics.inc('jwt_replay_detected_total')
+        return True
+
+    @property
+    def partition_count(self) -> int:
+        return len(self._partitions) + len(self._unbounded)
+
+    @property
+    def nbytes(self) -> int:
+        with self._lock:
+            return (sum(bloom.nbytes for bloom in self._partitions.values())
+                    + sum(entry[0].nbytes for entry in self._unbounded.values()))
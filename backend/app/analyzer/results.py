@@ -0,0 +1,151 @@
+"""
+Módulo de tipos de resultado de las fases de análisis de JWT.
+
+Cada fase produce un objeto pequeño con `__slots__` (sin diccionario por
+instancia) en lugar de un diccionario anidado. Los pipelines por lotes, que
+conservan millones de resultados, guardan estos objetos; la API JSON los
+convierte con `to_dict()`, que reproduce exactamente el formato histórico
+de cada endpoint.
+
+Los resultados válidos no crean listas ni diccionarios auxiliares: la lista
+de tokens del lexer y la lista de errores sintácticos se construyen solo al
+convertir a diccionario (o cuando realmente hay errores).
+"""
+
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+
+NO_ERRORS: Tuple[str, ...] = ()
+
+
+class LexResult:
+    """Resultado del análisis léxico (Fase 1)."""
+
+    __slots__ = ('valid', 'header', 'payload', 'signature', 'error', 'error_type')
+
+    def __init__(self, valid: bool, header: str = '', payload: str = '', signature: str = '',
+                 error: Optional[str] = None, error_type: Optional[str] = None):
+        self.valid = valid
+        self.header = header
+        self.payload = payload
+        self.signature = signature
+        self.error = error
+        self.error_type = error_type
+
+    @property
+    def tokens(self):
+        return [self.header, self.payload, self.signature] if self.valid else []
+
+    def to_dict(self) -> Dict[str, Any]:
+        if self.valid:
+            return {
+                'valid': True,
+                'tokens': self.tokens,
+                'header': self.header,
+                'payload': self.payload,
+                'signature': self.signature
+            }
+        result = {'valid': False, 'tokens': [], 'error': self.error}
+        if self.error_type is not None:
+            result['error_type'] = self.error_type
+        return result
+
+
+class DecodeResult:
+    """Header y payload decodificados de Base64URL (Fase 4); se desempaqueta como (header, payload)."""
+
+    __slots__ = ('header', 'payload')
+
+    def __init__(self, header: str, payload: str):
+        self.header = header
+        self.payload = payload
+
+    def __iter__(self) -> Iterator[str]:
+        yield self.header
+        yield self.payload
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'header': self.header, 'payload': self.payload}
+
+
+class SyntaxResult:
+    """Resultado del análisis sintáctico: objetos parseados y errores (tupla vacía compartida si es válido)."""
+
+    __slots__ = ('valid', 'header', 'payload', 'errors', 'error_type')
+
+    def __init__(self, valid: bool, header: Any = None, payload: Any = None,
+                 errors: Tuple[str, ...] = NO_ERRORS, error_type: Optional[str] = None):
+        self.valid = valid
+        self.header = header
+        self.payload = payload
+        self.errors = errors
+        self.error_type = error_type
+
+    def to_dict(self) -> Dict[str, Any]:
+        result = {
+            'success': True,
+            'valid': self.valid,
+            'header': self.header,
+            'payload': self.payload,
+            'errors': list(self.errors)
+        }
+        if self.error_type is not None:
+            result['error_type'] = self.error_type
+        return result
+
+
+class SemanticResult:
+    """Resultado del análisis semántico con la política aplicada."""
+
+    __slots__ = ('valid', 'header', 'payload', 'policy_id', 'error', 'error_type')
+
+    def __init__(self, valid: bool, header: Any, payload: Any, policy_id: Optional[str] = None,
+                 error: Optional[str] = None, error_type: Optional[str] = None):
+        self.valid = valid
+        self.header = header
+        self.payload = payload
+        self.policy_id = policy_id
+        self.error = error
+        self.error_type = error_type
+
+    def to_dict(self) -> Dict[str, Any]:
+        if self.valid:
+            return {'header': self.header, 'payload': self.payload, 'valid': True, 'policy': self.policy_id}
+        return {'valid': False, 'error': self.error, 'error_type': self.error_type}
+
+
+class CryptoResult:
+    """
+    Resultado de la verificación criptográfica.
+
+    algorithm y header están presentes desde que se pudo leer el algoritmo;
+    payload solo en los resultados válidos.
+    """
+
+    __slots__ = ('valid', 'algorithm', 'header', 'payload', 'error', 'error_type')
+
+    def __init__(self, valid: bool, algorithm: Optional[str] = None, header: Any = None, payload: Any = None,
+                 error: Optional[str] = None, error_type: Optional[str] = None):
+        self.valid = valid
+        self.algorithm = algorithm
+        self.header = header
+        self.payload = payload
+        self.error = error
+        self.error_type = error_type
+
+    def to_dict(self) -> Dict[str, Any]:
+        if self.valid:
+            return {
+                'valid': True,
+                'algorithm': self.algorithm,
+                'header': self.header,
+                'payload': self.payload
+            }
+        result = {'valid': False}
+        if self.algorithm is not None:
+            result['algorithm'] = self.algorithm
+            result['header'] = self.header
+        result['error'] = self.error
+        if self.error_type is not None:
+            result['error_type'] = self.error_type
+        return result
@@ -1,5 +1,9 @@
 import time 
 
+from app.analyzer.results import SemanticResult
+from app.analyzer.validation_policy import DEFAULT_POLICY
+from app.services.metrics_service import instrument
+
 class SemanticError(ValueError):
     """Clase base para todos los errores semánticos."""
     pass
@@ -24,18 +28,53 @@ class NotActiveTokenError(SemanticError):
     """(Regla R-P4)"""
     pass
 
-class SemanticAnalyzer:
-    def __init__(self):
-        self.supported_algorithms = {"HS256", "HS384"}
+class ReplayedTokenError(SemanticError):
+    """(Regla R-P8: 'jti' repetido dentro de su ventana de validez)"""
+    pass
 
-    def analyze(self, header_map, payload_map):
+class SemanticAnalyzer:
+    def __init__(self, replay_detector=None, policy=None):
+        self.policy = policy or DEFAULT_POLICY
+        self.supported_algorithms = self.policy.algorithms
+        self.replay_detector = replay_detector
+
+    @instrument('semantic')
+    def analyze(self, header_map, payload_map, replay_detector=None, policy=None):
+        # La política ya viene compilada: aquí solo hay pruebas de pertenencia
+        policy = policy or self.policy
         t_actual = int(time.time())
-        self._validate_header(header_map)
-        self._validate_payload(payload_map, t_actual)
+        self._validate_header(header_map, policy)
+        self._validate_payload(payload_map, t_actual, policy)
+        self._validate_policy(payload_map, t_actual, policy)
+
+        detector = replay_detector or self.replay_detector
+        if detector is not None:
+            self._validate_replay(payload_map, t_actual, detector)
 
         return (header_map, payload_map)
 
-    def _validate_header(self, h_map):
+    def check(self, header_map, payload_map, replay_detector=None, policy=None):
+        """Igual que analyze, pero retorna un SemanticResult en lugar de lanzar SemanticError."""
+        policy = policy or self.policy
+        try:
+            self.analyze(header_map, payload_map, replay_detector, policy)
+        except SemanticError as e:
+            return SemanticResult(False, header_map, payload_map, policy.policy_id, str(e), type(e).__name__)
+        return SemanticResult(True, header_map, payload_map, policy.policy_id)
+
+    def _validate_replay(self, p_map, t_actual, detector):
+
+        if 'jti' not in p_map:
+            return
+
+        if not isinstance(p_map['jti'], str):
+            raise InvalidDataTypeError("ERROR_TIPO_DATO_INVALIDO: 'jti' debe ser String.")
+
+        if detector.check_and_add(p_map['jti'], p_map.get('exp'), t_actual):
+            raise ReplayedTokenError(f"ERROR_TOKEN_REPETIDO: El jti '{p_map['jti']}' ya fue utilizado.")
+
+    def _validate_header(self, h_map, policy=None):
+        policy = policy or self.policy
 
         if 'alg' not in h_map:
             raise MissingClaimError("ERROR_CLAIM_FALTANTE: El claim 'alg' es obligatorio.")
@@ -49,24 +88,25 @@ class SemanticAnalyzer:
         if not isinstance(h_map['typ'], str):
             raise InvalidDataTypeError("ERROR_TIPO_DATO_INVALIDO: El claim 'typ' debe ser un String.")
 
-        if h_map['alg'] not in self.supported_algorithms:
+        if h_map['alg'] not in policy.algorithms:
             raise InvalidValueError(f"ERROR_VALOR_INVALIDO: El alg '{h_map['alg']}' no es soportado.")
 
         if h_map['typ'] != "JWT":
             raise InvalidValueError("ERROR_VALOR_INVALIDO: El claim 'typ' debe ser 'JWT'.")
 
-    def _validate_payload(self, p_map, t_actual):
+    def _validate_payload(self, p_map, t_actual, policy=None):
+        leeway = (policy or self.policy).leeway
 
         if 'exp' in p_map:
             if not isinstance(p_map['exp'], int):
                 raise InvalidDataTypeError("ERROR_TIPO_DATO_INVALIDO: 'exp' debe ser NumericDate (int).")
-            if t_actual >= p_map['exp']:
+            if t_actual >= p_map['exp'] + leeway:
                 raise ExpirationDateError(f"ERROR_TOKEN_EXPIRADO: El token expiró.")
 
         if 'nbf' in p_map:
             if not isinstance(p_map['nbf'], int):
                 raise InvalidDataTypeError("ERROR_TIPO_DATO_INVALIDO: 'nbf' debe ser NumericDate (int).")
-            if t_actual < p_map['nbf']:
+            if t_actual + leeway < p_map['nbf']:
                 raise NotActiveTokenError("ERROR_TOKEN_NO_ACTIVO: El token aún no es válido.")
 
         if 'iat' in p_map and not isinstance(p_map['iat'], int):
@@ -84,4 +124,28 @@ class SemanticAnalyzer:
             es_list = isinstance(aud, list) and all(isinstance(s, str) for s in aud)
 
             if not (es_string or es_list):
-                raise InvalidDataTypeError("ERROR_TIPO_DATO_INVALIDO: 'aud' debe ser String o Arreglo de Strings.")
\ No newline at end of file
+                raise InvalidDataTypeError("ERROR_TIPO_DATO_INVALIDO: 'aud' debe ser String o Arreglo de Strings.")
+
+    def _validate_policy(self, p_map, t_actual, policy):
+
+        # Incluye los claims que la política restringe: omitirlos no evade la restricción
+        missing = policy.enforced_claims.difference(p_map)
+        if missing:
+            raise MissingClaimError(
+                f"ERROR_CLAIM_FALTANTE: La política '{policy.policy_id}' exige los claims: {', '.join(sorted(missing))}."
+            )
+
+        if policy.issuers is not None and p_map['iss'] not in policy.issuers:
+            raise InvalidValueError(f"ERROR_VALOR_INVALIDO: El emisor '{p_map['iss']}' no es aceptado.")
+
+        if policy.audiences is not None:
+            aud = p_map['aud']
+            if policy.audiences.isdisjoint([aud] if isinstance(aud, str) else aud):
+                raise InvalidValueError("ERROR_VALOR_INVALIDO: Ninguna audiencia del token es aceptada.")
+
+        if policy.max_lifetime is not None:
+            inicio = p_map['iat'] if 'iat' in p_map else t_actual
+            if p_map['exp'] - inicio > policy.max_lifetime + policy.leeway:
+                raise InvalidValueError(
+                    f"ERROR_VALOR_INVALIDO: La vida del token supera el máximo de {policy.max_lifetime} segundos."
+                )
@@ -8,21 +8,44 @@
 ANALIZADOR SINTÁCTICO (PROYECTO JWT)
 -----------------------------------------------------------
 Incluye:
-- Parser JSON manual (parcial) basado en la GLC.
+- Parser JSON manual (parcial) basado en la GLC, en versión recursiva
+  (JSONParser) e iterativa con pila explícita (IterativeJSONParser).
 - Fallback a json.loads por si no funciona el parser manual.
 - Validaciones estructurales del header y payload.
 - typ != "JWT" tratado como error fatal.
+- Límites de tamaño, profundidad y número de claims (ver limits.py).
 """
 
 import json
+import re
+import time
+
+from app.analyzer.limits import DEFAULT_LIMITS, LimitExceededError, reject
+from app.analyzer.results import NO_ERRORS, SyntaxResult
+from app.services.metrics_service import instrument, metrics
 
 class JSONParseError(Exception):
     pass
 
+DIGITS = frozenset('0123456789')
+HEX_DIGITS = frozenset('0123456789abcdefABCDEF')
+SIMPLE_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+STRING_CHUNK = re.compile(r'[^"\\\x00-\x1f]*')
+
 class JSONParser:
-    def __init__(self, text):
+    def __init__(self, text, max_depth=None):
         self.text = text
         self.i = 0
+        self.depth = 0
+        self.max_depth = max_depth
+
+    def enter(self):
+        self.depth += 1
+        if self.max_depth is not None and self.depth > self.max_depth:
+            reject('json_depth', self.depth, self.max_depth)
+
+    def leave(self):
+        self.depth -= 1
 
     def skip_ws(self):
         while self.i < len(self.text) and self.text[self.i] in " \n\t\r":
@@ -46,9 +69,12 @@ class JSONParser:
         c = self.peek()
         if c is None:
             raise JSONParseError("EOF inesperado.")
-        if c == '"': return self.parse_string()
         if c == '{': return self.parse_object()
         if c == '[': return self.parse_array()
+        return self.parse_scalar(c)
+
+    def parse_scalar(self, c):
+        if c == '"': return self.parse_string()
         if c.isdigit() or c == '-': return self.parse_number()
         if self.text.startswith("true", self.i):
             self.i += 4
@@ -66,67 +92,97 @@ class JSONParser:
         if self.peek() != '"':
             raise JSONParseError("Se esperaba inicio de string.")
         self.i += 1
-        out = ""
-        while self.i < len(self.text):
+        parts = []
+        while True:
+            # Tramo sin comillas, escapes ni caracteres de control, en un solo paso
+            chunk = STRING_CHUNK.match(self.text, self.i)
+            if chunk.end() > self.i:
+                parts.append(chunk.group())
+                self.i = chunk.end()
+            if self.i >= len(self.text):
+                raise JSONParseError("String no cerrado.")
             c = self.text[self.i]
             if c == '"':
                 self.i += 1
-                return out
-            if c == '\\':
-                if self.i + 1 >= len(self.text):
-                    raise JSONParseError("Escape incompleto.")
-                nxt = self.text[self.i+1]
-                if nxt in ['"', '\\', '/']:
-                    out += nxt
-                    self.i += 2
-                elif nxt == 'n':
-                    out += '\n'; self.i += 2
-                elif nxt == 't':
-                    out += '\t'; self.i += 2
-                elif nxt == 'r':
-                    out += '\r'; self.i += 2
-                elif nxt == 'u':
-                    hexv = self.text[self.i+2:self.i+6]
-                    if len(hexv) < 4:
-                        raise JSONParseError("Unicode incompleto.")
-                    out += chr(int(hexv, 16))
-                    self.i += 6
-                else:
-                    raise JSONParseError("Escape inválido.")
+                return ''.join(parts)
+            if c != '\\':
+                raise JSONParseError("Carácter de control en string.")
+            if self.i + 1 >= len(self.text):
+                raise JSONParseError("Escape incompleto.")
+            nxt = self.text[self.i+1]
+            if nxt == 'u':
+                parts.append(self.parse_unicode_escape())
+            elif nxt in SIMPLE_ESCAPES:
+                parts.append(SIMPLE_ESCAPES[nxt])
+                self.i += 2
             else:
-                out += c; self.i += 1
-        raise JSONParseError("String no cerrado.")
+                raise JSONParseError("Escape inválido.")
+
+    def read_hex4(self, start):
+        hexv = self.text[start:start+4]
+        if len(hexv) < 4:
+            raise JSONParseError("Unicode incompleto.")
+        if not all(h in HEX_DIGITS for h in hexv):
+            raise JSONParseError("Unicode inválido.")
+        return int(hexv, 16)
+
+    def parse_unicode_escape(self):
+        # \uXXXX; un par de surrogates UTF-16 escapados se combina en un solo carácter
+        code = self.read_hex4(self.i + 2)
+        self.i += 6
+        if 0xD800 <= code <= 0xDBFF and self.text.startswith('\\u', self.i):
+            low = self.read_hex4(self.i + 2)
+            if 0xDC00 <= low <= 0xDFFF:
+                self.i += 6
+                return chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00))
+        return chr(code)
+
+    def read_digits(self):
+        start = self.i
+        while self.i < len(self.text) and self.text[self.i] in DIGITS:
+            self.i += 1
+        if self.i == start:
+            raise JSONParseError("Número inválido.")
 
     def parse_number(self):
+        # Sin skip_ws entre las partes del número: "1 .5" no es un número
         self.skip_ws()
         start = self.i
-        if self.peek() == '-': self.i += 1
-        if not self.peek() or not self.peek().isdigit():
-            raise JSONParseError("Número inválido.")
-        while self.peek() and self.peek().isdigit():
+        text = self.text
+        if text.startswith('-', self.i): self.i += 1
+        if text.startswith('0', self.i):
             self.i += 1
-        if self.peek() == '.':
+        else:
+            self.read_digits()
+        is_float = False
+        if text.startswith('.', self.i):
+            is_float = True
             self.i += 1
-            if not self.peek() or not self.peek().isdigit():
+            try:
+                self.read_digits()
+            except JSONParseError:
                 raise JSONParseError("Decimal inválido.")
-            while self.peek() and self.peek().isdigit():
-                self.i += 1
-        num_str = self.text[start:self.i]
-        try:
-            if '.' in num_str:
-                return float(num_str)
-            return int(num_str)
-        except:
-            raise JSONParseError("Número mal formado.")
+        if self.i < len(text) and text[self.i] in 'eE':
+            is_float = True
+            self.i += 1
+            if self.i < len(text) and text[self.i] in '+-': self.i += 1
+            try:
+                self.read_digits()
+            except JSONParseError:
+                raise JSONParseError("Exponente inválido.")
+        num_str = text[start:self.i]
+        return float(num_str) if is_float else int(num_str)
 
     def parse_object(self):
         self.skip_ws()
         if self.peek() != '{': raise JSONParseError("Se esperaba '{'.")
         self.i += 1
+        self.enter()
         obj = {}
         self.skip_ws()
         if self.peek() == '}':
             self.i += 1
+            self.leave()
             return obj
         while True:
             key = self.parse_string()
@@ -141,16 +197,19 @@ class JSONParser:
                 break
             if self.peek() != ',': raise JSONParseError("Se esperaba ',' o '}'.")
             self.i += 1
+        self.leave()
         return obj
 
     def parse_array(self):
         self.skip_ws()
         if self.peek() != '[': raise JSONParseError("Se esperaba '['.")
         self.i += 1
+        self.enter()
         arr = []
         self.skip_ws()
         if self.peek() == ']':
             self.i += 1
+            self.leave()
             return arr
         while True:
             arr.append(self.parse_value())
@@ -160,67 +219,179 @@ class JSONParser:
                 break
             if self.peek() != ',': raise JSONParseError("Se esperaba ',' o ']'.")
             self.i += 1
+        self.leave()
         return arr
 
 
-def parse_json_manual(text):
-    return JSONParser(text).parse()
+class IterativeJSONParser(JSONParser):
+    """
+    Parser JSON iterativo con pila explícita de contenedores.
+
+    Recorre la misma GLC que JSONParser y produce los mismos resultados y
+    mensajes de error, pero sin un frame de Python por nivel de anidamiento:
+    la profundidad queda limitada solo por max_depth y no por el límite de
+    recursión del intérprete.
+    """
+
+    def parse_value(self):
+        # Cada frame es [contenedor, clave pendiente]; la clave es None en arreglos
+        stack = []
+        while True:
+            # Inicio de un value
+            self.skip_ws()
+            c = self.peek()
+            if c is None:
+                raise JSONParseError("EOF inesperado.")
+            if c == '{':
+                self.i += 1
+                self.enter()
+                self.skip_ws()
+                if self.peek() == '}':
+                    self.i += 1
+                    self.leave()
+                    value = {}
+                else:
+                    stack.append([{}, self.parse_key()])
+                    continue
+            elif c == '[':
+                self.i += 1
+                self.enter()
+                self.skip_ws()
+                if self.peek() == ']':
+                    self.i += 1
+                    self.leave()
+                    value = []
+                else:
+                    stack.append([[], None])
+                    continue
+            else:
+                value = self.parse_scalar(c)
+
+            # Fin de un value: se agrega al contenedor actual, cerrando los que terminen
+            while True:
+                if not stack:
+                    return value
+                frame = stack[-1]
+                container = frame[0]
+                self.skip_ws()
+                if frame[1] is not None:
+                    container[frame[1]] = value
+                    if self.peek() == '}':
+                        self.i += 1
+                        self.leave()
+                        stack.pop()
+                        value = container
+                        continue
+                    if self.peek() != ',': raise JSONParseError("Se esperaba ',' o '}'.")
+                    self.i += 1
+                    frame[1] = self.parse_key()
+                else:
+                    container.append(value)
+                    if self.peek() == ']':
+                        self.i += 1
+                        self.leave()
+                        stack.pop()
+                        value = container
+                        continue
+                    if self.peek() != ',': raise JSONParseError("Se esperaba ',' o ']'.")
+                    self.i += 1
+                break
+
+    def parse_key(self):
+        key = self.parse_string()
+        self.skip_ws()
+        if self.peek() != ':': raise JSONParseError("Se esperaba ':'.")
+        self.i += 1
+        return key
+
 
+def parse_json_manual(text, max_depth=None):
+    return IterativeJSONParser(text, max_depth).parse()
 
-def analyze_syntax(header_str, payload_str):
-    result = {"success": True, "valid": False, "header": None, "payload": None, "errors": []}
+
+def parse_fallback(text, error):
+    # Cada fallback es un doble parseo: se cuenta por motivo y resultado
+    # ('accepted' = el parser manual rechazó JSON válido) y se acumula su tiempo.
+    start = time.perf_counter()
+    outcome = 'rejected'
+    try:
+        value = json.loads(text)
+        outcome = 'accepted'
+        return value
+    finally:
+        metrics.inc('jwt_json_fallback_total', reason=type(error).__name__, outcome=outcome)
+        metrics.inc('jwt_json_fallback_seconds_total', time.perf_counter() - start)
+
+
+def parse_segment(text, limits):
+    # Los límites se verifican antes de parsear y nunca caen al fallback,
+    # para que json.loads no procese una entrada ya rechazada.
+    limits.check_decoded(text)
+    metrics.inc('jwt_json_parse_total')
+    try: value = parse_json_manual(text, limits.max_json_depth)
+    except LimitExceededError: raise
+    except Exception as e: value = parse_fallback(text, e)
+    limits.check_claims(value)
+    return value
+
+
+def analyze_syntax(header_str, payload_str, limits=None):
+    return parse_syntax(header_str, payload_str, limits).to_dict()
+
+
+@instrument('syntax', size=lambda header_str, payload_str, *args, **kwargs: len(header_str) + len(payload_str),
+            error_type=lambda r: None if r.valid else r.error_type or 'SyntaxError')
+def parse_syntax(header_str, payload_str, limits=None):
+    """Igual que analyze_syntax, pero retorna un SyntaxResult (objeto con __slots__)."""
+    limits = limits or DEFAULT_LIMITS
 
     # PARSE HEADER
     try:
-        try: header = parse_json_manual(header_str)
-        except: header = json.loads(header_str)
+        header = parse_segment(header_str, limits)
+    except LimitExceededError as e:
+        return SyntaxResult(False, errors=("Header inválido: " + str(e),), error_type="LimitExceededError")
     except Exception as e:
-        result["errors"].append("Header inválido: " + str(e))
-        return result
+        return SyntaxResult(False, errors=("Header inválido: " + str(e),))
 
     # PARSE PAYLOAD
     try:
-        try: payload = parse_json_manual(payload_str)
-        except: payload = json.loads(payload_str)
+        payload = parse_segment(payload_str, limits)
+    except LimitExceededError as e:
+        return SyntaxResult(False, errors=("Payload inválido: " + str(e),), error_type="LimitExceededError")
     except Exception as e:
-        result["errors"].append("Payload inválido: " + str(e))
-        return result
-
-    result["header"] = header
-    result["payload"] = payload
+        return SyntaxResult(False, errors=("Payload inválido: " + str(e),))
 
     # VALIDACIONES
+    errors = []
     if not isinstance(header, dict):
-        result["errors"].append("Header debe ser objeto JSON.")
+        errors.append("Header debe ser objeto JSON.")
     if not isinstance(payload, dict):
-        result["errors"].append("Payload debe ser objeto JSON.")
+        errors.append("Payload debe ser objeto JSON.")
 
     if "alg" not in header:
-        result["errors"].append("Header faltante 'alg'.")
+        errors.append("Header faltante 'alg'.")
     if "typ" not in header:
-        result["errors"].append("Header faltante 'typ'.")
+        errors.append("Header faltante 'typ'.")
     else:
         if header["typ"] != "JWT":
-            result["errors"].append("Header 'typ' debe ser exactamente 'JWT' (FATAL).")
+            errors.append("Header 'typ' debe ser exactamente 'JWT' (FATAL).")
 
     for t in ("iat", "exp", "nbf"):
         if t in payload and not isinstance(payload[t], int):
-            result["errors"].append(f"Claim '{t}' debe ser entero.")
+            errors.append(f"Claim '{t}' debe ser entero.")
 
     if "aud" in payload:
         aud = payload["aud"]
         if isinstance(aud, list):
             if not all(isinstance(x, str) for x in aud):
-                result["errors"].append("Claim 'aud' debe ser lista de strings.")
+                errors.append("Claim 'aud' debe ser lista de strings.")
         elif not isinstance(aud, str):
-            result["errors"].append("Claim 'aud' debe ser string o lista.")
+            errors.append("Claim 'aud' debe ser string o lista.")
 
     if "permissions" in payload:
         perms = payload["permissions"]
         if not (isinstance(perms, list) and all(isinstance(p, str) for p in perms)):
-            result["errors"].append("Claim 'permissions' debe ser lista de strings.")
-
-    if not result["errors"]:
-        result["valid"] = True
+            errors.append("Claim 'permissions' debe ser lista de strings.")
 
-    return result
+    # Los resultados válidos comparten la tupla vacía NO_ERRORS
+    return SyntaxResult(not errors, header, payload, tuple(errors) if errors else NO_ERRORS)
@@ -0,0 +1,270 @@
+"""
+Módulo de políticas de validación semántica de JWT.
+
+Una política con nombre define los algoritmos permitidos, los claims
+obligatorios, los conjuntos de 'iss' y 'aud' esperados, la vida máxima del
+token y la tolerancia de reloj (leeway). Cada política se compila una sola
+vez en un objeto inmutable con conjuntos `frozenset`, de modo que validar un
+token no implica interpretar la definición de la política, solo pruebas de
+pertenencia y comparaciones de enteros.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, FrozenSet, Mapping, Optional
+
+
+class PolicyError(ValueError):
+    """Se lanza cuando la definición de una política es inválida."""
+    pass
+
+
+class UnknownPolicyError(KeyError):
+    """Se lanza cuando se solicita una política que no está registrada."""
+
+    def __init__(self, policy_id: str):
+        self.policy_id = policy_id
+        super().__init__(policy_id)
+
+    def __str__(self):
+        if not isinstance(self.policy_id, str):
+            return "ERROR_POLITICA_DESCONOCIDA: El id de la política debe ser un String."
+        return f"ERROR_POLITICA_DESCONOCIDA: La política '{self.policy_id}' no está registrada."
+
+
+def _string_set(spec: Mapping[str, Any], name: str) -> Optional[FrozenSet[str]]:
+    value = spec.get(name)
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, (list, tuple, set, frozenset)) or not all(isinstance(v, str) for v in value):
+        raise PolicyError(f"'{name}' debe ser un String o una lista de Strings.")
+    return frozenset(value)
+
+
+def _non_negative_int(spec: Mapping[str, Any], name: str, default: Optional[int]) -> Optional[int]:
+    value = spec.get(name, default)
+    if value is None:
+        return None
+    if type(value) is not int or value < 0:
+        raise PolicyError(f"'{name}' debe ser un entero no negativo.")
+    return value
+
+
+class ValidationPolicy:
+    """
+    Política de validación compilada e inmutable.
+
+    algorithms, required_claims, issuers y audiences son frozensets; issuers y
+    audiences en None significan "cualquier valor". max_lifetime (segundos)
+    en None desactiva el control de vida máxima.
+
+    enforced_claims agrega a required_claims los claims que la política
+    restringe ('iss' con issuers, 'aud' con audiences y 'exp' con
+    max_lifetime): un token que los omite no puede evadir la restricción.
+    """
+
+    FIELDS = ('algorithms', 'required_claims', 'issuers', 'audiences', 'max_lifetime', 'leeway')
+
+    __slots__ = ('policy_id', 'enforced_claims') + FIELDS
+
+    def __init__(self, policy_id: str, algorithms: FrozenSet[str], required_claims: FrozenSet[str] = frozenset(),
+                 issuers: Optional[FrozenSet[str]] = None, audiences: Optional[FrozenSet[str]] = None,
+                 max_lifetime: Optional[int] = None, leeway: int = 0):
+        for name, value in (('policy_id', policy_id), ('algorithms', algorithms),
+                            ('required_claims', required_claims), ('issuers', issuers),
+                            ('audiences', audiences), ('max_lifetime', max_lifetime), ('leeway', leeway)):
+            object.__setattr__(self, name, value)
+        constrained = {claim for claim, constraint in (('iss', issuers), ('aud', audiences), ('exp', max_lifetime))
+                       if constraint is not None}
+        object.__setattr__(self, 'enforced_claims', required_claims.union(constrained))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ValidationPolicy es inmutable.")
+
+    def __repr__(self):
+        return f"ValidationPolicy({self.policy_id!r})"
+
+    @classmethod
+    def compile(cls, policy_id: str, spec: Mapping[str, Any]) -> 'ValidationPolicy':
+        """
+        Valida una definición de política (diccionario) y la compila.
+
+        Claves aceptadas: algorithms (obligatoria), required_claims, issuers,
+        audiences, max_lifetime y leeway.
+        """
+        if not isinstance(policy_id, str) or not policy_id:
+            raise PolicyError("El id de la política debe ser un String no vacío.")
+        if not isinstance(spec, Mapping):
+            raise PolicyError("La política debe ser un objeto JSON.")
+        unknown = set(spec) - set(cls.FIELDS)
+        if unknown:
+            raise PolicyError(f"Campos desconocidos en la política: {', '.join(sorted(unknown))}")
+
+        algorithms = _string_set(spec, 'algorithms')
+        if not algorithms:
+            raise PolicyError("'algorithms' debe contener al menos un algoritmo.")
+
+        return cls(
+            policy_id,
+            algorithms=algorithms,
+            required_claims=_string_set(spec, 'required_claims') or frozenset(),
+            issuers=_string_set(spec, 'issuers'),
+            audiences=_string_set(spec, 'audiences'),
+            max_lifetime=_non_negative_int(spec, 'max_lifetime', None),
+            leeway=_non_negative_int(spec, 'leeway', 0),
+        )
+
+    def as_dict(self) -> Dict[str, Any]:
+        def listed(value):
+            return sorted(value) if value is not None else None
+
+        return {
+            'id': self.policy_id,
+            'algorithms': listed(self.algorithms),
+            'required_claims': listed(self.required_claims),
+            'issuers': listed(self.issuers),
+            'audiences': listed(self.audiences),
+            'max_lifetime': self.max_lifetime,
+            'leeway': self.leeway,
+        }
+
+
+DEFAULT_POLICY_ID = 'default'
+
+# Reglas históricas del analizador: HS256/HS384, sin claims obligatorios ni leeway
+DEFAULT_POLICY = ValidationPolicy.compile(DEFAULT_POLICY_ID, {'algorithms': ['HS256', 'HS384']})
+
+
+class PolicyRegistry:
+    """
+    Registro de políticas compiladas por id.
+
+    Las escrituras reemplazan el diccionario completo (copy-on-write), por lo
+    que las lecturas por solicitud no toman locks.
+
+    Con `store` (por ejemplo DatabaseService) las políticas administradas por
+    API se persisten y se comparten entre workers: register/remove escriben
+    primero en el store, y cada worker recarga las políticas cuando cambia la
+    versión del store, consultándola a lo sumo cada `refresh_seconds`. El
+    store expone load_policies() -> {id: definición o None si se eliminó},
+    save_policy(id, definición), delete_policy(id) y get_policies_version().
+    Sin store los cambios son locales al proceso.
+    """
+
+    def __init__(self, default: ValidationPolicy = DEFAULT_POLICY, store=None, refresh_seconds: float = 5.0):
+        self._lock = threading.Lock()
+        self._policies: Dict[str, ValidationPolicy] = {default.policy_id: default}
+        # Políticas base (por defecto y JWT_POLICIES_FILE), sobre las que se aplica el store
+        self._base: Dict[str, ValidationPolicy] = dict(self._policies)
+        self.store = store
+        self.refresh_seconds = refresh_seconds
+        self._version = None
+        self._checked_at = float('-inf')
+        self._refresh_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, environ: Optional[Mapping[str, str]] = None, store=None) -> 'PolicyRegistry':
+        """
+        Crea el registro y carga las políticas del archivo JSON indicado en
+        JWT_POLICIES_FILE ({"id": {definición}, ...}), si existe. Las del
+        store se cargan con refresh() (y luego cada
+        JWT_POLICIES_REFRESH_SECONDS, si cambió su versión).
+        """
+        environ = os.environ if environ is None else environ
+        registry = cls(store=store, refresh_seconds=float(environ.get('JWT_POLICIES_REFRESH_SECONDS', 5)))
+        path = environ.get('JWT_POLICIES_FILE')
+        if path:
+            with open(path, encoding='utf-8') as f:
+                definitions = json.load(f)
+            if not isinstance(definitions, dict):
+                raise PolicyError(f"{path} debe contener un objeto {{id: política}}.")
+            for policy_id, spec in definitions.items():
+                policy = ValidationPolicy.compile(policy_id, spec)
+                registry._base[policy_id] = policy
+            registry._policies = dict(registry._base)
+        return registry
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Recarga las políticas del store si cambió su versión.
+
+        Retorna True si recargó. Una definición inválida en el store se omite
+        (la política conserva su definición base, si tiene).
+        """
+        if self.store is None:
+            return False
+        # Un solo hilo consulta el store; los demás siguen con las políticas actuales
+        if not self._refresh_lock.acquire(blocking=force):
+            return False
+        try:
+            self._checked_at = time.monotonic()
+            version = self.store.get_policies_version()
+            if version == self._version and not force:
+                return False
+            definitions = self.store.load_policies()
+            policies = dict(self._base)
+            for policy_id, spec in definitions.items():
+                if spec is None:
+                    if policy_id != DEFAULT_POLICY_ID:
+                        policies.pop(policy_id, None)
+                    continue
+                try:
+                    policies[policy_id] = ValidationPolicy.compile(policy_id, spec)
+                except PolicyError:
+                    continue
+            with self._lock:
+                self._policies = policies
+                self._version = version
+            return True
+        finally:
+            self._refresh_lock.release()
+
+    def _maybe_refresh(self) -> None:
+        if self.store is not None and time.monotonic() - self._checked_at >= self.refresh_seconds:
+            try:
+                self.refresh()
+            except Exception:
+                # Store no disponible: se mantienen las políticas actuales y se reintenta en el próximo intervalo
+                pass
+
+    def register(self, policy_id: str, spec: Mapping[str, Any]) -> ValidationPolicy:
+        """Compila y registra (o reemplaza) una política."""
+        policy = ValidationPolicy.compile(policy_id, spec)
+        if self.store is not None:
+            self.store.save_policy(policy_id, spec)
+        with self._lock:
+            policies = dict(self._policies)
+            policies[policy_id] = policy
+            self._policies = policies
+        return policy
+
+    def remove(self, policy_id: str) -> None:
+        if policy_id == DEFAULT_POLICY_ID:
+            raise PolicyError("La política por defecto no se puede eliminar.")
+        self._maybe_refresh()
+        if policy_id not in self._policies:
+            raise UnknownPolicyError(policy_id)
+        if self.store is not None:
+            self.store.delete_policy(policy_id)
+        with self._lock:
+            policies = dict(self._policies)
+            policies.pop(policy_id, None)
+            self._policies = policies
+
+    def get(self, policy_id: Optional[str] = None) -> ValidationPolicy:
+        """Retorna la política `policy_id` (la por defecto si es None)."""
+        if policy_id is not None and not isinstance(policy_id, str):
+            raise UnknownPolicyError(policy_id)
+        self._maybe_refresh()
+        policy = self._policies.get(DEFAULT_POLICY_ID if policy_id is None else policy_id)
+        if policy is None:
+            raise UnknownPolicyError(policy_id)
+        return policy
+
+    def all(self) -> Dict[str, ValidationPolicy]:
+        self._maybe_refresh()
+        return dict(self._policies)
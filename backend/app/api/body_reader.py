@@ -0,0 +1,127 @@
+"""
+Lectura de tokens desde el cuerpo crudo de la solicitud.
+
+Permite enviar tokens sin envoltorio JSON ni codificación en la URL:
+`application/jwt` para un único token y `text/plain` para varios tokens
+separados por saltos de línea. El cuerpo se lee de forma incremental desde
+request.stream, y una línea que supera la longitud máxima se descarta sin
+acumularla en memoria.
+"""
+
+from typing import Iterator, Optional, Tuple
+
+from flask import Request, current_app
+
+from app.services.tracing_service import timed
+
+
+RAW_JWT_MIMETYPE = 'application/jwt'
+RAW_LINES_MIMETYPE = 'text/plain'
+CHUNK_SIZE = 64 * 1024
+
+
+class LimitedRequest(Request):
+    """
+    Solicitud con tope de cuerpo por endpoint.
+
+    Los endpoints de BODY_LIMITS usan su propio límite de ResourceLimits en
+    lugar de MAX_CONTENT_LENGTH (por ejemplo, POST /jobs admite lotes de
+    cientos de MiB sin subir el tope del resto de la API). El tope se aplica
+    también a los cuerpos sin Content-Length (chunked), al leer el stream.
+    """
+
+    BODY_LIMITS = {'api.submit_job': 'max_job_content_length'}
+
+    @property
+    def max_content_length(self) -> Optional[int]:
+        limit = self.BODY_LIMITS.get(self.endpoint)
+        limits = current_app.config.get('JWT_LIMITS') if current_app else None
+        if limit is not None and limits is not None:
+            return getattr(limits, limit)
+        return super().max_content_length
+
+
+def _decode(line: bytes) -> str:
+    return line.strip().decode('utf-8', errors='replace')
+
+
+@timed('parse')
+def read_raw_token(stream, max_length: int) -> Tuple[Optional[str], int]:
+    """
+    Lee un único token de un cuerpo `application/jwt`.
+
+    Retorna (token, longitud). Si el cuerpo supera max_length (sin contar
+    espacios finales) el token es None y la longitud es la leída.
+    """
+    data = stream.read(max_length + 3)
+    # Bytes de contenido después de data; los espacios finales solo se suman si les sigue contenido
+    extra = 0
+    trailing = 0
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        content = len(chunk.rstrip())
+        if content:
+            extra += trailing + content
+            trailing = len(chunk) - content
+        else:
+            trailing += len(chunk)
+    if extra:
+        return None, len(data.lstrip()) + extra
+    if len(data.strip()) > max_length:
+        return None, len(data.strip())
+    token = _decode(data)
+    return token, len(token)
+
+
+def iter_raw_tokens(stream, max_length: int, chunk_size: int = CHUNK_SIZE) -> Iterator[Tuple[Optional[str], int]]:
+    """
+    Itera los tokens de un cuerpo `text/plain` (un token por línea).
+
+    Produce (token, longitud) por cada línea no vacía; si la línea supera
+    max_length el token es None y no se conserva en memoria.
+    """
+    pending = bytearray()
+    discarding = False
+    discarded = 0
+
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        start = 0
+        while True:
+            newline = chunk.find(b'\n', start)
+            end = len(chunk) if newline == -1 else newline
+            piece = chunk[start:end]
+            if discarding:
+                discarded += len(piece)
+            else:
+                pending += piece
+                if len(pending) > max_length + 1:
+                    # Línea demasiado larga: se descarta el resto sin acumularlo
+                    discarding = True
+                    discarded = len(pending)
+                    pending.clear()
+            if newline == -1:
+                break
+            if discarding:
+                yield None, discarded
+                discarding = False
+                discarded = 0
+            else:
+                line = bytes(pending).strip()
+                pending.clear()
+                if line:
+                    token = _decode(line)
+                    yield (token, len(token)) if len(line) <= max_length else (None, len(line))
+            start = newline + 1
+
+    if discarding:
+        yield None, discarded
+    else:
+        line = bytes(pending).strip()
+        if line:
+            token = _decode(line)
+            yield (token, len(token)) if len(line) <= max_length else (None, len(line))
@@ -5,11 +5,16 @@ Define los endpoints REST para el análisis léxico, decodificación, sintactico
 Se aplica como interfaz HTTP para el frontend y clientes externos.
 """
 
-from flask import Blueprint, jsonify, request
+import hashlib
+import hmac
+import json
+
+from flask import Blueprint, Response, current_app, jsonify, request, send_file
+from app.analyzer.limits import DEFAULT_LIMITS, LimitExceededError, reject
 from app.analyzer.lexical_analyzer import JWTLexer
 from app.analyzer.decoder_json import get_decoded_strings
 from app.analyzer.encoder import encode_jwt
-from app.analyzer.crypto_verifier import verify_jwt_signature
+from app.analyzer.crypto_verifier import verify_jwt_signature, verify_signature_fast
 from app.analyzer.semantic_analyzer import (
     SemanticAnalyzer,
     SemanticError,
@@ -17,15 +22,145 @@ from app.analyzer.semantic_analyzer import (
     InvalidDataTypeError,
     InvalidValueError,
     ExpirationDateError,
-    NotActiveTokenError
+    NotActiveTokenError,
+    ReplayedTokenError
 )
 from app.analyzer.syntactic_analyzer import analyze_syntax
+from app.analyzer.pipeline import InvalidDepthError, analyze_token, check_depth
+from app.analyzer.validation_policy import PolicyError, PolicyRegistry, UnknownPolicyError
+from app.api.body_reader import RAW_JWT_MIMETYPE, RAW_LINES_MIMETYPE, read_raw_token, iter_raw_tokens
+from app.services.change_feed_service import TooManySubscribersError, change_notifier
 from app.services.database_service import DatabaseService
+from app.services.job_service import JobQueueFullError, UnknownJobError
+from app.services.metrics_service import metrics
 
 
 api_bp = Blueprint('api', __name__)
 jwt_lexer = JWTLexer()
 semantic_analyzer = SemanticAnalyzer()
+default_policies = PolicyRegistry()
+
+
+def get_limits():
+    """Retorna los límites de recursos configurados en la aplicación."""
+    return current_app.config.get('JWT_LIMITS', DEFAULT_LIMITS)
+
+
+def get_policies():
+    """Retorna el registro de políticas de validación de la aplicación."""
+    return current_app.config.get('JWT_POLICIES') or default_policies
+
+
+def admin_denied_response():
+    """
+    Verifica el token de administración (Authorization: Bearer <JWT_ADMIN_TOKEN>).
+    
+    Retorna None si la solicitud está autorizada, o la respuesta de error.
+    Sin JWT_ADMIN_TOKEN configurado los endpoints de administración quedan
+    deshabilitados.
+    """
+    admin_token = current_app.config.get('JWT_ADMIN_TOKEN')
+    if not admin_token:
+        return jsonify({
+            'success': False,
+            'error': 'Administración deshabilitada: configure JWT_ADMIN_TOKEN.'
+        }), 403
+    supplied = request.headers.get('Authorization', '').encode('utf-8')
+    if not hmac.compare_digest(supplied, f'Bearer {admin_token}'.encode('utf-8')):
+        return jsonify({
+            'success': False,
+            'error': 'Token de administración inválido.'
+        }), 401
+    return None
+
+
+def limit_exceeded_response(error):
+    """Respuesta 413 uniforme para entradas que superan los límites."""
+    return jsonify({
+        'success': False,
+        'error': str(error),
+        'error_type': 'LimitExceededError'
+    }), 413
+
+
+def invalid_depth_response(error):
+    """Respuesta 400 para una profundidad de análisis desconocida."""
+    return jsonify({
+        'success': False,
+        'error': str(error),
+        'error_type': 'InvalidDepthError'
+    }), 400
+
+
+def oversized_token_result(length, limits):
+    """Resultado léxico para un token crudo descartado por superar la longitud máxima."""
+    try:
+        reject('token_length', length, limits.max_token_length)
+    except LimitExceededError as e:
+        return {
+            'valid': False,
+            'tokens': [],
+            'error': str(e),
+            'error_type': 'LimitExceededError'
+        }
+
+
+def conditional_response(payload, etag, cache_control):
+    """
+    Respuesta JSON con ETag fuerte y Cache-Control.
+    
+    Si la solicitud trae If-None-Match con el mismo ETag responde 304 sin
+    cuerpo; `payload` puede ser una función para no construir el cuerpo en
+    ese caso.
+    """
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify(payload() if callable(payload) else payload)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+
+def lexical_etag(jwt, limits):
+    """ETag del análisis léxico: depende solo del token y de los límites configurados."""
+    digest = hashlib.sha256(f"{jwt}\x00{limits.fingerprint()}".encode('utf-8')).hexdigest()
+    return f"lex-{digest[:32]}"
+
+
+def get_result_cache():
+    """Retorna la cache de resultados compartida entre workers (None si está deshabilitada)."""
+    return current_app.config.get('JWT_RESULT_CACHE')
+
+
+def analyze_lexical_cached(token, limits):
+    """
+    Análisis léxico servido desde la cache compartida cuando está habilitada.
+    
+    Solo se cachea el análisis léxico: verificar una firma HMAC cuesta menos
+    que una consulta a la cache (ver tools/bench_result_cache.py).
+    """
+    cache = get_result_cache()
+    if cache is None:
+        return jwt_lexer.analyze(token, limits)
+    return cache.get_or_compute(
+        'lexical', (token, limits.fingerprint()), lambda: jwt_lexer.analyze(token, limits)
+    )
+
+
+@api_bp.before_request
+def reject_oversized_body():
+    """
+    Rechaza en O(1) los cuerpos cuyo Content-Length supera MAX_CONTENT_LENGTH
+    (o el tope propio del endpoint, ver body_reader.LimitedRequest).
+    
+    Se aplica antes de leer el cuerpo, para que ningún endpoint llegue a
+    parsear una solicitud que de todos modos sería rechazada.
+    """
+    max_length = request.max_content_length
+    if max_length is not None and request.content_length is not None and request.content_length > max_length:
+        metrics.inc('jwt_limit_rejections_total', limit='content_length')
+        return limit_exceeded_response(LimitExceededError('content_length', request.content_length, max_length))
 
 @api_bp.route('/analyze/lexical/<string:jwt>', methods=['GET'])
 def analyze_jwt(jwt):
@@ -34,9 +169,68 @@ def analyze_jwt(jwt):
     
     Recibe un JWT en la URL y retorna el resultado del análisis léxico (Fase 1).
     Se aplica como primer paso en el proceso de análisis de JWT.
+    
+    El resultado es determinista, por lo que se responde con ETag y un
+    If-None-Match coincidente recibe 304 sin volver a analizar el token.
     """
     try:
-        result = jwt_lexer.analyze(jwt)
+        limits = get_limits()
+        etag = lexical_etag(jwt, limits)
+        if request.if_none_match.contains_weak(etag):
+            return conditional_response(None, etag, 'private, max-age=300')
+        result = analyze_lexical_cached(jwt, limits)
+        if result.get('error_type') == 'LimitExceededError':
+            return limit_exceeded_response(result['error'])
+        return conditional_response({
+            'success': True,
+            'result': result
+        }, etag, 'private, max-age=300')
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@api_bp.route('/analyze/lexical', methods=['POST'])
+def analyze_jwt_raw():
+    """
+    Endpoint para análisis léxico con el token en el cuerpo de la solicitud.
+    
+    Acepta `application/jwt` (un token, misma respuesta que la versión GET),
+    `text/plain` (un token por línea, responde una lista de resultados en
+    el mismo orden) o JSON con el campo "jwt". Evita la codificación en la
+    URL y los límites de longitud de URL de los proxies.
+    """
+    try:
+        limits = get_limits()
+        
+        if request.mimetype == RAW_LINES_MIMETYPE:
+            results = [
+                jwt_lexer.analyze(token, limits) if token is not None else oversized_token_result(length, limits)
+                for token, length in iter_raw_tokens(request.stream, limits.max_token_length)
+            ]
+            return jsonify({
+                'success': True,
+                'count': len(results),
+                'results': results
+            })
+        
+        if request.mimetype == RAW_JWT_MIMETYPE:
+            token, length = read_raw_token(request.stream, limits.max_token_length)
+            if token is None:
+                return limit_exceeded_response(oversized_token_result(length, limits)['error'])
+        else:
+            data = request.get_json(silent=True)
+            if not isinstance(data, dict) or not isinstance(data.get('jwt'), str):
+                return jsonify({
+                    'success': False,
+                    'error': 'Se esperaba un cuerpo application/jwt, text/plain o JSON con el campo "jwt"'
+                }), 400
+            token = data['jwt']
+        
+        result = analyze_lexical_cached(token, limits)
+        if result.get('error_type') == 'LimitExceededError':
+            return limit_exceeded_response(result['error'])
         return jsonify({
             'success': True,
             'result': result
@@ -47,6 +241,66 @@ def analyze_jwt(jwt):
             'error': str(e)
         }), 500
 
+@api_bp.route('/analyze/full', methods=['POST'])
+def analyze_jwt_full():
+    """
+    Endpoint de análisis completo de un JWT en una sola solicitud.
+    
+    Ejecuta las fases léxica, de decodificación, sintáctica, semántica y, si
+    se envía la clave secreta, criptográfica, deteniéndose en la primera que
+    falla. Acepta `application/jwt` (clave en la cabecera `X-JWT-Secret`) o
+    JSON {"jwt", "secret", "policy", "depth"}. Reemplaza la cadena de solicitudes
+    lexical → decoder → syntax → semantic de los clientes.
+    
+    depth (o ?depth=) es la última fase a ejecutar: lexical, decode, syntax,
+    semantic o crypto (por defecto).
+    """
+    try:
+        limits = get_limits()
+        if request.mimetype == RAW_JWT_MIMETYPE:
+            token, length = read_raw_token(request.stream, limits.max_token_length)
+            if token is None:
+                return limit_exceeded_response(oversized_token_result(length, limits)['error'])
+            data = {'jwt': token, 'secret': request.headers.get('X-JWT-Secret')}
+        else:
+            data = request.get_json(silent=True)
+            if not isinstance(data, dict) or not isinstance(data.get('jwt'), str):
+                return jsonify({
+                    'success': False,
+                    'error': 'Se esperaba un cuerpo application/jwt o JSON con el campo "jwt"'
+                }), 400
+        
+        secret = data.get('secret')
+        if secret is not None and not isinstance(secret, str):
+            return jsonify({
+                'success': False,
+                'error': 'El campo "secret" debe ser un string'
+            }), 400
+        
+        policy = get_policies().get(data.get('policy') or request.args.get('policy'))
+        depth = check_depth(data.get('depth') or request.args.get('depth'))
+        result = analyze_token(data['jwt'], secret, limits, policy, current_app.config.get('JWT_REVOCATION_LIST'),
+                               depth)
+        if result['error_type'] == 'LimitExceededError':
+            return limit_exceeded_response(result['error'])
+        return jsonify({
+            'success': True,
+            'result': result
+        })
+    except UnknownPolicyError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'error_type': 'UnknownPolicyError'
+        }), 400
+    except InvalidDepthError as e:
+        return invalid_depth_response(e)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @api_bp.route('/analyze/decoder', methods=['POST'])
 def analyze_jwt_decoder():
     """
@@ -71,12 +325,14 @@ def analyze_jwt_decoder():
                 'error': 'El JSON debe contener el resultado del análisis léxico con "header" y "payload"'
             }), 400
         
-        result = get_decoded_strings(data)
+        result = get_decoded_strings(data, get_limits())
         
         return jsonify({
             'success': True,
             'result': result
         })
+    except LimitExceededError as e:
+        return limit_exceeded_response(e)
     except Exception as e:
         return jsonify({
             'success': False,
@@ -114,17 +370,35 @@ def analyze_jwt_semantic():
                 'error': 'Los campos "header" y "payload" deben ser diccionarios'
             }), 400
         
+        limits = get_limits()
+        limits.check_claims(header_map)
+        limits.check_claims(payload_map)
+        
+        # Política de validación: campo "policy" del cuerpo o ?policy=
+        policy = get_policies().get(data.get('policy') or request.args.get('policy'))
+        
         # Realizar análisis semántico
-        result = semantic_analyzer.analyze(header_map, payload_map)
+        result = semantic_analyzer.analyze(
+            header_map, payload_map, current_app.config.get('JWT_REPLAY_DETECTOR'), policy
+        )
         
         return jsonify({
             'success': True,
             'result': {
                 'header': result[0],
                 'payload': result[1],
-                'valid': True
+                'valid': True,
+                'policy': policy.policy_id
             }
         })
+    except LimitExceededError as e:
+        return limit_exceeded_response(e)
+    except UnknownPolicyError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'error_type': 'UnknownPolicyError'
+        }), 400
     except MissingClaimError as e:
         return jsonify({
             'success': False,
@@ -155,6 +429,12 @@ def analyze_jwt_semantic():
             'error': str(e),
             'error_type': 'NotActiveTokenError'
         }), 400
+    except ReplayedTokenError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'error_type': 'ReplayedTokenError'
+        }), 400
     except SemanticError as e:
         return jsonify({
             'success': False,
@@ -226,6 +506,24 @@ def encode_jwt_endpoint():
             'error': str(e)
         }), 500
 
+def verify_only_response(jwt_token, secret):
+    """Respuesta de la verificación rápida de firma (?verify_only=true)."""
+    decode_payload = request.args.get('payload', 'false').lower() in ('true', '1', 'yes')
+    result = verify_signature_fast(
+        jwt_token, secret, get_limits(), current_app.config.get('JWT_REVOCATION_LIST'), decode_payload
+    )
+    if result.error_type == 'LimitExceededError':
+        return limit_exceeded_response(result.error)
+
+    response = {'success': True, 'valid': result.valid, 'algorithm': result.algorithm}
+    if decode_payload and result.valid:
+        response['payload'] = result.payload
+    if not result.valid:
+        response['error'] = result.error
+        response['error_type'] = result.error_type
+    return jsonify(response), 200 if result.valid else 400
+
+
 @api_bp.route('/analyze/crypto-verification', methods=['POST'])
 def verify_jwt_crypto():
     """
@@ -234,9 +532,24 @@ def verify_jwt_crypto():
     Recibe un JWT completo y una clave secreta. Recalcula la firma digital
     basándose en el contenido del header y payload y la compara con la firma
     adjunta en el token, validando así la integridad criptográfica.
+    
+    Además del cuerpo JSON acepta el token crudo como `application/jwt`,
+    con la clave secreta en la cabecera `X-JWT-Secret`.
+
+    Con `?verify_only=true` usa la verificación rápida (verify_signature_fast):
+    responde solo valid y algorithm, sin header ni cache, y el payload
+    únicamente si además se pide `?payload=true`.
     """
     try:
-        data = request.get_json()
+        if request.mimetype == RAW_JWT_MIMETYPE:
+            token, length = read_raw_token(request.stream, get_limits().max_token_length)
+            if token is None:
+                return limit_exceeded_response(oversized_token_result(length, get_limits())['error'])
+            data = {'jwt': token}
+            if 'X-JWT-Secret' in request.headers:
+                data['secret'] = request.headers['X-JWT-Secret']
+        else:
+            data = request.get_json()
         
         if not data:
             return jsonify({
@@ -271,8 +584,16 @@ def verify_jwt_crypto():
                 'error': 'El campo "secret" debe ser un string'
             }), 400
         
+        if request.args.get('verify_only', 'false').lower() in ('true', '1', 'yes'):
+            return verify_only_response(jwt_token, secret)
+
         # Verificar la firma criptográfica
-        result = verify_jwt_signature(jwt_token, secret)
+        result = verify_jwt_signature(
+            jwt_token, secret, get_limits(), current_app.config.get('JWT_REVOCATION_LIST')
+        )
+        
+        if result.get('error_type') == 'LimitExceededError':
+            return limit_exceeded_response(result['error'])
         
         if result['valid']:
             return jsonify({
@@ -287,6 +608,7 @@ def verify_jwt_crypto():
                 'success': True,
                 'valid': False,
                 'error': result.get('error', 'Verificación fallida'),
+                'error_type': result.get('error_type'),
                 'algorithm': result.get('algorithm'),
                 'header': result.get('header')
             }), 400
@@ -325,7 +647,10 @@ def syntax_analyzer_endpoint():
         payload_str = data["result"][1] # STRING JSON
 
         # Llamar a tu analizador sintáctico
-        result = analyze_syntax(header_str, payload_str)
+        result = analyze_syntax(header_str, payload_str, get_limits())
+
+        if result.get('error_type') == 'LimitExceededError':
+            return limit_exceeded_response(result['errors'][0])
 
         return jsonify({
             'success': True,
@@ -339,45 +664,121 @@ def syntax_analyzer_endpoint():
         }), 500
 
 
+@api_bp.route('/policies', methods=['GET'])
+def list_policies():
+    """
+    Endpoint para listar las políticas de validación registradas.
+    """
+    return jsonify({
+        'success': True,
+        'policies': [policy.as_dict() for policy in get_policies().all().values()]
+    })
+
+@api_bp.route('/policies/<string:policy_id>', methods=['PUT'])
+def register_policy(policy_id):
+    """
+    Endpoint de administración para registrar o reemplazar una política.
+    
+    El cuerpo es la definición de la política (algorithms, required_claims,
+    issuers, audiences, max_lifetime, leeway); se compila una sola vez aquí y
+    queda disponible de inmediato para /analyze/semantic. Con el store de
+    MongoDB se persiste y los demás workers la cargan en a lo sumo
+    JWT_POLICIES_REFRESH_SECONDS.
+    """
+    denied = admin_denied_response()
+    if denied is not None:
+        return denied
+    try:
+        policy = get_policies().register(policy_id, request.get_json(silent=True))
+        return jsonify({
+            'success': True,
+            'policy': policy.as_dict()
+        })
+    except PolicyError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'error_type': 'PolicyError'
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@api_bp.route('/policies/<string:policy_id>', methods=['DELETE'])
+def delete_policy(policy_id):
+    """
+    Endpoint de administración para eliminar una política.
+    """
+    denied = admin_denied_response()
+    if denied is not None:
+        return denied
+    try:
+        get_policies().remove(policy_id)
+        return jsonify({
+            'success': True,
+            'message': f"Política '{policy_id}' eliminada"
+        })
+    except UnknownPolicyError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'error_type': 'UnknownPolicyError'
+        }), 404
+    except PolicyError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'error_type': 'PolicyError'
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+def format_jwt(jwt):
+    """Transforma un documento de la colección JWTS al formato esperado por el frontend."""
+    # Obtener el secreto directamente
+    secreto_valor = jwt.get('secreto')
+    
+    # Construir el diccionario asegurando que secreto siempre esté presente
+    # Usar un valor por defecto si es None para evitar que Flask lo omita
+    formatted_jwt = {
+        'id': str(jwt.get('_id', '')),
+        'token': str(jwt.get('token', '')),
+        'name': str(jwt.get('name', f"JWT {str(jwt.get('_id', ''))[:8]}")),
+        'createdAt': str(jwt.get('createdAt', jwt.get('_id', ''))),
+        'valido': jwt.get('valido'),
+        'secreto': str(secreto_valor) if secreto_valor is not None else '',  # Usar string vacío en lugar de None
+    }
+    
+    # Agregar tipo_error si existe
+    if 'tipo_error' in jwt:
+        formatted_jwt['tipo_error'] = str(jwt['tipo_error'])
+    else:
+        formatted_jwt['tipo_error'] = None
+    
+    return formatted_jwt
+
 @api_bp.route('/jwts', methods=['GET'])
 def get_jwts():
     """
     Endpoint para obtener la lista de todos los JWTs de la base de datos.
     
-    Retorna una lista de JWTs con su información completa.
+    Retorna una lista de JWTs con su información completa. El ETag se deriva
+    de la versión de la colección: con If-None-Match vigente responde 304 sin
+    leer la colección, y la lista formateada se sirve desde la cache
+    read-through mientras no haya escrituras.
     """
     try:
-        jwts = DatabaseService.get_all_jwts()
+        version = DatabaseService.get_collection_version()
         
-        # Transformar los datos al formato esperado por el frontend
-        formatted_jwts = []
-        for jwt in jwts:
-            # Obtener el secreto directamente
-            secreto_valor = jwt.get('secreto')
-            
-            # Construir el diccionario asegurando que secreto siempre esté presente
-            # Usar un valor por defecto si es None para evitar que Flask lo omita
-            formatted_jwt = {
-                'id': str(jwt.get('_id', '')),
-                'token': str(jwt.get('token', '')),
-                'name': str(jwt.get('name', f"JWT {str(jwt.get('_id', ''))[:8]}")),
-                'createdAt': str(jwt.get('createdAt', jwt.get('_id', ''))),
-                'valido': jwt.get('valido'),
-                'secreto': str(secreto_valor) if secreto_valor is not None else '',  # Usar string vacío en lugar de None
-            }
-            
-            # Agregar tipo_error si existe
-            if 'tipo_error' in jwt:
-                formatted_jwt['tipo_error'] = str(jwt['tipo_error'])
-            else:
-                formatted_jwt['tipo_error'] = None
-            
-            formatted_jwts.append(formatted_jwt)
-        
-        return jsonify({
+        return conditional_response(lambda: {
             'success': True,
-            'jwts': formatted_jwts
-        })
+            'jwts': DatabaseService.get_all_jwts_cached(format_jwt, version)
+        }, f"jwts-{version}", 'no-cache')
     except Exception as e:
         # Log del error para debugging
         print(f"Error en get_jwts: {str(e)}")
@@ -390,6 +791,362 @@ def get_jwts():
         }), 500
 
 
+def sse_message(event, data, event_id=None):
+    """Serializa un mensaje Server-Sent Events."""
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'), default=str)}")
+    return '\n'.join(lines) + '\n\n'
+
+
+def change_event_message(change):
+    """Delta de la lista de JWTs en el mismo formato que GET /jwts."""
+    data = {'op': change.op, 'id': change.document_id}
+    if change.document is not None:
+        data['jwt'] = format_jwt(change.document)
+    return sse_message('jwt', data, change.sse_id)
+
+
+@api_bp.route('/jwts/events', methods=['GET'])
+def stream_jwt_events():
+    """
+    Endpoint Server-Sent Events con los cambios de la colección JWTS.
+    
+    Emite un evento 'ready' al conectar, un evento 'jwt' por cada delta
+    ({"op": "insert"|"update"|"delete", "id", "jwt"}) y 'reset' cuando el
+    cliente debe recargar la lista completa. Con Last-Event-ID (reconexión
+    automática de EventSource) reenvía los eventos perdidos. El costo en
+    régimen estable es proporcional a los cambios, no al tamaño de la colección.
+    """
+    try:
+        subscription, replay = change_notifier.subscribe(request.headers.get('Last-Event-ID'))
+    except TooManySubscribersError as e:
+        response = jsonify({
+            'success': False,
+            'error': str(e),
+            'error_type': 'TooManySubscribers'
+        })
+        response.status_code = 503
+        response.headers['Retry-After'] = '30'
+        return response
+    
+    heartbeat = current_app.config.get('JWT_CHANGE_FEED_HEARTBEAT', 15)
+    
+    def generate():
+        try:
+            if replay is None:
+                yield sse_message('reset', {}, change_notifier.last_event_id)
+            else:
+                for change in replay:
+                    yield change_event_message(change)
+            yield sse_message('ready', {'last_event_id': change_notifier.last_event_id})
+            while True:
+                change = subscription.next(heartbeat)
+                if subscription.take_overflow():
+                    yield sse_message('reset', {}, change_notifier.last_event_id)
+                elif change is not None:
+                    yield change_event_message(change)
+                else:
+                    # Comentario SSE: mantiene viva la conexión a través de proxies
+                    yield ': ping\n\n'
+        finally:
+            change_notifier.unsubscribe(subscription)
+    
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@api_bp.route('/jwts/analytics', methods=['GET'])
+def get_jwts_analytics():
+    """
+    Endpoint de analítica sobre la colección de JWTs.
+    
+    Por defecto responde desde los contadores incrementales (sin recorrer la
+    colección). Con ?full=true agrega la distribución de 'exp' y los conteos
+    recalculados con pipelines de agregación en MongoDB.
+    """
+    try:
+        response = {
+            'success': True,
+            'source': 'counters',
+            'summary': DatabaseService.get_stats_summary()
+        }
+        
+        if request.args.get('full', 'false').lower() in ('true', '1', 'yes'):
+            response['source'] = 'aggregate'
+            response['analytics'] = DatabaseService.get_aggregated_analytics()
+        
+        return jsonify(response)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+def get_jobs():
+    """Retorna el administrador de trabajos por lotes de la aplicación."""
+    return current_app.config['JWT_JOBS']
+
+
+def unknown_job_response(error):
+    return jsonify({
+        'success': False,
+        'error': str(error),
+        'error_type': 'UnknownJobError'
+    }), 404
+
+
+@api_bp.route('/jobs', methods=['POST'])
+def submit_job():
+    """
+    Endpoint para encolar un trabajo de análisis por lotes.
+    
+    Acepta JSON {"kind": "analyze", "tokens": [...], "secret", "policy", "depth"},
+    JSON {"kind": "reverify", "policy", "depth"} (re-verifica la colección JWTS
+    con el secreto guardado de cada token) o `text/plain` con un token por
+    línea (?policy= y ?depth=). depth es la última fase a ejecutar.
+    Responde 202 con el estado del trabajo y su URL en Location; el progreso
+    se consulta en GET /jobs/<id> y los resultados en /jobs/<id>/results.
+    
+    El cuerpo admite hasta JWT_MAX_JOB_CONTENT_LENGTH bytes. "reverify" usa
+    los secretos guardados, por lo que requiere el token de administración.
+    """
+    try:
+        limits = get_limits()
+        if request.mimetype == RAW_LINES_MIMETYPE:
+            data = {'kind': 'analyze', 'policy': request.args.get('policy'), 'depth': request.args.get('depth')}
+            data['tokens'] = [
+                token if token is not None else {
+                    'valid': False,
+                    'phase': 'lexical',
+                    'error_type': 'LimitExceededError',
+                    'error': oversized_token_result(length, limits)['error']
+                }
+                for token, length in iter_raw_tokens(request.stream, limits.max_token_length)
+            ]
+            if 'X-JWT-Secret' in request.headers:
+                data['secret'] = request.headers['X-JWT-Secret']
+        else:
+            data = request.get_json(silent=True)
+            if not isinstance(data, dict):
+                return jsonify({
+                    'success': False,
+                    'error': 'Se esperaba un cuerpo JSON o text/plain con un token por línea'
+                }), 400
+        
+        kind = data.get('kind', 'analyze')
+        policy_id = data.get('policy')
+        if policy_id is not None and not isinstance(policy_id, str):
+            return jsonify({
+                'success': False,
+                'error': 'El campo "policy" debe ser un string'
+            }), 400
+        options = {
+            'limits': limits,
+            'policy': get_policies().get(policy_id),
+            'revocation_list': current_app.config.get('JWT_REVOCATION_LIST'),
+            'depth': check_depth(data.get('depth')),
+        }
+        
+        if kind == 'analyze':
+            tokens = data.get('tokens')
+            secret = data.get('secret')
+            if not isinstance(tokens, list) or not all(isinstance(t, (str, dict)) for t in tokens):
+                return jsonify({
+                    'success': False,
+                    'error': 'El campo "tokens" debe ser una lista de strings'
+                }), 400
+            if secret is not None and not isinstance(secret, str):
+                return jsonify({
+                    'success': False,
+                    'error': 'El campo "secret" debe ser un string'
+                }), 400
+            if request.mimetype != RAW_LINES_MIMETYPE and not all(isinstance(t, str) for t in tokens):
+                return jsonify({
+                    'success': False,
+                    'error': 'El campo "tokens" debe ser una lista de strings'
+                }), 400
+            job = get_jobs().submit_tokens(tokens, secret, **options)
+        elif kind == 'reverify':
+            denied = admin_denied_response()
+            if denied is not None:
+                return denied
+            job = get_jobs().submit_reverify(**options)
+        else:
+            return jsonify({
+                'success': False,
+                'error': 'El campo "kind" debe ser "analyze" o "reverify"'
+            }), 400
+        
+        response = jsonify({
+            'success': True,
+            'job': job.as_dict()
+        })
+        response.status_code = 202
+        response.headers['Location'] = f"{request.script_root}{request.path}/{job.job_id}"
+        return response
+    except UnknownPolicyError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'error_type': 'UnknownPolicyError'
+        }), 400
+    except LimitExceededError as e:
+        return limit_exceeded_response(e)
+    except InvalidDepthError as e:
+        return invalid_depth_response(e)
+    except JobQueueFullError as e:
+        response = jsonify({
+            'success': False,
+            'error': str(e),
+            'error_type': 'JobQueueFullError'
+        })
+        response.status_code = 503
+        response.headers['Retry-After'] = '30'
+        return response
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@api_bp.route('/jobs', methods=['GET'])
+def list_jobs():
+    """
+    Endpoint para listar los trabajos conservados (de todos los workers que
+    comparten el almacén).
+    """
+    return jsonify({
+        'success': True,
+        'jobs': [job.as_dict() for job in get_jobs().list()]
+    })
+
+@api_bp.route('/jobs/<string:job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Endpoint con el estado y el progreso de un trabajo.
+    """
+    try:
+        return jsonify({
+            'success': True,
+            'job': get_jobs().get(job_id).as_dict()
+        })
+    except UnknownJobError as e:
+        return unknown_job_response(e)
+
+@api_bp.route('/jobs/<string:job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """
+    Endpoint para cancelar un trabajo.
+    
+    Un trabajo en cola no llega a ejecutarse; uno en ejecución se detiene
+    tras el token en curso y conserva los resultados ya calculados. Si lo
+    ejecuta otro worker, se detiene en su próximo bloque o heartbeat.
+    """
+    try:
+        return jsonify({
+            'success': True,
+            'job': get_jobs().cancel(job_id).as_dict()
+        })
+    except UnknownJobError as e:
+        return unknown_job_response(e)
+
+@api_bp.route('/jobs/<string:job_id>/results', methods=['GET'])
+def get_job_results(job_id):
+    """
+    Endpoint con una página de resultados de un trabajo (?offset=0&limit=100).
+    
+    Los resultados están disponibles a medida que el trabajo avanza, en el
+    orden de los tokens de entrada.
+    """
+    try:
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        limit = min(max(request.args.get('limit', 100, type=int), 1), 1000)
+        jobs = get_jobs()
+        results = jobs.results_page(job_id, offset, limit)
+        return jsonify({
+            'success': True,
+            'offset': offset,
+            'limit': limit,
+            'available': jobs.results_count(job_id),
+            'status': jobs.get(job_id).status,
+            'results': results
+        })
+    except UnknownJobError as e:
+        return unknown_job_response(e)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@api_bp.route('/jobs/<string:job_id>/results.ndjson', methods=['GET'])
+def stream_job_results(job_id):
+    """
+    Endpoint que descarga todos los resultados disponibles como NDJSON
+    (un resultado por línea), en streaming y sin armar la lista en memoria.
+    """
+    try:
+        lines = get_jobs().iter_result_lines(job_id)
+    except UnknownJobError as e:
+        return unknown_job_response(e)
+    response = Response(lines, mimetype='application/x-ndjson')
+    response.headers['Content-Disposition'] = f'attachment; filename="{job_id}.ndjson"'
+    return response
+
+@api_bp.route('/jobs/<string:job_id>/results.parquet', methods=['GET'])
+def download_job_results_parquet(job_id):
+    """
+    Endpoint que descarga los resultados de un trabajo terminado en Parquet.
+    
+    Una fila por token con validez, tipo de error, alg/iss/sub (columnas
+    tipo diccionario), iat/exp/nbf y tamaños de segmento. Requiere pyarrow.
+    """
+    try:
+        path = get_jobs().columnar_parquet_path(job_id)
+    except UnknownJobError as e:
+        return unknown_job_response(e)
+    except RuntimeError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 501
+    if path is None:
+        return jsonify({
+            'success': False,
+            'error': 'Los resultados columnares están disponibles cuando el trabajo termina.'
+        }), 409
+    return send_file(path, mimetype='application/vnd.apache.parquet', as_attachment=True,
+                     download_name=f"{job_id}.parquet")
+
+
+@api_bp.route('/cache/stats', methods=['GET'])
+def get_result_cache_stats():
+    """
+    Endpoint con el estado de la cache de resultados compartida: entradas,
+    capacidad y aciertos/fallos sumados de todos los workers.
+    """
+    cache = get_result_cache()
+    if cache is None:
+        return jsonify({
+            'success': True,
+            'enabled': False
+        })
+    try:
+        return jsonify({
+            'success': True,
+            'enabled': True,
+            'cache': cache.stats()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
 @api_bp.route('/health', methods=['GET'])
 def health_check():
     """
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+TEST DEL CONTROL DE ADMISIÓN (PROYECTO JWT)
+-------------------------------------------
+Prueba que AdmissionController no consume tokens ni lugares de concurrencia
+cuando otro límite rechaza la solicitud.
+"""
+
+import os
+import sys
+
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from flask import Flask
+
+from app.services.admission_service import AdmissionController, LaneConfig, PRIORITY_LANE, STANDARD_LANE
+
+fallos = []
+
+
+def check(name, condition, detail=''):
+    if condition:
+        print("[OK]", name)
+    else:
+        print("[ERROR]", name, detail)
+        fallos.append(name)
+
+
+def controller(client_burst=2, endpoint_burst=100, max_concurrency=4):
+    # Tasas mínimas: los buckets no se recargan durante la prueba
+    lane = LaneConfig(client_rate=1e-6, client_burst=client_burst, endpoint_rate=1e-6,
+                      endpoint_burst=endpoint_burst, max_concurrency=max_concurrency)
+    return AdmissionController({STANDARD_LANE: lane, PRIORITY_LANE: lane})
+
+
+app = Flask(__name__)
+
+print("\n=====================")
+print("ORDEN DE LOS LÍMITES")
+print("=====================")
+
+with app.test_request_context(environ_base={'REMOTE_ADDR': '10.0.0.1'}):
+    # Concurrencia agotada: el bucket del cliente no se toca
+    admission = controller(client_burst=2, max_concurrency=1)
+    check("primera admitida", admission.admit('api.x')[0] is None)
+    rejected = [admission.admit('api.x')[0] for _ in range(5)]
+    check("rechazos por concurrencia", rejected == ['concurrency'] * 5, rejected)
+    admission.release(STANDARD_LANE)
+    check("el cliente conserva su token", admission.admit('api.x')[0] is None)
+    admission.release(STANDARD_LANE)
+
+    # Endpoint agotado: se devuelven el token del cliente y el lugar del semáforo
+    admission = controller(client_burst=2, endpoint_burst=1, max_concurrency=1)
+    check("endpoint: primera admitida", admission.admit('api.a')[0] is None)
+    admission.release(STANDARD_LANE)
+    rejected = [admission.admit('api.a')[0] for _ in range(5)]
+    check("rechazos por endpoint", rejected == ['endpoint_rate'] * 5, rejected)
+    check("otro endpoint admitido", admission.admit('api.b')[0] is None)
+    admission.release(STANDARD_LANE)
+
+    # Cliente agotado: libera el lugar del semáforo
+    admission = controller(client_burst=1, max_concurrency=1)
+    admission.admit('api.x')
+    admission.release(STANDARD_LANE)
+    check("rechazo por cliente", admission.admit('api.x')[0] == 'client_rate')
+    check("semáforo libre tras el rechazo", admission._semaphores[STANDARD_LANE].acquire(blocking=False))
+
+print("\n=====================")
+print("CARRILES")
+print("=====================")
+
+admission = controller()
+check("health prioritario", admission.lane_for('api.health_check') == PRIORITY_LANE)
+check("GET léxico prioritario", admission.lane_for('api.analyze_jwt') == PRIORITY_LANE)
+check("application/jwt prioritario", admission.lane_for('api.analyze_jwt_raw', 'application/jwt') == PRIORITY_LANE)
+check("lote text/plain estándar", admission.lane_for('api.analyze_jwt_raw', 'text/plain') == STANDARD_LANE)
+check("JSON estándar", admission.lane_for('api.analyze_jwt_raw', 'application/json') == STANDARD_LANE)
+check("otro endpoint con application/jwt estándar",
+      admission.lane_for('api.verify_jwt_crypto', 'application/jwt') == STANDARD_LANE)
+
+# Los lotes agotan el carril estándar sin quitar capacidad a los tokens sueltos
+admission = controller(max_concurrency=1)
+with app.test_request_context(environ_base={'REMOTE_ADDR': '10.0.0.2'}):
+    check("lote admitido", admission.admit('api.analyze_jwt_raw', 'text/plain') == (None, 0.0, STANDARD_LANE))
+    check("segundo lote: concurrencia",
+          admission.admit('api.analyze_jwt_raw', 'text/plain')[0] == 'concurrency')
+    check("token suelto con el carril estándar lleno",
+          admission.admit('api.analyze_jwt_raw', 'application/jwt') == (None, 0.0, PRIORITY_LANE))
+
+print("\n=====================")
+print("PRUEBAS COMPLETADAS:", "con errores: " + ", ".join(fallos) if fallos else "sin errores")
+print("=====================")
+sys.exit(1 if fallos else 0)
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+TEST DEL ANALIZADOR LÉXICO POR LOTES (PROYECTO JWT)
+---------------------------------------------------
+Prueba que BatchJWTLexer produce, token por token, exactamente el mismo
+resultado que JWTLexer: tokens válidos, formatos inválidos, caracteres no
+ASCII y rechazos por límites de recursos, con lista o buffer empaquetado.
+"""
+
+import os
+import random
+import sys
+
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from app.analyzer.batch_lexer import BatchJWTLexer, pack_tokens
+from app.analyzer.encoder import encode_jwt
+from app.analyzer.lexical_analyzer import JWTLexer
+from app.analyzer.limits import ResourceLimits
+
+fallos = []
+
+
+def check(name, condition, detail=''):
+    if condition:
+        print("[OK]", name)
+    else:
+        print("[ERROR]", name, detail)
+        fallos.append(name)
+
+
+def differences(batch_lexer, lexer, tokens, result=None):
+    result = result or batch_lexer.analyze_batch(tokens)
+    return [(t, result.result(i), lexer.analyze(t)) for i, t in enumerate(tokens)
+            if result.result(i) != lexer.analyze(t)]
+
+
+token = encode_jwt({'alg': 'HS256', 'typ': 'JWT'}, {'sub': 'x', 'n': 1}, 'clave')
+h, p, s = token.split('.')
+cases = [
+    token, f"{h}.{p}.{s}", 'a.b.c', '', '.', '..', 'a..c', '.b.c', 'a.b.', 'a.b', 'a.b.c.d',
+    f"{h}.{p}", f"{token}.extra", token[:10] + '+' + token[11:], token[:10] + '=' + token[11:],
+    f"{h}.{p}.{s}ñ", 'ñ.b.c', 'a.€.c', 'a.b.c ', ' a.b.c', 'a-_.b-_.c-_',
+]
+
+print("\n=====================")
+print("EQUIVALENCIA")
+print("=====================")
+
+lexer, batch_lexer = JWTLexer(), BatchJWTLexer()
+diff = differences(batch_lexer, lexer, cases)
+check("casos borde", not diff, diff[:3])
+result = batch_lexer.analyze_batch(cases)
+check("valid_count", result.valid_count == sum(lexer.analyze(t)['valid'] for t in cases), result.valid_count)
+check("arreglo valid", result.valid.tolist() == [lexer.analyze(t)['valid'] for t in cases])
+check("lex_result", all(result.lex_result(i).to_dict() == lexer.lex(t).to_dict() for i, t in enumerate(cases)))
+
+rnd = random.Random(7)
+alphabet = 'abcXYZ019-_.+/=ñ '
+random_tokens = [''.join(rnd.choice(alphabet) for _ in range(rnd.randint(0, 12))) for _ in range(5000)]
+diff = differences(batch_lexer, lexer, random_tokens)
+check("tokens aleatorios", not diff, diff[:3])
+
+buffer, offsets = pack_tokens(cases)
+packed = batch_lexer.analyze_packed(buffer, offsets)
+check("buffer empaquetado sin lista", [packed.result(i) for i in range(len(cases))]
+      == [lexer.analyze(t) for t in cases])
+check("lote vacío", len(batch_lexer.analyze_batch([])) == 0)
+
+print("\n=====================")
+print("LÍMITES")
+print("=====================")
+
+limits = ResourceLimits(max_token_length=60, max_segment_length=20, max_decoded_length=12)
+lexer, batch_lexer = JWTLexer(limits), BatchJWTLexer(limits)
+limit_cases = [
+    'a' * 61, 'a.' + 'b' * 21 + '.c', 'a.' + 'b' * 17 + '.c', 'a' * 16 + '.b.c', 'a.b.' + 'c' * 16,
+    'a' * 16 + '.' + 'b' * 21 + '.c', 'a.b.c', 'ñ' * 61, 'ñ' * 30, 'a' * 16 + 'ñ', 'a' * 12 + '.' + 'b' * 15,
+]
+diff = differences(batch_lexer, lexer, limit_cases)
+check("rechazos por límites", not diff, diff[:3])
+result = batch_lexer.analyze_batch(limit_cases)
+check("mensajes de LimitExceededError",
+      sum(result.result(i).get('error_type') == 'LimitExceededError' for i in range(len(limit_cases)))
+      == sum(lexer.analyze(t).get('error_type') == 'LimitExceededError' for t in limit_cases) > 0)
+lengths = [rnd.randint(0, 70) for _ in range(3000)]
+random_tokens = [''.join(rnd.choice('ab.') for _ in range(n)) for n in lengths]
+diff = differences(batch_lexer, lexer, random_tokens)
+check("límites aleatorios", not diff, diff[:3])
+
+print("\n=====================")
+print("PRUEBAS COMPLETADAS:", "con errores: " + ", ".join(fallos) if fallos else "sin errores")
+print("=====================")
+sys.exit(1 if fallos else 0)
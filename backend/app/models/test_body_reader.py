@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+TEST DE LA LECTURA DE TOKENS DEL CUERPO CRUDO (PROYECTO JWT)
+------------------------------------------------------------
+Prueba read_raw_token e iter_raw_tokens en el límite de longitud: un token
+de exactamente max_length se acepta aunque lo sigan espacios o saltos de
+línea (en el mismo bloque o en los siguientes), y uno con contenido después
+del máximo se rechaza con la longitud leída.
+"""
+
+import io
+import os
+import sys
+
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from flask import Flask
+
+from app.api.body_reader import CHUNK_SIZE, iter_raw_tokens, read_raw_token
+
+fallos = []
+
+
+def check(name, condition, detail=''):
+    if condition:
+        print("[OK]", name)
+    else:
+        print("[ERROR]", name, detail)
+        fallos.append(name)
+
+
+def read(body, max_length):
+    return read_raw_token(io.BytesIO(body), max_length)
+
+
+token = 'a' * 30 + '.' + 'b' * 30 + '.c'
+MAX = len(token)
+
+print("\n=====================")
+print("APPLICATION/JWT")
+print("=====================")
+
+with Flask(__name__).test_request_context():
+    check("exactamente el máximo", read(token.encode(), MAX) == (token, MAX))
+    for name, trailing in (('\\r\\n', b'\r\n'), ('\\r\\n\\r\\n', b'\r\n\r\n'), ('espacios', b' ' * 100),
+                           ('un bloque de espacios', b' ' * (CHUNK_SIZE * 2 + 5))):
+        check(f"máximo seguido de {name}", read(token.encode() + trailing, MAX) == (token, MAX),
+              read(token.encode() + trailing, MAX))
+    check("espacios iniciales", read(b'  ' + token.encode() + b'\n', MAX) == (token, MAX))
+    check("un carácter de más", read(token.encode() + b'x', MAX) == (None, MAX + 1))
+    check("contenido tras los espacios", read(token.encode() + b'\r\n\r\n' + b'x', MAX) == (None, MAX + 5),
+          read(token.encode() + b'\r\n\r\n' + b'x', MAX))
+    check("contenido tras un bloque de espacios",
+          read(token.encode() + b' ' * CHUNK_SIZE + b'xy  ', MAX)[0] is None)
+    check("cuerpo grande", read(b'a' * (CHUNK_SIZE * 3), MAX) == (None, CHUNK_SIZE * 3))
+
+print("\n=====================")
+print("TEXT/PLAIN")
+print("=====================")
+
+body = (token + '\r\n' + token + 'x\n\n' + 'a.b.c').encode()
+results = list(iter_raw_tokens(io.BytesIO(body), MAX, chunk_size=7))
+check("líneas en bloques pequeños", results == [(token, MAX), (None, MAX + 1), ('a.b.c', 5)], results)
+
+print("\n=====================")
+print("PRUEBAS COMPLETADAS:", "con errores: " + ", ".join(fallos) if fallos else "sin errores")
+print("=====================")
+sys.exit(1 if fallos else 0)
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+TEST DE LA EXPORTACIÓN COLUMNAR (PROYECTO JWT)
+----------------------------------------------
+Prueba ColumnarResultBuilder (códigos de diccionario, .npy y Parquet) y la
+exportación columnar de los trabajos por lotes.
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+import types
+
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+try:
+    # Sin conexión a MongoDB Atlas se usa una base en memoria (si mongomock está instalado)
+    import mongomock
+    sys.modules.setdefault('db', types.SimpleNamespace(db=mongomock.MongoClient()['JWTData']))
+except ImportError:
+    pass
+
+from app.analyzer.encoder import encode_base64url, encode_jwt, sign_token
+from app.services.columnar_export_service import ColumnarResultBuilder, ERROR_CODES, MISSING_TIME, load_npy
+
+fallos = []
+
+
+def raw_jwt(header, payload, secret):
+    """Firma un token sin la validación semántica de encode_jwt (p. ej. uno expirado)."""
+    header_b64 = encode_base64url(json.dumps(header))
+    payload_b64 = encode_base64url(json.dumps(payload))
+    return f"{header_b64}.{payload_b64}.{sign_token(header_b64, payload_b64, header['alg'], secret)}"
+
+
+def check(name, condition, detail=''):
+    if condition:
+        print("[OK]", name)
+    else:
+        print("[ERROR]", name, detail)
+        fallos.append(name)
+
+
+print("\n=====================")
+print("CÓDIGOS DE DICCIONARIO")
+print("=====================")
+
+# alg es controlado por quien envía el token: más de 65.535 valores distintos no deben desbordar
+builder = ColumnarResultBuilder()
+try:
+    for i in range(70_000):
+        builder.append(False, 'SemanticError', {'alg': f"alg-{i}"}, {})
+    check("70.000 valores distintos de alg", len(builder) == 70_000)
+    table = builder.to_numpy()
+    check("último código de alg", int(table['alg'][-1]) == 70_000, table['alg'][-1])
+except OverflowError as e:
+    check("70.000 valores distintos de alg", False, e)
+
+print("\n=====================")
+print("IDA Y VUELTA .npy")
+print("=====================")
+
+builder = ColumnarResultBuilder()
+builder.append(True, None, {'alg': 'HS256'}, {'iss': 'emisor', 'sub': 'u1', 'exp': 1700000000},
+               ['aaaa', 'bbbbbb', 'cc'])
+builder.append(False, 'LexicalError')
+directory = tempfile.mkdtemp()
+builder.save_npy(directory)
+table, metadata = load_npy(directory)
+check("filas", len(table) == 2)
+check("valid", list(table['valid']) == [True, False])
+check("error_code", int(table['error_code'][1]) == ERROR_CODES['LexicalError'])
+check("alg decodificado", metadata['dictionaries']['alg'][table['alg'][0]] == 'HS256')
+check("exp presente", int(table['exp'][0]) == 1700000000)
+check("iat ausente", int(table['iat'][0]) == MISSING_TIME)
+check("tamaños de segmento", (int(table['header_size'][0]), int(table['signature_size'][0])) == (4, 2))
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+    print("[SKIP] Parquet: pyarrow no está instalado")
+
+if pq is not None:
+    path = os.path.join(directory, 'resultados.parquet')
+    builder.save_parquet(path)
+    rows = pq.read_table(path).to_pylist()
+    check("Parquet: alg", rows[0]['alg'] == 'HS256' and rows[1]['alg'] is None, rows)
+    check("Parquet: error_type", rows[0]['error_type'] is None and rows[1]['error_type'] == 'LexicalError', rows)
+
+print("\n=====================")
+print("EXPORTACIÓN DE TRABAJOS")
+print("=====================")
+
+try:
+    from app.services.job_service import ColumnarStore, JobManager, LocalResultStore
+except Exception as e:
+    print("[SKIP] Trabajos: no se pudo importar job_service sin MongoDB:", e)
+else:
+    directory = tempfile.mkdtemp()
+    manager = JobManager(LocalResultStore(directory), workers=1, columnar=ColumnarStore(directory))
+    now = int(time.time())
+    tokens = [
+        encode_jwt({'alg': 'HS256', 'typ': 'JWT'}, {'sub': 'a', 'iss': 'emisor', 'exp': now + 600}, 'k'),
+        'no.es-un-token',
+        raw_jwt({'alg': 'HS384', 'typ': 'JWT'}, {'sub': 'b', 'exp': now - 600}, 'k'),
+    ]
+    for depth in ('crypto', 'lexical'):
+        job = manager.submit_tokens(tokens, 'k', depth=depth)
+        job.future.result()
+        table, metadata = load_npy(os.path.join(directory, f"{job.job_id}.columnar"))
+        check(f"{depth}: una fila por token", len(table) == len(tokens), len(table))
+        check(f"{depth}: validez", list(table['valid']) == ([True, False, False] if depth == 'crypto'
+                                                            else [True, False, True]), list(table['valid']))
+        check(f"{depth}: tamaño del header", int(table['header_size'][0]) == len(tokens[0].split('.')[0]))
+        if depth == 'crypto':
+            check("crypto: alg del tercer token", metadata['dictionaries']['alg'][table['alg'][2]] == 'HS384')
+            check("crypto: error del tercer token",
+                  int(table['error_code'][2]) == ERROR_CODES['ExpirationDateError'], table['error_code'])
+        if pq is not None:
+            rows = pq.read_table(manager.columnar_parquet_path(job.job_id)).to_pylist()
+            check(f"{depth}: Parquet del trabajo", [r['valid'] for r in rows] == list(table['valid']))
+
+print("\n=====================")
+print("PRUEBAS COMPLETADAS:", "con errores: " + ", ".join(fallos) if fallos else "sin errores")
+print("=====================")
+sys.exit(1 if fallos else 0)
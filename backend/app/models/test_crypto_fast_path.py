@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+TEST DE LA VERIFICACIÓN RÁPIDA DE FIRMA (PROYECTO JWT)
+------------------------------------------------------
+Prueba que verify_signature_fast da el mismo veredicto que el verificador
+completo (verify_jwt_signature) en tokens válidos, manipulados, con
+algoritmos no soportados, revocados o que superan los límites, y que
+?verify_only=true responde igual que el endpoint completo.
+
+Requiere mongomock (base en memoria) para la parte de API.
+"""
+
+import base64
+import os
+import sys
+import tempfile
+import types
+
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from app.analyzer.crypto_verifier import verify_jwt_signature, verify_signature_fast
+from app.analyzer.encoder import encode_jwt
+from app.analyzer.limits import ResourceLimits
+from app.analyzer.revocation_list import RevocationList, write_revocation_file
+
+fallos = []
+
+
+def check(name, condition, detail=''):
+    if condition:
+        print("[OK]", name)
+    else:
+        print("[ERROR]", name, detail)
+        fallos.append(name)
+
+
+def b64(data):
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+SECRET = 'clave'
+hs256 = encode_jwt({'alg': 'HS256', 'typ': 'JWT'}, {'sub': 'x', 'jti': 'id-1'}, SECRET)
+hs384 = encode_jwt({'alg': 'HS384', 'typ': 'JWT'}, {'sub': 'x'}, SECRET)
+revoked = encode_jwt({'alg': 'HS256', 'typ': 'JWT'}, {'sub': 'y', 'jti': 'revocado'}, SECRET)
+h, p, s = hs256.split('.')
+last = 'A' if s[-1] != 'A' else 'Q'
+non_canonical = s[:-1] + ('B' if s[-1] == 'A' else 'A')
+tampered = b64(b'{"sub":"admin"}')
+alg_none = b64(b'{"alg":"none"}')
+without_alg = b64(b'{"typ":"JWT"}')
+
+cases = {
+    'HS256 válido': (hs256, SECRET),
+    'HS384 válido': (hs384, SECRET),
+    'con padding': (hs256 + '=', SECRET),
+    'clave incorrecta': (hs256, 'otra'),
+    'payload manipulado': (f"{h}.{tampered}.{s}", SECRET),
+    'firma de otra longitud': (f"{h}.{p}.{s[:-1]}", SECRET),
+    'firma con otro último carácter': (f"{h}.{p}.{s[:-1]}{last}", SECRET),
+    'firma no canónica': (f"{h}.{p}.{non_canonical}", SECRET),
+    'firma con caracteres inválidos': (f"{h}.{p}.{'*' * len(s)}", SECRET),
+    'alg none': (f"{alg_none}.{p}.", SECRET),
+    'sin alg': (f"{without_alg}.{p}.{s}", SECRET),
+    'header inválido': (f"%%%.{p}.{s}", SECRET),
+    'dos partes': (f"{h}.{p}", SECRET),
+    'cuatro partes': (f"{hs256}.x", SECRET),
+    'token revocado': (revoked, SECRET),
+    'supera los límites': (hs256 + 'A' * 100, SECRET),
+}
+
+directory = tempfile.mkdtemp()
+write_revocation_file(os.path.join(directory, 'revocados.bin'), jtis=['revocado'])
+revocation_list = RevocationList(os.path.join(directory, 'revocados.bin'))
+limits = ResourceLimits(max_token_length=len(hs384) + 10)
+
+print("\n=====================")
+print("MISMO VEREDICTO")
+print("=====================")
+
+for name, (token, secret) in cases.items():
+    full = verify_jwt_signature(token, secret, limits, revocation_list)
+    fast = verify_signature_fast(token, secret, limits, revocation_list, decode_payload=True)
+    same = (fast.valid == full['valid'] and fast.error_type == full.get('error_type')
+            and (not full['valid'] or (fast.algorithm == full['algorithm'] and fast.payload == full['payload'])))
+    check(f"{name} ({'válido' if full['valid'] else 'inválido'})", same,
+          {'completo': full, 'rapido': fast.to_dict()})
+
+check("casos válidos presentes", verify_signature_fast(hs256, SECRET).valid
+      and verify_signature_fast(hs384, SECRET).valid)
+check("payload solo si se pide", verify_signature_fast(hs256, SECRET).payload is None)
+
+print("\n=====================")
+print("ENDPOINT")
+print("=====================")
+
+try:
+    import mongomock
+except ImportError:
+    mongomock = None
+    print("[SKIP] API: se requiere mongomock")
+
+if mongomock is not None:
+    sys.modules['db'] = types.SimpleNamespace(db=mongomock.MongoClient()['JWTData'])
+    os.environ['JWT_REVOCATION_LIST'] = os.path.join(directory, 'revocados.bin')
+    from run import create_app
+
+    client = create_app().test_client()
+    for name, (token, secret) in cases.items():
+        full = client.post('/api/analyze/crypto-verification', json={'jwt': token, 'secret': secret})
+        fast = client.post('/api/analyze/crypto-verification?verify_only=true&payload=true',
+                           json={'jwt': token, 'secret': secret})
+        full_body, fast_body = full.get_json(), fast.get_json()
+        same = (fast.status_code == full.status_code and fast_body.get('valid') == full_body.get('valid')
+                and fast_body.get('error_type') == full_body.get('error_type')
+                and fast_body.get('payload') == (full_body.get('payload') if full_body.get('valid') else None))
+        check(f"endpoint: {name}", same, (full.status_code, full_body, fast.status_code, fast_body))
+
+print("\n=====================")
+print("PRUEBAS COMPLETADAS:", "con errores: " + ", ".join(fallos) if fallos else "sin errores")
+print("=====================")
+sys.exit(1 if fallos else 0)
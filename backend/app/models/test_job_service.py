@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+TEST DE LOS TRABAJOS POR LOTES (PROYECTO JWT)
+---------------------------------------------
+Prueba que el estado y los resultados de un trabajo se comparten entre
+workers (almacén local en un directorio común y MongoDB), la cancelación
+desde otro worker, los trabajos abandonados, el tope de cuerpo propio de
+POST /jobs y que "reverify" requiere el token de administración.
+
+Requiere mongomock (base en memoria) si no hay conexión a MongoDB.
+"""
+
+import os
+import sys
+import tempfile
+import time
+import types
+
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+try:
+    import mongomock
+except ImportError:
+    print("[SKIP] Se requiere mongomock para probar los trabajos sin MongoDB")
+    sys.exit(0)
+sys.modules['db'] = types.SimpleNamespace(db=mongomock.MongoClient()['JWTData'])
+
+from app.analyzer.encoder import encode_jwt
+from app.services.job_service import (
+    CANCELLED, COMPLETED, FAILED, JobManager, LocalResultStore, MongoResultStore, UnknownJobError
+)
+
+fallos = []
+
+
+def check(name, condition, detail=''):
+    if condition:
+        print("[OK]", name)
+    else:
+        print("[ERROR]", name, detail)
+        fallos.append(name)
+
+
+def wait(manager, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = manager.get(job_id)
+        if job.status in (COMPLETED, FAILED, CANCELLED):
+            return job
+        time.sleep(0.02)
+    return manager.get(job_id)
+
+
+GOOD = encode_jwt({'alg': 'HS256', 'typ': 'JWT'}, {'sub': 'a', 'exp': int(time.time()) + 3600}, 'k')
+TOKENS = [GOOD, 'no.es-un-token', GOOD + 'x', GOOD]
+
+for name, make_store in (('local', lambda directory: LocalResultStore(directory)),
+                         ('mongo', lambda directory: MongoResultStore())):
+    print("\n=====================")
+    print(f"ALMACÉN {name.upper()}")
+    print("=====================")
+
+    directory = tempfile.mkdtemp()
+    worker_1 = JobManager(make_store(directory), workers=1, chunk_size=2, heartbeat_seconds=0.05)
+    worker_2 = JobManager(make_store(directory), workers=1, chunk_size=2, heartbeat_seconds=0.05)
+
+    job = worker_1.submit_tokens(TOKENS, 'k')
+    job.future.result()
+    remote = worker_2.get(job.job_id)
+    check(f"{name}: otro worker ve el estado", remote.status == COMPLETED and remote.valid == 2, remote.as_dict())
+    check(f"{name}: otro worker cuenta los resultados", worker_2.results_count(job.job_id) == 4)
+    page = worker_2.results_page(job.job_id, 1, 2)
+    check(f"{name}: otro worker pagina", [r['index'] for r in page] == [1, 2], page)
+    lines = b''.join(worker_2.iter_result_lines(job.job_id)).splitlines()
+    check(f"{name}: otro worker descarga NDJSON", len(lines) == 4, len(lines))
+    check(f"{name}: lista compartida", job.job_id in [j.job_id for j in worker_2.list()])
+
+    restarted = JobManager(make_store(directory), workers=1)
+    check(f"{name}: sobrevive al reinicio", restarted.get(job.job_id).status == COMPLETED)
+
+    # Cancelación desde otro worker: el que lo ejecuta lo detiene en su próximo bloque
+    long_job = worker_1.submit_tokens(['a.b.c'] * 200_000)
+    time.sleep(0.05)
+    worker_2.cancel(long_job.job_id)
+    long_job.future.result(timeout=30)
+    final = worker_2.get(long_job.job_id)
+    check(f"{name}: cancelación remota", final.status == CANCELLED, final.as_dict())
+    check(f"{name}: resultados parciales conservados",
+          0 < worker_2.results_count(long_job.job_id) < 200_000, worker_2.results_count(long_job.job_id))
+
+    # Un trabajo cuyo worker dejó de actualizarlo se informa fallido
+    abandoned = worker_1.submit_tokens([])
+    abandoned.future.result()
+    state = dict(worker_1.get(abandoned.job_id).as_dict(), status='running', updated_at=time.time() - 3600)
+    worker_1.store.save_state(abandoned.job_id, state)
+    check(f"{name}: trabajo abandonado", worker_2.get(abandoned.job_id).status == FAILED)
+
+    try:
+        worker_2.get('0' * 32)
+        check(f"{name}: trabajo desconocido", False)
+    except UnknownJobError:
+        check(f"{name}: trabajo desconocido", True)
+
+print("\n=====================")
+print("API")
+print("=====================")
+
+os.environ['JWT_ADMIN_TOKEN'] = 'admin'
+os.environ['JWT_JOB_RESULT_DIR'] = tempfile.mkdtemp()
+from run import create_app
+
+client = create_app().test_client()
+body = ('\n'.join([GOOD] * 20_000)).encode()
+check("lote de más de 1 MiB", len(body) > 1024 * 1024)
+response = client.post('/api/jobs', data=body, content_type='text/plain')
+check("POST /jobs admite el lote", response.status_code == 202, response.status_code)
+response = client.post('/api/analyze/full', data=body, content_type='application/jwt')
+check("el resto de la API conserva MAX_CONTENT_LENGTH", response.status_code == 413, response.status_code)
+
+response = client.post('/api/jobs', json={'kind': 'reverify'})
+check("reverify sin token de administración", response.status_code == 401, response.status_code)
+response = client.post('/api/jobs', json={'kind': 'reverify'}, headers={'Authorization': 'Bearer admin'})
+check("reverify con token de administración", response.status_code == 202, response.status_code)
+
+print("\n=====================")
+print("PRUEBAS COMPLETADAS:", "con errores: " + ", ".join(fallos) if fallos else "sin errores")
+print("=====================")
+sys.exit(1 if fallos else 0)
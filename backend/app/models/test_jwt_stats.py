@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+TEST DE LOS CONTADORES DE JWTS_STATS (PROYECTO JWT)
+---------------------------------------------------
+Prueba que cada escritura actualiza los contadores en un único bulk_write,
+que rebuild_stats reconcilia sin perder escrituras concurrentes y que
+backfill_claims completa los documentos previos a la analítica.
+
+Requiere mongomock (base en memoria) si no hay conexión a MongoDB.
+"""
+
+import os
+import sys
+import types
+
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+try:
+    import mongomock
+except ImportError:
+    print("[SKIP] Se requiere mongomock para probar los contadores sin MongoDB")
+    sys.exit(0)
+sys.modules['db'] = types.SimpleNamespace(db=mongomock.MongoClient()['JWTData'])
+
+from app.analyzer.encoder import encode_jwt
+from app.services import database_service
+from app.services.database_service import DatabaseService
+from app.services.metrics_service import metrics
+
+fallos = []
+
+
+def check(name, condition, detail=''):
+    if condition:
+        print("[OK]", name)
+    else:
+        print("[ERROR]", name, detail)
+        fallos.append(name)
+
+
+def bulk_writes():
+    return metrics.get('jwt_mongo_total', operation='incrementar_varios', error_type='none')
+
+
+def token(alg, iss):
+    return encode_jwt({'alg': alg, 'typ': 'JWT'}, {'sub': 'x', 'iss': iss}, 'clave')
+
+
+DatabaseService.publish_changes = False
+stats = sys.modules['db'].db[DatabaseService.STATS_COLLECTION_NAME]
+
+print("\n=====================")
+print("ESCRITURAS")
+print("=====================")
+
+before = bulk_writes()
+ids = [
+    DatabaseService.create_jwt({'name': 'a', 'token': token('HS256', 'emisor-1'), 'valido': True}),
+    DatabaseService.create_jwt({'name': 'b', 'token': token('HS256', 'emisor-2'), 'valido': True}),
+    DatabaseService.create_jwt({'name': 'c', 'token': token('HS384', 'emisor-1'), 'valido': False,
+                                'tipo_error': 'SignatureError'}),
+]
+check("un bulk_write por inserción", bulk_writes() - before == 3, bulk_writes() - before)
+summary = DatabaseService.get_stats_summary()
+check("total", summary['total'] == 3, summary)
+check("por alg", summary['alg'] == {'HS256': 2, 'HS384': 1}, summary['alg'])
+check("por iss", summary['iss'] == {'emisor-1': 2, 'emisor-2': 1}, summary['iss'])
+
+before = bulk_writes()
+DatabaseService.update_jwt(ids[1], {'token': token('HS384', 'emisor-2')})
+check("un bulk_write por actualización", bulk_writes() - before == 1, bulk_writes() - before)
+summary = DatabaseService.get_stats_summary()
+check("actualización mueve alg", summary['alg'] == {'HS256': 1, 'HS384': 2}, summary['alg'])
+check("actualización conserva el total", summary['total'] == 3, summary)
+
+DatabaseService.delete_jwt(ids[2])
+summary = DatabaseService.get_stats_summary()
+check("eliminación", summary['total'] == 2 and summary['valido'] == {'True': 2}, summary)
+
+# Una segunda eliminación (o actualización) del mismo id no encuentra el documento y no toca los contadores
+before = bulk_writes()
+check("eliminación repetida", DatabaseService.delete_jwt(ids[2]) is False)
+check("actualización de un id eliminado", DatabaseService.update_jwt(ids[2], {'valido': True}) is False)
+check("sin escrituras de contadores", bulk_writes() == before, bulk_writes() - before)
+check("contadores intactos", DatabaseService.get_stats_summary() == summary, DatabaseService.get_stats_summary())
+
+# Actualizaciones sucesivas: cada una descuenta el estado que reemplazó
+DatabaseService.update_jwt(ids[0], {'valido': False, 'tipo_error': 'SignatureError'})
+DatabaseService.update_jwt(ids[0], {'valido': False, 'tipo_error': 'ExpirationDateError'})
+summary = DatabaseService.get_stats_summary()
+check("actualizaciones sucesivas", summary['valido'] == {'True': 1, 'False': 1}
+      and summary['tipo_error'].get('ExpirationDateError') == 1 and 'SignatureError' not in summary['tipo_error'],
+      summary)
+DatabaseService.update_jwt(ids[0], {'valido': True, 'tipo_error': None})
+
+print("\n=====================")
+print("RECONCILIACIÓN")
+print("=====================")
+
+# Contadores desviados: uno de más, uno faltante y uno de un valor que ya no existe
+stats.update_one({'_id': 'alg:HS384'}, {'$inc': {'count': 5}})
+stats.delete_one({'_id': 'iss:emisor-1'})
+stats.update_one({'_id': 'alg:RS256'}, {'$set': {'dim': 'alg', 'value': 'RS256', 'count': 7}}, upsert=True)
+check("rebuild_stats converge", DatabaseService.rebuild_stats() is True)
+summary = DatabaseService.get_stats_summary()
+check("alg reconciliado", summary['alg'] == {'HS256': 1, 'HS384': 1}, summary['alg'])
+check("iss reconciliado", summary['iss'] == {'emisor-1': 1, 'emisor-2': 1}, summary['iss'])
+
+# Una escritura que llega mientras se agrega la colección no se pierde ni se cuenta dos veces
+group_by = DatabaseService._group_by
+calls = []
+
+
+def group_by_with_concurrent_write(field):
+    if not calls:
+        DatabaseService.create_jwt({'name': 'd', 'token': token('HS256', 'emisor-3'), 'valido': True})
+    calls.append(field)
+    return group_by(field)
+
+
+DatabaseService._group_by = staticmethod(group_by_with_concurrent_write)
+try:
+    converged = DatabaseService.rebuild_stats()
+finally:
+    DatabaseService._group_by = staticmethod(group_by)
+summary = DatabaseService.get_stats_summary()
+check("escritura concurrente: converge", converged is True)
+check("escritura concurrente: reintento", len(calls) > len(DatabaseService._dimension_fields()), len(calls))
+check("escritura concurrente: total", summary['total'] == 3, summary)
+check("escritura concurrente: alg", summary['alg'] == {'HS256': 2, 'HS384': 1}, summary['alg'])
+
+print("\n=====================")
+print("BACKFILL")
+print("=====================")
+
+# Documentos insertados antes de la analítica: sin claims ni contadores
+database_service.insertar_uno(DatabaseService.COLLECTION_NAME, {'name': 'e', 'token': token('HS384', 'viejo'),
+                                                                'valido': True})
+check("backfill_claims", DatabaseService.backfill_claims() == 1)
+summary = DatabaseService.get_stats_summary()
+check("backfill: contadores", summary['total'] == 4 and summary['iss'].get('viejo') == 1, summary)
+DatabaseService.ensure_indexes()
+indexes = sys.modules['db'].db[DatabaseService.COLLECTION_NAME].index_information()
+check("ensure_indexes", all(f"{field}_1" in indexes for field in DatabaseService.INDEXED_FIELDS), indexes)
+
+print("\n=====================")
+print("PRUEBAS COMPLETADAS:", "con errores: " + ", ".join(fallos) if fallos else "sin errores")
+print("=====================")
+sys.exit(1 if fallos else 0)
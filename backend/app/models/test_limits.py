@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+TEST DE LOS LÍMITES DE RECURSOS (PROYECTO JWT)
+----------------------------------------------
+Prueba la configuración por entorno de ResourceLimits, el rechazo de tokens,
+segmentos, profundidad JSON y número de claims antes de decodificar o
+parsear (sin caer al fallback de json.loads), y las respuestas 413 de la
+API por token o cuerpo demasiado grandes.
+
+Requiere mongomock (base en memoria) para la parte de API.
+"""
+
+import os
+import sys
+import types
+
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from app.analyzer.encoder import encode_jwt
+from app.analyzer.lexical_analyzer import JWTLexer
+from app.analyzer.limits import LimitExceededError, ResourceLimits
+from app.analyzer.syntactic_analyzer import parse_syntax
+from app.services.metrics_service import metrics
+
+fallos = []
+
+
+def check(name, condition, detail=''):
+    if condition:
+        print("[OK]", name)
+    else:
+        print("[ERROR]", name, detail)
+        fallos.append(name)
+
+
+def rejected(limit, func, *args):
+    try:
+        func(*args)
+    except LimitExceededError as e:
+        return e.limit == limit
+    return False
+
+
+print("\n=====================")
+print("CONFIGURACIÓN")
+print("=====================")
+
+limits = ResourceLimits.from_env({'JWT_MAX_TOKEN_LENGTH': '100', 'MAX_CONTENT_LENGTH': '2048',
+                                  'JWT_MAX_CLAIMS': ''})
+check("variables de entorno", limits.max_token_length == 100 and limits.max_content_length == 2048)
+check("valor vacío usa el defecto", limits.max_claims == ResourceLimits.DEFAULTS['max_claims'])
+for overrides in ({'max_token_length': 0}, {'desconocido': 1}):
+    try:
+        ResourceLimits(**overrides)
+        error = None
+    except ValueError as e:
+        error = e
+    check(f"inválido {overrides}", error is not None)
+try:
+    limits.max_claims = 5
+    immutable = False
+except AttributeError:
+    immutable = True
+check("inmutable", immutable)
+
+print("\n=====================")
+print("TOKENS Y SEGMENTOS")
+print("=====================")
+
+limits = ResourceLimits(max_token_length=200, max_segment_length=60, max_decoded_length=40)
+check("longitud del token", rejected('token_length', limits.check_token, 'a' * 201))
+check("longitud del segmento", rejected('segment_length', limits.check_token, 'a.' + 'b' * 61 + '.c'))
+check("tamaño decodificado estimado", rejected('decoded_length', limits.check_token, 'a.' + 'b' * 56 + '.c'))
+check("token en el límite", not rejected('token_length', limits.check_token, 'a' * 40 + '.' + 'b' * 40 + '.c'))
+
+before = metrics.get('jwt_limit_rejections_total', limit='token_length')
+result = JWTLexer().lex('a' * 201, limits)
+check("léxico: LimitExceededError", not result.valid and result.error_type == 'LimitExceededError', result.to_dict())
+check("léxico: métrica", metrics.get('jwt_limit_rejections_total', limit='token_length') == before + 1)
+
+print("\n=====================")
+print("JSON")
+print("=====================")
+
+limits = ResourceLimits(max_json_depth=4, max_claims=3)
+HEADER = '{"alg":"HS256","typ":"JWT"}'
+fallbacks = metrics.snapshot()
+deep = '{"a":' * 5 + '1' + '}' * 5
+result = parse_syntax(HEADER, deep, limits)
+check("profundidad", not result.valid and result.error_type == 'LimitExceededError', result.to_dict())
+check("profundidad sin fallback a json.loads",
+      sum(v for k, v in metrics.snapshot().items() if k[0] == 'jwt_json_fallback_total')
+      == sum(v for k, v in fallbacks.items() if k[0] == 'jwt_json_fallback_total'))
+result = parse_syntax(HEADER, '{"a":1,"b":2,"c":3,"d":4}', limits)
+check("número de claims", not result.valid and result.error_type == 'LimitExceededError', result.to_dict())
+result = parse_syntax(HEADER, '{"a":{"b":{"c":1}},"d":2}', limits)
+check("dentro de los límites", result.valid, result.to_dict())
+
+print("\n=====================")
+print("API")
+print("=====================")
+
+try:
+    import mongomock
+except ImportError:
+    mongomock = None
+    print("[SKIP] API: se requiere mongomock")
+
+if mongomock is not None:
+    sys.modules['db'] = types.SimpleNamespace(db=mongomock.MongoClient()['JWTData'])
+    os.environ.update(JWT_MAX_TOKEN_LENGTH='512', MAX_CONTENT_LENGTH='4096')
+    from run import create_app
+
+    client = create_app().test_client()
+    token = encode_jwt({'alg': 'HS256', 'typ': 'JWT'}, {'sub': 'x'}, 'clave')
+    response = client.post('/api/analyze/full', json={'jwt': token, 'secret': 'clave'})
+    check("token válido: 200", response.status_code == 200, response.get_json())
+    response = client.post('/api/analyze/full', json={'jwt': token + 'A' * 600, 'secret': 'clave'})
+    check("token largo: 413", response.status_code == 413
+          and response.get_json()['error_type'] == 'LimitExceededError', response.status_code)
+    response = client.post('/api/analyze/full', data='{"jwt":"' + 'A' * 5000 + '"}',
+                           content_type='application/json')
+    check("cuerpo grande: 413", response.status_code == 413, response.status_code)
+
+print("\n=====================")
+print("PRUEBAS COMPLETADAS:", "con errores: " + ", ".join(fallos) if fallos else "sin errores")
+print("=====================")
+sys.exit(1 if fallos else 0)
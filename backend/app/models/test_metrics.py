@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+TEST DE LA AGREGACIÓN DE MÉTRICAS ENTRE PROCESOS (PROYECTO JWT)
+---------------------------------------------------------------
+Prueba que merge_dumps suma contadores e histogramas, que los archivos de
+procesos terminados se compactan en metrics-archive.json sin perder ni
+duplicar valores, y que GET /metrics respeta JWT_METRICS_TOKEN y
+JWT_METRICS_ENABLED.
+"""
+
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import types
+
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from app.services.metrics_service import MetricsRegistry, MultiprocessMetrics, fcntl, merge_dumps
+
+fallos = []
+
+
+def check(name, condition, detail=''):
+    if condition:
+        print("[OK]", name)
+    else:
+        print("[ERROR]", name, detail)
+        fallos.append(name)
+
+
+def registry(count, seconds):
+    r = MetricsRegistry()
+    r.inc('jwt_phase_total', count, phase='lexical', error_type='none')
+    r.observe('jwt_phase_duration_seconds', seconds, phase='lexical')
+    return r
+
+
+def total(data):
+    return sum(v for name, labels, v in data['counters'] if name == 'jwt_phase_total')
+
+
+def observations(data):
+    return sum(count for name, labels, buckets, counts, s, count in data['histograms']
+               if name == 'jwt_phase_duration_seconds')
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+print("\n=====================")
+print("SUMA DE REGISTROS")
+print("=====================")
+
+merged = merge_dumps([registry(2, 0.001).dump(), registry(3, 0.002).dump()])
+check("contadores", total(merged) == 5, merged)
+check("histogramas", observations(merged) == 2, merged)
+sums = [s for name, labels, buckets, counts, s, count in merged['histograms']]
+check("suma del histograma", abs(sums[0] - 0.003) < 1e-9, sums)
+
+print("\n=====================")
+print("COMPACTACIÓN")
+print("=====================")
+
+directory = tempfile.mkdtemp()
+current = MultiprocessMetrics(directory, registry=registry(1, 0.001), interval=5)
+host = socket.gethostname()
+dead = os.path.join(directory, f"metrics-{host}-{dead_pid()}-1.json")
+alive = os.path.join(directory, f"metrics-{host}-{os.getppid()}-2.json")
+stale = os.path.join(directory, "metrics-otro-host-7-3.json")
+fresh = os.path.join(directory, "metrics-otro-host-8-4.json")
+for path, count in ((dead, 10), (alive, 100), (stale, 1000), (fresh, 10000)):
+    with open(path, 'w') as f:
+        json.dump(registry(count, 0.001).dump(), f)
+old = time.time() - current.stale_seconds - 10
+os.utime(stale, (old, old))
+
+data = current.collect()
+check("total con compactación", total(data) == 11111, total(data))
+check("observaciones", observations(data) == 5, observations(data))
+if fcntl is not None:
+    names = set(os.listdir(directory))
+    check("pid terminado compactado", os.path.basename(dead) not in names, names)
+    check("archivo sin volcar compactado", os.path.basename(stale) not in names, names)
+    check("procesos vivos conservados", {os.path.basename(alive), os.path.basename(fresh)} <= names, names)
+    check("archivo de compactación", MultiprocessMetrics.ARCHIVE_NAME in names, names)
+
+current.registry.inc('jwt_phase_total', 1, phase='lexical', error_type='none')
+data = current.collect()
+check("segunda consulta sin duplicar", total(data) == 11112, total(data))
+
+# Un proceso que termina tras sumar a la compactación sin eliminar los archivos no los duplica
+if fcntl is not None:
+    leftover = os.path.join(directory, f"metrics-{host}-{dead_pid()}-5.json")
+    with open(leftover, 'w') as f:
+        json.dump(registry(5, 0.001).dump(), f)
+    remove = current._remove
+    current._remove = lambda name: None
+    try:
+        first = total(current.collect())
+    finally:
+        current._remove = remove
+    check("compactación interrumpida", first == 11117, first)
+    check("archivo sumado y no eliminado", os.path.exists(leftover))
+    second = total(current.collect())
+    check("sin duplicar tras la interrupción", second == 11117, second)
+    check("eliminado en la siguiente compactación", not os.path.exists(leftover))
+
+print("\n=====================")
+print("ENDPOINT")
+print("=====================")
+
+try:
+    import mongomock
+except ImportError:
+    mongomock = None
+    print("[SKIP] Endpoint: se requiere mongomock")
+
+if mongomock is not None:
+    sys.modules['db'] = types.SimpleNamespace(db=mongomock.MongoClient()['JWTData'])
+    os.environ.pop('JWT_METRICS_DIR', None)
+    os.environ['JWT_METRICS_TOKEN'] = 'scrape'
+    from run import create_app
+
+    client = create_app().test_client()
+    check("sin token: 401", client.get('/metrics').status_code == 401)
+    check("token incorrecto: 401",
+          client.get('/metrics', headers={'Authorization': 'Bearer otro'}).status_code == 401)
+    response = client.get('/metrics', headers={'Authorization': 'Bearer scrape'})
+    check("con token: 200", response.status_code == 200 and b'# TYPE' in response.data, response.status_code)
+    os.environ['JWT_METRICS_ENABLED'] = 'false'
+    check("deshabilitado: 404", create_app().test_client().get('/metrics').status_code == 404)
+
+print("\n=====================")
+print("PRUEBAS COMPLETADAS:", "con errores: " + ", ".join(fallos) if fallos else "sin errores")
+print("=====================")
+sys.exit(1 if fallos else 0)
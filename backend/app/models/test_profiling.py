@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+TEST DEL PERFILADO BAJO DEMANDA (PROYECTO JWT)
+----------------------------------------------
+Prueba que el perfilado no se habilita sin JWT_ADMIN_TOKEN, que marcar una
+solicitud y descargar los perfiles exige el token, y que la retención
+tolera los perfiles que otro worker elimina mientras se recorren.
+
+Requiere mongomock (base en memoria) si no hay conexión a MongoDB.
+"""
+
+import json
+import os
+import sys
+import tempfile
+import types
+
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from app.services.profiling_service import ProfileStore
+
+fallos = []
+
+
+def check(name, condition, detail=''):
+    if condition:
+        print("[OK]", name)
+    else:
+        print("[ERROR]", name, detail)
+        fallos.append(name)
+
+
+print("\n=====================")
+print("RETENCIÓN")
+print("=====================")
+
+store = ProfileStore(tempfile.mkdtemp(), retention=2)
+for i in range(3):
+    store.save(f"{i:032x}", {'id': i}, b'datos', 'prof')
+    os.utime(store.path(f"{i:032x}", 'json'), (1000 + i, 1000 + i))
+check("retención", sorted(n for n in os.listdir(store.directory) if n.endswith('.json'))
+      == [f"{i:032x}.json" for i in (1, 2)], os.listdir(store.directory))
+
+# Otro worker elimina un perfil entre listdir y getmtime
+getmtime = os.path.getmtime
+
+
+def getmtime_after_concurrent_delete(path):
+    if path.endswith(f"{1:032x}.json") and os.path.exists(path):
+        os.unlink(path)
+    return getmtime(path)
+
+
+os.path.getmtime = getmtime_after_concurrent_delete
+try:
+    store.save(f"{3:032x}", {'id': 3}, b'datos', 'prof')
+    error = None
+except FileNotFoundError as e:
+    error = e
+finally:
+    os.path.getmtime = getmtime
+check("perfil eliminado por otro worker", error is None, error)
+check("retención tras la eliminación", store.summary(f"{3:032x}") == {'id': 3})
+
+print("\n=====================")
+print("TOKEN DE ADMINISTRACIÓN")
+print("=====================")
+
+try:
+    import mongomock
+except ImportError:
+    mongomock = None
+    print("[SKIP] API: se requiere mongomock")
+
+if mongomock is not None:
+    sys.modules['db'] = types.SimpleNamespace(db=mongomock.MongoClient()['JWTData'])
+    os.environ.update(JWT_PROFILING_ENABLED='true', JWT_PROFILING_DIR=tempfile.mkdtemp())
+    os.environ.pop('JWT_ADMIN_TOKEN', None)
+    from app.analyzer.encoder import encode_jwt
+    from run import create_app
+
+    token = encode_jwt({'alg': 'HS256', 'typ': 'JWT'}, {'sub': 'x'}, 'clave')
+    body = {'jwt': token, 'secret': 'clave'}
+
+    app = create_app()
+    client = app.test_client()
+    response = client.post('/api/analyze/full', json=body, headers={'X-JWT-Profile': 'cprofile'})
+    check("sin token: no se habilita", 'JWT_PROFILER' not in app.config)
+    check("sin token: sin perfil", 'X-JWT-Profile-Id' not in response.headers)
+    check("sin token: sin rutas", client.get(f"/api/profiles/{0:032x}").status_code == 404)
+
+    os.environ['JWT_ADMIN_TOKEN'] = 'admin'
+    client = create_app().test_client()
+    auth = {'Authorization': 'Bearer admin'}
+    response = client.post('/api/analyze/full', json=body, headers={'X-JWT-Profile': 'cprofile'})
+    check("marca sin bearer: no se perfila", 'X-JWT-Profile-Id' not in response.headers)
+    response = client.post('/api/analyze/full', json=body, headers={'X-JWT-Profile': 'cprofile', **auth})
+    profile_id = response.headers.get('X-JWT-Profile-Id')
+    check("marca con bearer: perfil", profile_id is not None and 'profile' in json.loads(response.data))
+    check("resumen sin bearer: 401", client.get(f"/api/profiles/{profile_id}").status_code == 401)
+    check("resumen con bearer", client.get(f"/api/profiles/{profile_id}", headers=auth).status_code == 200)
+    check("descarga sin bearer: 401", client.get(f"/api/profiles/{profile_id}.prof").status_code == 401)
+
+print("\n=====================")
+print("PRUEBAS COMPLETADAS:", "con errores: " + ", ".join(fallos) if fallos else "sin errores")
+print("=====================")
+sys.exit(1 if fallos else 0)
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+TEST DEL DETECTOR DE REPLAY (PROYECTO JWT)
+------------------------------------------
+Prueba ReplayDetector en sus dos modos: filtros de Bloom por worker
+(repeticiones con y sin 'exp' a través de los límites de partición, memoria
+acotada) y registro exacto compartido entre workers, que se consulta una vez
+por token y no reserva filtros.
+"""
+
+import os
+import sys
+
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from app.analyzer.replay_detector import ReplayDetector
+
+fallos = []
+
+
+def check(name, condition, detail=''):
+    if condition:
+        print("[OK]", name)
+    else:
+        print("[ERROR]", name, detail)
+        fallos.append(name)
+
+
+class ExactStore:
+    """Registro exacto compartido (equivalente en memoria de DatabaseService.register_jti)."""
+
+    def __init__(self):
+        self.expires = {}
+        self.calls = 0
+
+    def __call__(self, jti, exp):
+        self.calls += 1
+        if jti in self.expires:
+            return False
+        self.expires[jti] = exp
+        return True
+
+
+NOW = 1_700_000_000
+
+print("\n=====================")
+print("UN WORKER")
+print("=====================")
+
+detector = ReplayDetector(partition_seconds=300, max_window_seconds=3600, expected_per_partition=1000)
+check("primer uso", detector.check_and_add('a', NOW + 60, now=NOW) is False)
+check("repetición", detector.check_and_add('a', NOW + 60, now=NOW + 10) is True)
+check("token expirado no se registra", detector.check_and_add('b', NOW - 1, now=NOW) is False)
+check("sin exp: primer uso", detector.check_and_add('c', None, now=NOW) is False)
+check("sin exp: repetición 600 s después", detector.check_and_add('c', None, now=NOW + 600) is True)
+check("exp lejano: repetición 600 s después",
+      detector.check_and_add('d', NOW + 10 ** 6, now=NOW) is False
+      and detector.check_and_add('d', NOW + 10 ** 6, now=NOW + 600) is True)
+
+print("\n=====================")
+print("VERIFICACIÓN EXACTA")
+print("=====================")
+
+store = ExactStore()
+worker_1 = ReplayDetector(partition_seconds=300, max_window_seconds=3600, expected_per_partition=1000,
+                          exact_check=store)
+worker_2 = ReplayDetector(partition_seconds=300, max_window_seconds=3600, expected_per_partition=1000,
+                          exact_check=store)
+for i in range(1000):
+    worker_1.check_and_add(f"nuevo-{i}", NOW + 60, now=NOW)
+check("una consulta por jti nuevo", store.calls == 1000, store.calls)
+check("sin filtros en memoria", worker_1.nbytes == 0 and worker_1.partition_count == 0, worker_1.nbytes)
+check("repetición en el mismo worker", worker_1.check_and_add('nuevo-0', NOW + 60, now=NOW + 1) is True)
+check("repetición en otro worker", worker_2.check_and_add('nuevo-1', NOW + 60, now=NOW + 1) is True)
+check("una consulta por repetición", store.calls == 1002, store.calls)
+check("retención exacta de exp", store.expires['nuevo-0'] == NOW + 60, store.expires['nuevo-0'])
+check("sin exp: primer uso en worker 2", worker_2.check_and_add('y', None, now=NOW) is False)
+check("sin exp: repetición en worker 1 tras dos particiones",
+      worker_1.check_and_add('y', None, now=NOW + 600) is True)
+check("retención exacta sin exp", store.expires['y'] == NOW + 3600, store.expires['y'])
+check("token expirado no consulta", worker_1.check_and_add('z', NOW - 1, now=NOW) is False
+      and store.calls == 1004, store.calls)
+
+print("\n=====================")
+print("MEMORIA ACOTADA")
+print("=====================")
+
+detector = ReplayDetector(partition_seconds=300, max_window_seconds=600, expected_per_partition=50)
+for i in range(1000):
+    detector.check_and_add(f"sin-exp-{i}", None, now=NOW + i)
+check("filtros sin exp acotados", detector.partition_count <= detector.unbounded_partitions,
+      detector.partition_count)
+for i in range(1000):
+    detector.check_and_add(f"con-exp-{i}", NOW + i + 60, now=NOW + i)
+check("particiones expiradas descartadas",
+      detector.partition_count <= detector.unbounded_partitions + 600 // 300 + 2, detector.partition_count)
+
+print("\n=====================")
+print("PRUEBAS COMPLETADAS:", "con errores: " + ", ".join(fallos) if fallos else "sin errores")
+print("=====================")
+sys.exit(1 if fallos else 0)
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+TEST DE LA CACHE DE RESULTADOS COMPARTIDA (PROYECTO JWT)
+--------------------------------------------------------
+Prueba que SharedResultCache comparte los aciertos entre procesos del mismo
+archivo, que la capacidad es acotada, que el archivo se crea con permisos
+0600 y que la API solo cachea el análisis léxico (nunca la verificación de
+firma, con su header y payload decodificados).
+"""
+
+import os
+import sqlite3
+import stat
+import sys
+import tempfile
+import types
+
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from app.services.result_cache_service import SharedResultCache
+
+fallos = []
+
+
+def check(name, condition, detail=''):
+    if condition:
+        print("[OK]", name)
+    else:
+        print("[ERROR]", name, detail)
+        fallos.append(name)
+
+
+print("\n=====================")
+print("CACHE COMPARTIDA")
+print("=====================")
+
+path = os.path.join(tempfile.mkdtemp(), 'results.db')
+worker_1 = SharedResultCache(path, capacity=10, evict_every=5, flush_interval=0)
+worker_2 = SharedResultCache(path, capacity=10, evict_every=5, flush_interval=0)
+check("archivo 0600", stat.S_IMODE(os.stat(path).st_mode) == 0o600, oct(os.stat(path).st_mode))
+
+calls = []
+value = worker_1.get_or_compute('lexical', ('token',), lambda: calls.append(1) or {'valid': True})
+again = worker_2.get_or_compute('lexical', ('token',), lambda: calls.append(1) or {'valid': False})
+check("el acierto de un worker lo aprovecha otro", again == value and len(calls) == 1, (again, calls))
+check("no cacheable", worker_1.get_or_compute('lexical', ('otro',), lambda: {'x': 1},
+                                              cacheable=lambda v: False) == {'x': 1}
+      and worker_2.get(b'x') is None)
+
+for i in range(40):
+    worker_1.get_or_compute('lexical', (f"t{i}",), lambda: {'i': i})
+worker_1.evict()
+stats = worker_2.stats()
+check("capacidad acotada", stats['entries'] <= 10, stats)
+check("aciertos de todos los workers", stats['hits'] == 1 and stats['workers'] == 1, stats)
+
+print("\n=====================")
+print("API")
+print("=====================")
+
+try:
+    import mongomock
+except ImportError:
+    mongomock = None
+    print("[SKIP] API: se requiere mongomock")
+
+if mongomock is not None:
+    sys.modules['db'] = types.SimpleNamespace(db=mongomock.MongoClient()['JWTData'])
+    os.environ['JWT_RESULT_CACHE_PATH'] = os.path.join(tempfile.mkdtemp(), 'api.db')
+    from app.analyzer.encoder import encode_jwt
+    from run import create_app
+
+    client = create_app().test_client()
+    token = encode_jwt({'alg': 'HS256', 'typ': 'JWT'}, {'sub': 'dato-personal'}, 'clave')
+    for _ in range(2):
+        client.get('/api/analyze/lexical/' + token)
+        response = client.post('/api/analyze/crypto-verification', json={'jwt': token, 'secret': 'clave'})
+    check("verificación de firma", response.get_json()['payload'] == {'sub': 'dato-personal'})
+    with sqlite3.connect(os.environ['JWT_RESULT_CACHE_PATH']) as connection:
+        values = [row[0] for row in connection.execute('SELECT value FROM results')]
+    check("solo el resultado léxico en la cache", len(values) == 1, values)
+    check("sin payload decodificado", not any('dato-personal' in v for v in values), values)
+
+print("\n=====================")
+print("PRUEBAS COMPLETADAS:", "con errores: " + ", ".join(fallos) if fallos else "sin errores")
+print("=====================")
+sys.exit(1 if fallos else 0)
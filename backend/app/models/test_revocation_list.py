@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+TEST DE LA LISTA DE REVOCACIÓN (PROYECTO JWT)
+---------------------------------------------
+Prueba la escritura y consulta del archivo de revocación (tokens completos
+y 'jti', con prefijos de 64 bits que colisionan), la recarga al reemplazar
+el archivo, el rechazo de archivos inválidos y la consulta desde la
+verificación de firma.
+"""
+
+import os
+import sys
+import tempfile
+
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from app.analyzer import revocation_list as module
+from app.analyzer.crypto_verifier import verify_jwt_signature
+from app.analyzer.encoder import encode_jwt
+from app.analyzer.revocation_list import RevocationList, write_revocation_file
+
+fallos = []
+
+
+def check(name, condition, detail=''):
+    if condition:
+        print("[OK]", name)
+    else:
+        print("[ERROR]", name, detail)
+        fallos.append(name)
+
+
+directory = tempfile.mkdtemp()
+path = os.path.join(directory, 'revocados.bin')
+
+print("\n=====================")
+print("CONSULTA")
+print("=====================")
+
+tokens = [f"token-{i}" for i in range(1000)]
+jtis = [f"jti-{i}" for i in range(1000)]
+check("entradas escritas", write_revocation_file(path, tokens[::2], jtis[::2] + jtis[:1]) == 1000)
+revocations = RevocationList(path, reload_interval=0)
+check("longitud", len(revocations) == 1000)
+check("tokens revocados", all(revocations.is_revoked(token=t) for t in tokens[::2]))
+check("tokens no revocados", not any(revocations.is_revoked(token=t) for t in tokens[1::2]))
+check("jti revocados", all(revocations.is_revoked(jti=j) for j in jtis[::2]))
+check("jti no revocados", not any(revocations.is_revoked(jti=j) for j in jtis[1::2]))
+check("un jti no revoca el token del mismo texto", not revocations.is_revoked(token='jti-0'))
+check("sin argumentos", revocations.is_revoked() is False)
+
+# Digests con el mismo prefijo de 64 bits: la consulta confirma con el digest completo
+token_key = module.token_key
+module.token_key = lambda token: b'\x00' * 8 + token_key(token)[8:]
+try:
+    write_revocation_file(path, ['a', 'b', 'c'])
+    revocations.reload()
+    collisions = (all(revocations.is_revoked(token=t) for t in 'abc'), revocations.is_revoked(token='d'))
+finally:
+    module.token_key = token_key
+check("prefijos repetidos", collisions == (True, False), collisions)
+
+write_revocation_file(path)
+revocations.reload()
+check("lista vacía", len(revocations) == 0 and not revocations.is_revoked(token='a'))
+
+print("\n=====================")
+print("RECARGA")
+print("=====================")
+
+write_revocation_file(path, ['viejo'])
+revocations = RevocationList(path, reload_interval=0)
+held = revocations._current
+write_revocation_file(path, ['nuevo'])
+check("recarga al reemplazar", revocations.is_revoked(token='nuevo') and not revocations.is_revoked(token='viejo'))
+check("la versión anterior sigue legible", held.count == 1 and module.token_key('viejo') in held)
+lazy = RevocationList(path, reload_interval=3600)
+write_revocation_file(path, ['otro'])
+check("sin recarga antes del intervalo", lazy.is_revoked(token='nuevo'))
+
+for name, content in (('magic', b'X' * 24), ('truncado', open(path, 'rb').read()[:-1])):
+    bad = os.path.join(directory, name)
+    with open(bad, 'wb') as f:
+        f.write(content)
+    try:
+        RevocationList(bad)
+        error = None
+    except ValueError as e:
+        error = e
+    check(f"archivo inválido: {name}", error is not None)
+
+check("recarga tras otro reemplazo", revocations.is_revoked(token='otro'))
+os.unlink(path)
+check("archivo eliminado: se conserva la versión cargada", revocations.is_revoked(token='otro'))
+
+print("\n=====================")
+print("VERIFICACIÓN DE FIRMA")
+print("=====================")
+
+revoked = encode_jwt({'alg': 'HS256', 'typ': 'JWT'}, {'sub': 'x', 'jti': 'revocado'}, 'clave')
+full = encode_jwt({'alg': 'HS256', 'typ': 'JWT'}, {'sub': 'y'}, 'clave')
+valid = encode_jwt({'alg': 'HS256', 'typ': 'JWT'}, {'sub': 'z', 'jti': 'vigente'}, 'clave')
+write_revocation_file(path, [full], ['revocado'])
+revocations = RevocationList(path)
+for name, token, expected in (('por jti', revoked, 'RevokedTokenError'), ('por token', full, 'RevokedTokenError'),
+                              ('vigente', valid, None)):
+    result = verify_jwt_signature(token, 'clave', revocation_list=revocations)
+    check(f"firma: {name}", result.get('error_type') == expected and result['valid'] is (expected is None), result)
+result = verify_jwt_signature(revoked, 'otra', revocation_list=revocations)
+check("firma inválida antes que revocación", result.get('error_type') is None and not result['valid'], result)
+
+print("\n=====================")
+print("PRUEBAS COMPLETADAS:", "con errores: " + ", ".join(fallos) if fallos else "sin errores")
+print("=====================")
+sys.exit(1 if fallos else 0)
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+TEST DE LOS SNAPSHOTS DE JWTS (PROYECTO JWT)
+--------------------------------------------
+Prueba la exportación (sin el campo secreto por defecto), la lectura por
+memory-map y la actualización incremental, incluidos los documentos con
+_id menor que la marca del snapshot (los ObjectId no siempre crecen).
+
+Requiere mongomock (base en memoria) si no hay conexión a MongoDB.
+"""
+
+import os
+import sys
+import tempfile
+import types
+
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+try:
+    import mongomock
+except ImportError:
+    print("[SKIP] Se requiere mongomock para probar los snapshots sin MongoDB")
+    sys.exit(0)
+sys.modules['db'] = types.SimpleNamespace(db=mongomock.MongoClient()['JWTData'])
+
+from bson.objectid import ObjectId
+
+from app.services import database_service
+from app.services.database_service import DatabaseService
+from app.services.snapshot_service import JwtsSnapshot, export_snapshot, refresh_snapshot
+
+fallos = []
+
+
+def check(name, condition, detail=''):
+    if condition:
+        print("[OK]", name)
+    else:
+        print("[ERROR]", name, detail)
+        fallos.append(name)
+
+
+DatabaseService.publish_changes = False
+path = os.path.join(tempfile.mkdtemp(), 'jwts.snap')
+
+print("\n=====================")
+print("EXPORTACIÓN")
+print("=====================")
+
+ids = [DatabaseService.create_jwt({'token': f"token-{i}", 'name': f"n{i}", 'secreto': 'clave'}) for i in range(5)]
+check("documentos exportados", export_snapshot(path) == 5)
+with JwtsSnapshot(path) as snapshot:
+    check("tokens", list(snapshot.iter_tokens()) == [f"token-{i}" for i in range(5)])
+    check("secreto excluido por defecto", all('secreto' not in document for document in snapshot),
+          snapshot.document(0))
+    check("exclusión registrada", snapshot.info['exclude'] == ['secreto'], snapshot.info)
+    watermark = snapshot.watermark
+check("secreto con exclude=()", export_snapshot(path + '.full', exclude=()) == 5
+      and 'secreto' in JwtsSnapshot(path + '.full').document(0))
+
+print("\n=====================")
+print("ACTUALIZACIÓN")
+print("=====================")
+
+DatabaseService.delete_jwt(ids[1])
+DatabaseService.create_jwt({'token': 'token-nuevo', 'name': 'nuevo', 'secreto': 'clave'})
+# Un documento con _id menor que la marca (p. ej. generado por un cliente con el reloj atrasado)
+old_id = ObjectId.from_datetime(ObjectId(watermark).generation_time.replace(year=2001))
+database_service.insertar_uno(DatabaseService.COLLECTION_NAME, {'_id': old_id, 'token': 'token-viejo',
+                                                                'name': 'viejo', 'secreto': 'clave'})
+counts = refresh_snapshot(path)
+check("conteos", counts == {'added': 2, 'removed': 1, 'total': 6}, counts)
+with JwtsSnapshot(path) as snapshot:
+    tokens = list(snapshot.iter_tokens())
+    check("documento con _id menor que la marca", 'token-viejo' in tokens, tokens)
+    check("eliminado quitado", 'token-1' not in tokens, tokens)
+    check("orden de _id", [d['_id'] for d in snapshot] == sorted(d['_id'] for d in snapshot))
+    check("secreto excluido en los agregados", all('secreto' not in document for document in snapshot))
+check("sin cambios", refresh_snapshot(path) == {'added': 0, 'removed': 0, 'total': 6})
+
+print("\n=====================")
+print("PRUEBAS COMPLETADAS:", "con errores: " + ", ".join(fallos) if fallos else "sin errores")
+print("=====================")
+sys.exit(1 if fallos else 0)
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+TEST DE LAS POLÍTICAS DE VALIDACIÓN (PROYECTO JWT)
+--------------------------------------------------
+Prueba que un token no evade una política omitiendo los claims que ella
+restringe, que un id de política que no es String se rechaza con 400 y que
+las políticas administradas por API se comparten entre workers mediante el
+store.
+"""
+
+import os
+import sys
+import time
+import types
+
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from app.analyzer.semantic_analyzer import InvalidValueError, MissingClaimError, SemanticAnalyzer
+from app.analyzer.validation_policy import PolicyRegistry, UnknownPolicyError, ValidationPolicy
+
+fallos = []
+
+
+def check(name, condition, detail=''):
+    if condition:
+        print("[OK]", name)
+    else:
+        print("[ERROR]", name, detail)
+        fallos.append(name)
+
+
+def rejected(payload, policy, error):
+    try:
+        SemanticAnalyzer().analyze({'alg': 'HS256', 'typ': 'JWT'}, payload, policy=policy)
+    except error:
+        return True
+    except Exception as e:
+        print("   ", type(e).__name__, e)
+        return False
+    return False
+
+
+NOW = int(time.time())
+
+print("\n=====================")
+print("CLAIMS RESTRINGIDOS")
+print("=====================")
+
+policy = ValidationPolicy.compile('estricta', {'algorithms': ['HS256'], 'issuers': ['https://a.com'],
+                                               'audiences': ['api'], 'max_lifetime': 3600})
+valid = {'iss': 'https://a.com', 'aud': 'api', 'iat': NOW, 'exp': NOW + 60}
+check("token completo aceptado", SemanticAnalyzer().analyze({'alg': 'HS256', 'typ': 'JWT'}, valid, policy=policy))
+for claim in ('iss', 'aud', 'exp'):
+    payload = {k: v for k, v in valid.items() if k != claim}
+    check(f"sin '{claim}' se rechaza", rejected(payload, policy, MissingClaimError))
+check("emisor no aceptado", rejected(dict(valid, iss='https://b.com'), policy, InvalidValueError))
+check("vida máxima superada", rejected(dict(valid, exp=NOW + 7200), policy, InvalidValueError))
+check("as_dict conserva required_claims", policy.as_dict()['required_claims'] == [])
+
+print("\n=====================")
+print("STORE COMPARTIDO")
+print("=====================")
+
+
+class MemoryStore:
+    """Store en memoria con la interfaz de DatabaseService."""
+
+    def __init__(self):
+        self.definitions, self.version = {}, 0
+
+    def load_policies(self):
+        return dict(self.definitions)
+
+    def save_policy(self, policy_id, spec):
+        self.definitions[policy_id] = dict(spec)
+        self.version += 1
+
+    def delete_policy(self, policy_id):
+        self.definitions[policy_id] = None
+        self.version += 1
+
+    def get_policies_version(self):
+        return self.version
+
+
+store = MemoryStore()
+worker_1 = PolicyRegistry(store=store, refresh_seconds=0)
+worker_2 = PolicyRegistry(store=store, refresh_seconds=0)
+worker_1.register('equipo-a', {'algorithms': ['HS384']})
+check("worker 2 ve la política", worker_2.get('equipo-a').algorithms == frozenset({'HS384'}))
+worker_2.remove('equipo-a')
+try:
+    worker_1.get('equipo-a')
+    check("worker 1 ve la eliminación", False)
+except UnknownPolicyError:
+    check("worker 1 ve la eliminación", True)
+restarted = PolicyRegistry(store=store)
+restarted.register('equipo-b', {'algorithms': ['HS256']})
+check("persiste tras reiniciar", 'equipo-b' in PolicyRegistry(store=store, refresh_seconds=0).all())
+try:
+    worker_1.get(['lista'])
+    check("id que no es String", False)
+except UnknownPolicyError as e:
+    check("id que no es String", 'String' in str(e), str(e))
+
+print("\n=====================")
+print("API")
+print("=====================")
+
+try:
+    import mongomock
+except ImportError:
+    mongomock = None
+    print("[SKIP] API: se requiere mongomock")
+
+if mongomock is not None:
+    sys.modules['db'] = types.SimpleNamespace(db=mongomock.MongoClient()['JWTData'])
+    os.environ['JWT_ADMIN_TOKEN'] = 'admin'
+    os.environ['JWT_POLICIES_REFRESH_SECONDS'] = '0'
+    from run import create_app
+
+    app_1, app_2 = create_app(), create_app()
+    client_1, client_2 = app_1.test_client(), app_2.test_client()
+    for path, body in (('/api/analyze/semantic', {'header': {'alg': 'HS256'}, 'payload': {}, 'policy': ['x']}),
+                       ('/api/analyze/full', {'jwt': 'a.b.c', 'policy': {'x': 1}})):
+        response = client_1.post(path, json=body)
+        check(f"{path}: policy no String -> 400", response.status_code == 400, response.status_code)
+
+    response = client_1.put('/api/policies/equipo-c', json={'algorithms': ['HS256'], 'issuers': ['https://a.com']},
+                            headers={'Authorization': 'Bearer admin'})
+    check("PUT /policies", response.status_code == 200, response.get_json())
+    response = client_2.post('/api/analyze/semantic', json={'header': {'alg': 'HS256', 'typ': 'JWT'},
+                                                            'payload': {'sub': 'x'}, 'policy': 'equipo-c'})
+    check("otro worker aplica la política", response.status_code == 400
+          and response.get_json().get('error_type') == 'MissingClaimError', response.get_json())
+
+print("\n=====================")
+print("PRUEBAS COMPLETADAS:", "con errores: " + ", ".join(fallos) if fallos else "sin errores")
+print("=====================")
+sys.exit(1 if fallos else 0)
@@ -0,0 +1,221 @@
+"""
+Servicio de control de admisión y descarte de carga (load shedding).
+
+Aplica limitación de tasa por cliente y por endpoint (token bucket) y un
+tope de solicitudes concurrentes por carril. Las solicitudes baratas (health
+y análisis léxico de un solo token) van por un carril prioritario con su
+propia capacidad, de modo que una ráfaga de lotes o verificaciones
+criptográficas no las deja sin workers. El carril se decide por endpoint y,
+en los que aceptan varios formatos de cuerpo, por el tipo del cuerpo. Las solicitudes que exceden los límites se rechazan de inmediato
+con 429 y Retry-After.
+"""
+
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from flask import current_app, g, jsonify, request
+
+from app.services.metrics_service import metrics
+
+
+PRIORITY_LANE = 'priority'
+STANDARD_LANE = 'standard'
+
+
+class TokenBucket:
+    """Token bucket con reloj monotónico: `rate` tokens/s y capacidad `burst`."""
+
+    __slots__ = ('rate', 'burst', 'tokens', 'updated_at', 'lock')
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def try_acquire(self) -> Tuple[bool, float]:
+        """Consume un token; retorna (admitido, segundos hasta el próximo token)."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True, 0.0
+            return False, (1 - self.tokens) / self.rate
+
+    def refund(self) -> None:
+        """Devuelve un token consumido por una solicitud que otro límite rechazó."""
+        with self.lock:
+            self.tokens = min(self.burst, self.tokens + 1)
+
+
+class LaneConfig:
+    """Límites de un carril: tasa por cliente, tasa por endpoint y concurrencia."""
+
+    def __init__(self, client_rate: float, client_burst: float,
+                 endpoint_rate: float, endpoint_burst: float, max_concurrency: int):
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.endpoint_rate = endpoint_rate
+        self.endpoint_burst = endpoint_burst
+        self.max_concurrency = max_concurrency
+
+
+class AdmissionController:
+    """
+    Controlador de admisión por carril.
+
+    Los buckets por cliente se guardan en un LRU acotado (`max_clients`)
+    para que la memoria no crezca con el número de clientes distintos.
+    """
+
+    PRIORITY_ENDPOINTS = frozenset({'api.health_check', 'api.analyze_jwt'})
+    # Endpoints prioritarios solo con estos tipos de cuerpo (un token por solicitud); por ejemplo,
+    # POST /analyze/lexical con text/plain lleva hasta un MiB de tokens y va al carril estándar
+    PRIORITY_MIMETYPES = {'api.analyze_jwt_raw': frozenset({'application/jwt'})}
+
+    def __init__(self, lanes, max_clients: int = 10000, client_header: Optional[str] = None):
+        self.lanes = lanes
+        self.max_clients = max_clients
+        self.client_header = client_header
+        self._client_buckets: 'OrderedDict[Tuple[str, str], TokenBucket]' = OrderedDict()
+        self._endpoint_buckets = {}
+        self._semaphores = {lane: threading.BoundedSemaphore(cfg.max_concurrency) for lane, cfg in lanes.items()}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'AdmissionController':
+        env = os.getenv
+        lanes = {
+            STANDARD_LANE: LaneConfig(
+                client_rate=float(env('JWT_ADMISSION_CLIENT_RATE', 50)),
+                client_burst=float(env('JWT_ADMISSION_CLIENT_BURST', 100)),
+                endpoint_rate=float(env('JWT_ADMISSION_ENDPOINT_RATE', 200)),
+                endpoint_burst=float(env('JWT_ADMISSION_ENDPOINT_BURST', 400)),
+                max_concurrency=int(env('JWT_ADMISSION_MAX_CONCURRENCY', 8)),
+            ),
+            PRIORITY_LANE: LaneConfig(
+                client_rate=float(env('JWT_ADMISSION_PRIORITY_CLIENT_RATE', 200)),
+                client_burst=float(env('JWT_ADMISSION_PRIORITY_CLIENT_BURST', 400)),
+                endpoint_rate=float(env('JWT_ADMISSION_PRIORITY_ENDPOINT_RATE', 2000)),
+                endpoint_burst=float(env('JWT_ADMISSION_PRIORITY_ENDPOINT_BURST', 4000)),
+                max_concurrency=int(env('JWT_ADMISSION_PRIORITY_MAX_CONCURRENCY', 32)),
+            ),
+        }
+        return cls(
+            lanes,
+            max_clients=int(env('JWT_ADMISSION_MAX_CLIENTS', 10000)),
+            client_header=env('JWT_ADMISSION_CLIENT_HEADER') or None,
+        )
+
+    def lane_for(self, endpoint: Optional[str], mimetype: Optional[str] = None) -> str:
+        if endpoint in self.PRIORITY_ENDPOINTS or mimetype in self.PRIORITY_MIMETYPES.get(endpoint, ()):
+            return PRIORITY_LANE
+        return STANDARD_LANE
+
+    def _client_bucket(self, client: str, lane: str) -> TokenBucket:
+        key = (client, lane)
+        with self._lock:
+            bucket = self._client_buckets.get(key)
+            if bucket is None:
+                cfg = self.lanes[lane]
+                bucket = TokenBucket(cfg.client_rate, cfg.client_burst)
+                self._client_buckets[key] = bucket
+                if len(self._client_buckets) > self.max_clients:
+                    self._client_buckets.popitem(last=False)
+            else:
+                self._client_buckets.move_to_end(key)
+            return bucket
+
+    def _endpoint_bucket(self, endpoint: str, lane: str) -> TokenBucket:
+        # Un endpoint puede usar los dos carriles según el cuerpo: un bucket por carril
+        key = (endpoint, lane)
+        with self._lock:
+            bucket = self._endpoint_buckets.get(key)
+            if bucket is None:
+                cfg = self.lanes[lane]
+                bucket = TokenBucket(cfg.endpoint_rate, cfg.endpoint_burst)
+                self._endpoint_buckets[key] = bucket
+            return bucket
+
+    def client_id(self) -> str:
+        if self.client_header and request.headers.get(self.client_header):
+            return request.headers[self.client_header].split(',')[0].strip()
+        return request.remote_addr or 'desconocido'
+
+    def admit(self, endpoint: str, mimetype: Optional[str] = None) -> Tuple[Optional[str], float, str]:
+        """
+        Decide si se admite la solicitud actual.
+
+        Retorna (motivo_de_rechazo o None, retry_after, carril). Si se admite,
+        la solicitud ocupa un lugar del semáforo del carril hasta release().
+        Una solicitud rechazada no consume nada: si un límite posterior la
+        rechaza, se devuelven el lugar y los tokens ya tomados.
+        """
+        lane = self.lane_for(endpoint, mimetype)
+        semaphore = self._semaphores[lane]
+        if not semaphore.acquire(blocking=False):
+            return 'concurrency', 1.0, lane
+
+        client_bucket = self._client_bucket(self.client_id(), lane)
+        ok, retry_after = client_bucket.try_acquire()
+        if not ok:
+            semaphore.release()
+            return 'client_rate', retry_after, lane
+
+        ok, retry_after = self._endpoint_bucket(endpoint, lane).try_acquire()
+        if not ok:
+            client_bucket.refund()
+            semaphore.release()
+            return 'endpoint_rate', retry_after, lane
+
+        return None, 0.0, lane
+
+    def release(self, lane: str) -> None:
+        self._semaphores[lane].release()
+
+
+def _before_request():
+    controller = current_app.config.get('JWT_ADMISSION_CONTROLLER')
+    if controller is None or request.endpoint is None or request.method == 'OPTIONS':
+        return None
+
+    reason, retry_after, lane = controller.admit(request.endpoint, request.mimetype)
+    if reason is not None:
+        metrics.inc('jwt_admission_rejected_total', lane=lane, reason=reason)
+        response = jsonify({
+            'success': False,
+            'error': 'Demasiadas solicitudes: intenta de nuevo más tarde.',
+            'error_type': 'TooManyRequests'
+        })
+        response.status_code = 429
+        response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+        return response
+
+    metrics.inc('jwt_admission_admitted_total', lane=lane)
+    g.admission_lane = lane
+    return None
+
+
+def _teardown_request(exc):
+    lane = g.pop('admission_lane', None)
+    if lane is not None:
+        current_app.config['JWT_ADMISSION_CONTROLLER'].release(lane)
+
+
+def init_admission(app, controller: Optional[AdmissionController] = None) -> None:
+    """
+    Registra el control de admisión en la aplicación.
+
+    Se ejecuta antes que los hooks de los blueprints, para que una solicitud
+    descartada no llegue a leer su cuerpo.
+    """
+    app.config['JWT_ADMISSION_CONTROLLER'] = controller or AdmissionController.from_env()
+    app.before_request(_before_request)
+    app.teardown_request(_teardown_request)
@@ -0,0 +1,224 @@
+"""
+Servicio de eventos de cambio de la colección JWTS.
+
+Publica inserciones, actualizaciones y eliminaciones como deltas pequeños
+para que los clientes (vía Server-Sent Events) mantengan su lista al día sin
+volver a descargar la colección completa. La fuente es un notificador en
+proceso alimentado por DatabaseService, o un change stream de MongoDB cuando
+se ejecutan varios workers contra un replica set (Atlas).
+
+Cada evento tiene un id "<época>-<n>" (la época identifica al proceso) y se
+conserva en un buffer circular, de modo que un cliente que se reconecta con
+Last-Event-ID recibe lo que se perdió. Si ese id ya salió del buffer,
+pertenece a otro proceso, o si un suscriptor lento desborda su cola, recibe
+un evento 'reset' y debe recargar la lista.
+"""
+
+import logging
+import os
+import queue
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.metrics_service import metrics
+
+
+logger = logging.getLogger(__name__)
+
+OPERATIONS = ('insert', 'update', 'delete')
+
+
+class ChangeEvent:
+    """Delta de la colección: operación, id del documento y documento (None en delete)."""
+
+    __slots__ = ('event_id', 'op', 'document_id', 'document', 'epoch')
+
+    def __init__(self, event_id: int, op: str, document_id: str, document: Optional[Dict[str, Any]], epoch: str):
+        self.event_id = event_id
+        self.op = op
+        self.document_id = document_id
+        self.document = document
+        self.epoch = epoch
+
+    @property
+    def sse_id(self) -> str:
+        return f"{self.epoch}-{self.event_id}"
+
+
+class Subscription:
+    """Cola acotada de eventos de un suscriptor."""
+
+    def __init__(self, max_pending: int):
+        self.events: 'queue.Queue[ChangeEvent]' = queue.Queue(max_pending)
+        self.overflowed = False
+
+    def push(self, event: ChangeEvent) -> None:
+        try:
+            self.events.put_nowait(event)
+        except queue.Full:
+            # El cliente va atrasado: se descartan sus eventos y recibirá un 'reset'
+            self.overflowed = True
+
+    def take_overflow(self) -> bool:
+        """Retorna True (una vez) si la cola se desbordó, vaciándola."""
+        if not self.overflowed:
+            return False
+        self.overflowed = False
+        while True:
+            try:
+                self.events.get_nowait()
+            except queue.Empty:
+                return True
+
+    def next(self, timeout: float) -> Optional[ChangeEvent]:
+        try:
+            return self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class TooManySubscribersError(RuntimeError):
+    """Se lanza cuando se alcanza el máximo de suscriptores simultáneos."""
+    pass
+
+
+class ChangeNotifier:
+    """
+    Notificador en proceso de cambios de la colección JWTS.
+
+    Args:
+        history: Eventos conservados para reanudar con Last-Event-ID
+        max_pending: Eventos pendientes por suscriptor antes de forzar un 'reset'
+        max_subscribers: Conexiones simultáneas permitidas
+    """
+
+    def __init__(self, history: int = 1000, max_pending: int = 1000, max_subscribers: int = 100):
+        self.max_pending = max_pending
+        self.max_subscribers = max_subscribers
+        self._history: 'deque[ChangeEvent]' = deque(maxlen=history)
+        self._subscribers: List[Subscription] = []
+        self._last_id = 0
+        self._lock = threading.Lock()
+        self.epoch = os.urandom(4).hex()
+
+    @property
+    def last_event_id(self) -> str:
+        return f"{self.epoch}-{self._last_id}"
+
+    def publish(self, op: str, document_id: str, document: Optional[Dict[str, Any]] = None) -> ChangeEvent:
+        """Registra un cambio y lo entrega a todos los suscriptores."""
+        if op not in OPERATIONS:
+            raise ValueError(f"Operación desconocida: {op}")
+        with self._lock:
+            self._last_id += 1
+            event = ChangeEvent(self._last_id, op, str(document_id), document, self.epoch)
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.push(event)
+        metrics.inc('jwt_change_events_total', op=op)
+        return event
+
+    def subscribe(self, last_event_id: Optional[str] = None) -> Tuple[Subscription, Optional[List[ChangeEvent]]]:
+        """
+        Registra un suscriptor.
+
+        Retorna (suscripción, eventos a reenviar). Los eventos a reenviar son
+        los posteriores a last_event_id (el valor de Last-Event-ID), o None si
+        ya no se pueden reconstruir y el cliente debe recargar la lista.
+        """
+        subscription = Subscription(self.max_pending)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                raise TooManySubscribersError("Se alcanzó el máximo de suscriptores de eventos.")
+            self._subscribers.append(subscription)
+            replay: Optional[List[ChangeEvent]] = []
+            if last_event_id:
+                epoch, _, number = last_event_id.partition('-')
+                if epoch != self.epoch or not number.isdigit() or int(number) > self._last_id:
+                    replay = None
+                else:
+                    number = int(number)
+                    oldest = self._history[0].event_id if self._history else self._last_id + 1
+                    if number + 1 < oldest:
+                        replay = None
+                    else:
+                        replay = [e for e in self._history if e.event_id > number]
+        return subscription, replay
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+
+class ChangeStreamSource:
+    """
+    Alimenta un ChangeNotifier desde un change stream de MongoDB.
+
+    Se ejecuta en un hilo daemon; ante un error se reconecta con backoff
+    reanudando desde el último resume token, de modo que no se pierden
+    cambios mientras el oplog los conserve.
+    """
+
+    OPERATION_TYPES = {'insert': 'insert', 'update': 'update', 'replace': 'update', 'delete': 'delete'}
+
+    def __init__(self, collection_name: str, notifier: ChangeNotifier, max_backoff: float = 30.0):
+        self.collection_name = collection_name
+        self.notifier = notifier
+        self.max_backoff = max_backoff
+        self._resume_token = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name='jwts-change-stream', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        from crud import observar
+
+        backoff = 1.0
+        while not self._stop.is_set():
+            try:
+                options = {'full_document': 'updateLookup', 'max_await_time_ms': 1000}
+                if self._resume_token is not None:
+                    options['resume_after'] = self._resume_token
+                with observar(self.collection_name, **options) as stream:
+                    backoff = 1.0
+                    while not self._stop.is_set():
+                        change = stream.try_next()
+                        if change is None:
+                            continue
+                        self._resume_token = stream.resume_token
+                        self._publish(change)
+            except Exception as e:
+                logger.warning("Change stream de %s interrumpido: %s", self.collection_name, e)
+                metrics.inc('jwt_change_stream_errors_total')
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+
+    def _publish(self, change: Dict[str, Any]) -> None:
+        op = self.OPERATION_TYPES.get(change.get('operationType'))
+        if op is None:
+            return
+        document_id = change['documentKey']['_id']
+        document = change.get('fullDocument') if op != 'delete' else None
+        if op == 'update' and document is None:
+            # El documento se eliminó antes del lookup: llegará su propio 'delete'
+            return
+        if document is not None:
+            document = dict(document, _id=str(document_id))
+        self.notifier.publish(op, str(document_id), document)
+
+
+# Instancia compartida por toda la aplicación
+change_notifier = ChangeNotifier()
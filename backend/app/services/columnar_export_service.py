@@ -0,0 +1,231 @@
+"""
+Servicio de exportación columnar de resultados de análisis por lotes.
+
+Acumula los campos fijos de cada resultado (validez, código de error, alg,
+iss, sub, iat/exp/nbf y tamaños de segmento) en buffers tipados por columna,
+en lugar de conservar un diccionario anidado por token. Los strings se
+codifican por diccionario. Las columnas se exportan como arreglo estructurado
+de NumPy (.npy, cargable con memory-map) o como Parquet si pyarrow está
+instalado.
+"""
+
+import json
+import os
+from array import array
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+# Centinela para claims temporales ausentes o no enteros
+MISSING_TIME = -(2 ** 63)
+
+# Códigos de error estables (el código 0 indica que no hubo error)
+ERROR_CODES: Dict[Optional[str], int] = {
+    None: 0,
+    'LexicalError': 1,
+    'DecodeError': 2,
+    'SyntaxError': 3,
+    'LimitExceededError': 4,
+    'MissingClaimError': 5,
+    'InvalidDataTypeError': 6,
+    'InvalidValueError': 7,
+    'ExpirationDateError': 8,
+    'NotActiveTokenError': 9,
+    'SemanticError': 10,
+    'SignatureError': 11,
+    'ReplayedTokenError': 12,
+    'RevokedTokenError': 13,
+    'UnknownError': 255,
+}
+ERROR_NAMES = {code: name for name, code in ERROR_CODES.items()}
+
+RESULT_DTYPE = np.dtype([
+    ('valid', np.bool_),
+    ('error_code', np.uint8),
+    ('alg', np.uint32),
+    ('iss', np.uint32),
+    ('sub', np.uint32),
+    ('iat', np.int64),
+    ('exp', np.int64),
+    ('nbf', np.int64),
+    ('header_size', np.uint32),
+    ('payload_size', np.uint32),
+    ('signature_size', np.uint32),
+])
+
+STRING_COLUMNS = ('alg', 'iss', 'sub')
+TIME_COLUMNS = ('iat', 'exp', 'nbf')
+
+
+class StringDictionary:
+    """Codificación por diccionario de una columna de strings (0 = ausente)."""
+
+    def __init__(self):
+        self.values: List[Optional[str]] = [None]
+        self._codes: Dict[str, int] = {}
+
+    def encode(self, value: Any) -> int:
+        if not isinstance(value, str):
+            return 0
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self._codes[value] = code
+            self.values.append(value)
+        return code
+
+
+class ColumnarResultBuilder:
+    """
+    Acumulador columnar de resultados de análisis.
+
+    Cada resultado ocupa ~48 bytes en buffers `array` más su entrada en los
+    diccionarios de strings, frente a varios KB del diccionario anidado.
+    """
+
+    def __init__(self):
+        self._valid = array('B')
+        self._error_code = array('B')
+        # Los códigos de string son de 32 bits: alg, iss y sub vienen del token (cardinalidad no acotada)
+        self._alg = array('I')
+        self._iss = array('I')
+        self._sub = array('I')
+        self._times = {name: array('q') for name in TIME_COLUMNS}
+        self._sizes = {name: array('I') for name in ('header_size', 'payload_size', 'signature_size')}
+        self.dictionaries = {name: StringDictionary() for name in STRING_COLUMNS}
+
+    def __len__(self):
+        return len(self._valid)
+
+    def append(self, valid: bool, error_type: Optional[str] = None,
+               header: Optional[Dict[str, Any]] = None, payload: Optional[Dict[str, Any]] = None,
+               segments: Optional[Sequence[str]] = None) -> None:
+        """
+        Agrega un resultado.
+
+        header y payload son los diccionarios decodificados (si se llegaron a
+        obtener); segments son los segmentos Base64URL del análisis léxico.
+        """
+        header = header if isinstance(header, dict) else {}
+        payload = payload if isinstance(payload, dict) else {}
+        segments = segments or ()
+
+        self._valid.append(1 if valid else 0)
+        self._error_code.append(ERROR_CODES.get(error_type, ERROR_CODES['UnknownError']))
+        self._alg.append(self.dictionaries['alg'].encode(header.get('alg')))
+        self._iss.append(self.dictionaries['iss'].encode(payload.get('iss')))
+        self._sub.append(self.dictionaries['sub'].encode(payload.get('sub')))
+        for name in TIME_COLUMNS:
+            value = payload.get(name)
+            self._times[name].append(value if type(value) is int and -2 ** 63 < value < 2 ** 63 else MISSING_TIME)
+        for i, name in enumerate(('header_size', 'payload_size', 'signature_size')):
+            self._sizes[name].append(len(segments[i]) if i < len(segments) else 0)
+
+    def append_result(self, result: Dict[str, Any]) -> None:
+        """
+        Agrega un resultado en formato diccionario.
+
+        Acepta las claves 'valid', 'error_type', 'tokens' (segmentos del
+        análisis léxico) y 'header'/'payload' como diccionarios decodificados.
+        """
+        self.append(
+            bool(result.get('valid')),
+            result.get('error_type'),
+            result.get('header'),
+            result.get('payload'),
+            result.get('tokens'),
+        )
+
+    def nbytes(self) -> int:
+        """Memoria ocupada por los buffers de columnas (sin diccionarios)."""
+        buffers = [self._valid, self._error_code, self._alg, self._iss, self._sub,
+                   *self._times.values(), *self._sizes.values()]
+        return sum(buf.itemsize * len(buf) for buf in buffers)
+
+    def to_numpy(self) -> np.ndarray:
+        """Retorna las columnas como un arreglo estructurado de NumPy."""
+        table = np.empty(len(self), dtype=RESULT_DTYPE)
+        table['valid'] = np.frombuffer(self._valid, dtype=np.uint8).astype(np.bool_)
+        table['error_code'] = np.frombuffer(self._error_code, dtype=np.uint8)
+        table['alg'] = np.frombuffer(self._alg, dtype=np.uint32)
+        table['iss'] = np.frombuffer(self._iss, dtype=np.uint32)
+        table['sub'] = np.frombuffer(self._sub, dtype=np.uint32)
+        for name in TIME_COLUMNS:
+            table[name] = np.frombuffer(self._times[name], dtype=np.int64)
+        for name, buf in self._sizes.items():
+            table[name] = np.frombuffer(buf, dtype=np.uint32)
+        return table
+
+    def _metadata(self) -> Dict[str, Any]:
+        return {
+            'version': 2,
+            'rows': len(self),
+            'missing_time': MISSING_TIME,
+            'error_codes': {str(code): name for code, name in ERROR_NAMES.items()},
+            'dictionaries': {name: d.values for name, d in self.dictionaries.items()},
+        }
+
+    def save_npy(self, directory: str) -> None:
+        """
+        Escribe results.npy (arreglo estructurado) y dictionaries.json.
+
+        Se carga con load_npy, que abre el arreglo con memory-map.
+        """
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, 'results.npy'), self.to_numpy())
+        with open(os.path.join(directory, 'dictionaries.json'), 'w', encoding='utf-8') as f:
+            json.dump(self._metadata(), f, ensure_ascii=False)
+
+    def save_parquet(self, path: str) -> None:
+        """Escribe las columnas en Parquet con columnas de strings tipo diccionario (requiere pyarrow)."""
+        write_parquet(self.to_numpy(), self._metadata(), path)
+
+
+def write_parquet(table: np.ndarray, metadata: Dict[str, Any], path: str) -> None:
+    """
+    Escribe en Parquet una tabla de resultados (de to_numpy o load_npy) con sus metadatos.
+
+    Requiere pyarrow; lanza RuntimeError si no está instalado.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("La exportación a Parquet requiere pyarrow (pip install pyarrow).") from e
+
+    def dictionary_column(codes, values):
+        # El código 0 (ausente) se representa como nulo de Arrow
+        codes = np.asarray(codes).astype(np.int64)
+        indices = pa.array(codes - 1, mask=codes == 0)
+        return pa.DictionaryArray.from_arrays(indices, pa.array(values[1:], type=pa.string()))
+
+    columns = {}
+    for name in RESULT_DTYPE.names:
+        if name in STRING_COLUMNS:
+            columns[name] = dictionary_column(table[name], metadata['dictionaries'][name])
+        elif name in TIME_COLUMNS:
+            values = np.asarray(table[name])
+            columns[name] = pa.array(values, mask=values == MISSING_TIME)
+        elif name == 'error_code':
+            names = [None] + [ERROR_NAMES.get(code, 'UnknownError') for code in range(1, 256)]
+            columns['error_type'] = dictionary_column(table[name], names)
+        else:
+            columns[name] = pa.array(np.asarray(table[name]))
+    # Escritura atómica: un lector concurrente nunca ve un archivo a medias
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    pq.write_table(pa.table(columns), tmp_path)
+    os.replace(tmp_path, path)
+
+
+def load_npy(directory: str, mmap: bool = True):
+    """
+    Carga resultados exportados con save_npy.
+
+    Retorna (tabla, metadatos); con mmap=True el arreglo se abre con
+    memory-map y no se lee completo a memoria.
+    """
+    table = np.load(os.path.join(directory, 'results.npy'), mmap_mode='r' if mmap else None)
+    with open(os.path.join(directory, 'dictionaries.json'), encoding='utf-8') as f:
+        metadata = json.load(f)
+    return table, metadata
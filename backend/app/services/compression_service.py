@@ -0,0 +1,190 @@
+"""
+Servicio de compresión de respuestas HTTP.
+
+Las respuestas grandes (GET /jwts, resultados de trabajos en JSON o NDJSON)
+repiten los mismos segmentos de header, claves y mensajes de error miles de
+veces, por lo que se comprimen muy bien. La codificación se negocia con
+Accept-Encoding entre zstd, br y gzip (zstd y br solo si los paquetes
+`zstandard` y `brotli` están instalados; gzip usa zlib de la biblioteca
+estándar).
+
+Las respuestas en streaming (generadores) se comprimen bloque a bloque con
+un flush por bloque, de modo que el cliente recibe cada parte sin esperar al
+final. Las respuestas normales solo se comprimen si superan un tamaño mínimo.
+"""
+
+import os
+import zlib
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+from flask import request
+
+from app.services.metrics_service import metrics
+
+
+COMPRESSIBLE_MIMETYPES = frozenset({
+    'application/json', 'application/x-ndjson', 'text/plain', 'text/csv',
+})
+
+# Las respuestas con estos códigos no tienen cuerpo
+NO_BODY_STATUSES = frozenset({204, 304})
+
+
+class _Gzip:
+    def __init__(self, level: int):
+        # wbits 16 + MAX_WBITS: formato gzip (cabecera y CRC)
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _Brotli:
+    def __init__(self, level: int):
+        import brotli
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _Zstd:
+    def __init__(self, level: int):
+        import zstandard
+        self._flush_block = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(self._flush_block)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+def available_encodings() -> Dict[str, Callable[[int], object]]:
+    """Codificaciones disponibles en este entorno, en orden de preferencia."""
+    encodings = {}
+    try:
+        import zstandard  # noqa: F401
+        encodings['zstd'] = _Zstd
+    except ImportError:
+        pass
+    try:
+        import brotli  # noqa: F401
+        encodings['br'] = _Brotli
+    except ImportError:
+        pass
+    encodings['gzip'] = _Gzip
+    return encodings
+
+
+class ResponseCompressor:
+    """
+    Compresión negociada de respuestas.
+
+    Args:
+        min_size: Bytes mínimos para comprimir una respuesta no streaming
+        level: Nivel de compresión (nivel de gzip y zstd, calidad de brotli)
+        encodings: Codificaciones permitidas, en orden de preferencia
+    """
+
+    def __init__(self, min_size: int = 1024, level: int = 6, encodings: Optional[Iterable[str]] = None):
+        self.min_size = min_size
+        self.level = level
+        supported = available_encodings()
+        names = list(encodings) if encodings is not None else list(supported)
+        self.encodings = {name: supported[name] for name in names if name in supported}
+
+    @classmethod
+    def from_env(cls) -> 'ResponseCompressor':
+        encodings = os.getenv('JWT_COMPRESSION_ENCODINGS')
+        return cls(
+            min_size=int(os.getenv('JWT_COMPRESSION_MIN_SIZE', 1024)),
+            level=int(os.getenv('JWT_COMPRESSION_LEVEL', 6)),
+            encodings=[e.strip() for e in encodings.split(',') if e.strip()] if encodings else None,
+        )
+
+    def negotiate(self) -> Optional[str]:
+        """Codificación a usar según Accept-Encoding (None si no hay una aceptable)."""
+        return request.accept_encodings.best_match(list(self.encodings))
+
+    def _eligible(self, response) -> bool:
+        return (
+            request.method != 'HEAD'
+            and response.status_code >= 200
+            and response.status_code not in NO_BODY_STATUSES
+            and response.mimetype in COMPRESSIBLE_MIMETYPES
+            and 'Content-Encoding' not in response.headers
+            and 'no-transform' not in response.headers.get('Cache-Control', '')
+            and not response.direct_passthrough
+        )
+
+    def _stream(self, chunks: Iterable, encoding: str) -> Iterator[bytes]:
+        compressor = self.encodings[encoding](self.level)
+        sizes = [0, 0]
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                if not chunk:
+                    continue
+                sizes[0] += len(chunk)
+                compressed = compressor.compress(chunk)
+                sizes[1] += len(compressed)
+                yield compressed
+            tail = compressor.finish()
+            sizes[1] += len(tail)
+            yield tail
+        finally:
+            # Cerrar el generador original ejecuta sus bloques finally
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
+            self._count(encoding, *sizes)
+
+    @staticmethod
+    def _count(encoding: str, original: int, compressed: int) -> None:
+        metrics.inc('jwt_compression_responses_total', encoding=encoding)
+        metrics.inc('jwt_compression_bytes_total', original, encoding=encoding, stage='original')
+        metrics.inc('jwt_compression_bytes_total', compressed, encoding=encoding, stage='compressed')
+
+    def __call__(self, response):
+        """Hook after_request: comprime la respuesta si corresponde."""
+        if not self._eligible(response):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = self.negotiate()
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = self._stream(response.response, encoding)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            compressor = self.encodings[encoding](self.level)
+            compressed = compressor.compress(data) + compressor.finish()
+            response.set_data(compressed)
+            self._count(encoding, len(data), len(compressed))
+
+        response.headers['Content-Encoding'] = encoding
+        # La representación comprimida no es idéntica byte a byte: el ETag pasa
+        # a ser débil, que If-None-Match sigue aceptando (comparación débil)
+        etag, weak = response.get_etag()
+        if etag is not None and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+
+def init_compression(app, compressor: Optional[ResponseCompressor] = None) -> None:
+    """Registra la compresión de respuestas en la aplicación."""
+    app.config['JWT_COMPRESSOR'] = compressor or ResponseCompressor.from_env()
+    app.after_request(app.config['JWT_COMPRESSOR'])
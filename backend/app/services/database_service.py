@@ -13,13 +13,156 @@ data_dir = os.path.join(backend_dir, 'data')
 if data_dir not in sys.path:
     sys.path.insert(0, data_dir)
 
-from crud import obtener_todos, obtener_por_id, insertar_uno, actualizar_por_id, eliminar_por_id
+import json
+import threading
+import time
+from datetime import datetime, timezone
+
+from bson.objectid import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from crud import (
+    obtener_todos, obtener_por_id, obtener_por_filtro, insertar_uno, actualizar_por_id,
+    eliminar_todos, agregar, incrementar, incrementar_varios, crear_indice,
+    insertar_varios, obtener_paginado, iterar_por_filtro, contar, eliminar_por_filtro, reemplazar_por_filtro,
+    actualizar_por_filtro, actualizar_y_obtener_anterior, eliminar_y_obtener
+)
+from app.analyzer.lexical_analyzer import JWTLexer
+from app.analyzer.decoder_json import decode_segments
+from app.services.change_feed_service import change_notifier
+from app.services.metrics_service import instrument, instrument_generator, metrics
+
+
+def _mongo(func):
+    # Latencia y errores de cada llamada a MongoDB, por operación de crud
+    return instrument(func.__name__, metric='jwt_mongo', label='operation')(func)
+
+
+obtener_todos = _mongo(obtener_todos)
+obtener_por_id = _mongo(obtener_por_id)
+obtener_por_filtro = _mongo(obtener_por_filtro)
+obtener_paginado = _mongo(obtener_paginado)
+contar = _mongo(contar)
+agregar = _mongo(agregar)
+insertar_uno = _mongo(insertar_uno)
+insertar_varios = _mongo(insertar_varios)
+actualizar_por_id = _mongo(actualizar_por_id)
+reemplazar_por_filtro = _mongo(reemplazar_por_filtro)
+actualizar_por_filtro = _mongo(actualizar_por_filtro)
+actualizar_y_obtener_anterior = _mongo(actualizar_y_obtener_anterior)
+incrementar = _mongo(incrementar)
+incrementar_varios = _mongo(incrementar_varios)
+crear_indice = _mongo(crear_indice)
+eliminar_por_filtro = _mongo(eliminar_por_filtro)
+eliminar_y_obtener = _mongo(eliminar_y_obtener)
+eliminar_todos = _mongo(eliminar_todos)
+iterar_por_filtro = instrument_generator('iterar_por_filtro', iterar_por_filtro)
+
+
+_lexer = JWTLexer()
+
+
+def extract_claims(token):
+    """
+    Decodifica los claims indexables de un token para almacenarlos junto a él.
+    
+    Retorna un diccionario con alg, typ, iss, sub, aud, iat, exp, nbf y jti
+    (solo los presentes y con tipo válido), o None si el token no se puede
+    decodificar.
+    """
+    if not isinstance(token, str):
+        return None
+    try:
+        header_json, payload_json = decode_segments(_lexer.lex(token))
+        header = json.loads(header_json)
+        payload = json.loads(payload_json)
+    except ValueError:
+        return None
+    if not isinstance(header, dict) or not isinstance(payload, dict):
+        return None
+
+    claims = {}
+    for name, source in (('alg', header), ('typ', header), ('iss', payload), ('sub', payload), ('jti', payload)):
+        if isinstance(source.get(name), str):
+            claims[name] = source[name]
+    aud = payload.get('aud')
+    if isinstance(aud, str) or (isinstance(aud, list) and all(isinstance(a, str) for a in aud)):
+        claims['aud'] = aud
+    for name in ('iat', 'exp', 'nbf'):
+        value = payload.get(name)
+        # MongoDB solo admite enteros de 64 bits
+        if type(value) is int and -2 ** 63 <= value < 2 ** 63:
+            claims[name] = value
+    return claims
 
 
 class DatabaseService:
     """Servicio para operaciones de base de datos con JWTs."""
     
     COLLECTION_NAME = "JWTS"
+    STATS_COLLECTION_NAME = "JWTS_STATS"
+    JTI_COLLECTION_NAME = "JTI_SEEN"
+    META_COLLECTION_NAME = "JWTS_META"
+    JOB_RESULTS_COLLECTION_NAME = "JOB_RESULTS"
+    JOBS_COLLECTION_NAME = "JOBS"
+    POLICIES_COLLECTION_NAME = "POLICIES"
+    
+    # Documento de JWTS_META con la versión de la colección JWTS
+    VERSION_ID = 'version'
+    
+    # Documento de JWTS_META con la versión de las políticas de validación
+    POLICIES_VERSION_ID = 'policies_version'
+    
+    # Publicar los cambios en el notificador en proceso (se desactiva cuando
+    # la fuente de eventos es un change stream de MongoDB)
+    publish_changes = True
+    
+    # Cache read-through de la lista transformada: {transform: (versión, lista)}
+    _list_cache = {}
+    _list_cache_lock = threading.Lock()
+    
+    # Dimensiones con contadores mantenidos incrementalmente en JWTS_STATS
+    STAT_DIMENSIONS = ('alg', 'iss', 'valido', 'tipo_error')
+    
+    # Campos de claims indexados para los pipelines de agregación
+    INDEXED_FIELDS = ('claims.alg', 'claims.iss', 'claims.exp')
+    
+    @staticmethod
+    def _stat_values(document):
+        """Valores de cada dimensión de estadística para un documento."""
+        claims = document.get('claims') or {}
+        values = {
+            'alg': claims.get('alg'),
+            'iss': claims.get('iss'),
+            'valido': document.get('valido'),
+            'tipo_error': document.get('tipo_error'),
+        }
+        return {dim: ('sin_valor' if value is None else value) for dim, value in values.items()}
+    
+    @staticmethod
+    def _stat_counter(dim, value):
+        """Filtro del contador de una dimensión (dim None para el total)."""
+        if dim is None:
+            return {'_id': 'total'}
+        return {'_id': f"{dim}:{value}", 'dim': dim, 'value': value}
+    
+    @staticmethod
+    def _update_stats(*changes):
+        """
+        Aplica los cambios [(documento, delta), ...] a los contadores en un único bulk_write.
+        
+        Los deltas de un mismo contador se suman antes de escribir: en una
+        actualización que no cambia la dimensión (-1 y +1) no se escribe nada.
+        """
+        deltas = {}
+        for document, delta in changes:
+            keys = [(None, None), *DatabaseService._stat_values(document).items()]
+            for key in keys:
+                deltas[key] = deltas.get(key, 0) + delta
+        incrementar_varios(DatabaseService.STATS_COLLECTION_NAME, [
+            (DatabaseService._stat_counter(dim, value), {'count': delta})
+            for (dim, value), delta in deltas.items() if delta
+        ])
     
     @staticmethod
     def get_all_jwts():
@@ -35,6 +178,62 @@ class DatabaseService:
         except Exception as e:
             raise Exception(f"Error al obtener JWTs de la base de datos: {str(e)}")
     
+    @staticmethod
+    def get_collection_version():
+        """
+        Obtiene la versión de la colección JWTS.
+        
+        La versión se guarda en MongoDB y aumenta con cada escritura, por lo
+        que es la misma para todos los workers. Leerla cuesta una consulta por
+        _id, en lugar de recorrer la colección.
+        
+        Returns:
+            int: Versión actual (0 si nunca hubo escrituras)
+        """
+        try:
+            documents = obtener_por_filtro(
+                DatabaseService.META_COLLECTION_NAME, {'_id': DatabaseService.VERSION_ID}
+            )
+            return documents[0].get('value', 0) if documents else 0
+        except Exception as e:
+            raise Exception(f"Error al obtener la versión de la colección: {str(e)}")
+    
+    @staticmethod
+    def _bump_version():
+        """Incrementa la versión de la colección e invalida la cache local."""
+        incrementar(DatabaseService.META_COLLECTION_NAME, {'_id': DatabaseService.VERSION_ID}, {'value': 1})
+        with DatabaseService._list_cache_lock:
+            DatabaseService._list_cache = {}
+    
+    @staticmethod
+    def get_all_jwts_cached(transform, version=None):
+        """
+        Read-through de la lista completa de JWTs ya transformada.
+        
+        Si la versión de la colección no cambió desde la última lectura se
+        retorna la lista en memoria sin consultar JWTS ni volver a aplicar
+        `transform`. La versión se lee antes que la lista: una escritura
+        concurrente a lo sumo provoca una recarga extra, nunca una lista vieja
+        asociada a una versión nueva.
+        
+        Args:
+            transform: Función aplicada a cada documento (por ejemplo, el formato del frontend)
+            version: Versión ya leída con get_collection_version (opcional)
+            
+        Returns:
+            list: Lista transformada
+        """
+        version = DatabaseService.get_collection_version() if version is None else version
+        cached = DatabaseService._list_cache.get(transform)
+        if cached is not None and cached[0] == version:
+            metrics.inc('jwt_list_cache_total', result='hit')
+            return cached[1]
+        metrics.inc('jwt_list_cache_total', result='miss')
+        value = [transform(document) for document in DatabaseService.get_all_jwts()]
+        with DatabaseService._list_cache_lock:
+            DatabaseService._list_cache[transform] = (version, value)
+        return value
+    
     @staticmethod
     def get_jwt_by_id(jwt_id):
         """
@@ -64,7 +263,13 @@ class DatabaseService:
             str: ID del JWT creado
         """
         try:
+            jwt_data = dict(jwt_data)
+            jwt_data['claims'] = extract_claims(jwt_data.get('token'))
             jwt_id = insertar_uno(DatabaseService.COLLECTION_NAME, jwt_data)
+            DatabaseService._update_stats((jwt_data, 1))
+            DatabaseService._bump_version()
+            if DatabaseService.publish_changes:
+                change_notifier.publish('insert', jwt_id, jwt_data)
             return jwt_id
         except Exception as e:
             raise Exception(f"Error al crear JWT: {str(e)}")
@@ -79,10 +284,27 @@ class DatabaseService:
             update_data: Diccionario con los campos a actualizar
             
         Returns:
-            bool: True si la actualización fue exitosa
+            bool: True si el JWT existía y se actualizó
         """
         try:
-            return actualizar_por_id(DatabaseService.COLLECTION_NAME, jwt_id, update_data)
+            update_data = dict(update_data)
+            if 'token' in update_data:
+                update_data['claims'] = extract_claims(update_data['token'])
+            
+            # El documento previo lo retorna la misma escritura: con actualizaciones
+            # concurrentes cada una descuenta exactamente el estado que reemplazó
+            previous = actualizar_y_obtener_anterior(DatabaseService.COLLECTION_NAME, jwt_id, update_data)
+            if previous is None:
+                return False
+            # Los contadores se actualizan antes que la versión (ver rebuild_stats)
+            if {'claims', 'valido', 'tipo_error'} & set(update_data):
+                DatabaseService._update_stats((previous, -1), ({**previous, **update_data}, 1))
+            DatabaseService._bump_version()
+            if DatabaseService.publish_changes:
+                current = obtener_por_id(DatabaseService.COLLECTION_NAME, jwt_id)
+                if current is not None:
+                    change_notifier.publish('update', jwt_id, current)
+            return True
         except Exception as e:
             raise Exception(f"Error al actualizar JWT: {str(e)}")
     
@@ -95,10 +317,420 @@ class DatabaseService:
             jwt_id: ID del JWT a eliminar
             
         Returns:
-            bool: True si la eliminación fue exitosa
+            bool: True si el JWT existía y se eliminó
         """
         try:
-            return eliminar_por_id(DatabaseService.COLLECTION_NAME, jwt_id)
+            # Con eliminaciones concurrentes del mismo id solo una recibe el documento
+            # y descuenta los contadores
+            previous = eliminar_y_obtener(DatabaseService.COLLECTION_NAME, jwt_id)
+            if previous is None:
+                return False
+            DatabaseService._update_stats((previous, -1))
+            DatabaseService._bump_version()
+            if DatabaseService.publish_changes:
+                change_notifier.publish('delete', jwt_id)
+            return True
         except Exception as e:
             raise Exception(f"Error al eliminar JWT: {str(e)}")
 
+    @staticmethod
+    def ensure_indexes():
+        """Crea los índices sobre los claims usados por los pipelines de agregación."""
+        try:
+            for field in DatabaseService.INDEXED_FIELDS:
+                crear_indice(DatabaseService.COLLECTION_NAME, field)
+        except Exception as e:
+            raise Exception(f"Error al crear índices: {str(e)}")
+
+    @staticmethod
+    def backfill_claims():
+        """
+        Decodifica y guarda los claims de los documentos que aún no los tienen
+        y reconstruye los contadores a partir de la colección.
+        
+        Returns:
+            int: Número de documentos actualizados
+        """
+        try:
+            updated = 0
+            pending = iterar_por_filtro(
+                DatabaseService.COLLECTION_NAME,
+                {'claims': {'$exists': False}},
+                {'token': 1}
+            )
+            for document in pending:
+                actualizar_por_id(
+                    DatabaseService.COLLECTION_NAME,
+                    document['_id'],
+                    {'claims': extract_claims(document.get('token'))}
+                )
+                updated += 1
+            if updated:
+                DatabaseService._bump_version()
+            DatabaseService.rebuild_stats()
+            return updated
+        except Exception as e:
+            raise Exception(f"Error al completar claims: {str(e)}")
+
+    @staticmethod
+    def rebuild_stats(max_attempts=5):
+        """
+        Reconcilia los contadores de JWTS_STATS con pipelines de agregación.
+        
+        No borra los contadores: lee los actuales, agrega la colección y aplica
+        con $inc la diferencia, de modo que los incrementos concurrentes no se
+        pierden. Los escritores actualizan los contadores antes de incrementar
+        la versión de la colección; si la versión cambia mientras se calcula o
+        se aplica la diferencia, se repite el cálculo (hasta max_attempts).
+        
+        Returns:
+            bool: True si una pasada terminó sin escrituras concurrentes
+        """
+        try:
+            for _ in range(max_attempts):
+                version = DatabaseService.get_collection_version()
+                current = {
+                    counter['_id']: counter.get('count', 0)
+                    for counter in obtener_todos(DatabaseService.STATS_COLLECTION_NAME)
+                }
+                target = {}
+                total = agregar(DatabaseService.COLLECTION_NAME, [{'$count': 'count'}])
+                target['total'] = (DatabaseService._stat_counter(None, None), total[0]['count'] if total else 0)
+                for dim, field in DatabaseService._dimension_fields().items():
+                    for group in DatabaseService._group_by(field):
+                        value = 'sin_valor' if group['_id'] is None else group['_id']
+                        counter = DatabaseService._stat_counter(dim, value)
+                        target[counter['_id']] = (counter, group['count'])
+                if DatabaseService.get_collection_version() != version:
+                    continue
+                
+                increments = [
+                    (counter, {'count': count - current.get(counter_id, 0)})
+                    for counter_id, (counter, count) in target.items()
+                    if count != current.get(counter_id, 0)
+                ]
+                increments += [
+                    ({'_id': counter_id}, {'count': -count})
+                    for counter_id, count in current.items() if counter_id not in target and count
+                ]
+                incrementar_varios(DatabaseService.STATS_COLLECTION_NAME, increments)
+                if DatabaseService.get_collection_version() == version:
+                    return True
+            return False
+        except Exception as e:
+            raise Exception(f"Error al reconstruir estadísticas: {str(e)}")
+
+    @staticmethod
+    def _dimension_fields():
+        return {'alg': 'claims.alg', 'iss': 'claims.iss', 'valido': 'valido', 'tipo_error': 'tipo_error'}
+
+    @staticmethod
+    def _group_by(field):
+        return agregar(DatabaseService.COLLECTION_NAME, [
+            {'$group': {'_id': f'${field}', 'count': {'$sum': 1}}},
+            {'$sort': {'count': -1}},
+        ])
+
+    @staticmethod
+    def get_stats_summary():
+        """
+        Resumen servido desde los contadores incrementales (sin recorrer JWTS).
+        
+        Returns:
+            dict: total y conteos por alg, iss, valido y tipo_error
+        """
+        try:
+            counters = obtener_todos(DatabaseService.STATS_COLLECTION_NAME)
+            summary = {'total': 0, **{dim: {} for dim in DatabaseService.STAT_DIMENSIONS}}
+            for counter in counters:
+                if counter['_id'] == 'total':
+                    summary['total'] = counter.get('count', 0)
+                elif counter.get('dim') in summary and counter.get('count', 0) > 0:
+                    summary[counter['dim']][str(counter['value'])] = counter['count']
+            return summary
+        except Exception as e:
+            raise Exception(f"Error al obtener estadísticas: {str(e)}")
+
+    @staticmethod
+    def get_aggregated_analytics(now=None):
+        """
+        Analítica calculada en el servidor con pipelines de agregación.
+        
+        Incluye la distribución de 'exp' relativa al instante actual ($bucket)
+        y los conteos por dimensión ($group).
+        
+        Returns:
+            dict: exp_distribution y conteos por dimensión
+        """
+        now = int(time.time()) if now is None else now
+        hour, day = 3600, 86400
+        boundaries = [-2 ** 62, now - 30 * day, now - day, now, now + hour, now + day, now + 30 * day, 2 ** 62]
+        labels = ['expirado_hace_mas_de_30d', 'expirado_hace_1d_a_30d', 'expirado_ultimas_24h',
+                  'expira_en_1h', 'expira_en_24h', 'expira_en_30d', 'expira_en_mas_de_30d']
+        try:
+            buckets = agregar(DatabaseService.COLLECTION_NAME, [
+                {'$bucket': {
+                    'groupBy': '$claims.exp',
+                    'boundaries': boundaries,
+                    'default': 'sin_exp',
+                    'output': {'count': {'$sum': 1}},
+                }},
+            ])
+            exp_distribution = {label: 0 for label in labels}
+            exp_distribution['sin_exp'] = 0
+            for bucket in buckets:
+                if bucket['_id'] == 'sin_exp':
+                    exp_distribution['sin_exp'] = bucket['count']
+                else:
+                    exp_distribution[labels[boundaries.index(bucket['_id'])]] = bucket['count']
+
+            analytics = {'exp_distribution': exp_distribution}
+            for dim, field in DatabaseService._dimension_fields().items():
+                analytics[dim] = {
+                    str('sin_valor' if g['_id'] is None else g['_id']): g['count']
+                    for g in DatabaseService._group_by(field)
+                }
+            return analytics
+        except Exception as e:
+            raise Exception(f"Error al calcular analítica: {str(e)}")
+
+    @staticmethod
+    def register_jti(jti, exp):
+        """
+        Registra un 'jti' de forma exacta (verificación de replay).
+        
+        El documento usa el 'jti' como _id, por lo que la inserción es atómica;
+        un índice TTL sobre expiresAt lo elimina cuando el token expira.
+        
+        Args:
+            jti: Identificador del token
+            exp: Instante de expiración (NumericDate)
+            
+        Returns:
+            bool: True si el 'jti' era nuevo, False si ya estaba registrado
+        """
+        try:
+            insertar_uno(DatabaseService.JTI_COLLECTION_NAME, {
+                '_id': jti,
+                'expiresAt': datetime.fromtimestamp(exp, tz=timezone.utc)
+            })
+            return True
+        except DuplicateKeyError:
+            return False
+        except Exception as e:
+            raise Exception(f"Error al registrar jti: {str(e)}")
+
+    @staticmethod
+    def ensure_jti_index():
+        """Crea el índice TTL que expira los 'jti' registrados."""
+        try:
+            crear_indice(DatabaseService.JTI_COLLECTION_NAME, 'expiresAt', expireAfterSeconds=0)
+        except Exception as e:
+            raise Exception(f"Error al crear índice TTL de jti: {str(e)}")
+
+    @staticmethod
+    def load_policies():
+        """
+        Obtiene las políticas de validación administradas por API.
+        
+        Returns:
+            dict: {id: definición}, con None para las políticas eliminadas
+        """
+        try:
+            return {
+                document['_id']: None if document.get('deleted') else document.get('spec')
+                for document in obtener_todos(DatabaseService.POLICIES_COLLECTION_NAME)
+            }
+        except Exception as e:
+            raise Exception(f"Error al obtener las políticas: {str(e)}")
+
+    @staticmethod
+    def save_policy(policy_id, spec):
+        """Guarda (o reemplaza) la definición de una política e incrementa su versión."""
+        try:
+            reemplazar_por_filtro(DatabaseService.POLICIES_COLLECTION_NAME, {'_id': policy_id},
+                                  {'_id': policy_id, 'spec': dict(spec), 'deleted': False})
+            incrementar(DatabaseService.META_COLLECTION_NAME, {'_id': DatabaseService.POLICIES_VERSION_ID},
+                        {'value': 1})
+        except Exception as e:
+            raise Exception(f"Error al guardar la política: {str(e)}")
+
+    @staticmethod
+    def delete_policy(policy_id):
+        """
+        Marca una política como eliminada e incrementa la versión.
+        
+        Se guarda una marca en lugar de borrar el documento, para que una
+        política cargada desde JWT_POLICIES_FILE siga eliminada en todos los
+        workers y tras reiniciar.
+        """
+        try:
+            reemplazar_por_filtro(DatabaseService.POLICIES_COLLECTION_NAME, {'_id': policy_id},
+                                  {'_id': policy_id, 'deleted': True})
+            incrementar(DatabaseService.META_COLLECTION_NAME, {'_id': DatabaseService.POLICIES_VERSION_ID},
+                        {'value': 1})
+        except Exception as e:
+            raise Exception(f"Error al eliminar la política: {str(e)}")
+
+    @staticmethod
+    def get_policies_version():
+        """Versión de las políticas (0 si nunca se administraron por API)."""
+        try:
+            documents = obtener_por_filtro(
+                DatabaseService.META_COLLECTION_NAME, {'_id': DatabaseService.POLICIES_VERSION_ID}
+            )
+            return documents[0].get('value', 0) if documents else 0
+        except Exception as e:
+            raise Exception(f"Error al obtener la versión de las políticas: {str(e)}")
+
+    @staticmethod
+    def count_jwts():
+        """Cuenta los documentos de la colección JWTS."""
+        try:
+            return contar(DatabaseService.COLLECTION_NAME, {})
+        except Exception as e:
+            raise Exception(f"Error al contar JWTs: {str(e)}")
+
+    @staticmethod
+    def iter_jwts(projection=None, after_id=None):
+        """
+        Itera la colección JWTS por lotes y en orden de _id, sin cargarla
+        completa en memoria.
+        
+        Args:
+            projection: Campos a retornar (opcional)
+            after_id: Retornar solo los documentos con _id mayor (opcional). Los
+                ObjectId crecen con el instante de creación, por lo que sirve
+                para leer únicamente lo insertado desde una lectura anterior.
+        """
+        filtro = {}
+        if after_id is not None:
+            filtro = {'_id': {'$gt': ObjectId(after_id) if ObjectId.is_valid(after_id) else after_id}}
+        return iterar_por_filtro(DatabaseService.COLLECTION_NAME, filtro, projection, orden='_id')
+
+    @staticmethod
+    def iter_jwts_by_ids(ids, projection=None, batch_size=1000):
+        """
+        Itera los documentos de JWTS con los _id dados, por lotes de batch_size
+        _id y en orden de _id dentro de cada lote (los _id se recorren ordenados).
+        """
+        ids = sorted(ids)
+        for start in range(0, len(ids), batch_size):
+            batch = [ObjectId(i) if ObjectId.is_valid(i) else i for i in ids[start:start + batch_size]]
+            yield from iterar_por_filtro(DatabaseService.COLLECTION_NAME, {'_id': {'$in': batch}}, projection,
+                                         orden='_id')
+
+    @staticmethod
+    def ensure_job_results_index():
+        """Crea el índice (job_id, seq) usado para paginar los resultados de trabajos."""
+        try:
+            crear_indice(DatabaseService.JOB_RESULTS_COLLECTION_NAME, [('job_id', 1), ('seq', 1)], unique=True)
+        except Exception as e:
+            raise Exception(f"Error al crear índice de resultados de trabajos: {str(e)}")
+
+    @staticmethod
+    def save_job_results(job_id, start, results):
+        """
+        Guarda un bloque de resultados de un trabajo.
+        
+        Args:
+            job_id: Id del trabajo
+            start: Posición (seq) del primer resultado del bloque
+            results: Lista de resultados
+        """
+        try:
+            if results:
+                insertar_varios(DatabaseService.JOB_RESULTS_COLLECTION_NAME, [
+                    {'job_id': job_id, 'seq': start + i, 'result': result}
+                    for i, result in enumerate(results)
+                ])
+        except Exception as e:
+            raise Exception(f"Error al guardar resultados del trabajo: {str(e)}")
+
+    @staticmethod
+    def get_job_results(job_id, offset, limit):
+        """Obtiene una página de resultados de un trabajo, en orden."""
+        try:
+            documents = obtener_paginado(
+                DatabaseService.JOB_RESULTS_COLLECTION_NAME, {'job_id': job_id, 'seq': {'$gte': offset}},
+                'seq', limite=limit, proyeccion={'_id': 0, 'result': 1}
+            )
+            return [d['result'] for d in documents]
+        except Exception as e:
+            raise Exception(f"Error al obtener resultados del trabajo: {str(e)}")
+
+    @staticmethod
+    def iter_job_results(job_id):
+        """Itera todos los resultados de un trabajo, en orden."""
+        documents = iterar_por_filtro(
+            DatabaseService.JOB_RESULTS_COLLECTION_NAME, {'job_id': job_id}, {'_id': 0, 'result': 1}, orden='seq'
+        )
+        for document in documents:
+            yield document['result']
+
+    @staticmethod
+    def count_job_results(job_id):
+        """Cuenta los resultados guardados de un trabajo (usa el índice job_id+seq)."""
+        try:
+            return contar(DatabaseService.JOB_RESULTS_COLLECTION_NAME, {'job_id': job_id})
+        except Exception as e:
+            raise Exception(f"Error al contar los resultados del trabajo: {str(e)}")
+
+    @staticmethod
+    def save_job_state(job_id, state):
+        """
+        Guarda el estado de un trabajo en JOBS (compartido por todos los workers).
+        
+        Se usa $set para no pisar la marca cancel_requested que otro worker
+        pudo haber puesto. Dos upserts simultáneos del mismo _id (el registro
+        y el inicio del trabajo) pueden fallar con DuplicateKeyError: el
+        documento ya existe y el reintento lo actualiza.
+        """
+        try:
+            try:
+                actualizar_por_filtro(DatabaseService.JOBS_COLLECTION_NAME, {'_id': job_id}, state, upsert=True)
+            except DuplicateKeyError:
+                actualizar_por_filtro(DatabaseService.JOBS_COLLECTION_NAME, {'_id': job_id}, state, upsert=True)
+        except Exception as e:
+            raise Exception(f"Error al guardar el estado del trabajo: {str(e)}")
+
+    @staticmethod
+    def get_job_state(job_id):
+        """Obtiene el estado de un trabajo, o None si no existe."""
+        try:
+            documents = obtener_por_filtro(DatabaseService.JOBS_COLLECTION_NAME, {'_id': job_id}, {'_id': 0})
+            return documents[0] if documents else None
+        except Exception as e:
+            raise Exception(f"Error al obtener el estado del trabajo: {str(e)}")
+
+    @staticmethod
+    def list_job_states():
+        """Obtiene el estado de todos los trabajos conservados."""
+        try:
+            return obtener_por_filtro(DatabaseService.JOBS_COLLECTION_NAME, {}, {'_id': 0})
+        except Exception as e:
+            raise Exception(f"Error al listar los trabajos: {str(e)}")
+
+    @staticmethod
+    def request_job_cancel(job_id):
+        """Marca un trabajo para que el worker que lo ejecuta lo cancele."""
+        try:
+            actualizar_por_filtro(DatabaseService.JOBS_COLLECTION_NAME, {'_id': job_id}, {'cancel_requested': True})
+        except Exception as e:
+            raise Exception(f"Error al cancelar el trabajo: {str(e)}")
+
+    @staticmethod
+    def delete_job_state(job_id):
+        """Elimina el estado de un trabajo."""
+        try:
+            eliminar_por_filtro(DatabaseService.JOBS_COLLECTION_NAME, {'_id': job_id})
+        except Exception as e:
+            raise Exception(f"Error al eliminar el estado del trabajo: {str(e)}")
+
+    @staticmethod
+    def delete_job_results(job_id):
+        """Elimina los resultados de un trabajo."""
+        try:
+            eliminar_por_filtro(DatabaseService.JOB_RESULTS_COLLECTION_NAME, {'job_id': job_id})
+        except Exception as e:
+            raise Exception(f"Error al eliminar resultados del trabajo: {str(e)}")
@@ -0,0 +1,645 @@
+"""
+Servicio de trabajos de análisis por lotes en segundo plano.
+
+Los análisis grandes (re-verificar toda la colección JWTS, analizar los
+tokens de un día) no caben en una solicitud HTTP. Un trabajo se encola y
+retorna su id de inmediato; se ejecuta en un pool acotado de workers y
+guarda sus resultados por bloques en un almacén local (NDJSON) o en
+MongoDB, desde donde se consultan paginados o como archivo en streaming.
+Cada trabajo tiene topes de tokens y de tiempo y se puede cancelar.
+
+La profundidad del análisis (depth) se elige por trabajo: con 'lexical' los
+tokens se validan por bloques con el lexer vectorizado.
+
+Además del NDJSON, cada trabajo acumula sus resultados en columnas
+(columnar_export_service) y al terminar los guarda como arreglo de NumPy
+(.npy) en el directorio de resultados, desde donde se descargan en Parquet.
+
+El estado de cada trabajo se guarda junto a sus resultados (un archivo JSON
+en el directorio local o la colección JOBS), de modo que cualquier worker
+responde por él y sobrevive a un reinicio. Solo el worker que lo ejecuta
+tiene el trabajo en memoria; los demás lo cancelan con una marca en el
+almacén, y un trabajo cuyo worker dejó de actualizarlo se informa fallido.
+"""
+
+import json
+import os
+import re
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from array import array
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from app.analyzer.limits import reject
+from app.analyzer.pipeline import DEFAULT_DEPTH, analyze_token, analyze_tokens
+from app.services.columnar_export_service import ColumnarResultBuilder, load_npy, write_parquet
+from app.services.database_service import DatabaseService
+from app.services.metrics_service import metrics
+
+
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+FINISHED_STATES = frozenset({COMPLETED, FAILED, CANCELLED})
+
+
+class JobQueueFullError(RuntimeError):
+    """Se lanza cuando se alcanza el máximo de trabajos pendientes."""
+    pass
+
+
+class UnknownJobError(KeyError):
+    """Se lanza cuando se consulta un trabajo que no existe (o ya fue descartado)."""
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        super().__init__(job_id)
+
+    def __str__(self):
+        return f"El trabajo '{self.job_id}' no existe."
+
+
+_JOB_ID_RE = re.compile(r'[0-9a-f]{32}')
+
+
+class LocalResultStore:
+    """
+    Resultados en un archivo NDJSON por trabajo, con el estado del trabajo al lado.
+
+    Junto al NDJSON se escribe un índice de offsets (`.idx`, 8 bytes por
+    resultado), de modo que una página se lee con dos seeks sin recorrer el
+    archivo. No hay estado en memoria: cualquier proceso que comparta el
+    directorio pagina los resultados y lee el estado (`.job.json`).
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _path(self, job_id: str, suffix: str = '.ndjson') -> str:
+        return os.path.join(self.directory, f"{job_id}{suffix}")
+
+    def append(self, job_id: str, results: List[Dict[str, Any]]) -> None:
+        lines = [json.dumps(r, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n' for r in results]
+        with self._lock:
+            with open(self._path(job_id), 'ab') as f:
+                position = f.tell()
+                f.write(b''.join(lines))
+            offsets = array('Q')
+            for line in lines:
+                position += len(line)
+                offsets.append(position)
+            # Los offsets se publican después de escribir: un lector nunca ve una línea a medias
+            with open(self._path(job_id, '.idx'), 'ab') as f:
+                f.write(offsets.tobytes())
+
+    def _offsets(self, job_id: str, start: int, count: int) -> array:
+        """Offsets de fin de línea [start, start + count) del índice."""
+        offsets = array('Q')
+        try:
+            with open(self._path(job_id, '.idx'), 'rb') as f:
+                f.seek(start * offsets.itemsize)
+                data = f.read(count * offsets.itemsize)
+        except FileNotFoundError:
+            return offsets
+        offsets.frombytes(data[:len(data) - len(data) % offsets.itemsize])
+        return offsets
+
+    def count(self, job_id: str) -> int:
+        try:
+            return os.path.getsize(self._path(job_id, '.idx')) // array('Q').itemsize
+        except FileNotFoundError:
+            return 0
+
+    def page(self, job_id: str, offset: int, limit: int) -> List[Dict[str, Any]]:
+        end = min(offset + limit, self.count(job_id))
+        if offset >= end:
+            return []
+        offsets = self._offsets(job_id, offset - 1, end - offset + 1) if offset else \
+            array('Q', [0]) + self._offsets(job_id, 0, end)
+        with open(self._path(job_id), 'rb') as f:
+            f.seek(offsets[0])
+            data = f.read(offsets[-1] - offsets[0])
+        return [json.loads(line) for line in data.splitlines()]
+
+    def iter_lines(self, job_id: str) -> Iterator[bytes]:
+        count = self.count(job_id)
+        last = self._offsets(job_id, count - 1, 1) if count else None
+        if not last:
+            return
+        with open(self._path(job_id), 'rb') as f:
+            remaining = last[0]
+            while remaining > 0:
+                chunk = f.read(min(64 * 1024, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    def save_state(self, job_id: str, state: Dict[str, Any]) -> None:
+        # Escritura atómica: un lector nunca ve un estado a medias
+        fd, tmp_path = tempfile.mkstemp(prefix='.job-', dir=self.directory)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self._path(job_id, '.job.json'))
+
+    def load_state(self, job_id: str) -> Optional[Dict[str, Any]]:
+        if not _JOB_ID_RE.fullmatch(job_id):
+            return None
+        try:
+            with open(self._path(job_id, '.job.json'), encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return None
+        state['cancel_requested'] = self.cancel_requested(job_id)
+        return state
+
+    def list_states(self) -> List[Dict[str, Any]]:
+        states = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.job.json'):
+                state = self.load_state(name[:-len('.job.json')])
+                if state is not None:
+                    states.append(state)
+        return states
+
+    def request_cancel(self, job_id: str) -> None:
+        open(self._path(job_id, '.cancel'), 'a').close()
+
+    def cancel_requested(self, job_id: str) -> bool:
+        return os.path.exists(self._path(job_id, '.cancel'))
+
+    def delete(self, job_id: str) -> None:
+        for suffix in ('.ndjson', '.idx', '.job.json', '.cancel'):
+            try:
+                os.unlink(self._path(job_id, suffix))
+            except FileNotFoundError:
+                pass
+
+
+class MongoResultStore:
+    """
+    Resultados en la colección JOB_RESULTS y estado en JOBS (compartidas por todos los workers).
+
+    No hay estado en memoria: la posición de cada bloque y el número de
+    resultados disponibles se cuentan sobre el índice (job_id, seq).
+    """
+
+    def __init__(self):
+        DatabaseService.ensure_job_results_index()
+
+    def append(self, job_id: str, results: List[Dict[str, Any]]) -> None:
+        # Un trabajo tiene un único escritor: el conteo es la posición del bloque
+        DatabaseService.save_job_results(job_id, DatabaseService.count_job_results(job_id), results)
+
+    def count(self, job_id: str) -> int:
+        return DatabaseService.count_job_results(job_id)
+
+    def page(self, job_id: str, offset: int, limit: int) -> List[Dict[str, Any]]:
+        return DatabaseService.get_job_results(job_id, offset, limit)
+
+    def iter_lines(self, job_id: str) -> Iterator[bytes]:
+        # Se agrupan las líneas en bloques de ~64 KiB, como en el almacén local
+        buffer = []
+        size = 0
+        for result in DatabaseService.iter_job_results(job_id):
+            line = json.dumps(result, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+            buffer.append(line)
+            size += len(line)
+            if size >= 64 * 1024:
+                yield b''.join(buffer)
+                buffer, size = [], 0
+        if buffer:
+            yield b''.join(buffer)
+
+    def save_state(self, job_id: str, state: Dict[str, Any]) -> None:
+        DatabaseService.save_job_state(job_id, state)
+
+    def load_state(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return DatabaseService.get_job_state(job_id)
+
+    def list_states(self) -> List[Dict[str, Any]]:
+        return DatabaseService.list_job_states()
+
+    def request_cancel(self, job_id: str) -> None:
+        DatabaseService.request_job_cancel(job_id)
+
+    def cancel_requested(self, job_id: str) -> bool:
+        state = DatabaseService.get_job_state(job_id)
+        return bool(state and state.get('cancel_requested'))
+
+    def delete(self, job_id: str) -> None:
+        DatabaseService.delete_job_results(job_id)
+        DatabaseService.delete_job_state(job_id)
+
+
+class ColumnarStore:
+    """
+    Exportación columnar de los resultados de cada trabajo terminado.
+
+    Se guarda como `<job_id>.columnar/` (results.npy y dictionaries.json, ver
+    columnar_export_service.save_npy); el Parquet se genera a partir de ella
+    en la primera descarga y se conserva junto a ella.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _npy_dir(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.columnar")
+
+    def save(self, job_id: str, builder: ColumnarResultBuilder) -> None:
+        # Se escribe en un directorio temporal y se renombra: nunca queda una exportación a medias
+        tmp_dir = tempfile.mkdtemp(prefix='.columnar-', dir=self.directory)
+        builder.save_npy(tmp_dir)
+        os.replace(tmp_dir, self._npy_dir(job_id))
+
+    def exists(self, job_id: str) -> bool:
+        return os.path.isdir(self._npy_dir(job_id))
+
+    def parquet_path(self, job_id: str) -> str:
+        """Ruta del Parquet del trabajo, generándolo si no existe (requiere pyarrow)."""
+        path = os.path.join(self.directory, f"{job_id}.parquet")
+        if not os.path.exists(path):
+            table, metadata = load_npy(self._npy_dir(job_id))
+            write_parquet(table, metadata, path)
+        return path
+
+    def delete(self, job_id: str) -> None:
+        shutil.rmtree(self._npy_dir(job_id), ignore_errors=True)
+        try:
+            os.unlink(os.path.join(self.directory, f"{job_id}.parquet"))
+        except FileNotFoundError:
+            pass
+
+
+class Job:
+    """Estado y progreso de un trabajo."""
+
+    def __init__(self, kind: str, total: int, options: Dict[str, Any]):
+        self.job_id = uuid.uuid4().hex
+        self.kind = kind
+        self.total = total
+        self.options = options
+        self.status = QUEUED
+        self.processed = 0
+        self.valid = 0
+        self.errors: Dict[str, int] = {}
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.cancel_event = threading.Event()
+        # Serializa los guardados del estado (ejecución, heartbeat y cierre)
+        self.save_lock = threading.Lock()
+        self.future = None
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> 'Job':
+        """Reconstruye un trabajo (sin ejecución asociada) a partir de su estado guardado."""
+        job = cls(state['kind'], state['total'], {'depth': state.get('depth', DEFAULT_DEPTH)})
+        job.job_id = state['id']
+        for name in ('status', 'processed', 'valid', 'errors', 'error', 'created_at', 'started_at', 'finished_at'):
+            setattr(job, name, state.get(name))
+        return job
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.job_id,
+            'kind': self.kind,
+            'depth': self.options.get('depth', DEFAULT_DEPTH),
+            'status': self.status,
+            'total': self.total,
+            'processed': self.processed,
+            'progress': round(self.processed / self.total, 4) if self.total else 1.0,
+            'valid': self.valid,
+            'errors': dict(self.errors),
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class JobManager:
+    """
+    Pool acotado de workers para trabajos de análisis.
+
+    Solo los trabajos en cola o en ejecución de este proceso están en memoria;
+    el estado se guarda en el almacén al encolar, en cada bloque de resultados,
+    cada `heartbeat_seconds` y al terminar, y las consultas se responden desde
+    el almacén.
+
+    Args:
+        store: Almacén de resultados y estado (LocalResultStore o MongoResultStore)
+        workers: Trabajos ejecutados en paralelo
+        max_queued: Trabajos pendientes o en ejecución admitidos en este proceso
+        max_tokens: Tope de tokens por trabajo
+        max_seconds: Tope de duración de cada trabajo
+        retention: Trabajos terminados que se conservan (los más antiguos se descartan con sus resultados)
+        chunk_size: Resultados por bloque escrito en el almacén
+        columnar: Exportación columnar de los resultados (None para no generarla)
+        heartbeat_seconds: Intervalo con el que se actualiza el estado de los trabajos pendientes
+        stale_seconds: Sin actualizaciones durante este tiempo, un trabajo pendiente se informa fallido
+    """
+
+    def __init__(self, store, workers: int = 2, max_queued: int = 100, max_tokens: int = 1_000_000,
+                 max_seconds: float = 3600, retention: int = 100, chunk_size: int = 500,
+                 columnar: Optional[ColumnarStore] = None, heartbeat_seconds: float = 10,
+                 stale_seconds: float = 60):
+        self.store = store
+        self.columnar = columnar
+        self.max_queued = max_queued
+        self.max_tokens = max_tokens
+        self.max_seconds = max_seconds
+        self.retention = retention
+        self.chunk_size = chunk_size
+        self.heartbeat_seconds = heartbeat_seconds
+        self.stale_seconds = stale_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='jwt-job')
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._heartbeat: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls) -> 'JobManager':
+        env = os.getenv
+        directory = env('JWT_JOB_RESULT_DIR') or os.path.join(tempfile.gettempdir(), 'jwt-jobs')
+        if env('JWT_JOB_RESULT_STORE', 'local').lower() == 'mongo':
+            store = MongoResultStore()
+        else:
+            store = LocalResultStore(directory)
+        columnar = None
+        if env('JWT_JOB_COLUMNAR', 'True').lower() in ('true', '1', 'yes'):
+            columnar = ColumnarStore(directory)
+        return cls(
+            store,
+            workers=int(env('JWT_JOB_WORKERS', 2)),
+            max_queued=int(env('JWT_JOB_MAX_QUEUED', 100)),
+            max_tokens=int(env('JWT_JOB_MAX_TOKENS', 1_000_000)),
+            max_seconds=float(env('JWT_JOB_MAX_SECONDS', 3600)),
+            retention=int(env('JWT_JOB_RETENTION', 100)),
+            columnar=columnar,
+            heartbeat_seconds=float(env('JWT_JOB_HEARTBEAT_SECONDS', 10)),
+            stale_seconds=float(env('JWT_JOB_STALE_SECONDS', 60)),
+        )
+
+    def _save(self, job: Job) -> None:
+        # La instantánea se toma con el lock: un heartbeat no puede escribir un estado
+        # anterior después del guardado final
+        with job.save_lock:
+            self.store.save_state(job.job_id, {**job.as_dict(), 'owner': self.owner, 'updated_at': time.time()})
+
+    def _register(self, job: Job, source: Iterable[Any]) -> Job:
+        with self._lock:
+            if len(self._jobs) >= self.max_queued:
+                metrics.inc('jwt_jobs_rejected_total', reason='queue_full')
+                raise JobQueueFullError("Hay demasiados trabajos pendientes; intenta más tarde.")
+            self._jobs[job.job_id] = job
+            if self._heartbeat is None:
+                self._heartbeat = threading.Thread(target=self._heartbeat_loop, name='jwt-job-heartbeat',
+                                                   daemon=True)
+                self._heartbeat.start()
+        try:
+            self._save(job)
+            self._evict()
+        except Exception:
+            with self._lock:
+                self._jobs.pop(job.job_id, None)
+            raise
+        job.future = self._executor.submit(self._run, job, source)
+        metrics.inc('jwt_jobs_submitted_total', kind=job.kind)
+        return job
+
+    def _evict(self) -> None:
+        finished = sorted((state for state in self.store.list_states() if state.get('status') in FINISHED_STATES),
+                          key=lambda state: state.get('finished_at') or 0)
+        for state in finished[:max(0, len(finished) - self.retention)]:
+            self.store.delete(state['id'])
+            if self.columnar is not None:
+                self.columnar.delete(state['id'])
+
+    def _heartbeat_loop(self) -> None:
+        # Mantiene vigente el estado de los trabajos de este proceso y aplica las cancelaciones de otros workers
+        while True:
+            time.sleep(self.heartbeat_seconds)
+            with self._lock:
+                jobs = list(self._jobs.values())
+            for job in jobs:
+                try:
+                    if self.store.cancel_requested(job.job_id):
+                        self._cancel_local(job)
+                    if job.status not in FINISHED_STATES:
+                        self._save(job)
+                except Exception:
+                    # Almacén no disponible: se reintenta en el próximo intervalo
+                    pass
+
+    def submit_tokens(self, tokens: List[Any], secret: Optional[str] = None, **options) -> Job:
+        """
+        Encola el análisis de una lista de tokens.
+
+        Cada elemento es un token (str) o un resultado ya calculado (dict),
+        por ejemplo el de una línea descartada por superar la longitud máxima.
+        """
+        if len(tokens) > self.max_tokens:
+            reject('job_tokens', len(tokens), self.max_tokens)
+        source = ({'index': i, 'token': token, 'secret': secret} for i, token in enumerate(tokens))
+        return self._register(Job('analyze', len(tokens), options), source)
+
+    def submit_reverify(self, **options) -> Job:
+        """Encola la re-verificación de toda la colección JWTS con el secreto guardado de cada token."""
+        total = DatabaseService.count_jwts()
+        if total > self.max_tokens:
+            reject('job_tokens', total, self.max_tokens)
+
+        def source():
+            for i, document in enumerate(DatabaseService.iter_jwts()):
+                secret = document.get('secreto')
+                yield {
+                    'index': i,
+                    'id': str(document.get('_id')),
+                    'name': document.get('name'),
+                    'token': document.get('token') or '',
+                    'secret': secret if isinstance(secret, str) and secret else None,
+                }
+
+        return self._register(Job('reverify', total, options), source())
+
+    def _from_state(self, state: Dict[str, Any]) -> Job:
+        job = Job.from_state(state)
+        # Un trabajo pendiente cuyo worker dejó de actualizarlo (reinicio, caída) ya no va a terminar
+        if job.status not in FINISHED_STATES and time.time() - state.get('updated_at', 0) > self.stale_seconds:
+            job.status = FAILED
+            job.error = "El worker que ejecutaba el trabajo dejó de responder."
+            job.finished_at = time.time()
+            self.store.save_state(job.job_id, {**state, **job.as_dict()})
+        return job
+
+    def get(self, job_id: str) -> Job:
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+        state = self.store.load_state(job_id)
+        if state is None:
+            raise UnknownJobError(job_id)
+        return self._from_state(state)
+
+    def list(self) -> List[Job]:
+        jobs = [self._jobs.get(state['id']) or self._from_state(state) for state in self.store.list_states()]
+        return sorted(jobs, key=lambda job: job.created_at or 0)
+
+    def cancel(self, job_id: str) -> Job:
+        """
+        Cancela un trabajo. Si lo ejecuta otro worker se deja la marca en el
+        almacén y ese worker lo detiene en su próximo bloque o heartbeat.
+        """
+        job = self._jobs.get(job_id)
+        if job is not None:
+            self._cancel_local(job)
+            return job
+        job = self.get(job_id)
+        if job.status not in FINISHED_STATES:
+            self.store.request_cancel(job_id)
+        return job
+
+    def _cancel_local(self, job: Job) -> None:
+        job.cancel_event.set()
+        if job.future is not None and job.future.cancel():
+            # Aún no había empezado: no llegará a ejecutarse
+            self._finish(job, CANCELLED)
+
+    def _finish(self, job: Job, status: str, error: Optional[str] = None) -> None:
+        job.status = status
+        job.error = error
+        job.finished_at = time.time()
+        try:
+            self._save(job)
+        finally:
+            with self._lock:
+                self._jobs.pop(job.job_id, None)
+        metrics.inc('jwt_jobs_finished_total', kind=job.kind, status=status)
+
+    def _run(self, job: Job, source: Iterable[Dict[str, Any]]) -> None:
+        if job.cancel_event.is_set():
+            self._finish(job, CANCELLED)
+            return
+        job.status = RUNNING
+        job.started_at = time.time()
+        deadline = time.monotonic() + self.max_seconds
+        options = job.options
+        depth = options.get('depth', DEFAULT_DEPTH)
+        if depth == 'lexical':
+            source = self._lexical_source(source, options.get('limits'))
+        chunk: List[Dict[str, Any]] = []
+        columns = ColumnarResultBuilder() if self.columnar is not None else None
+        status, error = COMPLETED, None
+        try:
+            self._save(job)
+            for item in source:
+                if job.cancel_event.is_set():
+                    status = CANCELLED
+                    break
+                if time.monotonic() > deadline:
+                    status, error = FAILED, f"El trabajo superó el tiempo máximo de {self.max_seconds:g} s."
+                    break
+
+                token = item.pop('token')
+                secret = item.pop('secret')
+                analysis = item.pop('analysis', None)
+                if analysis is None:
+                    if isinstance(token, dict):
+                        analysis = token
+                    else:
+                        analysis = analyze_token(token, secret, options.get('limits'), options.get('policy'),
+                                                 options.get('revocation_list'), depth)
+                if columns is not None:
+                    # Los segmentos solo existen si el token pasó la fase léxica
+                    lexed = isinstance(token, str) and (analysis['valid'] or analysis.get('phase') != 'lexical')
+                    columns.append(analysis['valid'], analysis.get('error_type'), analysis.get('header'),
+                                   analysis.get('payload'), token.split('.') if lexed else None)
+                record = {
+                    **item,
+                    'valid': analysis['valid'],
+                    'phase': analysis.get('phase'),
+                    'error_type': analysis.get('error_type'),
+                    'error': analysis.get('error'),
+                }
+                chunk.append(record)
+                job.processed += 1
+                if record['valid']:
+                    job.valid += 1
+                else:
+                    error_type = record['error_type'] or 'UnknownError'
+                    job.errors[error_type] = job.errors.get(error_type, 0) + 1
+
+                if len(chunk) >= self.chunk_size:
+                    self.store.append(job.job_id, chunk)
+                    chunk = []
+                    self._save(job)
+                    if self.store.cancel_requested(job.job_id):
+                        job.cancel_event.set()
+            # Los últimos resultados se guardan antes de marcar el trabajo como terminado
+            if chunk:
+                self.store.append(job.job_id, chunk)
+            if columns is not None:
+                self.columnar.save(job.job_id, columns)
+        except Exception as e:
+            status, error = FAILED, str(e)
+        try:
+            self._finish(job, status, error)
+        except Exception:
+            # El estado no se pudo guardar: otros workers lo verán fallido al vencer stale_seconds
+            pass
+        metrics.inc('jwt_job_tokens_total', job.processed, kind=job.kind)
+
+    def _lexical_source(self, source: Iterable[Dict[str, Any]], limits) -> Iterator[Dict[str, Any]]:
+        """Valida los tokens por bloques con el lexer vectorizado y los entrega ya analizados."""
+        source = iter(source)
+        while True:
+            items = list(islice(source, self.chunk_size))
+            if not items:
+                return
+            analyses = iter(analyze_tokens(
+                [item['token'] for item in items if isinstance(item['token'], str)], limits=limits, depth='lexical'
+            ))
+            for item in items:
+                if isinstance(item['token'], str):
+                    item['analysis'] = next(analyses)
+                yield item
+
+    def results_page(self, job_id: str, offset: int, limit: int) -> List[Dict[str, Any]]:
+        self.get(job_id)
+        return self.store.page(job_id, offset, limit)
+
+    def results_count(self, job_id: str) -> int:
+        self.get(job_id)
+        return self.store.count(job_id)
+
+    def iter_result_lines(self, job_id: str) -> Iterator[bytes]:
+        self.get(job_id)
+        return self.store.iter_lines(job_id)
+
+    def columnar_parquet_path(self, job_id: str) -> Optional[str]:
+        """
+        Ruta del Parquet con los resultados de un trabajo terminado.
+
+        Retorna None si el trabajo no terminó o no tiene exportación columnar
+        (JWT_JOB_COLUMNAR deshabilitado); lanza RuntimeError sin pyarrow.
+        """
+        job = self.get(job_id)
+        if self.columnar is None or job.status not in FINISHED_STATES or not self.columnar.exists(job_id):
+            return None
+        return self.columnar.parquet_path(job_id)
@@ -0,0 +1,498 @@
+"""
+Servicio de métricas de la API.
+
+Mantiene contadores e histogramas en memoria (protegidos con lock)
+identificados por nombre y etiquetas. Se aplica para contabilizar rechazos
+y eventos operativos de los analizadores y las rutas, y para medir la
+latencia y el tamaño de entrada de cada fase (instrument) y de cada llamada
+a MongoDB.
+
+Las métricas se exponen en formato de texto de Prometheus en GET /metrics.
+Con varios workers, cada proceso vuelca periódicamente su registro a un
+archivo propio en JWT_METRICS_DIR y /metrics suma los archivos de todos los
+procesos, de modo que los contadores e histogramas son los del servicio y no
+los del worker que atendió la solicitud.
+"""
+
+import atexit
+import functools
+import hmac
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.services.tracing_service import record_phase_span
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin compactación de los archivos de métricas
+    fcntl = None
+
+
+# Límites superiores de los buckets (el bucket +Inf se agrega siempre)
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 10.0)
+SIZE_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 65536, 262144)
+
+# Contadores con etiqueta result=hit|miss de los que se deriva una tasa de aciertos
+HIT_RATIO_COUNTERS = {
+    'jwt_result_cache_total': 'jwt_result_cache_hit_ratio',
+    'jwt_list_cache_total': 'jwt_list_cache_hit_ratio',
+}
+
+Key = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+class MetricsRegistry:
+    """Registro de contadores e histogramas con etiquetas, seguro entre hilos."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[Key, float] = {}
+        # Por serie: [conteos por bucket (el último es +Inf), suma, cantidad]
+        self._histograms: Dict[Key, list] = {}
+        self._buckets: Dict[str, Tuple[float, ...]] = {}
+        # Claves ya armadas de record_phase, para no ordenar etiquetas en cada llamada
+        self._phase_keys: Dict[tuple, Tuple[Key, Key, Key]] = {}
+
+    @staticmethod
+    def _key(name, labels):
+        return (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        """Incrementa el contador `name` con las etiquetas dadas."""
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, buckets: Iterable[float] = LATENCY_BUCKETS, **labels) -> None:
+        """
+        Registra una observación en el histograma `name`.
+
+        Los buckets se fijan con la primera observación del histograma.
+        """
+        key = self._key(name, labels)
+        with self._lock:
+            self._observe(key, value, buckets)
+
+    def _observe(self, key: Key, value: float, buckets: Iterable[float]) -> None:
+        series = self._histograms.get(key)
+        if series is None:
+            bounds = self._buckets.setdefault(key[0], tuple(buckets))
+            series = self._histograms[key] = [[0] * (len(bounds) + 1), 0.0, 0]
+        series[0][bisect_left(self._buckets[key[0]], value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def record_phase(self, metric: str, label: str, phase: str, seconds: float,
+                     error_type: Optional[str], size: Optional[int]) -> None:
+        """Latencia, resultado y tamaño de entrada de una fase u operación, con un solo lock."""
+        keys = self._phase_keys.get((metric, label, phase, error_type))
+        if keys is None:
+            labels = ((label, phase),)
+            keys = self._phase_keys[(metric, label, phase, error_type)] = (
+                (metric + '_duration_seconds', labels),
+                (metric + '_total', tuple(sorted(((label, phase), ('error_type', error_type or 'none'))))),
+                (metric + '_input_bytes', labels),
+            )
+        with self._lock:
+            self._observe(keys[0], seconds, LATENCY_BUCKETS)
+            self._counters[keys[1]] = self._counters.get(keys[1], 0) + 1
+            if size is not None:
+                self._observe(keys[2], size, SIZE_BUCKETS)
+
+    def get(self, name: str, **labels) -> float:
+        """Retorna el valor actual de un contador (0 si no existe)."""
+        with self._lock:
+            return self._counters.get(self._key(name, labels), 0)
+
+    def get_histogram(self, name: str, **labels) -> Optional[Dict[str, Any]]:
+        """Retorna buckets, conteos, suma y cantidad de un histograma (None si no existe)."""
+        with self._lock:
+            series = self._histograms.get(self._key(name, labels))
+            if series is None:
+                return None
+            return {'buckets': self._buckets[name], 'counts': list(series[0]), 'sum': series[1], 'count': series[2]}
+
+    def snapshot(self) -> Dict[Key, float]:
+        """Retorna una copia de todos los contadores."""
+        with self._lock:
+            return dict(self._counters)
+
+    def dump(self) -> Dict[str, list]:
+        """Contadores e histogramas en una estructura serializable a JSON."""
+        with self._lock:
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self._counters.items()],
+                'histograms': [
+                    [name, list(labels), list(self._buckets[name]), list(series[0]), series[1], series[2]]
+                    for (name, labels), series in self._histograms.items()
+                ],
+            }
+
+    def reset(self) -> None:
+        """Elimina todos los contadores e histogramas (uso en pruebas y tras un fork)."""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._buckets.clear()
+
+
+# Instancia compartida por toda la aplicación
+metrics = MetricsRegistry()
+
+
+def instrument(phase: str, size: Optional[Callable[..., int]] = None,
+               error_type: Optional[Callable[[Any], Optional[str]]] = None,
+               metric: str = 'jwt_phase', label: str = 'phase'):
+    """
+    Decorador que mide una fase: histograma de latencia, contador por
+    error_type y, si se indica `size` (función de los mismos argumentos),
+    histograma del tamaño de entrada.
+
+    `error_type` obtiene el tipo de error de un resultado retornado; las
+    excepciones se cuentan con el nombre de su clase y se propagan.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                _record(metric, label, phase, start, type(e).__name__, _size(size, args, kwargs))
+                raise
+            _record(metric, label, phase, start,
+                    error_type(result) if error_type is not None else None, _size(size, args, kwargs))
+            return result
+        return wrapper
+    return decorator
+
+
+def _record(metric: str, label: str, phase: str, start: float, error_type: Optional[str],
+            size: Optional[int]) -> None:
+    # Además de la métrica, la fase queda en la traza de la solicitud en curso (Server-Timing)
+    seconds = time.perf_counter() - start
+    metrics.record_phase(metric, label, phase, seconds, error_type, size)
+    record_phase_span(metric, phase, start, seconds, error_type, size)
+
+
+def _size(size, args, kwargs) -> Optional[int]:
+    if size is None:
+        return None
+    try:
+        return size(*args, **kwargs)
+    except Exception:
+        return None
+
+
+def instrument_generator(operation: str, func: Callable, metric: str = 'jwt_mongo', label: str = 'operation'):
+    """Como instrument, para funciones generadoras: mide el recorrido completo del cursor."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        error = None
+        try:
+            yield from func(*args, **kwargs)
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            _record(metric, label, operation, start, error, None)
+    return wrapper
+
+
+class MultiprocessMetrics:
+    """
+    Agregación de métricas entre procesos mediante archivos en un directorio.
+
+    Cada proceso escribe su registro completo (valores acumulados) en
+    `metrics-<host>-<pid>-<inicio>.json` de forma atómica cada `interval`
+    segundos y al terminar. collect() suma todos los archivos.
+
+    Los archivos de procesos terminados (pid inexistente en este host, o sin
+    actualizar durante `stale_seconds`) se suman a `metrics-archive.json` y se
+    eliminan, de modo que sus contadores siguen en el total del servicio sin
+    que el directorio crezca con cada reinicio de worker. La compactación la
+    hace un solo proceso a la vez (flock); el archivo guarda los nombres que
+    acaba de sumar para no contarlos dos veces si el proceso termina antes de
+    eliminarlos.
+    """
+
+    ARCHIVE_NAME = 'metrics-archive.json'
+    LOCK_NAME = '.metrics-compact.lock'
+
+    def __init__(self, directory: str, registry: MetricsRegistry = metrics, interval: float = 5.0,
+                 stale_seconds: Optional[float] = None):
+        self.directory = directory
+        self.registry = registry
+        self.interval = interval
+        self.stale_seconds = stale_seconds if stale_seconds is not None else max(60.0, 12 * interval)
+        self._stop = threading.Event()
+        self._thread = None
+        self._path = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _new_path(self) -> str:
+        return os.path.join(
+            self.directory, f"metrics-{socket.gethostname()}-{os.getpid()}-{int(time.time() * 1000)}.json"
+        )
+
+    def start(self) -> None:
+        """Inicia el volcado periódico; tras un fork, el hijo arranca de cero con su propio archivo."""
+        self._path = self._new_path()
+        self._thread = threading.Thread(target=self._loop, name='jwt-metrics-flush', daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self) -> None:
+        # El hijo hereda los valores del padre, que ya se cuentan en el archivo del padre
+        self.registry.reset()
+        self._stop = threading.Event()
+        self._path = self._new_path()
+        self._thread = threading.Thread(target=self._loop, name='jwt-metrics-flush', daemon=True)
+        self._thread.start()
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+    def _write(self, path: str, data: Dict[str, Any]) -> None:
+        fd, tmp_path = tempfile.mkstemp(prefix='.metrics-', dir=self.directory)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def _read(self, name: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(self.directory, name)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            # Archivo de un proceso que se está reemplazando, ya compactado o dañado: se omite
+            return None
+
+    def flush(self) -> None:
+        """Escribe el registro de este proceso en su archivo."""
+        if self._path is None:
+            self._path = self._new_path()
+        self._write(self._path, self.registry.dump())
+
+    def _process_files(self) -> List[str]:
+        return [name for name in os.listdir(self.directory)
+                if name.startswith('metrics-') and name.endswith('.json') and name != self.ARCHIVE_NAME]
+
+    def _is_dead(self, name: str, now: float) -> bool:
+        """Indica si el archivo es de un proceso terminado."""
+        if os.path.join(self.directory, name) == self._path:
+            return False
+        try:
+            host, pid, _ = name[len('metrics-'):-len('.json')].rsplit('-', 2)
+            pid = int(pid)
+        except ValueError:
+            host, pid = None, None
+        if host == socket.gethostname() and pid is not None:
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                return True
+            except (PermissionError, OSError):
+                pass
+        # Otro host, o un pid reutilizado: un proceso vivo vuelca cada `interval` segundos
+        try:
+            return now - os.path.getmtime(os.path.join(self.directory, name)) > self.stale_seconds
+        except FileNotFoundError:
+            return False
+
+    def compact(self) -> int:
+        """
+        Suma al archivo de compactación los registros de los procesos
+        terminados y elimina sus archivos. Retorna cuántos se compactaron
+        (0 si otro proceso está compactando o no hay flock en la plataforma).
+        """
+        if fcntl is None:
+            return 0
+        with open(os.path.join(self.directory, self.LOCK_NAME), 'a') as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return 0
+            archive = self._read(self.ARCHIVE_NAME) or {}
+            # Los de la compactación anterior ya están sumados: solo falta eliminarlos
+            for name in archive.get('merged', []):
+                self._remove(name)
+            now = time.time()
+            dead, dumps = [], [archive]
+            for name in self._process_files():
+                if self._is_dead(name, now):
+                    dump = self._read(name)
+                    if dump is not None:
+                        dead.append(name)
+                        dumps.append(dump)
+            if not dead:
+                return 0
+            self._write(os.path.join(self.directory, self.ARCHIVE_NAME), {**merge_dumps(dumps), 'merged': dead})
+            for name in dead:
+                self._remove(name)
+            return len(dead)
+
+    def _remove(self, name: str) -> None:
+        try:
+            os.unlink(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            pass
+
+    def collect(self) -> Dict[str, list]:
+        """Suma los registros de todos los procesos (incluido el actual, volcado antes de leer)."""
+        self.flush()
+        try:
+            self.compact()
+        except OSError:
+            pass
+        archive = self._read(self.ARCHIVE_NAME)
+        dumps = [archive] if archive is not None else []
+        merged = set(archive.get('merged', [])) if archive is not None else set()
+        for name in self._process_files():
+            if name in merged:
+                continue
+            dump = self._read(name)
+            if dump is not None:
+                dumps.append(dump)
+        return merge_dumps(dumps)
+
+
+def merge_dumps(dumps: Iterable[Dict[str, list]]) -> Dict[str, list]:
+    """Suma contadores e histogramas de varios registros (MetricsRegistry.dump)."""
+    counters: Dict[Key, float] = {}
+    histograms: Dict[Key, list] = {}
+    for dump in dumps:
+        for name, labels, value in dump.get('counters', []):
+            key = (name, tuple(tuple(pair) for pair in labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, buckets, counts, total, count in dump.get('histograms', []):
+            key = (name, tuple(tuple(pair) for pair in labels))
+            series = histograms.get(key)
+            if series is None:
+                histograms[key] = [list(buckets), list(counts), total, count]
+            elif series[0] == list(buckets):
+                series[1] = [a + b for a, b in zip(series[1], counts)]
+                series[2] += total
+                series[3] += count
+    return {
+        'counters': [[name, list(labels), value] for (name, labels), value in counters.items()],
+        'histograms': [[name, list(labels), *series] for (name, labels), series in histograms.items()],
+    }
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(str(v))}"' for k, v in pairs) + '}'
+
+
+def _number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def hit_ratios(counters: List[list]) -> List[list]:
+    """Tasas de aciertos (gauges) derivadas de los contadores de HIT_RATIO_COUNTERS."""
+    totals: Dict[Tuple[str, tuple], List[float]] = {}
+    for name, labels, value in counters:
+        if name not in HIT_RATIO_COUNTERS:
+            continue
+        labels = [tuple(pair) for pair in labels]
+        result = dict(labels).get('result')
+        if result not in ('hit', 'miss'):
+            continue
+        group = (HIT_RATIO_COUNTERS[name], tuple(pair for pair in labels if pair[0] != 'result'))
+        entry = totals.setdefault(group, [0, 0])
+        entry[0 if result == 'hit' else 1] += value
+    return [[name, list(labels), hits / (hits + misses)]
+            for (name, labels), (hits, misses) in totals.items() if hits + misses]
+
+
+def render_prometheus(data: Dict[str, list], gauges: Iterable[list] = ()) -> str:
+    """Formato de texto de Prometheus (0.0.4) de un registro volcado con dump o merge_dumps."""
+    families: Dict[str, Tuple[str, list]] = {}
+    for name, labels, value in data.get('counters', []):
+        families.setdefault(name, ('counter', []))[1].append((labels, value))
+    for name, labels, value in list(gauges) + hit_ratios(data.get('counters', [])):
+        families.setdefault(name, ('gauge', []))[1].append((labels, value))
+    for name, labels, buckets, counts, total, count in data.get('histograms', []):
+        families.setdefault(name, ('histogram', []))[1].append((labels, (buckets, counts, total, count)))
+
+    lines = []
+    for name in sorted(families):
+        kind, series = families[name]
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in sorted(series, key=lambda item: [tuple(pair) for pair in item[0]]):
+            if kind != 'histogram':
+                lines.append(f'{name}{_labels(labels)} {_number(value)}')
+                continue
+            buckets, counts, total, count = value
+            cumulative = 0
+            for bound, bucket_count in zip(list(buckets) + [float('inf')], counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{_labels(labels, (("le", _number(bound)),))} {cumulative}')
+            lines.append(f'{name}_sum{_labels(labels)} {_number(total)}')
+            lines.append(f'{name}_count{_labels(labels)} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+def init_metrics(app, gauges: Optional[Callable[[], Iterable[list]]] = None) -> None:
+    """
+    Registra GET /metrics en la aplicación.
+
+    Con JWT_METRICS_DIR se agregan los registros de todos los procesos que
+    comparten el directorio (JWT_METRICS_FLUSH_SECONDS entre volcados,
+    JWT_METRICS_STALE_SECONDS sin volcar para dar por terminado un proceso).
+    Con JWT_METRICS_TOKEN el endpoint exige `Authorization: Bearer <token>`.
+    `gauges` agrega valores calculados al momento de la consulta.
+    """
+    from flask import Response, request
+
+    directory = os.getenv('JWT_METRICS_DIR')
+    multiprocess = None
+    if directory:
+        stale_seconds = os.getenv('JWT_METRICS_STALE_SECONDS')
+        multiprocess = MultiprocessMetrics(
+            directory,
+            interval=float(os.getenv('JWT_METRICS_FLUSH_SECONDS', 5)),
+            stale_seconds=float(stale_seconds) if stale_seconds else None
+        )
+        multiprocess.start()
+    app.config['JWT_METRICS_MULTIPROCESS'] = multiprocess
+    token = os.getenv('JWT_METRICS_TOKEN')
+
+    def metrics_endpoint():
+        if token:
+            supplied = request.headers.get('Authorization', '').encode('utf-8')
+            if not hmac.compare_digest(supplied, f'Bearer {token}'.encode('utf-8')):
+                return Response('Token de métricas inválido.\n', status=401, mimetype='text/plain',
+                                headers={'WWW-Authenticate': 'Bearer'})
+        data = multiprocess.collect() if multiprocess is not None else metrics.dump()
+        body = render_prometheus(data, gauges() if gauges is not None else ())
+        return Response(body, mimetype='text/plain', content_type='text/plain; version=0.0.4; charset=utf-8')
+
+    app.add_url_rule('/metrics', 'metrics', metrics_endpoint, methods=['GET'])
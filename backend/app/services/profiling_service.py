@@ -0,0 +1,470 @@
+"""
+Servicio de perfilado bajo demanda.
+
+Cuando un tipo de token es lento en producción, el tiempo total de la
+solicitud no dice qué fase ni qué función es responsable. Con
+JWT_PROFILING_ENABLED, una solicitud que lleva la cabecera
+`X-JWT-Profile: cprofile|sample` (o `?profile=cprofile|sample`) se ejecuta
+bajo un perfilador:
+
+- cprofile: determinista (cProfile), con llamadas y tiempos exactos por función.
+- sample: muestreo de la pila del hilo de la solicitud cada
+  JWT_PROFILING_SAMPLE_INTERVAL segundos (menor sobrecarga).
+
+Las funciones con más tiempo vuelven en el campo `profile` de las respuestas
+JSON y el perfil completo se guarda en JWT_PROFILING_DIR para descargarlo
+(GET /api/profiles/<id> y /api/profiles/<id>.prof, legible con pstats o
+snakeviz).
+
+Con JWT_PROFILING_CONTINUOUS_HZ > 0, un hilo muestrea a baja frecuencia las
+pilas de todas las solicitudes en curso y acumula las pilas calientes en
+formato "folded" (una pila por línea con su cuenta), listo para
+flamegraph.pl o speedscope (GET /api/profiles/stacks.folded).
+
+Sin estas variables no se registra ningún hook: la sobrecarga es nula. El
+perfilado requiere JWT_ADMIN_TOKEN: marcar una solicitud y descargar los
+perfiles exige `Authorization: Bearer <token>`, y sin token no se habilita.
+"""
+
+import cProfile
+import hmac
+import json
+import os
+import pstats
+import re
+import socket
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from flask import Response, current_app, g, jsonify, request
+
+from app.services.metrics_service import metrics
+
+
+PROFILE_HEADER = 'X-JWT-Profile'
+MODES = ('cprofile', 'sample')
+PROFILE_ID = re.compile(r'^[0-9a-f]{32}$')
+
+
+def _frame_name(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def fold_stack(frame) -> str:
+    """Pila de un frame en formato folded: de la raíz a la hoja, separada por ';'."""
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class StackSampler:
+    """
+    Muestrea periódicamente la pila de un conjunto de hilos desde un hilo propio.
+
+    Args:
+        interval: Segundos entre muestras
+        threads: Función que retorna los identificadores de los hilos a muestrear
+    """
+
+    def __init__(self, interval: float, threads: Callable[[], Iterable[int]]):
+        self.interval = interval
+        self.threads = threads
+        self.stacks: Counter = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> 'StackSampler':
+        self._thread = threading.Thread(target=self._run, name='jwt-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self) -> None:
+        frames = sys._current_frames()
+        stacks = [fold_stack(frames[ident]) for ident in list(self.threads()) if ident in frames]
+        with self._lock:
+            self.stacks.update(stacks)
+
+    def folded(self) -> str:
+        with self._lock:
+            return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top(self, limit: int) -> List[Dict[str, Any]]:
+        """Funciones con más muestras propias (hoja de la pila) y totales (en cualquier nivel)."""
+        with self._lock:
+            stacks = dict(self.stacks)
+        own: Counter = Counter()
+        total: Counter = Counter()
+        samples = sum(stacks.values())
+        for stack, count in stacks.items():
+            names = stack.split(';')
+            own[names[-1]] += count
+            for name in set(names):
+                total[name] += count
+        return [
+            {'function': name, 'own_samples': count, 'total_samples': total[name],
+             'own_ratio': round(count / samples, 4)}
+            for name, count in own.most_common(limit)
+        ]
+
+
+def cprofile_top(stats: pstats.Stats, limit: int) -> List[Dict[str, Any]]:
+    """Funciones con más tiempo propio de un perfil de cProfile."""
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:limit]
+    return [
+        {
+            'function': function,
+            'file': os.path.basename(filename),
+            'line': line,
+            'calls': calls,
+            'tottime': round(tottime, 6),
+            'cumtime': round(cumtime, 6),
+        }
+        for (filename, line, function), (_, calls, tottime, cumtime, _) in rows
+    ]
+
+
+class ProfileStore:
+    """Perfiles guardados en un directorio (compartible entre workers), con retención acotada."""
+
+    def __init__(self, directory: str, retention: int = 50):
+        self.directory = directory
+        self.retention = retention
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, profile_id: str, extension: str) -> str:
+        return os.path.join(self.directory, f"{profile_id}.{extension}")
+
+    def save(self, profile_id: str, summary: Dict[str, Any], data: bytes, extension: str) -> None:
+        for ext, content in ((extension, data), ('json', json.dumps(summary).encode('utf-8'))):
+            fd, tmp_path = tempfile.mkstemp(prefix='.profile-', dir=self.directory)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, self.path(profile_id, ext))
+        self._evict()
+
+    def _evict(self) -> None:
+        summaries = []
+        for name in os.listdir(self.directory):
+            if not (PROFILE_ID.match(name.split('.', 1)[0]) and name.endswith('.json')):
+                continue
+            try:
+                summaries.append((os.path.getmtime(os.path.join(self.directory, name)), name))
+            except FileNotFoundError:
+                # Otro worker lo eliminó entre listdir y getmtime
+                continue
+        summaries.sort()
+        for _, name in summaries[:max(0, len(summaries) - self.retention)]:
+            profile_id = name.split('.', 1)[0]
+            for extension in ('json', 'prof', 'folded'):
+                try:
+                    os.unlink(self.path(profile_id, extension))
+                except FileNotFoundError:
+                    pass
+
+    def summary(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.path(profile_id, 'json')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+
+class ContinuousSampler:
+    """
+    Muestreo continuo a baja frecuencia de los hilos que atienden solicitudes.
+
+    Cada proceso vuelca sus pilas acumuladas a `stacks-<host>-<pid>.folded`
+    cada `flush_interval` segundos; folded() suma los archivos de todos los
+    procesos del directorio.
+    """
+
+    def __init__(self, directory: str, hz: float, flush_interval: float = 30.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.active: set = set()
+        self.sampler = StackSampler(1.0 / hz, lambda: self.active)
+        self._flushed_at = time.monotonic()
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.directory, f"stacks-{socket.gethostname()}-{os.getpid()}.folded")
+
+    def start(self) -> None:
+        self.sampler.start()
+
+    def enter(self) -> None:
+        self.active.add(threading.get_ident())
+
+    def leave(self) -> None:
+        self.active.discard(threading.get_ident())
+        if time.monotonic() - self._flushed_at >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        self._flushed_at = time.monotonic()
+        fd, tmp_path = tempfile.mkstemp(prefix='.stacks-', dir=self.directory)
+        with os.fdopen(fd, 'w') as f:
+            f.write(self.sampler.folded())
+        os.replace(tmp_path, self.path)
+
+    def folded(self) -> str:
+        self.flush()
+        stacks: Counter = Counter()
+        for name in os.listdir(self.directory):
+            if not (name.startswith('stacks-') and name.endswith('.folded')):
+                continue
+            with open(os.path.join(self.directory, name)) as f:
+                for line in f:
+                    stack, _, count = line.rstrip('\n').rpartition(' ')
+                    if stack and count.isdigit():
+                        stacks[stack] += int(count)
+        return ''.join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+class RequestProfiler:
+    """
+    Hooks de Flask que perfilan las solicitudes marcadas.
+
+    Args:
+        store: Almacén de perfiles
+        enabled: Acepta la marca por solicitud (cabecera o query)
+        top: Funciones incluidas en el resumen
+        sample_interval: Segundos entre muestras en el modo sample
+        continuous: Muestreo continuo (opcional)
+    """
+
+    def __init__(self, store: ProfileStore, enabled: bool = True, top: int = 20,
+                 sample_interval: float = 0.001, continuous: Optional[ContinuousSampler] = None):
+        self.store = store
+        self.enabled = enabled
+        self.top = top
+        self.sample_interval = sample_interval
+        self.continuous = continuous
+
+    @classmethod
+    def from_env(cls) -> Optional['RequestProfiler']:
+        """Crea el perfilador si JWT_PROFILING_ENABLED o JWT_PROFILING_CONTINUOUS_HZ lo activan."""
+        enabled = os.getenv('JWT_PROFILING_ENABLED', 'False').lower() in ('true', '1', 'yes')
+        hz = float(os.getenv('JWT_PROFILING_CONTINUOUS_HZ', 0))
+        if not enabled and hz <= 0:
+            return None
+        directory = os.getenv('JWT_PROFILING_DIR') or os.path.join(tempfile.gettempdir(), 'jwt-profiles')
+        continuous = None
+        if hz > 0:
+            continuous = ContinuousSampler(
+                directory, hz, flush_interval=float(os.getenv('JWT_PROFILING_FLUSH_SECONDS', 30))
+            )
+        return cls(
+            ProfileStore(directory, retention=int(os.getenv('JWT_PROFILING_RETENTION', 50))),
+            enabled=enabled,
+            top=int(os.getenv('JWT_PROFILING_TOP', 20)),
+            sample_interval=float(os.getenv('JWT_PROFILING_SAMPLE_INTERVAL', 0.001)),
+            continuous=continuous,
+        )
+
+    def requested_mode(self) -> Optional[str]:
+        mode = request.headers.get(PROFILE_HEADER) or request.args.get('profile')
+        if not self.enabled or mode not in MODES or request.method == 'OPTIONS':
+            return None
+        # Perfilar requiere el token de administración
+        return mode if authorized() else None
+
+    def before_request(self):
+        if self.continuous is not None:
+            self.continuous.enter()
+        mode = self.requested_mode()
+        if mode is None:
+            return None
+        if mode == 'cprofile':
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Otro perfilador activo en el intérprete: la solicitud sigue sin perfilar
+                metrics.inc('jwt_profiles_total', mode=mode, result='busy')
+                return None
+        else:
+            ident = threading.get_ident()
+            profiler = StackSampler(self.sample_interval, lambda: (ident,)).start()
+        g.jwt_profile = (mode, profiler, time.perf_counter())
+        return None
+
+    def after_request(self, response):
+        state = g.pop('jwt_profile', None)
+        if state is None:
+            return response
+        mode, profiler, started = state
+        duration = time.perf_counter() - started
+        profile_id = uuid.uuid4().hex
+        if mode == 'cprofile':
+            profiler.disable()
+            stats = pstats.Stats(profiler)
+            top = cprofile_top(stats, self.top)
+            samples = None
+            fd, tmp_path = tempfile.mkstemp(prefix='.pstats-', dir=self.store.directory)
+            os.close(fd)
+            stats.dump_stats(tmp_path)
+            with open(tmp_path, 'rb') as f:
+                data = f.read()
+            os.unlink(tmp_path)
+            extension = 'prof'
+        else:
+            profiler.stop()
+            top = profiler.top(self.top)
+            samples = sum(profiler.stacks.values())
+            data = profiler.folded().encode('utf-8')
+            extension = 'folded'
+
+        summary = {
+            'id': profile_id,
+            'mode': mode,
+            'endpoint': request.endpoint,
+            'path': request.path,
+            'status': response.status_code,
+            'duration': round(duration, 6),
+            'samples': samples,
+            'created_at': time.time(),
+            'download': f"{request.script_root}/api/profiles/{profile_id}.{extension}",
+            'top': top,
+        }
+        self.store.save(profile_id, summary, data, extension)
+        metrics.inc('jwt_profiles_total', mode=mode, result='stored')
+
+        response.headers['X-JWT-Profile-Id'] = profile_id
+        if response.is_json and not response.is_streamed:
+            body = response.get_json(silent=True)
+            if isinstance(body, dict):
+                body['profile'] = summary
+                response.set_data(json.dumps(body))
+        return response
+
+    def teardown_request(self, exc):
+        if self.continuous is not None:
+            self.continuous.leave()
+        # Si la vista lanzó una excepción no se ejecutó after_request
+        state = g.pop('jwt_profile', None)
+        if state is not None:
+            mode, profiler, _ = state
+            if mode == 'cprofile':
+                profiler.disable()
+            else:
+                profiler.stop()
+
+
+def authorized() -> bool:
+    """Indica si la solicitud lleva el token de administración (False si no está configurado)."""
+    admin_token = current_app.config.get('JWT_ADMIN_TOKEN')
+    if not admin_token:
+        return False
+    supplied = request.headers.get('Authorization', '').encode('utf-8')
+    return hmac.compare_digest(supplied, f'Bearer {admin_token}'.encode('utf-8'))
+
+
+def _denied():
+    if not current_app.config.get('JWT_ADMIN_TOKEN'):
+        return jsonify({
+            'success': False,
+            'error': 'Administración deshabilitada: configure JWT_ADMIN_TOKEN.'
+        }), 403
+    return jsonify({
+        'success': False,
+        'error': 'Token de administración inválido.'
+    }), 401
+
+
+def _profiler() -> RequestProfiler:
+    return current_app.config['JWT_PROFILER']
+
+
+def get_profile(profile_id):
+    """Resumen de un perfil guardado."""
+    if not authorized():
+        return _denied()
+    summary = _profiler().store.summary(profile_id) if PROFILE_ID.match(profile_id) else None
+    if summary is None:
+        return jsonify({
+            'success': False,
+            'error': f"El perfil '{profile_id}' no existe.",
+            'error_type': 'UnknownProfileError'
+        }), 404
+    return jsonify({'success': True, 'profile': summary})
+
+
+def download_profile(profile_id, extension):
+    """Perfil completo: .prof (pstats de cProfile) o .folded (pilas muestreadas)."""
+    if not authorized():
+        return _denied()
+    path = _profiler().store.path(profile_id, extension)
+    if not PROFILE_ID.match(profile_id) or not os.path.exists(path):
+        return jsonify({
+            'success': False,
+            'error': f"El perfil '{profile_id}.{extension}' no existe.",
+            'error_type': 'UnknownProfileError'
+        }), 404
+    with open(path, 'rb') as f:
+        data = f.read()
+    mimetype = 'application/octet-stream' if extension == 'prof' else 'text/plain'
+    response = Response(data, mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{profile_id}.{extension}"'
+    return response
+
+
+def continuous_stacks():
+    """Pilas calientes acumuladas por el muestreo continuo de todos los workers."""
+    if not authorized():
+        return _denied()
+    continuous = _profiler().continuous
+    if continuous is None:
+        return jsonify({
+            'success': False,
+            'error': 'El muestreo continuo está deshabilitado: configure JWT_PROFILING_CONTINUOUS_HZ.'
+        }), 404
+    response = Response(continuous.folded(), mimetype='text/plain')
+    response.headers['Content-Disposition'] = 'attachment; filename="stacks.folded"'
+    return response
+
+
+def init_profiling(app, profiler: Optional[RequestProfiler] = None) -> None:
+    """
+    Registra el perfilado en la aplicación.
+
+    Se registra después de la compresión, para que su after_request se
+    ejecute antes y agregue el resumen al cuerpo sin comprimir. Sin
+    JWT_ADMIN_TOKEN no se habilita: los perfiles exponen rutas y tiempos
+    internos, y marcar solicitudes permitiría a cualquiera cargar el servidor.
+    """
+    profiler = profiler or RequestProfiler.from_env()
+    if profiler is None:
+        return
+    if not app.config.get('JWT_ADMIN_TOKEN'):
+        app.logger.warning("Perfilado no habilitado: requiere JWT_ADMIN_TOKEN.")
+        return
+    app.config['JWT_PROFILER'] = profiler
+    app.before_request(profiler.before_request)
+    app.after_request(profiler.after_request)
+    app.teardown_request(profiler.teardown_request)
+    if profiler.continuous is not None:
+        profiler.continuous.start()
+
+    app.add_url_rule('/api/profiles/stacks.folded', 'profiles_stacks', continuous_stacks, methods=['GET'])
+    app.add_url_rule('/api/profiles/<profile_id>.<any(prof, folded):extension>', 'profiles_download',
+                     download_profile, methods=['GET'])
+    app.add_url_rule('/api/profiles/<profile_id>', 'profiles_get', get_profile, methods=['GET'])
@@ -0,0 +1,236 @@
+"""
+Servicio de cache de resultados compartida entre workers.
+
+Con varios procesos (gunicorn), una cache en memoria se duplica en cada
+worker, se calienta N veces y se pierde cada vez que un worker se recicla.
+Esta cache vive en un archivo SQLite en modo WAL del host: lo que un worker
+calcula lo aprovechan todos, y sobrevive a los reinicios de los workers.
+
+Las claves de las entradas son un digest SHA-256 del tipo de análisis, el
+token y su contexto (límites), pero los valores son los resultados tal
+cual: un resultado léxico contiene los segmentos del token, y por lo tanto
+su payload en base64. El archivo es tan sensible como los tokens que se
+analizan; se crea con permisos 0600. En modo WAL las lecturas no toman
+locks ni bloquean a los escritores; cada hilo usa su propia conexión. La
+capacidad es acotada: las entradas más antiguas (por orden de inserción) y
+las vencidas se eliminan periódicamente.
+
+Los aciertos y fallos se cuentan en memoria y se vuelcan cada pocos
+segundos a la tabla `counters` (una fila por worker), de donde se obtiene
+la tasa de aciertos global.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from app.services.metrics_service import metrics
+
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS results ("
+    " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+    " key BLOB NOT NULL UNIQUE,"
+    " value TEXT NOT NULL,"
+    " expires_at REAL NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS counters ("
+    " worker TEXT PRIMARY KEY,"
+    " hits INTEGER NOT NULL,"
+    " misses INTEGER NOT NULL,"
+    " updated_at REAL NOT NULL)",
+)
+
+
+def cache_key(kind: str, parts: Iterable[str]) -> bytes:
+    """Digest de la entrada: tipo de análisis y partes separadas por NUL."""
+    digest = hashlib.sha256(kind.encode('utf-8'))
+    for part in parts:
+        digest.update(b'\x00')
+        digest.update(part.encode('utf-8', 'surrogatepass'))
+    return digest.digest()
+
+
+class SharedResultCache:
+    """
+    Cache de resultados JSON en SQLite (WAL), compartida por los procesos del host.
+
+    Args:
+        path: Archivo de la base de datos
+        capacity: Entradas máximas (se admite un excedente de hasta evict_every)
+        ttl: Segundos de vigencia de cada entrada
+        evict_every: Inserciones de este proceso entre dos pasadas de desalojo
+        flush_interval: Segundos entre volcados de los contadores de aciertos
+    """
+
+    def __init__(self, path: str, capacity: int = 100_000, ttl: float = 3600,
+                 evict_every: int = 256, flush_interval: float = 5.0):
+        self.path = path
+        self.capacity = capacity
+        self.ttl = ttl
+        self.evict_every = evict_every
+        self.flush_interval = flush_interval
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._puts = 0
+        self._flushed_at = time.monotonic()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        # Los resultados contienen los tokens: solo el usuario del servicio puede leer el archivo
+        os.close(os.open(path, os.O_CREAT | os.O_RDWR, 0o600))
+        connection = self._connection()
+        with connection:
+            for statement in SCHEMA:
+                connection.execute(statement)
+
+    def _connection(self) -> sqlite3.Connection:
+        # Conexión por hilo y por proceso: una conexión heredada con fork no se reutiliza
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    @property
+    def worker_id(self) -> str:
+        return f"{socket.gethostname()}-{os.getpid()}"
+
+    def get(self, key: bytes) -> Optional[Any]:
+        """Retorna el valor vigente de la entrada, o None."""
+        try:
+            row = self._connection().execute(
+                'SELECT value FROM results WHERE key = ? AND expires_at > ?', (key, time.time())
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning("Cache de resultados no disponible: %s", e)
+            metrics.inc('jwt_result_cache_errors_total', op='get')
+            row = None
+        return json.loads(row[0]) if row is not None else None
+
+    def put(self, key: bytes, value: Any) -> None:
+        """Guarda una entrada. Si la base está ocupada se omite: la cache es best-effort."""
+        try:
+            self._connection().execute(
+                'INSERT OR REPLACE INTO results (key, value, expires_at) VALUES (?, ?, ?)',
+                (key, json.dumps(value, separators=(',', ':')), time.time() + self.ttl)
+            )
+        except sqlite3.Error as e:
+            logger.warning("No se pudo guardar en la cache de resultados: %s", e)
+            metrics.inc('jwt_result_cache_errors_total', op='put')
+            return
+        with self._lock:
+            self._puts += 1
+            evict = self._puts % self.evict_every == 0
+        if evict:
+            self.evict()
+
+    def evict(self) -> None:
+        """Elimina las entradas vencidas y las más antiguas que exceden la capacidad."""
+        try:
+            connection = self._connection()
+            connection.execute('DELETE FROM results WHERE expires_at <= ?', (time.time(),))
+            connection.execute(
+                'DELETE FROM results WHERE seq <= (SELECT MAX(seq) FROM results) - ?', (self.capacity,)
+            )
+        except sqlite3.Error as e:
+            logger.warning("No se pudo desalojar la cache de resultados: %s", e)
+            metrics.inc('jwt_result_cache_errors_total', op='evict')
+
+    def get_or_compute(self, kind: str, parts: Iterable[str], compute: Callable[[], Any],
+                       cacheable: Callable[[Any], bool] = lambda value: True) -> Any:
+        """
+        Retorna el resultado cacheado de (kind, parts) o lo calcula y lo guarda.
+
+        cacheable permite descartar resultados que no conviene compartir.
+        """
+        key = cache_key(kind, parts)
+        value = self.get(key)
+        hit = value is not None
+        metrics.inc('jwt_result_cache_total', kind=kind, result='hit' if hit else 'miss')
+        with self._lock:
+            if hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+            flush = time.monotonic() - self._flushed_at >= self.flush_interval
+        if not hit:
+            value = compute()
+            if cacheable(value):
+                self.put(key, value)
+        if flush:
+            self.flush_counters()
+        return value
+
+    def flush_counters(self) -> None:
+        """Suma los aciertos y fallos locales a la fila de este worker."""
+        with self._lock:
+            hits, misses = self._hits, self._misses
+            self._hits = self._misses = 0
+            self._flushed_at = time.monotonic()
+        if not hits and not misses:
+            return
+        try:
+            self._connection().execute(
+                'INSERT INTO counters (worker, hits, misses, updated_at) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT(worker) DO UPDATE SET hits = hits + excluded.hits, '
+                'misses = misses + excluded.misses, updated_at = excluded.updated_at',
+                (self.worker_id, hits, misses, time.time())
+            )
+        except sqlite3.Error as e:
+            # Se conservan para el próximo volcado
+            with self._lock:
+                self._hits += hits
+                self._misses += misses
+            logger.warning("No se pudieron volcar los contadores de la cache: %s", e)
+
+    def stats(self) -> Dict[str, Any]:
+        """Entradas, capacidad y aciertos/fallos de todos los workers."""
+        self.flush_counters()
+        connection = self._connection()
+        entries = connection.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+        hits, misses, workers = connection.execute(
+            'SELECT COALESCE(SUM(hits), 0), COALESCE(SUM(misses), 0), COUNT(*) FROM counters'
+        ).fetchone()
+        lookups = hits + misses
+        return {
+            'entries': entries,
+            'capacity': self.capacity,
+            'ttl': self.ttl,
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / lookups, 4) if lookups else None,
+            'workers': workers,
+        }
+
+    def gauges(self):
+        """Entradas y tasa de aciertos de todos los workers, como gauges para GET /metrics."""
+        stats = self.stats()
+        gauges = [['jwt_result_cache_entries', [], stats['entries']]]
+        if stats['hit_ratio'] is not None:
+            gauges.append(['jwt_result_cache_shared_hit_ratio', [], stats['hit_ratio']])
+        return gauges
+
+    @classmethod
+    def from_env(cls) -> Optional['SharedResultCache']:
+        """Crea la cache si JWT_RESULT_CACHE_PATH está definido."""
+        path = os.getenv('JWT_RESULT_CACHE_PATH')
+        if not path:
+            return None
+        return cls(
+            path,
+            capacity=int(os.getenv('JWT_RESULT_CACHE_CAPACITY', 100_000)),
+            ttl=float(os.getenv('JWT_RESULT_CACHE_TTL', 3600)),
+        )
@@ -0,0 +1,275 @@
+"""
+Servicio de snapshots locales de la colección JWTS.
+
+Las auditorías por lotes leen la colección completa desde MongoDB Atlas en
+cada corrida. Un snapshot es una copia local, compacta y versionada que se
+lee a velocidad de disco: los tokens se guardan con prefijo de longitud en
+una región contigua y el resto de cada documento (metadatos) en otra, con un
+índice de offsets que permite acceso aleatorio por memory-map sin cargar el
+archivo. Un snapshot se actualiza de forma incremental: se descargan los _id
+vigentes y, comparándolos con los del snapshot, solo los documentos que
+faltan; los eliminados se descartan. Por defecto no se exporta el campo
+'secreto' (DEFAULT_EXCLUDE).
+
+Leer un snapshot no requiere conexión a MongoDB; solo exportarlo o
+actualizarlo.
+
+Formato (little-endian):
+    cabecera   : magic (8 bytes) | versión (uint32) | codificación (uint32) | n (uint64)
+                 | offset de info (uint64) | longitud de info (uint64) | offset del índice (uint64)
+    tokens     : n x (longitud uint32 | token UTF-8)
+    metadatos  : n x (longitud uint32 | documento sin el token, JSON o msgpack)
+    índice     : n x uint64 offsets de token | n x uint64 offsets de metadatos
+    info       : JSON con la marca (último _id), fecha y versión de la colección
+"""
+
+import heapq
+import json
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import time
+from array import array
+from typing import Any, Dict, Iterable, Iterator, Optional, Sequence
+
+import numpy as np
+
+
+MAGIC = b'JWTSNAP1'
+VERSION = 1
+HEADER = struct.Struct('<8sIIQQQQ')
+LENGTH = struct.Struct('<I')
+
+ENCODINGS = {'json': 0, 'msgpack': 1}
+
+# Campos que no se exportan salvo que se pida explícitamente: las claves de verificación
+DEFAULT_EXCLUDE = ('secreto',)
+ENCODING_NAMES = {code: name for name, code in ENCODINGS.items()}
+
+
+def _encoder(encoding: str):
+    if encoding == 'msgpack':
+        try:
+            import msgpack
+        except ImportError as e:
+            raise RuntimeError("La codificación msgpack requiere msgpack (pip install msgpack).") from e
+        return lambda value: msgpack.packb(value, default=str)
+    if encoding == 'json':
+        return lambda value: json.dumps(value, ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8')
+    raise ValueError(f"Codificación desconocida: {encoding}")
+
+
+def _decoder(encoding: str):
+    if encoding == 'msgpack':
+        try:
+            import msgpack
+        except ImportError as e:
+            raise RuntimeError("El snapshot usa msgpack: instale msgpack (pip install msgpack).") from e
+        return lambda data: msgpack.unpackb(data, raw=False)
+    return json.loads
+
+
+def write_snapshot(path: str, documents: Iterable[Dict[str, Any]], encoding: str = 'json',
+                   info: Optional[Dict[str, Any]] = None) -> int:
+    """
+    Escribe un snapshot con los documentos dados (en orden de _id) y lo publica de forma atómica.
+
+    Los tokens se escriben directamente en el archivo y los metadatos en un
+    temporal que se agrega al final, por lo que la memoria usada no depende
+    del tamaño de la colección (salvo 16 bytes de índice por documento).
+    Retorna el número de documentos.
+    """
+    encode = _encoder(encoding)
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.snapshot-', dir=directory)
+    token_offsets, meta_offsets = array('Q'), array('Q')
+    watermark = None
+    try:
+        with os.fdopen(fd, 'w+b') as f, tempfile.TemporaryFile(dir=directory) as meta:
+            f.write(b'\x00' * HEADER.size)
+            position = HEADER.size
+            meta_position = 0
+            for document in documents:
+                document = dict(document)
+                token = document.pop('token', None)
+                token_bytes = (token if isinstance(token, str) else '').encode('utf-8', 'surrogatepass')
+                document['_id'] = str(document.get('_id'))
+                watermark = document['_id']
+                meta_bytes = encode(document)
+
+                token_offsets.append(position)
+                f.write(LENGTH.pack(len(token_bytes)))
+                f.write(token_bytes)
+                position += LENGTH.size + len(token_bytes)
+
+                meta_offsets.append(meta_position)
+                meta.write(LENGTH.pack(len(meta_bytes)))
+                meta.write(meta_bytes)
+                meta_position += LENGTH.size + len(meta_bytes)
+
+            meta.seek(0)
+            shutil.copyfileobj(meta, f)
+            meta_offsets = array('Q', (position + offset for offset in meta_offsets))
+            position += meta_position
+
+            # El índice queda alineado a 8 bytes para leerlo con np.frombuffer
+            padding = -position % 8
+            f.write(b'\x00' * padding)
+            index_offset = position + padding
+            f.write(token_offsets.tobytes())
+            f.write(meta_offsets.tobytes())
+
+            info = dict(info or {})
+            info.update({'watermark': watermark, 'count': len(token_offsets), 'written_at': time.time()})
+            info_bytes = json.dumps(info, separators=(',', ':')).encode('utf-8')
+            info_offset = index_offset + 16 * len(token_offsets)
+            f.write(info_bytes)
+
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, VERSION, ENCODINGS[encoding], len(token_offsets),
+                                info_offset, len(info_bytes), index_offset))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return len(token_offsets)
+
+
+class JwtsSnapshot:
+    """
+    Lectura por memory-map de un snapshot de JWTS.
+
+    token(i) no decodifica metadatos, de modo que recorrer solo los tokens
+    (por ejemplo para el lexer por lotes o para precalentar la cache) lee
+    únicamente la región de tokens.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, encoding, count, info_offset, info_length, index_offset = HEADER.unpack_from(self._mm, 0)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} no es un snapshot de JWTS válido (versión {VERSION}).")
+            self.encoding = ENCODING_NAMES[encoding]
+            self.info = json.loads(self._mm[info_offset:info_offset + info_length])
+            self._token_offsets = np.frombuffer(self._mm, dtype='<u8', count=count, offset=index_offset)
+            self._meta_offsets = np.frombuffer(self._mm, dtype='<u8', count=count, offset=index_offset + 8 * count)
+        except Exception:
+            self._mm.close()
+            raise
+        self._decode = _decoder(self.encoding)
+
+    def __len__(self) -> int:
+        return len(self._token_offsets)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self) -> None:
+        # Los arrays de NumPy referencian el mmap: se liberan antes de cerrarlo
+        self._token_offsets = self._meta_offsets = None
+        self._mm.close()
+
+    @property
+    def watermark(self) -> Optional[str]:
+        """_id del último documento del snapshot (marca para la actualización incremental)."""
+        return self.info.get('watermark')
+
+    def _read(self, offset: int) -> bytes:
+        (length,) = LENGTH.unpack_from(self._mm, offset)
+        start = offset + LENGTH.size
+        return self._mm[start:start + length]
+
+    def token(self, i: int) -> str:
+        return self._read(int(self._token_offsets[i])).decode('utf-8', 'surrogatepass')
+
+    def metadata(self, i: int) -> Dict[str, Any]:
+        return self._decode(self._read(int(self._meta_offsets[i])))
+
+    def document(self, i: int) -> Dict[str, Any]:
+        """Documento completo, con el mismo formato que DatabaseService.get_all_jwts."""
+        document = self.metadata(i)
+        document['token'] = self.token(i)
+        return document
+
+    def iter_tokens(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self.token(i)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(len(self)):
+            yield self.document(i)
+
+
+def export_snapshot(path: str, encoding: str = 'json', exclude: Sequence[str] = DEFAULT_EXCLUDE) -> int:
+    """
+    Exporta la colección JWTS completa a un snapshot.
+
+    Args:
+        path: Archivo de salida
+        encoding: Codificación de los metadatos ('json' o 'msgpack')
+        exclude: Campos a omitir (por defecto 'secreto'; () exporta todo)
+
+    Returns:
+        int: Número de documentos exportados
+    """
+    from app.services.database_service import DatabaseService
+
+    version = DatabaseService.get_collection_version()
+    documents = (_without(document, exclude) for document in DatabaseService.iter_jwts())
+    return write_snapshot(path, documents, encoding, {
+        'collection_version': version, 'exclude': list(exclude), 'refreshed_from': None,
+    })
+
+
+def refresh_snapshot(path: str, encoding: Optional[str] = None) -> Dict[str, int]:
+    """
+    Actualiza un snapshot de forma incremental.
+
+    Descarga la lista de _id vigentes y la compara con los _id del snapshot:
+    se descargan solo los documentos que faltan (sin suponer que los _id
+    crecen con el tiempo) y se quitan los eliminados; los demás documentos se
+    copian del snapshot anterior. Las modificaciones de documentos existentes
+    no se detectan: para incorporarlas se exporta de nuevo (export_snapshot).
+
+    Returns:
+        dict: added, removed y total
+    """
+    from app.services.database_service import DatabaseService
+
+    with JwtsSnapshot(path) as previous:
+        encoding = encoding or previous.encoding
+        exclude = previous.info.get('exclude') or []
+        version = DatabaseService.get_collection_version()
+        live_ids = {document['_id'] for document in DatabaseService.iter_jwts({'_id': 1})}
+        snapshot_ids = {previous.metadata(i)['_id'] for i in range(len(previous))}
+        missing_ids = live_ids - snapshot_ids
+        counts = {'added': len(missing_ids), 'removed': len(snapshot_ids - live_ids)}
+
+        kept = (document for document in previous if document['_id'] in live_ids)
+        added = (_without(document, exclude) for document in DatabaseService.iter_jwts_by_ids(missing_ids))
+        # Ambas secuencias están en orden de _id: el snapshot conserva ese orden
+        documents = heapq.merge(kept, added, key=lambda document: str(document['_id']))
+
+        total = write_snapshot(path + '.refresh', documents, encoding, {
+            'collection_version': version, 'exclude': exclude, 'refreshed_from': previous.watermark,
+        })
+    os.replace(path + '.refresh', path)
+    counts['total'] = total
+    return counts
+
+
+def _without(document: Dict[str, Any], exclude: Sequence[str]) -> Dict[str, Any]:
+    if not exclude:
+        return document
+    return {key: value for key, value in document.items() if key not in exclude}
@@ -0,0 +1,328 @@
+"""
+Servicio de tiempos por fase de cada solicitud.
+
+Las fases ya medidas por metrics_service.instrument (léxica, decodificación,
+sintáctica, semántica, criptográfica y cada llamada a MongoDB), más la
+lectura del cuerpo y la serialización de la respuesta, se registran en la
+traza de la solicitud en curso (una ContextVar: fuera de una solicitud no
+se registra nada). Al responder:
+
+- La cabecera `Server-Timing` lleva la duración total de cada fase en
+  milisegundos (`lexical;dur=0.041, db;dur=1.2, total;dur=2.9`), visible en
+  las herramientas de red del navegador y en las trazas del cliente.
+- Opcionalmente, las fases se exportan como spans compatibles con
+  OpenTelemetry (OTLP/JSON): un objeto `resourceSpans` por solicitud, en
+  JSON lines a JWT_TRACE_FILE (el formato del file exporter del collector)
+  o por HTTP a JWT_TRACE_ENDPOINT (p. ej. http://localhost:4318/v1/traces).
+  Si la solicitud trae `traceparent` (W3C), los spans se cuelgan de esa traza.
+
+Los tiempos se toman con time.perf_counter (monotónico); el reloj de pared
+solo se usa una vez por solicitud para ubicar los spans.
+"""
+
+import functools
+import json
+import os
+import queue
+import re
+import secrets
+import threading
+import time
+import urllib.request
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from flask import Request, g, request
+from flask.json.provider import DefaultJSONProvider
+
+
+SERVICE_NAME = 'jwt-analyzer'
+TRACEPARENT = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$')
+
+# Nombre en Server-Timing de las métricas que no son fases del análisis
+TIMING_NAMES = {'jwt_mongo': 'db'}
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+
+class RequestTrace:
+    """Spans registrados durante una solicitud."""
+
+    __slots__ = ('trace_id', 'span_id', 'parent_span_id', 'start', 'start_ns', 'spans')
+
+    def __init__(self, traceparent: Optional[str] = None):
+        match = TRACEPARENT.match(traceparent or '')
+        self.trace_id = match.group(1) if match else secrets.token_hex(16)
+        self.parent_span_id = match.group(2) if match else None
+        self.span_id = secrets.token_hex(8)
+        self.start = time.perf_counter()
+        self.start_ns = time.time_ns()
+        # (nombre en Server-Timing, nombre del span, inicio, duración, error_type, atributos)
+        self.spans: List[tuple] = []
+
+    def add(self, timing: str, name: str, start: float, duration: float,
+            error_type: Optional[str] = None, attributes: Optional[Dict[str, Any]] = None) -> None:
+        self.spans.append((timing, name, start, duration, error_type, attributes))
+
+    def server_timing(self, total: float) -> str:
+        """Valor de la cabecera Server-Timing: duración acumulada por fase, en el orden en que aparecieron."""
+        durations: Dict[str, float] = {}
+        for timing, _, _, duration, _, _ in self.spans:
+            durations[timing] = durations.get(timing, 0.0) + duration
+        durations['total'] = total
+        return ', '.join(f"{timing};dur={duration * 1000:.3f}" for timing, duration in durations.items())
+
+    def _unix_nano(self, start: float) -> str:
+        return str(self.start_ns + int((start - self.start) * 1e9))
+
+    def to_otlp(self, name: str, total: float, attributes: Dict[str, Any], error: bool) -> Dict[str, Any]:
+        """La solicitud (span SERVER) y sus fases (spans INTERNAL) como ExportTraceServiceRequest en JSON."""
+        root = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': name,
+            'kind': SPAN_KIND_SERVER,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': self._unix_nano(self.start + total),
+            'attributes': _attributes(attributes),
+            'status': {'code': STATUS_ERROR if error else STATUS_OK},
+        }
+        if self.parent_span_id is not None:
+            root['parentSpanId'] = self.parent_span_id
+        spans = [root]
+        for timing, span_name, start, duration, error_type, span_attributes in self.spans:
+            span_attributes = dict(span_attributes or {}, **{'jwt.timing': timing})
+            if error_type is not None:
+                span_attributes['jwt.error_type'] = error_type
+            spans.append({
+                'traceId': self.trace_id,
+                'spanId': secrets.token_hex(8),
+                'parentSpanId': self.span_id,
+                'name': span_name,
+                'kind': SPAN_KIND_INTERNAL,
+                'startTimeUnixNano': self._unix_nano(start),
+                'endTimeUnixNano': self._unix_nano(start + duration),
+                'attributes': _attributes(span_attributes),
+                'status': {'code': STATUS_ERROR if error_type is not None else STATUS_OK},
+            })
+        return {'resourceSpans': [{
+            'resource': {'attributes': _attributes({'service.name': SERVICE_NAME, 'process.pid': os.getpid()})},
+            'scopeSpans': [{'scope': {'name': __name__}, 'spans': spans}],
+        }]}
+
+
+def _attributes(values: Dict[str, Any]) -> List[Dict[str, Any]]:
+    result = []
+    for key, value in values.items():
+        if isinstance(value, bool):
+            result.append({'key': key, 'value': {'boolValue': value}})
+        elif isinstance(value, int):
+            result.append({'key': key, 'value': {'intValue': str(value)}})
+        else:
+            result.append({'key': key, 'value': {'stringValue': str(value)}})
+    return result
+
+
+current_trace: ContextVar[Optional[RequestTrace]] = ContextVar('jwt_request_trace', default=None)
+
+
+def record_span(timing: str, name: str, start: float, duration: float,
+                error_type: Optional[str] = None, attributes: Optional[Dict[str, Any]] = None) -> None:
+    """Registra una fase en la traza de la solicitud en curso (sin efecto fuera de una solicitud)."""
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add(timing, name, start, duration, error_type, attributes)
+
+
+def record_phase_span(metric: str, phase: str, start: float, duration: float,
+                      error_type: Optional[str], size: Optional[int]) -> None:
+    """Registra una fase medida por metrics_service.instrument (las de MongoDB como 'db')."""
+    trace = current_trace.get()
+    if trace is None:
+        return
+    timing = TIMING_NAMES.get(metric)
+    if timing == 'db':
+        trace.add(timing, f"mongodb.{phase}", start, duration, error_type,
+                  {'db.system': 'mongodb', 'db.operation.name': phase})
+    else:
+        trace.add(timing or phase, f"jwt.{phase}", start, duration, error_type,
+                  {'jwt.input_bytes': size} if size is not None else None)
+
+
+def timed(timing: str, name: Optional[str] = None):
+    """Decorador que registra la duración de la función como una fase de la solicitud."""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if current_trace.get() is None:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                record_span(timing, span_name, start, time.perf_counter() - start, type(e).__name__)
+                raise
+            record_span(timing, span_name, start, time.perf_counter() - start)
+            return result
+        return wrapper
+    return decorator
+
+
+class TimedRequest(Request):
+    """Request que registra la lectura y decodificación del cuerpo JSON como fase 'parse'."""
+
+    @timed('parse', 'request.get_json')
+    def get_json(self, *args, **kwargs):
+        return super().get_json(*args, **kwargs)
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Proveedor JSON que registra la construcción de las respuestas de jsonify como fase 'serialize'."""
+
+    @timed('serialize', 'jsonify')
+    def response(self, *args, **kwargs):
+        return super().response(*args, **kwargs)
+
+
+class FileSpanExporter:
+    """Agrega cada traza como una línea JSON (formato del file exporter de OpenTelemetry Collector)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, data: Dict[str, Any]) -> None:
+        line = json.dumps(data, separators=(',', ':')) + '\n'
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+
+
+class HttpSpanExporter:
+    """
+    Envía las trazas por OTLP/HTTP (JSON) desde un hilo propio.
+
+    La cola es acotada: si el collector no da abasto, las trazas nuevas se
+    descartan (contadas en `dropped`) en lugar de demorar las respuestas.
+    """
+
+    def __init__(self, endpoint: str, max_queued: int = 1000, timeout: float = 2.0):
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.dropped = 0
+        self.failed = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queued)
+        threading.Thread(target=self._run, name='jwt-span-exporter', daemon=True).start()
+
+    def export(self, data: Dict[str, Any]) -> None:
+        try:
+            self._queue.put_nowait(data)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            data = self._queue.get()
+            body = json.dumps(data, separators=(',', ':')).encode('utf-8')
+            req = urllib.request.Request(self.endpoint, data=body, headers={'Content-Type': 'application/json'})
+            try:
+                urllib.request.urlopen(req, timeout=self.timeout).close()
+            except Exception:
+                self.failed += 1
+
+
+class RequestTracer:
+    """
+    Hooks de Flask que abren la traza de cada solicitud a la API y agregan Server-Timing.
+
+    Args:
+        exporter: Destino de los spans (None para solo Server-Timing)
+        server_timing: Agregar la cabecera Server-Timing a las respuestas
+    """
+
+    def __init__(self, exporter=None, server_timing: bool = True):
+        self.exporter = exporter
+        self.server_timing = server_timing
+
+    @classmethod
+    def from_env(cls) -> Optional['RequestTracer']:
+        """Crea el trazador según JWT_SERVER_TIMING_ENABLED, JWT_TRACE_FILE y JWT_TRACE_ENDPOINT."""
+        server_timing = os.getenv('JWT_SERVER_TIMING_ENABLED', 'True').lower() in ('true', '1', 'yes')
+        exporter = None
+        if os.getenv('JWT_TRACE_ENDPOINT'):
+            exporter = HttpSpanExporter(os.getenv('JWT_TRACE_ENDPOINT'),
+                                        max_queued=int(os.getenv('JWT_TRACE_MAX_QUEUED', 1000)))
+        elif os.getenv('JWT_TRACE_FILE'):
+            exporter = FileSpanExporter(os.getenv('JWT_TRACE_FILE'))
+        if not server_timing and exporter is None:
+            return None
+        return cls(exporter, server_timing)
+
+    def before_request(self):
+        if request.blueprint != 'api':
+            return None
+        g.jwt_trace_token = current_trace.set(RequestTrace(request.headers.get('traceparent')))
+        return None
+
+    def after_request(self, response):
+        trace = current_trace.get()
+        if trace is None:
+            return response
+        total = time.perf_counter() - trace.start
+        if self.server_timing:
+            response.headers['Server-Timing'] = trace.server_timing(total)
+            # Sin Timing-Allow-Origin el navegador oculta Server-Timing a los orígenes cruzados
+            response.headers['Timing-Allow-Origin'] = '*'
+        if self.exporter is not None:
+            # La traza se exporta al cerrar la solicitud, después de enviar la respuesta
+            g.jwt_trace_export = (total, response.status_code)
+        return response
+
+    def teardown_request(self, exc):
+        token = g.pop('jwt_trace_token', None)
+        if token is None:
+            return
+        trace = current_trace.get()
+        current_trace.reset(token)
+        if self.exporter is None:
+            return
+        total, status = g.pop('jwt_trace_export', (time.perf_counter() - trace.start, 500))
+        rule = request.url_rule.rule if request.url_rule is not None else request.path
+        attributes = {
+            'http.request.method': request.method,
+            'http.route': rule,
+            'url.path': request.path,
+            'http.response.status_code': status,
+        }
+        if exc is not None:
+            attributes['error.type'] = type(exc).__name__
+        try:
+            self.exporter.export(trace.to_otlp(f"{request.method} {rule}", total, attributes,
+                                               error=status >= 500 or exc is not None))
+        except OSError:
+            pass
+
+
+def init_tracing(app, tracer: Optional[RequestTracer] = None) -> None:
+    """
+    Registra los tiempos por fase en la aplicación.
+
+    Debe registrarse antes que los demás hooks (admisión, compresión,
+    perfilado), para que el total incluya su trabajo.
+    """
+    tracer = tracer or RequestTracer.from_env()
+    if tracer is None:
+        return
+    if not issubclass(app.request_class, TimedRequest):
+        # Se combina con la clase de solicitud ya configurada (p. ej. body_reader.LimitedRequest)
+        app.request_class = type('TimedRequest', (TimedRequest, app.request_class), {})
+    app.json = TimedJSONProvider(app)
+    app.config['JWT_TRACER'] = tracer
+    app.before_request(tracer.before_request)
+    app.after_request(tracer.after_request)
+    app.teardown_request(tracer.teardown_request)
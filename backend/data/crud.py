@@ -21,6 +21,7 @@ documento: son los datos a insertar/modifcar o elimnar
 """
 
 from bson.objectid import ObjectId
+from pymongo import ReturnDocument, UpdateOne
 from db import db
 
 
@@ -70,6 +71,56 @@ def obtener_por_id(coleccion, id_documento):
     return documento
 
 
+def obtener_por_filtro(coleccion, filtro, proyeccion=None):
+    """
+    Obtiene los documentos que cumplen un filtro.
+    Convierte ObjectId a string igual que obtener_todos.
+    """
+    documentos = list(db[coleccion].find(filtro, proyeccion))
+    for d in documentos:
+        if "_id" in d and isinstance(d["_id"], ObjectId):
+            d["_id"] = str(d["_id"])
+    return documentos
+
+
+def obtener_paginado(coleccion, filtro, orden, salto=0, limite=0, proyeccion=None):
+    """
+    Obtiene una página de documentos que cumplen un filtro.
+    orden es el campo de ordenamiento ascendente; conviene que esté indexado.
+    """
+    cursor = db[coleccion].find(filtro, proyeccion).sort(orden, 1).skip(salto).limit(limite)
+    return list(cursor)
+
+
+def iterar_por_filtro(coleccion, filtro, proyeccion=None, orden=None, lote=1000):
+    """
+    Itera los documentos que cumplen un filtro sin cargarlos todos en memoria.
+    Convierte ObjectId a string igual que obtener_todos.
+    """
+    cursor = db[coleccion].find(filtro, proyeccion).batch_size(lote)
+    if orden is not None:
+        cursor = cursor.sort(orden, 1)
+    for d in cursor:
+        if "_id" in d and isinstance(d["_id"], ObjectId):
+            d["_id"] = str(d["_id"])
+        yield d
+
+
+def contar(coleccion, filtro):
+    """
+    Cuenta los documentos que cumplen un filtro.
+    """
+    return db[coleccion].count_documents(filtro)
+
+
+def agregar(coleccion, pipeline):
+    """
+    Ejecuta un pipeline de agregación ($group, $bucket, ...) en el servidor.
+    Regresa la lista de documentos resultantes.
+    """
+    return list(db[coleccion].aggregate(pipeline))
+
+
 # ===========================
 # 3. UPDATE (MODIFICAR DATOS)
 # ===========================
@@ -86,6 +137,79 @@ def actualizar_por_id(coleccion, id_documento, nuevos_datos):
     return True
 
 
+def actualizar_y_obtener_anterior(coleccion, id_documento, nuevos_datos):
+    """
+    Actualiza ($set) un documento por ID de forma atómica.
+    Retorna el documento previo a la actualización, o None si no existía.
+    """
+    documento = db[coleccion].find_one_and_update(
+        {"_id": ObjectId(id_documento)},
+        {"$set": nuevos_datos},
+        return_document=ReturnDocument.BEFORE
+    )
+    if documento:
+        documento["_id"] = str(documento["_id"])
+    return documento
+
+
+def actualizar_por_filtro(coleccion, filtro, nuevos_datos, upsert=False):
+    """
+    Actualiza ($set) el documento que cumple el filtro.
+    Con upsert=True se crea si no existe.
+    """
+    db[coleccion].update_one(filtro, {"$set": nuevos_datos}, upsert=upsert)
+    return True
+
+
+def reemplazar_por_filtro(coleccion, filtro, documento):
+    """
+    Reemplaza el documento que cumple el filtro.
+    Si no existe se crea (upsert).
+    """
+    db[coleccion].replace_one(filtro, documento, upsert=True)
+    return True
+
+
+def incrementar(coleccion, filtro, incrementos):
+    """
+    Incrementa campos numéricos ($inc) de un documento.
+    Si el documento no existe se crea (upsert).
+    """
+    db[coleccion].update_one(filtro, {"$inc": incrementos}, upsert=True)
+    return True
+
+
+def incrementar_varios(coleccion, incrementos):
+    """
+    Aplica varios $inc (con upsert) en un único bulk_write.
+    incrementos es una lista de (filtro, incrementos).
+    """
+    if not incrementos:
+        return True
+    db[coleccion].bulk_write(
+        [UpdateOne(filtro, {"$inc": campos}, upsert=True) for filtro, campos in incrementos],
+        ordered=False
+    )
+    return True
+
+
+def crear_indice(coleccion, campo, **opciones):
+    """
+    Crea un índice ascendente sobre un campo si no existe.
+    campo también puede ser una lista de (campo, dirección) para un índice compuesto.
+    opciones se pasan a create_index (por ejemplo expireAfterSeconds para TTL).
+    """
+    return db[coleccion].create_index(campo, **opciones)
+
+
+def observar(coleccion, **opciones):
+    """
+    Abre un change stream sobre una colección (requiere replica set, como Atlas).
+    opciones se pasan a watch (por ejemplo full_document o resume_after).
+    """
+    return db[coleccion].watch(**opciones)
+
+
 # ===========================
 # 4. DELETE (ELIMINAR DATOS)
 # ===========================
@@ -98,6 +222,25 @@ def eliminar_por_id(coleccion, id_documento):
     return True
 
 
+def eliminar_y_obtener(coleccion, id_documento):
+    """
+    Elimina un documento por ID de forma atómica.
+    Retorna el documento eliminado, o None si no existía.
+    """
+    documento = db[coleccion].find_one_and_delete({"_id": ObjectId(id_documento)})
+    if documento:
+        documento["_id"] = str(documento["_id"])
+    return documento
+
+
+def eliminar_por_filtro(coleccion, filtro):
+    """
+    Elimina todos los documentos que cumplen un filtro.
+    """
+    db[coleccion].delete_many(filtro)
+    return True
+
+
 def eliminar_todos(coleccion):
     """
     Elimina todos los documentos de una colección.
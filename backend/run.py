@@ -3,6 +3,20 @@ from flask import Flask
 from flask_cors import CORS
 from dotenv import load_dotenv
 from app.api.routes import api_bp
+from app.api.body_reader import LimitedRequest
+from app.analyzer.limits import ResourceLimits
+from app.analyzer.replay_detector import ReplayDetector
+from app.analyzer.revocation_list import RevocationList
+from app.analyzer.validation_policy import PolicyRegistry
+from app.services.database_service import DatabaseService
+from app.services.change_feed_service import ChangeStreamSource, change_notifier
+from app.services.admission_service import init_admission
+from app.services.compression_service import init_compression
+from app.services.job_service import JobManager
+from app.services.metrics_service import init_metrics
+from app.services.profiling_service import init_profiling
+from app.services.result_cache_service import SharedResultCache
+from app.services.tracing_service import init_tracing
 
 # Cargar variables de entorno desde .env
 load_dotenv()
@@ -15,8 +29,96 @@ def create_app():
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'amarillo-platano')
     app.config['DEBUG'] = os.getenv('DEBUG', 'False').lower() in ('true', '1', 'yes')
     
-    # Configurar CORS para permitir cualquier origen
-    CORS(app)
+    # Límites de recursos (JWT_MAX_TOKEN_LENGTH, JWT_MAX_JSON_DEPTH, MAX_CONTENT_LENGTH, ...)
+    limits = ResourceLimits.from_env()
+    app.config['JWT_LIMITS'] = limits
+    app.config['MAX_CONTENT_LENGTH'] = limits.max_content_length
+    # POST /jobs usa su propio tope (JWT_MAX_JOB_CONTENT_LENGTH)
+    app.request_class = LimitedRequest
+    
+    # Políticas de validación semántica (JWT_POLICIES_FILE) y token de administración.
+    # Las administradas por API se guardan en MongoDB y se comparten entre workers;
+    # con JWT_POLICIES_STORE=memory quedan locales al proceso (un solo worker)
+    policy_store = DatabaseService if os.getenv('JWT_POLICIES_STORE', 'mongo').lower() == 'mongo' else None
+    app.config['JWT_POLICIES'] = PolicyRegistry.from_env(store=policy_store)
+    if policy_store is not None:
+        try:
+            app.config['JWT_POLICIES'].refresh(force=True)
+        except Exception as e:
+            app.logger.warning(f"No se pudieron cargar las políticas de MongoDB (se reintentará): {e}")
+    app.config['JWT_ADMIN_TOKEN'] = os.getenv('JWT_ADMIN_TOKEN')
+    
+    # Lista de revocación en disco (memory-map, se recarga al reemplazar el archivo)
+    revocation_path = os.getenv('JWT_REVOCATION_LIST')
+    if revocation_path:
+        app.config['JWT_REVOCATION_LIST'] = RevocationList(
+            revocation_path,
+            reload_interval=float(os.getenv('JWT_REVOCATION_RELOAD_SECONDS', 5))
+        )
+    
+    # Cache de resultados compartida entre workers (SQLite WAL en JWT_RESULT_CACHE_PATH)
+    result_cache = SharedResultCache.from_env()
+    if result_cache is not None:
+        app.config['JWT_RESULT_CACHE'] = result_cache
+    
+    # Índices de los claims usados por /jwts/analytics (create_index no hace nada si ya existen).
+    # Los documentos previos a la analítica se completan con tools/jwts_maintenance.py backfill.
+    if os.getenv('JWT_ENSURE_INDEXES', 'True').lower() in ('true', '1', 'yes'):
+        try:
+            DatabaseService.ensure_indexes()
+        except Exception as e:
+            app.logger.warning("No se pudieron crear los índices de JWTS: %s", e)
+    
+    # Detección de replay por 'jti': inserción única en MongoDB (JTI_SEEN, compartida entre
+    # workers) o, con JWT_REPLAY_STORE=memory, filtros de Bloom por worker sin MongoDB
+    if os.getenv('JWT_REPLAY_DETECTION', 'False').lower() in ('true', '1', 'yes'):
+        replay_store = os.getenv('JWT_REPLAY_STORE', 'mongo').lower() == 'mongo'
+        if replay_store:
+            DatabaseService.ensure_jti_index()
+        app.config['JWT_REPLAY_DETECTOR'] = ReplayDetector(
+            partition_seconds=int(os.getenv('JWT_REPLAY_PARTITION_SECONDS', 300)),
+            max_window_seconds=int(os.getenv('JWT_REPLAY_MAX_WINDOW_SECONDS', 86400)),
+            expected_per_partition=int(os.getenv('JWT_REPLAY_EXPECTED_PER_PARTITION', 100000)),
+            false_positive_rate=float(os.getenv('JWT_REPLAY_FALSE_POSITIVE_RATE', 1e-4)),
+            exact_check=DatabaseService.register_jti if replay_store else None
+        )
+    
+    # Eventos de cambio de JWTS (SSE): notificador en proceso o change stream de MongoDB
+    change_notifier.max_subscribers = int(os.getenv('JWT_CHANGE_FEED_MAX_SUBSCRIBERS', 100))
+    app.config['JWT_CHANGE_FEED_HEARTBEAT'] = float(os.getenv('JWT_CHANGE_FEED_HEARTBEAT', 15))
+    if os.getenv('JWT_CHANGE_FEED', 'local').lower() == 'changestream':
+        DatabaseService.publish_changes = False
+        app.config['JWT_CHANGE_STREAM'] = ChangeStreamSource(DatabaseService.COLLECTION_NAME, change_notifier)
+        app.config['JWT_CHANGE_STREAM'].start()
+    
+    # Trabajos por lotes (JWT_JOB_WORKERS, JWT_JOB_MAX_QUEUED, JWT_JOB_RESULT_STORE, ...)
+    app.config['JWT_JOBS'] = JobManager.from_env()
+    
+    # Tiempos por fase en la cabecera Server-Timing y, con JWT_TRACE_FILE o
+    # JWT_TRACE_ENDPOINT, spans OTLP; primero, para que el total incluya los demás hooks
+    init_tracing(app)
+    
+    # Métricas en formato Prometheus (GET /metrics); con JWT_METRICS_DIR se suman las de todos los
+    # workers y con JWT_METRICS_TOKEN se exige el token. JWT_METRICS_ENABLED=false no registra el endpoint
+    if os.getenv('JWT_METRICS_ENABLED', 'True').lower() in ('true', '1', 'yes'):
+        init_metrics(app, gauges=result_cache.gauges if result_cache is not None else None)
+    
+    # Control de admisión: rate limiting por cliente/endpoint y tope de concurrencia (opcional)
+    if os.getenv('JWT_ADMISSION_ENABLED', 'False').lower() in ('true', '1', 'yes'):
+        init_admission(app)
+    
+    # Compresión negociada de respuestas (gzip, y br/zstd si están instalados)
+    if os.getenv('JWT_COMPRESSION_ENABLED', 'True').lower() in ('true', '1', 'yes'):
+        init_compression(app)
+    
+    # Perfilado bajo demanda (JWT_PROFILING_ENABLED) y muestreo continuo
+    # (JWT_PROFILING_CONTINUOUS_HZ); sin ellos no se registra ningún hook
+    init_profiling(app)
+    
+    # Configurar CORS para permitir cualquier origen (ETag visible para los GET
+    # condicionales y Location para los trabajos creados). Los preflight se
+    # cachean en el navegador para no duplicar cada POST con un OPTIONS.
+    CORS(app, expose_headers=['ETag', 'Location', 'X-JWT-Profile-Id', 'Server-Timing'], max_age=int(os.getenv('JWT_CORS_MAX_AGE', 600)))
     
     # Register blueprints
     app.register_blueprint(api_bp, url_prefix='/api')
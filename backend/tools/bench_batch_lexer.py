@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+BENCHMARK DEL ANALIZADOR LÉXICO POR LOTES (PROYECTO JWT)
+--------------------------------------------------------
+Mide el throughput de BatchJWTLexer frente a JWTLexer.analyze y comprueba
+que ambos producen resultados idénticos sobre una muestra.
+
+Uso:
+    python tools/bench_batch_lexer.py [--tokens 1000000] [--sample 20000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from app.analyzer.batch_lexer import BatchJWTLexer, pack_tokens
+from app.analyzer.encoder import encode_jwt
+from app.analyzer.lexical_analyzer import JWTLexer
+
+
+def generate_tokens(count, seed=42):
+    """Genera tokens reales firmados mezclados con variantes inválidas."""
+    rnd = random.Random(seed)
+    base = [
+        encode_jwt({"alg": alg, "typ": "JWT"}, {"sub": f"user-{i}", "role": "admin", "n": i}, f"secret-{i}")
+        for i, alg in enumerate(["HS256", "HS384"] * 8)
+    ]
+    corruptions = [
+        lambda t: t,
+        lambda t: t,
+        lambda t: t,
+        lambda t: t.replace('.', '..', 1),
+        lambda t: t + '.extra',
+        lambda t: t.rsplit('.', 1)[0],
+        lambda t: t[:10] + '+' + t[11:],
+    ]
+    return [rnd.choice(corruptions)(rnd.choice(base)) for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tokens', type=int, default=1_000_000)
+    parser.add_argument('--sample', type=int, default=20_000)
+    args = parser.parse_args()
+
+    tokens = generate_tokens(args.tokens)
+    lexer = JWTLexer()
+    batch_lexer = BatchJWTLexer()
+
+    # Equivalencia sobre una muestra
+    sample = tokens[:args.sample]
+    sample_result = batch_lexer.analyze_batch(sample)
+    mismatches = sum(sample_result.result(i) != lexer.analyze(t) for i, t in enumerate(sample))
+
+    start = time.perf_counter()
+    for token in sample:
+        lexer.analyze(token)
+    scalar_rate = len(sample) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    buffer, offsets = pack_tokens(tokens)
+    pack_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = batch_lexer.analyze_packed(buffer, offsets, tokens)
+    analyze_seconds = time.perf_counter() - start
+    batch_rate = len(tokens) / (pack_seconds + analyze_seconds)
+
+    print(f"tokens:                {len(tokens):,} ({buffer.nbytes / 1e6:.1f} MB)")
+    print(f"diferencias (muestra): {mismatches}")
+    print(f"válidos:               {result.valid_count:,}")
+    print(f"JWTLexer.analyze:      {scalar_rate:,.0f} tokens/s")
+    print(f"BatchJWTLexer:         {batch_rate:,.0f} tokens/s "
+          f"(empaquetado {pack_seconds:.2f} s, análisis {analyze_seconds:.2f} s)")
+    print(f"aceleración:           {batch_rate / scalar_rate:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
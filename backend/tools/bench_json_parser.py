@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+BENCHMARK DEL PARSER JSON (PROYECTO JWT)
+----------------------------------------
+Compara el parser recursivo (JSONParser) con el iterativo de pila explícita
+(IterativeJSONParser) sobre payloads anchos y profundos.
+
+Uso:
+    python tools/bench_json_parser.py [--repeat N]
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from app.analyzer.syntactic_analyzer import JSONParser, IterativeJSONParser
+
+
+def wide_payload(n):
+    return json.dumps({f"claim_{i}": (i if i % 3 else f"valor-{i}") for i in range(n)})
+
+
+def deep_payload(depth):
+    return '{"a":' * depth + '1' + '}' * depth
+
+
+def mixed_payload(n):
+    return json.dumps({
+        "iss": "https://api.mi-proyecto.com",
+        "aud": [f"https://svc{i}.mi-proyecto.com" for i in range(n)],
+        "permissions": [{"scope": f"read:{i}", "tags": [i, i + 1]} for i in range(n)],
+    })
+
+
+def bench(parser_cls, text, repeat):
+    try:
+        expected = json.loads(text)
+    except RecursionError:
+        # json.loads también tiene límite de anidamiento: no hay referencia
+        expected = None
+    try:
+        result = parser_cls(text).parse()
+        if expected is not None and result != expected:
+            return 'DIFIERE'
+        seconds = min(timeit.repeat(lambda: parser_cls(text).parse(), number=1, repeat=repeat))
+        return f"{seconds * 1e3:9.3f} ms"
+    except RecursionError:
+        return 'RecursionError'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    cases = {
+        "wide_100": wide_payload(100),
+        "wide_10000": wide_payload(10000),
+        "mixed_500": mixed_payload(500),
+        "deep_100": deep_payload(100),
+        "deep_900": deep_payload(900),
+        "deep_5000": deep_payload(5000),
+    }
+
+    print(f"{'caso':<12}{'bytes':>10}  {'recursivo':>16}  {'iterativo':>16}")
+    for name, text in cases.items():
+        recursive = bench(JSONParser, text, args.repeat)
+        iterative = bench(IterativeJSONParser, text, args.repeat)
+        print(f"{name:<12}{len(text):>10}  {recursive:>16}  {iterative:>16}")
+
+
+if __name__ == '__main__':
+    main()
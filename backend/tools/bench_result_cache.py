@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+BENCHMARK DE LA CACHE DE RESULTADOS COMPARTIDA (PROYECTO JWT)
+-------------------------------------------------------------
+Compara, por token y para distintos tamaños de payload, el costo de
+calcular cada análisis con el de un acierto en SharedResultCache (consulta
+SQLite + decodificación JSON):
+
+- léxico: JWTLexer.analyze frente a un acierto con el resultado léxico.
+- firma: verify_jwt_signature (HMAC) frente a un acierto que guarda solo el
+  veredicto, más la decodificación del header y el payload que la respuesta
+  necesita.
+
+Uso:
+    python tools/bench_result_cache.py [--iterations 20000] [--sizes 50,500,2000]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from app.analyzer.crypto_verifier import verify_jwt_signature
+from app.analyzer.decoder_json import decode_segments
+from app.analyzer.encoder import encode_jwt
+from app.analyzer.lexical_analyzer import JWTLexer
+from app.analyzer.limits import DEFAULT_LIMITS
+from app.services.result_cache_service import SharedResultCache
+
+
+def per_call_us(func, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=20_000)
+    parser.add_argument('--sizes', default='50,500,2000', help='Tamaños del claim "sub" (caracteres)')
+    args = parser.parse_args()
+
+    lexer = JWTLexer()
+    cache = SharedResultCache(os.path.join(tempfile.mkdtemp(), 'results.db'))
+    fingerprint = DEFAULT_LIMITS.fingerprint()
+    secret_digest = hashlib.sha256(b'clave').hexdigest()
+
+    print(f"{'token':>8} {'léxico':>10} {'acierto':>10} {'firma':>10} {'acierto':>10}   (µs por token)")
+    for size in (int(s) for s in args.sizes.split(',')):
+        token = encode_jwt({'alg': 'HS256', 'typ': 'JWT'},
+                           {'sub': 'x' * size, 'iss': 'https://a.com', 'exp': int(time.time()) + 3600}, 'clave')
+        lexical_result = lexer.analyze(token, DEFAULT_LIMITS)
+        verdict = {'valid': True, 'algorithm': 'HS256', 'error': None, 'error_type': None}
+
+        def lexical_hit():
+            cache.get_or_compute('lexical', (token, fingerprint), lambda: lexical_result)
+
+        def signature_hit():
+            cache.get_or_compute('signature', (token, secret_digest, fingerprint), lambda: verdict)
+            header, payload = decode_segments(lexer.lex(token))
+            json.loads(header)
+            json.loads(payload)
+
+        lexical_hit()
+        signature_hit()
+        print(f"{len(token):>8} "
+              f"{per_call_us(lambda: lexer.analyze(token, DEFAULT_LIMITS), args.iterations):>10.1f} "
+              f"{per_call_us(lexical_hit, args.iterations):>10.1f} "
+              f"{per_call_us(lambda: verify_jwt_signature(token, 'clave', DEFAULT_LIMITS), args.iterations):>10.1f} "
+              f"{per_call_us(signature_hit, args.iterations):>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+GENERADOR DE LISTA DE REVOCACIÓN (PROYECTO JWT)
+-----------------------------------------------
+Construye el archivo binario que consume RevocationList a partir de un
+archivo de texto con una entrada por línea:
+
+    token:<jwt completo>
+    jti:<identificador>
+
+El archivo de salida se reemplaza de forma atómica, por lo que puede
+regenerarse con el servidor en ejecución.
+
+Uso:
+    python tools/build_revocation_list.py entradas.txt revocados.bin
+"""
+
+import argparse
+import os
+import sys
+
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from app.analyzer.revocation_list import write_revocation_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help='Archivo de texto con líneas token:<jwt> o jti:<id>')
+    parser.add_argument('output', help='Archivo binario de revocación a generar')
+    args = parser.parse_args()
+
+    tokens, jtis = [], []
+    with open(args.input, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            kind, _, value = line.partition(':')
+            if kind == 'token':
+                tokens.append(value)
+            elif kind == 'jti':
+                jtis.append(value)
+            else:
+                sys.exit(f"Línea {line_number}: se esperaba 'token:' o 'jti:'")
+
+    count = write_revocation_file(args.output, tokens, jtis)
+    print(f"{count} entradas escritas en {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+EXPORTACIÓN COLUMNAR DE RESULTADOS (PROYECTO JWT)
+-------------------------------------------------
+Analiza un archivo de tokens (uno por línea) con el pipeline completo y
+guarda los resultados en columnas: arreglo estructurado de NumPy (.npy,
+cargable con memory-map mediante columnar_export_service.load_npy) y/o
+Parquet (requiere pyarrow).
+
+Uso:
+    python tools/export_columnar.py tokens.txt --npy resultados/
+    python tools/export_columnar.py tokens.txt --parquet resultados.parquet --secret clave --depth semantic
+"""
+
+import argparse
+import os
+import sys
+import time
+from itertools import islice
+
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from app.analyzer.limits import ResourceLimits
+from app.analyzer.pipeline import PHASES, DEFAULT_DEPTH, analyze_tokens
+from app.services.columnar_export_service import ColumnarResultBuilder
+
+
+CHUNK_SIZE = 10_000
+
+
+def iter_tokens(path):
+    with open(path, encoding='utf-8', errors='replace') as f:
+        for line in f:
+            token = line.strip()
+            if token:
+                yield token
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('tokens', help='Archivo con un token por línea')
+    parser.add_argument('--npy', metavar='DIR', help='Directorio de salida para results.npy y dictionaries.json')
+    parser.add_argument('--parquet', metavar='ARCHIVO', help='Archivo Parquet de salida (requiere pyarrow)')
+    parser.add_argument('--secret', help='Clave para la fase criptográfica (sin ella se omite)')
+    parser.add_argument('--depth', choices=PHASES, default=DEFAULT_DEPTH, help='Última fase a ejecutar')
+    args = parser.parse_args()
+    if not args.npy and not args.parquet:
+        parser.error('se requiere --npy y/o --parquet')
+
+    limits = ResourceLimits.from_env()
+    builder = ColumnarResultBuilder()
+    start = time.perf_counter()
+    tokens = iter_tokens(args.tokens)
+    while True:
+        chunk = list(islice(tokens, CHUNK_SIZE))
+        if not chunk:
+            break
+        for token, result in zip(chunk, analyze_tokens(chunk, args.secret, limits, depth=args.depth)):
+            lexed = result['valid'] or result['phase'] != 'lexical'
+            builder.append(result['valid'], result['error_type'], result['header'], result['payload'],
+                           token.split('.') if lexed else None)
+
+    if args.npy:
+        builder.save_npy(args.npy)
+    if args.parquet:
+        builder.save_parquet(args.parquet)
+    print(f"{len(builder)} tokens exportados en {time.perf_counter() - start:.2f} s "
+          f"({builder.nbytes() / 1024:.0f} KiB en columnas)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""
+CORPUS DIFERENCIAL DEL PARSER JSON (PROYECTO JWT)
+-------------------------------------------------
+Genera documentos JSON con una semilla fija (válidos y mutados) y los
+procesa con el parser manual (parse_json_manual) y con json.loads,
+registrando:
+
+- mismatch: ambos aceptan el documento pero producen valores distintos.
+- acepta_invalido: el parser manual acepta un documento que json.loads rechaza.
+- fallback: el parser manual rechaza un documento válido; en producción
+  parse_segment lo vuelve a parsear con json.loads (doble parseo).
+- tiempo relativo del parser manual (incluido el fallback) frente a
+  json.loads sobre los documentos válidos.
+
+Termina con código 1 si hay mismatches, aceptaciones inválidas, una tasa
+de fallback mayor a --max-fallback-rate o una razón de tiempo mayor a
+--max-ratio.
+
+Uso:
+    python tools/json_differential.py [--seed N] [--documents N] [--max-ratio R] [--report salida.json]
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import timeit
+
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from app.analyzer.syntactic_analyzer import parse_json_manual
+
+
+# Casos límite conocidos de la gramática JSON (válidos e inválidos)
+EDGE_CASES = [
+    '0', '-0', '1e5', '1E+2', '-1.5e-3', '01', '1.', '.5', '-', '+1', '1e', '0x10',
+    '"\\b\\f"', '"\\ud83d\\ude00"', '"\\u00e9"', '"\\u00zz"', '"\\u+0ab"', '"\\x41"',
+    '"\x01"', '"tab\there"', '"abc', '"\\"', 'tru', 'nul', 'true false', '[1,]', '{"a":1,}',
+    '{"a" 1}', '{1:2}', '[]', '{}', ' \n[ ]\t', '[[[]]]', '{"a":{"b":[null,true,false]}}',
+    '"\\/"', '"é中"', '"\U0001F600"', 'NaN', 'Infinity', '', '   ',
+]
+
+STRING_ALPHABET = (
+    'abcxyzABC0123 _-.:/' + '"\\' + '\b\f\n\r\t\x01\x1f' + 'éñü' + '中文' + '\U0001F600\U0001F511'
+)
+
+
+def random_string(rng, max_length=12):
+    return ''.join(rng.choice(STRING_ALPHABET) for _ in range(rng.randint(0, max_length)))
+
+
+def random_number(rng):
+    kind = rng.random()
+    if kind < 0.4:
+        return rng.randint(-1000, 1000)
+    if kind < 0.6:
+        return rng.randint(-2 ** 70, 2 ** 70)
+    if kind < 0.8:
+        return round(rng.uniform(-1e6, 1e6), rng.randint(0, 6))
+    # Floats muy grandes o muy pequeños: json.dumps los escribe con exponente
+    return rng.uniform(-1, 1) * 10 ** rng.randint(-30, 30)
+
+
+def random_value(rng, depth, max_depth):
+    roll = rng.random()
+    if depth < max_depth and roll < 0.25:
+        return {random_string(rng, 8): random_value(rng, depth + 1, max_depth)
+                for _ in range(rng.randint(0, 6))}
+    if depth < max_depth and roll < 0.4:
+        return [random_value(rng, depth + 1, max_depth) for _ in range(rng.randint(0, 6))]
+    if roll < 0.65:
+        return random_string(rng)
+    if roll < 0.9:
+        return random_number(rng)
+    return rng.choice([True, False, None])
+
+
+def random_claims(rng):
+    """Payload con forma de JWT: claims registrados más claims arbitrarios."""
+    payload = {
+        'iss': random_string(rng), 'sub': random_string(rng),
+        'iat': rng.randint(0, 2 ** 31), 'exp': rng.randint(0, 2 ** 31),
+        'aud': [random_string(rng) for _ in range(rng.randint(1, 3))],
+    }
+    for _ in range(rng.randint(0, 8)):
+        payload[random_string(rng, 8)] = random_value(rng, 1, 4)
+    return payload
+
+
+def serialize(rng, value):
+    """Serializa variando escape de no-ASCII, separadores e indentación."""
+    return json.dumps(
+        value,
+        ensure_ascii=rng.random() < 0.5,
+        indent=rng.choice([None, None, 0, 2, '\t']),
+        separators=rng.choice([None, (',', ':'), (' , ', ' : ')]),
+    )
+
+
+def mutate(rng, text):
+    """Aplica una mutación de un carácter (en general produce JSON inválido)."""
+    if not text:
+        return rng.choice('{["0')
+    i = rng.randrange(len(text))
+    op = rng.random()
+    if op < 0.25:
+        return text[:i]
+    if op < 0.5:
+        return text[:i] + text[i + 1:]
+    if op < 0.75:
+        return text[:i] + rng.choice('{}[]:,"\\ 0-.eE+tnu\x00') + text[i:]
+    return text[:i] + rng.choice('{}[]:,"\\0') + text[i + 1:]
+
+
+def generate_corpus(seed, documents, mutation_rate):
+    rng = random.Random(seed)
+    corpus = list(EDGE_CASES)
+    for _ in range(documents):
+        value = random_claims(rng) if rng.random() < 0.5 else random_value(rng, 0, 6)
+        text = serialize(rng, value)
+        if rng.random() < mutation_rate:
+            text = mutate(rng, text)
+        corpus.append(text)
+    return corpus
+
+
+def same_value(a, b):
+    """Igualdad estricta: distingue int/float/bool y compara NaN consigo mismo."""
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, dict):
+        return list(a) == list(b) and all(same_value(a[k], b[k]) for k in a)
+    if isinstance(a, list):
+        return len(a) == len(b) and all(same_value(x, y) for x, y in zip(a, b))
+    if isinstance(a, float) and math.isnan(a):
+        return math.isnan(b)
+    return a == b
+
+
+def _reject_constant(name):
+    raise ValueError(f"Constante no estándar: {name}")
+
+
+def strict_loads(text):
+    """json.loads sin las extensiones NaN/Infinity, que no son JSON (RFC 8259)."""
+    return json.loads(text, parse_constant=_reject_constant)
+
+
+def run_parser(parse, text):
+    try:
+        return True, parse(text)
+    except RecursionError:
+        return False, 'RecursionError'
+    except Exception as e:
+        return False, f"{type(e).__name__}: {e}"
+
+
+def compare(corpus):
+    report = {'documents': len(corpus), 'valid': 0, 'invalid': 0, 'equal': 0, 'rejected_by_both': 0,
+              'mismatch': [], 'accepts_invalid': [], 'fallback': []}
+    valid_docs = []
+    for text in corpus:
+        ok_ref, ref = run_parser(strict_loads, text)
+        ok_manual, manual = run_parser(parse_json_manual, text)
+        report['valid' if ok_ref else 'invalid'] += 1
+        if ok_ref:
+            valid_docs.append(text)
+        if ok_ref and ok_manual:
+            if same_value(ref, manual):
+                report['equal'] += 1
+            else:
+                report['mismatch'].append({'input': text, 'json': repr(ref), 'manual': repr(manual)})
+        elif ok_manual:
+            report['accepts_invalid'].append({'input': text, 'json': ref, 'manual': repr(manual)})
+        elif ok_ref:
+            report['fallback'].append({'input': text, 'manual': manual})
+        else:
+            report['rejected_by_both'] += 1
+    report['fallback_rate'] = len(report['fallback']) / report['valid'] if report['valid'] else 0.0
+    return report, valid_docs
+
+
+def time_corpus(documents, repeat):
+    """
+    Tiempo total (mejor de `repeat`) sobre los documentos válidos del camino
+    de producción (parser manual con fallback a json.loads, como en
+    parse_segment) y de json.loads solo.
+    """
+    def with_fallback():
+        for text in documents:
+            try:
+                parse_json_manual(text)
+            except Exception:
+                json.loads(text)
+
+    def reference():
+        for text in documents:
+            json.loads(text)
+
+    manual_seconds = min(timeit.repeat(with_fallback, number=1, repeat=repeat))
+    reference_seconds = min(timeit.repeat(reference, number=1, repeat=repeat))
+    return manual_seconds, reference_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--documents', type=int, default=5000)
+    parser.add_argument('--mutation-rate', type=float, default=0.3)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--max-ratio', type=float, default=25.0,
+                        help='Máximo tiempo del parser manual (con fallback) / json.loads (default: 25)')
+    parser.add_argument('--max-fallback-rate', type=float, default=0.0,
+                        help='Máxima fracción de documentos válidos que caen al fallback (default: 0)')
+    parser.add_argument('--report', help='Escribe el reporte completo en JSON')
+    parser.add_argument('--show', type=int, default=5, help='Ejemplos a mostrar por categoría')
+    args = parser.parse_args()
+
+    corpus = generate_corpus(args.seed, args.documents, args.mutation_rate)
+    report, valid_docs = compare(corpus)
+    manual_seconds, reference_seconds = time_corpus(valid_docs, args.repeat)
+    ratio = manual_seconds / reference_seconds if reference_seconds else float('inf')
+    report.update({
+        'seed': args.seed,
+        'manual_seconds': manual_seconds,
+        'json_seconds': reference_seconds,
+        'ratio': ratio,
+    })
+
+    print(f"semilla {args.seed}: {report['documents']} documentos "
+          f"({report['valid']} válidos, {report['invalid']} inválidos)")
+    print(f"  iguales            : {report['equal']}")
+    print(f"  rechazados por ambos: {report['rejected_by_both']}")
+    print(f"  mismatch           : {len(report['mismatch'])}")
+    print(f"  acepta inválido    : {len(report['accepts_invalid'])}")
+    print(f"  fallback           : {len(report['fallback'])} ({report['fallback_rate']:.2%} de los válidos)")
+    print(f"  tiempo manual {manual_seconds * 1e3:.1f} ms / json.loads {reference_seconds * 1e3:.1f} ms "
+          f"= {ratio:.1f}x (máximo {args.max_ratio:.1f}x)")
+    for category in ('mismatch', 'accepts_invalid', 'fallback'):
+        for case in report[category][:args.show]:
+            print(f"  [{category}] {case!r}"[:200])
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    failures = []
+    if report['mismatch']:
+        failures.append('mismatches')
+    if report['accepts_invalid']:
+        failures.append('aceptaciones inválidas')
+    if report['fallback_rate'] > args.max_fallback_rate:
+        failures.append('tasa de fallback')
+    if ratio > args.max_ratio:
+        failures.append('tiempo relativo')
+    if failures:
+        print("FALLA: " + ", ".join(failures))
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == '__main__':
+    main()
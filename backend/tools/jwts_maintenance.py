@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+MANTENIMIENTO DE LA COLECCIÓN JWTS (PROYECTO JWT)
+-------------------------------------------------
+Tareas de mantenimiento de la analítica de JWTS (/api/jwts/analytics):
+
+- indexes: crea los índices sobre los claims (claims.alg, claims.iss, claims.exp).
+- backfill: decodifica y guarda los claims de los documentos que no los
+  tienen (los creados antes de la analítica) y reconcilia los contadores.
+- rebuild-stats: reconcilia los contadores de JWTS_STATS con la colección.
+
+Se puede ejecutar con la aplicación en marcha: la reconciliación aplica la
+diferencia con $inc y no pierde las escrituras concurrentes.
+
+Uso:
+    python tools/jwts_maintenance.py indexes
+    python tools/jwts_maintenance.py backfill
+    python tools/jwts_maintenance.py rebuild-stats
+"""
+
+import argparse
+import os
+import sys
+import time
+
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from app.services.database_service import DatabaseService
+
+
+def indexes(args):
+    DatabaseService.ensure_indexes()
+    print(f"Índices creados: {', '.join(DatabaseService.INDEXED_FIELDS)}")
+
+
+def backfill(args):
+    start = time.perf_counter()
+    DatabaseService.ensure_indexes()
+    count = DatabaseService.backfill_claims()
+    print(f"{count} documentos completados y contadores reconciliados en {time.perf_counter() - start:.2f} s")
+
+
+def rebuild_stats(args):
+    start = time.perf_counter()
+    converged = DatabaseService.rebuild_stats(max_attempts=args.attempts)
+    elapsed = time.perf_counter() - start
+    if converged:
+        print(f"Contadores reconciliados en {elapsed:.2f} s")
+    else:
+        print(f"La colección cambió durante los {args.attempts} intentos; vuelva a ejecutar con menos escrituras "
+              f"({elapsed:.2f} s)")
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    p = commands.add_parser('indexes', help='Crea los índices sobre los claims')
+    p.set_defaults(func=indexes)
+
+    p = commands.add_parser('backfill', help='Completa los claims de los documentos previos y reconcilia contadores')
+    p.set_defaults(func=backfill)
+
+    p = commands.add_parser('rebuild-stats', help='Reconcilia los contadores de JWTS_STATS')
+    p.add_argument('--attempts', type=int, default=5, help='Intentos si la colección cambia durante el cálculo')
+    p.set_defaults(func=rebuild_stats)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+SNAPSHOT LOCAL DE LA COLECCIÓN JWTS (PROYECTO JWT)
+--------------------------------------------------
+Exporta la colección JWTS de MongoDB a un snapshot local compacto, lo
+actualiza de forma incremental y lo usa para precalentar la cache de
+resultados compartida (JWT_RESULT_CACHE_PATH).
+
+Uso:
+    python tools/jwts_snapshot.py export jwts.snap [--encoding msgpack] [--exclude CAMPO] [--include-secrets]
+    python tools/jwts_snapshot.py refresh jwts.snap
+    python tools/jwts_snapshot.py info jwts.snap
+    python tools/jwts_snapshot.py warm jwts.snap --cache /var/cache/jwt/results.db
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from app.analyzer.lexical_analyzer import JWTLexer
+from app.analyzer.limits import ResourceLimits
+from app.services.result_cache_service import SharedResultCache, cache_key
+from app.services.snapshot_service import DEFAULT_EXCLUDE, JwtsSnapshot, export_snapshot, refresh_snapshot
+
+
+def export(args):
+    start = time.perf_counter()
+    exclude = [field for field in args.exclude or DEFAULT_EXCLUDE
+               if not (args.include_secrets and field in DEFAULT_EXCLUDE)]
+    count = export_snapshot(args.snapshot, args.encoding, exclude)
+    print(f"{count} documentos exportados a {args.snapshot} en {time.perf_counter() - start:.2f} s")
+
+
+def refresh(args):
+    start = time.perf_counter()
+    counts = refresh_snapshot(args.snapshot)
+    print(f"{counts['added']} agregados, {counts['removed']} eliminados, {counts['total']} en total "
+          f"({time.perf_counter() - start:.2f} s)")
+
+
+def info(args):
+    with JwtsSnapshot(args.snapshot) as snapshot:
+        print(json.dumps({
+            'documents': len(snapshot),
+            'encoding': snapshot.encoding,
+            'size_bytes': os.path.getsize(args.snapshot),
+            **snapshot.info,
+        }, indent=2, ensure_ascii=False))
+
+
+def warm(args):
+    """Guarda en la cache compartida el análisis léxico de cada token del snapshot."""
+    limits = ResourceLimits.from_env()
+    fingerprint = limits.fingerprint()
+    lexer = JWTLexer()
+    cache = SharedResultCache(args.cache)
+    start = time.perf_counter()
+    with JwtsSnapshot(args.snapshot) as snapshot:
+        for token in snapshot.iter_tokens():
+            cache.put(cache_key('lexical', (token, fingerprint)), lexer.analyze(token, limits))
+        count = len(snapshot)
+    print(f"{count} resultados léxicos precalentados en {time.perf_counter() - start:.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    p = commands.add_parser('export', help='Exporta la colección completa')
+    p.add_argument('snapshot')
+    p.add_argument('--encoding', choices=('json', 'msgpack'), default='json',
+                   help='Codificación de los metadatos (msgpack requiere el paquete msgpack)')
+    p.add_argument('--exclude', action='append', metavar='CAMPO',
+                   help='Campo a omitir del snapshot (repetible; por defecto secreto)')
+    p.add_argument('--include-secrets', action='store_true',
+                   help='Exporta también el campo secreto (las claves de verificación)')
+    p.set_defaults(func=export)
+
+    p = commands.add_parser('refresh', help='Agrega los documentos nuevos y quita los eliminados')
+    p.add_argument('snapshot')
+    p.set_defaults(func=refresh)
+
+    p = commands.add_parser('info', help='Muestra la información del snapshot')
+    p.add_argument('snapshot')
+    p.set_defaults(func=info)
+
+    p = commands.add_parser('warm', help='Precalienta la cache de resultados compartida')
+    p.add_argument('snapshot')
+    p.add_argument('--cache', default=os.getenv('JWT_RESULT_CACHE_PATH'),
+                   help='Archivo de la cache (por defecto JWT_RESULT_CACHE_PATH)')
+    p.set_defaults(func=warm)
+
+    args = parser.parse_args()
+    if args.command == 'warm' and not args.cache:
+        parser.error('warm requiere --cache o JWT_RESULT_CACHE_PATH')
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
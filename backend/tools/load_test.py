@@ -0,0 +1,350 @@
+# -*- coding: utf-8 -*-
+"""
+PRUEBA DE CARGA DE LA API (PROYECTO JWT)
+----------------------------------------
+Levanta la aplicación con create_app() en un servidor HTTP local (o apunta
+a uno externo con --url) y la somete a una mezcla configurable de endpoints
+a una tasa de llegada fija (carga de lazo abierto). Los tokens y cuerpos de
+cada solicitud se generan antes de empezar, de modo que el generador no
+compite por CPU con la codificación.
+
+La latencia se mide desde el instante programado de la solicitud, no desde
+que un worker la toma: si el servidor se satura, la espera en cola cuenta
+como latencia (sin "coordinated omission").
+
+El reporte JSON incluye por endpoint: solicitudes, throughput, tasa de
+error, códigos de estado y latencias p50/p95/p99, más el commit de git,
+para comparar modos de servidor y versiones.
+
+Base de datos: por defecto usa mongomock (pip install mongomock) como
+sustituto local de MongoDB; con --mongo-uri usa un MongoDB real (por
+ejemplo mongodb://localhost:27017).
+
+Uso:
+    python tools/load_test.py --rate 200 --duration 30 --report carga.json
+    python tools/load_test.py --mix lexical=5,crypto=1 --rate 500 --no-admission
+    python tools/load_test.py --url http://localhost:8000 --rate 1000
+"""
+
+import argparse
+import http.client
+import json
+import logging
+import os
+import queue
+import random
+import subprocess
+import sys
+import threading
+import time
+import types
+from urllib.parse import urlsplit
+
+import numpy as np
+
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+
+SECRET = 'secreto-de-carga'
+
+ENDPOINTS = ('lexical', 'decoder', 'syntax', 'semantic', 'encoder', 'crypto', 'jwts')
+
+DEFAULT_MIX = 'lexical=4,decoder=2,syntax=2,semantic=2,encoder=1,crypto=2,jwts=1'
+
+
+def install_database(mongo_uri, db_name):
+    """Registra el módulo `db` que importa data/crud.py antes de cargar la app."""
+    if mongo_uri:
+        from pymongo import MongoClient
+        client = MongoClient(mongo_uri)
+    else:
+        try:
+            import mongomock
+        except ImportError:
+            sys.exit("Se requiere mongomock (pip install mongomock) o --mongo-uri.")
+        client = mongomock.MongoClient()
+    module = types.ModuleType('db')
+    module.client = client
+    module.db = client[db_name]
+    sys.modules['db'] = module
+
+
+def generate_tokens(count, seed):
+    """Genera `count` tokens HS256 firmados con claims variados."""
+    from app.analyzer.encoder import encode_jwt
+
+    rng = random.Random(seed)
+    now = int(time.time())
+    tokens = []
+    for i in range(count):
+        header = {'alg': 'HS256', 'typ': 'JWT'}
+        payload = {
+            'iss': f'https://emisor{rng.randint(1, 5)}.ejemplo.com',
+            'sub': f'usuario-{i}',
+            'aud': 'api-carga',
+            'iat': now,
+            'exp': now + 3600 + rng.randint(0, 86400),
+            'permissions': [f'scope:{j}' for j in range(rng.randint(0, 8))],
+        }
+        tokens.append((header, payload, encode_jwt(header, payload, SECRET)))
+    return tokens
+
+
+def build_requests(tokens):
+    """
+    Precalcula (método, ruta, cuerpo, cabeceras) por endpoint y token.
+
+    Los cuerpos de decoder/syntax/semantic se derivan del análisis de cada
+    token, igual que el flujo que sigue el frontend.
+    """
+    from app.analyzer.decoder_json import get_decoded_strings
+    from app.analyzer.lexical_analyzer import JWTLexer
+
+    lexer = JWTLexer()
+    json_headers = {'Content-Type': 'application/json'}
+    requests = {name: [] for name in ENDPOINTS}
+    for header, payload, token in tokens:
+        lex = lexer.analyze(token)
+        decoded = get_decoded_strings(lex)
+        requests['lexical'].append(('POST', '/api/analyze/lexical', token.encode(),
+                                    {'Content-Type': 'application/jwt'}))
+        requests['decoder'].append(('POST', '/api/analyze/decoder', json.dumps(lex).encode(), json_headers))
+        requests['syntax'].append(('POST', '/api/analyze/syntax',
+                                   json.dumps({'result': decoded}).encode(), json_headers))
+        requests['semantic'].append(('POST', '/api/analyze/semantic',
+                                     json.dumps({'header': header, 'payload': payload}).encode(), json_headers))
+        requests['encoder'].append(('POST', '/api/analyze/encoder',
+                                    json.dumps({'header': header, 'payload': payload, 'secret': SECRET}).encode(),
+                                    json_headers))
+        requests['crypto'].append(('POST', '/api/analyze/crypto-verification',
+                                   json.dumps({'jwt': token, 'secret': SECRET}).encode(), json_headers))
+        requests['jwts'].append(('GET', '/api/jwts', None, {}))
+    return requests
+
+
+def parse_mix(text):
+    mix = {}
+    for item in text.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"Endpoint desconocido: {name} (opciones: {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def seed_database(tokens, count):
+    """Guarda `count` JWTs para que GET /jwts tenga contenido."""
+    from app.services.database_service import DatabaseService
+
+    for i, (_, _, token) in enumerate(tokens[:count]):
+        DatabaseService.create_jwt({'name': f'carga-{i}', 'token': token})
+
+
+def start_server(app, threads):
+    """Sirve la app con el servidor de Werkzeug en un hilo; retorna (url, servidor)."""
+    from werkzeug.serving import make_server
+
+    # El log por solicitud de Werkzeug distorsiona la medición
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=threads > 0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return f'http://127.0.0.1:{server.server_port}', server
+
+
+def schedule(mix, rate, duration, seed):
+    """Instantes de llegada equiespaciados con el endpoint elegido según los pesos."""
+    rng = random.Random(seed)
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    total = int(rate * duration)
+    return [(i / rate, rng.choices(names, weights)[0]) for i in range(total)]
+
+
+class Worker(threading.Thread):
+    """Worker con conexión HTTP persistente que ejecuta solicitudes de la cola."""
+
+    def __init__(self, url, jobs, results, timeout):
+        super().__init__(daemon=True)
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.jobs = jobs
+        self.results = results
+        self.timeout = timeout
+        self.conn = None
+
+    def request(self, method, path, body, headers):
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            response.read()
+            if response.getheader('Connection', '').lower() == 'close':
+                self.conn.close()
+                self.conn = None
+            return response.status
+        except Exception:
+            self.conn.close()
+            self.conn = None
+            raise
+
+    def run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            scheduled_at, name, (method, path, body, headers) = job
+            try:
+                status = self.request(method, path, body, headers)
+            except Exception as e:
+                status = type(e).__name__
+            self.results.append((name, scheduled_at, time.perf_counter() - scheduled_at, status))
+
+
+def run_load(url, requests, arrivals, concurrency, timeout):
+    jobs = queue.Queue()
+    results = []
+    workers = [Worker(url, jobs, results, timeout) for _ in range(concurrency)]
+    for worker in workers:
+        worker.start()
+
+    counters = {name: 0 for name in requests}
+    start = time.perf_counter()
+    for offset, name in arrivals:
+        scheduled_at = start + offset
+        delay = scheduled_at - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        pool = requests[name]
+        jobs.put((scheduled_at, name, pool[counters[name] % len(pool)]))
+        counters[name] += 1
+
+    for _ in workers:
+        jobs.put(None)
+    for worker in workers:
+        worker.join()
+    return results, start, time.perf_counter() - start
+
+
+def summarize(results, measured_seconds, warmup_until):
+    """Agrupa los resultados por endpoint, descartando los programados durante el warmup."""
+    groups = {}
+    for name, scheduled_at, latency, status in results:
+        if scheduled_at < warmup_until:
+            continue
+        groups.setdefault(name, []).append((latency, status))
+
+    measured = max(measured_seconds, 1e-9)
+
+    def stats(entries):
+        latencies = np.array([lat for lat, _ in entries]) * 1e3
+        statuses = {}
+        for _, status in entries:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        errors = sum(count for status, count in statuses.items() if not status.startswith(('2', '3')))
+        return {
+            'requests': len(entries),
+            'throughput_rps': round(len(entries) / measured, 2),
+            'error_rate': round(errors / len(entries), 4),
+            'status': statuses,
+            'latency_ms': {
+                'mean': round(float(latencies.mean()), 3),
+                'p50': round(float(np.percentile(latencies, 50)), 3),
+                'p95': round(float(np.percentile(latencies, 95)), 3),
+                'p99': round(float(np.percentile(latencies, 99)), 3),
+                'max': round(float(latencies.max()), 3),
+            },
+        }
+
+    endpoints = {name: stats(entries) for name, entries in sorted(groups.items())}
+    everything = [entry for entries in groups.values() for entry in entries]
+    return endpoints, (stats(everything) if everything else None)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=backend_dir,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='Servidor externo; si se omite se levanta create_app() localmente')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f'Pesos por endpoint (default: {DEFAULT_MIX})')
+    parser.add_argument('--rate', type=float, default=100, help='Solicitudes por segundo (total)')
+    parser.add_argument('--duration', type=float, default=10, help='Segundos de carga')
+    parser.add_argument('--warmup', type=float, default=1, help='Segundos iniciales excluidos del reporte')
+    parser.add_argument('--concurrency', type=int, default=32, help='Conexiones/workers simultáneos')
+    parser.add_argument('--timeout', type=float, default=10)
+    parser.add_argument('--tokens', type=int, default=500, help='Tokens pregenerados')
+    parser.add_argument('--stored-jwts', type=int, default=100, help='JWTs guardados para GET /jwts')
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--mongo-uri', help='MongoDB real en lugar de mongomock')
+    parser.add_argument('--mongo-db', default='JWTLoadTest')
+    parser.add_argument('--no-admission', action='store_true', help='Desactiva el control de admisión')
+    parser.add_argument('--mode', help='Etiqueta del modo de servidor en el reporte '
+                        '(default: werkzeug-threaded, o external con --url)')
+    parser.add_argument('--report', help='Escribe el reporte JSON en esta ruta')
+    args = parser.parse_args()
+
+    # La admisión es opcional en la aplicación; la prueba la activa salvo con --no-admission
+    os.environ['JWT_ADMISSION_ENABLED'] = 'false' if args.no_admission else 'true'
+
+    server = None
+    if args.url:
+        url = args.url.rstrip('/')
+    else:
+        install_database(args.mongo_uri, args.mongo_db)
+        from run import create_app
+        app = create_app()
+        url, server = start_server(app, args.concurrency)
+
+    tokens = generate_tokens(args.tokens, args.seed)
+    requests = build_requests(tokens)
+    if server is not None:
+        seed_database(tokens, args.stored_jwts)
+
+    arrivals = schedule(args.mix, args.rate, args.duration, args.seed)
+    print(f"{len(arrivals)} solicitudes a {args.rate:g} rps durante {args.duration:g} s contra {url}")
+    results, start, elapsed = run_load(url, requests, arrivals, args.concurrency, args.timeout)
+    if server is not None:
+        server.shutdown()
+
+    endpoints, total = summarize(results, elapsed - args.warmup, start + args.warmup)
+
+    report = {
+        'commit': git_commit(),
+        'mode': args.mode or ('external' if args.url else 'werkzeug-threaded'),
+        'url': url,
+        'config': {
+            'rate': args.rate, 'duration': args.duration, 'warmup': args.warmup,
+            'concurrency': args.concurrency, 'mix': args.mix, 'tokens': args.tokens,
+            'seed': args.seed, 'admission': not args.no_admission,
+        },
+        'elapsed_seconds': round(elapsed, 3),
+        'total': total,
+        'endpoints': endpoints,
+    }
+
+    print(f"{'endpoint':<10}{'req':>7}{'rps':>9}{'error':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, row in list(endpoints.items()) + [('total', total)]:
+        if row is None:
+            continue
+        lat = row['latency_ms']
+        print(f"{name:<10}{row['requests']:>7}{row['throughput_rps']:>9.1f}{row['error_rate']:>8.2%}"
+              f"{lat['p50']:>10.2f}{lat['p95']:>10.2f}{lat['p99']:>10.2f}")
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
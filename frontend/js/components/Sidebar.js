@@ -33,6 +33,13 @@ class Sidebar {
      * @private
      */
     init() {
+        // Deltas recibidos mientras la lista aún se está cargando
+        this.pendingChanges = [];
+        this.listLoaded = false;
+
+        // Suscribirse primero a los cambios para no perder los ocurridos durante la carga
+        this.subscribeToChanges();
+
         // Cargar lista de JWTs
         this.loadJwtList();
 
@@ -68,6 +75,12 @@ class Sidebar {
                 jwtList: jwts,
                 loading: false 
             }, 'jwtList:updated');
+
+            // Aplicar los deltas que llegaron durante la carga (son idempotentes)
+            this.listLoaded = true;
+            const pending = this.pendingChanges;
+            this.pendingChanges = [];
+            pending.forEach((change) => this.applyChange(change));
         } catch (error) {
             console.error('Error al cargar lista de JWTs:', error);
             state.setState({ 
@@ -77,6 +90,81 @@ class Sidebar {
         }
     }
 
+    /**
+     * Se suscribe a los eventos de cambio de la colección de JWTs.
+     * 
+     * En régimen estable solo viajan los deltas; la lista completa se vuelve
+     * a pedir únicamente si el servidor envía 'reset'.
+     * 
+     * @private
+     */
+    async subscribeToChanges() {
+        if (typeof EventSource === 'undefined') {
+            return;
+        }
+
+        const jwtService = (await import('../services/JwtService.js')).default;
+        this.unsubscribeChanges = jwtService.subscribeJwtChanges({
+            onChange: (change) => {
+                if (this.listLoaded) {
+                    this.applyChange(change);
+                } else {
+                    this.pendingChanges.push(change);
+                }
+            },
+            onReset: () => {
+                this.listLoaded = false;
+                this.loadJwtList();
+            },
+        });
+    }
+
+    /**
+     * Aplica un delta a la lista y actualiza solo el elemento afectado del DOM.
+     * 
+     * @param {Object} change - Delta con op ('insert' | 'update' | 'delete'), id y jwt
+     * 
+     * @private
+     */
+    applyChange({ op, id, jwt }) {
+        const currentList = state.get('jwtList');
+        const index = currentList.findIndex((item) => String(item.id) === id);
+        let updatedList;
+
+        if (op === 'delete') {
+            if (index === -1) {
+                return;
+            }
+            updatedList = currentList.filter((_, i) => i !== index);
+        } else if (index === -1) {
+            updatedList = [...currentList, jwt];
+        } else {
+            updatedList = currentList.map((item, i) => (i === index ? jwt : item));
+        }
+
+        // Evento propio: 'jwtList:updated' volvería a renderizar la lista completa
+        state.setState({ jwtList: updatedList }, 'jwtList:changed');
+
+        if (currentList.length === 0 || updatedList.length === 0) {
+            this.render();
+            return;
+        }
+
+        const existing = this.jwtList.querySelector(`[data-jwt-id="${CSS.escape(id)}"]`);
+        if (op === 'delete') {
+            existing?.remove();
+            return;
+        }
+
+        const selectedJwt = state.get('selectedJwt');
+        const item = this.createJwtListItem(jwt, jwt.id === selectedJwt?.id);
+        if (existing) {
+            existing.replaceWith(item);
+        } else {
+            this.jwtList.appendChild(item);
+        }
+    }
+
     /**
      * Renderiza la lista de JWTs en el DOM.
      * 
@@ -12,6 +12,7 @@
  */
 
 import config from '../config.js';
+import stateManager from '../state.js';
 
 /**
  * URL base de la API del backend.
@@ -26,8 +27,78 @@ const API_BASE_URL = config.API_BASE_URL;
  * 
  * Proporciona métodos para interactuar con los endpoints de la API.
  * Todos los métodos devuelven Promesas para manejo asíncrono.
+ * 
+ * Las llamadas idénticas simultáneas comparten una sola petición, y los
+ * resultados deterministas (léxico, decodificación, sintaxis) se guardan en
+ * el LRU de state.js, de modo que volver a analizar un token no genera
+ * peticiones nuevas.
  */
 class JwtService {
+    constructor() {
+        /**
+         * Últimas respuestas de GET condicionales por endpoint: { etag, data }.
+         * @private
+         */
+        this._conditionalCache = new Map();
+
+        /**
+         * Peticiones en curso por clave, compartidas por llamadas idénticas.
+         * @private
+         */
+        this._inflight = new Map();
+
+        /**
+         * Si el servidor ofrece /analyze/full (se desactiva ante un 404).
+         * @private
+         */
+        this._fusedAvailable = true;
+    }
+
+    /**
+     * Comparte una petición en curso entre llamadas idénticas.
+     * 
+     * Mientras la promesa de `key` no se resuelve, las llamadas con la misma
+     * clave reciben esa promesa en lugar de lanzar otra petición.
+     * 
+     * @param {string} key - Identificador de la petición
+     * @param {Function} request - Función que lanza la petición y retorna una promesa
+     * @returns {Promise<*>} Resultado de la petición
+     * 
+     * @private
+     */
+    _coalesce(key, request) {
+        const pending = this._inflight.get(key);
+        if (pending) {
+            return pending;
+        }
+        const promise = request().finally(() => this._inflight.delete(key));
+        this._inflight.set(key, promise);
+        return promise;
+    }
+
+    /**
+     * Obtiene el resultado de una fase determinista del análisis.
+     * 
+     * Lo busca en el LRU de state.js; si no está, comparte la petición en
+     * curso o lanza una nueva y guarda el resultado. Los errores no se guardan.
+     * 
+     * @param {string} phase - Fase del análisis
+     * @param {string} key - Entrada de la fase (token o cuerpo serializado)
+     * @param {Function} request - Función que obtiene el resultado del servidor
+     * @returns {Promise<*>} Resultado de la fase
+     * 
+     * @private
+     */
+    async _cachedPhase(phase, key, request) {
+        const cached = stateManager.getResult(phase, key);
+        if (cached !== undefined) {
+            return cached;
+        }
+        const result = await this._coalesce(`${phase}\u0000${key}`, request);
+        stateManager.setResult(phase, key, result);
+        return result;
+    }
+
     /**
      * Realiza una petición HTTP al backend.
      * 
@@ -65,6 +136,64 @@ class JwtService {
         }
     }
 
+    /**
+     * Realiza un GET condicional al backend.
+     * 
+     * Envía If-None-Match con el último ETag recibido para el endpoint; ante
+     * un 304 reutiliza la respuesta guardada sin descargar ni parsear el cuerpo.
+     * 
+     * @param {string} endpoint - Ruta del endpoint (sin /api)
+     * @returns {Promise<Object>} Respuesta JSON del servidor (nueva o guardada)
+     * @throws {Error} Si la petición falla
+     * 
+     * @private
+     */
+    _fetchConditional(endpoint) {
+        // Varios componentes pueden pedir la misma lista a la vez
+        return this._coalesce(`GET ${endpoint}`, () => this._fetchConditionalRequest(endpoint));
+    }
+
+    /**
+     * Petición de _fetchConditional (sin coalescencia).
+     * 
+     * @param {string} endpoint - Ruta del endpoint (sin /api)
+     * @returns {Promise<Object>} Respuesta JSON del servidor
+     * 
+     * @private
+     */
+    async _fetchConditionalRequest(endpoint) {
+        const url = `${API_BASE_URL}${endpoint}`;
+        const cached = this._conditionalCache.get(endpoint);
+        const headers = cached ? { 'If-None-Match': cached.etag } : {};
+
+        try {
+            // no-store: la revalidación la controla este servicio y no la cache HTTP del navegador
+            const response = await fetch(url, { method: 'GET', headers, cache: 'no-store' });
+
+            if (response.status === 304 && cached) {
+                return cached.data;
+            }
+
+            const data = await response.json();
+
+            if (!response.ok) {
+                throw new Error(data.error || `Error ${response.status}: ${response.statusText}`);
+            }
+
+            const etag = response.headers.get('ETag');
+            if (etag) {
+                this._conditionalCache.set(endpoint, { etag, data });
+            }
+
+            return data;
+        } catch (error) {
+            if (error instanceof TypeError && error.message.includes('fetch')) {
+                throw new Error('No se pudo conectar con el servidor. Verifica que el backend esté ejecutándose.');
+            }
+            throw error;
+        }
+    }
+
     /**
      * Obtiene la lista de JWTs guardados desde la base de datos.
      * 
@@ -82,7 +211,8 @@ class JwtService {
      */
     async fetchJwts() {
         try {
-            const response = await this._fetch('/jwts', { method: 'GET' });
+            // GET condicional: si la colección no cambió el servidor responde 304
+            const response = await this._fetchConditional('/jwts');
             
             if (!response.success) {
                 throw new Error(response.error || 'Error al obtener la lista de JWTs');
@@ -94,6 +224,43 @@ class JwtService {
         }
     }
 
+    /**
+     * Se suscribe a los cambios de la colección de JWTs (Server-Sent Events).
+     * 
+     * El navegador reconecta automáticamente y reenvía Last-Event-ID, por lo
+     * que el servidor reenvía los cambios perdidos durante la desconexión.
+     * 
+     * @param {Object} handlers - Callbacks:
+     *   - onChange({ op, id, jwt }): Delta 'insert' | 'update' | 'delete'
+     *   - onReset(): La lista local quedó desactualizada y debe recargarse
+     *   - onReady(): Conexión establecida (también tras cada reconexión)
+     * @returns {Function} Función para cerrar la suscripción
+     * 
+     * @example
+     * const close = jwtService.subscribeJwtChanges({ onChange: (delta) => console.log(delta) });
+     */
+    subscribeJwtChanges({ onChange, onReset, onReady } = {}) {
+        const source = new EventSource(`${API_BASE_URL}/jwts/events`);
+
+        source.addEventListener('jwt', (event) => {
+            if (onChange) {
+                onChange(JSON.parse(event.data));
+            }
+        });
+        source.addEventListener('reset', () => {
+            if (onReset) {
+                onReset();
+            }
+        });
+        source.addEventListener('ready', () => {
+            if (onReady) {
+                onReady();
+            }
+        });
+
+        return () => source.close();
+    }
+
     /**
      * Realiza el análisis léxico de un JWT (Fase 1).
      * 
@@ -114,15 +281,20 @@ class JwtService {
      */
     async analyzeLexical(jwt) {
         try {
-            const response = await this._fetch(`/analyze/lexical/${encodeURIComponent(jwt)}`, {
-                method: 'GET',
-            });
+            return await this._cachedPhase('lexical', jwt, async () => {
+                // El token viaja crudo en el cuerpo: sin codificación en la URL
+                const response = await this._fetch('/analyze/lexical', {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/jwt' },
+                    body: jwt,
+                });
 
-            if (!response.success) {
-                throw new Error(response.error || 'Error en análisis léxico');
-            }
+                if (!response.success) {
+                    throw new Error(response.error || 'Error en análisis léxico');
+                }
 
-            return response.result;
+                return response.result;
+            });
         } catch (error) {
             throw new Error(`Error al analizar JWT léxicamente: ${error.message}`);
         }
@@ -142,16 +314,19 @@ class JwtService {
      */
     async decodeJwt(lexicalResult) {
         try {
-            const response = await this._fetch('/analyze/decoder', {
-                method: 'POST',
-                body: JSON.stringify(lexicalResult),
-            });
+            const body = JSON.stringify(lexicalResult);
+            return await this._cachedPhase('decoder', body, async () => {
+                const response = await this._fetch('/analyze/decoder', {
+                    method: 'POST',
+                    body,
+                });
 
-            if (!response.success) {
-                throw new Error(response.error || 'Error en decodificación');
-            }
+                if (!response.success) {
+                    throw new Error(response.error || 'Error en decodificación');
+                }
 
-            return response.result;
+                return response.result;
+            });
         } catch (error) {
             throw new Error(`Error al decodificar JWT: ${error.message}`);
         }
@@ -174,18 +349,21 @@ class JwtService {
      */
     async analyzeSyntax(decoderResult) {
         try {
-            const response = await this._fetch('/analyze/syntax', {
-                method: 'POST',
-                body: JSON.stringify({
-                    result: decoderResult
-                }),
+            const body = JSON.stringify({
+                result: decoderResult
             });
+            return await this._cachedPhase('syntax', body, async () => {
+                const response = await this._fetch('/analyze/syntax', {
+                    method: 'POST',
+                    body,
+                });
 
-            if (!response.success) {
-                throw new Error(response.error || 'Error en análisis sintáctico');
-            }
+                if (!response.success) {
+                    throw new Error(response.error || 'Error en análisis sintáctico');
+                }
 
-            return response.result;
+                return response.result;
+            });
         } catch (error) {
             throw new Error(`Error al analizar sintácticamente: ${error.message}`);
         }
@@ -209,13 +387,15 @@ class JwtService {
      */
     async analyzeSemantic(syntaxResult) {
         try {
-            const response = await this._fetch('/analyze/semantic', {
-                method: 'POST',
-                body: JSON.stringify({
-                    header: syntaxResult.header,
-                    payload: syntaxResult.payload
-                }),
+            const body = JSON.stringify({
+                header: syntaxResult.header,
+                payload: syntaxResult.payload
             });
+            // Depende de la hora actual (exp, nbf): se comparte la petición en curso, pero no se guarda
+            const response = await this._coalesce(`semantic\u0000${body}`, () => this._fetch('/analyze/semantic', {
+                method: 'POST',
+                body,
+            }));
 
             if (!response.success) {
                 return {
@@ -234,71 +414,135 @@ class JwtService {
     /**
      * Realiza el análisis completo de un JWT.
      * 
-     * Incluye análisis léxico, decodificación y análisis semántico.
+     * Usa el endpoint fusionado /analyze/full (una sola petición para todas
+     * las fases). Si el servidor no lo ofrece, encadena las fases léxica,
+     * de decodificación, sintáctica y semántica, reutilizando los resultados
+     * guardados de cada una.
      * 
      * @param {string} jwt - Token JWT completo
+     * @param {string} [secret] - Clave secreta; si se indica se verifica también la firma
      * @returns {Promise<Object>} Resultado del análisis con:
-     *   - lexical: Resultado del análisis léxico
-     *   - decoded: Header y payload decodificados
-     *   - semantic: Resultado del análisis semántico
+     *   - valid: Boolean indicando si el token pasó todas las fases
+     *   - phase: Última fase ejecutada (la que falló, si valid es false)
+     *   - error: Mensaje de error (null si es válido)
+     *   - error_type: Tipo de error (null si es válido)
+     *   - header: Header decodificado (si se llegó a obtener)
+     *   - payload: Payload decodificado (si se llegó a obtener)
      * 
      * @example
      * const analysis = await jwtService.analyzeJwt(token);
-     * console.log(analysis.decoded.header); // { alg: 'HS256', typ: 'JWT' }
+     * console.log(analysis.header); // { alg: 'HS256', typ: 'JWT' }
      */
-    async analyzeJwt(jwt) {
+    async analyzeJwt(jwt, secret = null) {
         try {
-            // 1. Análisis léxico
-            const lexicalResponse = await this._fetch(`/analyze/lexical/${encodeURIComponent(jwt)}`, {
-                method: 'GET',
-            });
-
-            if (!lexicalResponse.success) {
-                throw new Error(lexicalResponse.error || 'Error en análisis léxico');
+            if (this._fusedAvailable) {
+                const result = await this._coalesce(`full\u0000${jwt}\u0000${secret ?? ''}`, () => this._analyzeFull(jwt, secret));
+                if (result !== null) {
+                    return result;
+                }
             }
+            return await this._analyzeByPhases(jwt, secret);
+        } catch (error) {
+            throw new Error(`Error al analizar JWT: ${error.message}`);
+        }
+    }
 
-            const lexicalResult = lexicalResponse.result;
+    /**
+     * Análisis completo con el endpoint fusionado.
+     * 
+     * @param {string} jwt - Token JWT completo
+     * @param {string|null} secret - Clave secreta (opcional)
+     * @returns {Promise<Object|null>} Resultado, o null si el servidor no ofrece /analyze/full
+     * 
+     * @private
+     */
+    async _analyzeFull(jwt, secret) {
+        const headers = { 'Content-Type': 'application/jwt' };
+        if (secret) {
+            headers['X-JWT-Secret'] = secret;
+        }
 
-            // 2. Decodificación
-            const decoderResponse = await this._fetch('/analyze/decoder', {
-                method: 'POST',
-                body: JSON.stringify({
-                    header: lexicalResult.header,
-                    payload: lexicalResult.payload,
-                }),
-            });
+        let response;
+        try {
+            response = await fetch(`${API_BASE_URL}/analyze/full`, { method: 'POST', headers, body: jwt });
+        } catch (error) {
+            throw new Error('No se pudo conectar con el servidor. Verifica que el backend esté ejecutándose.');
+        }
 
-            if (!decoderResponse.success) {
-                throw new Error(decoderResponse.error || 'Error en decodificación');
-            }
+        if (response.status === 404) {
+            this._fusedAvailable = false;
+            return null;
+        }
 
-            const decodedResult = decoderResponse.result;
+        const data = await response.json();
+        if (!response.ok || !data.success) {
+            throw new Error(data.error || `Error ${response.status}: ${response.statusText}`);
+        }
+        return data.result;
+    }
 
-            // 3. Análisis semántico
-            let semanticResult = null;
-            try {
-                const semanticResponse = await this._fetch('/analyze/semantic', {
-                    method: 'POST',
-                    body: JSON.stringify({
-                        header: decodedResult.header,
-                        payload: decodedResult.payload,
-                    }),
-                });
+    /**
+     * Análisis completo encadenando las fases (servidores sin /analyze/full).
+     * 
+     * @param {string} jwt - Token JWT completo
+     * @param {string|null} secret - Clave secreta (opcional)
+     * @returns {Promise<Object>} Resultado con el mismo formato que analyzeJwt
+     * 
+     * @private
+     */
+    async _analyzeByPhases(jwt, secret) {
+        const failure = (phase, error, errorType, syntax = null) => ({
+            valid: false,
+            phase,
+            error,
+            error_type: errorType,
+            header: syntax ? syntax.header : null,
+            payload: syntax ? syntax.payload : null,
+        });
+
+        // 1. Análisis léxico
+        const lexicalResult = await this.analyzeLexical(jwt);
+        if (!lexicalResult.valid) {
+            return failure('lexical', lexicalResult.error, lexicalResult.error_type || 'LexicalError');
+        }
 
-                semanticResult = semanticResponse.success ? semanticResponse.result : null;
-            } catch (error) {
-                // El análisis semántico puede fallar, pero no es crítico
-                console.warn('Análisis semántico falló:', error);
-            }
+        // 2. Decodificación
+        let decoderResult;
+        try {
+            decoderResult = await this.decodeJwt(lexicalResult);
+        } catch (error) {
+            return failure('decode', error.message, 'DecodeError');
+        }
 
-            return {
-                lexical: lexicalResult,
-                decoded: decodedResult,
-                semantic: semanticResult,
-            };
+        // 3. Análisis sintáctico
+        const syntaxResult = await this.analyzeSyntax(decoderResult);
+        if (!syntaxResult.valid) {
+            return failure('syntax', (syntaxResult.errors || []).join('; '), syntaxResult.error_type || 'SyntaxError', syntaxResult);
+        }
+
+        // 4. Análisis semántico
+        try {
+            await this.analyzeSemantic(syntaxResult);
         } catch (error) {
-            throw new Error(`Error al analizar JWT: ${error.message}`);
+            return failure('semantic', error.message, 'SemanticError', syntaxResult);
         }
+
+        // 5. Verificación criptográfica (solo con clave)
+        if (secret) {
+            const crypto = await this.verifyJwt(jwt, secret);
+            if (!crypto.valid) {
+                return failure('crypto', crypto.error, crypto.rawResponse?.error_type || 'SignatureError', syntaxResult);
+            }
+        }
+
+        return {
+            valid: true,
+            phase: secret ? 'crypto' : 'semantic',
+            error: null,
+            error_type: null,
+            header: syntaxResult.header,
+            payload: syntaxResult.payload,
+        };
     }
 
     /**
@@ -319,7 +563,21 @@ class JwtService {
      *   console.log('JWT válido');
      * }
      */
-    async verifyJwt(jwt, secret) {
+    verifyJwt(jwt, secret) {
+        // No se guarda: la lista de revocación puede cambiar; solo se comparte la petición en curso
+        return this._coalesce(`verify\u0000${jwt}\u0000${secret}`, () => this._verifyJwtRequest(jwt, secret));
+    }
+
+    /**
+     * Petición de verifyJwt (sin coalescencia).
+     * 
+     * @param {string} jwt - Token JWT completo
+     * @param {string} secret - Clave secreta
+     * @returns {Promise<Object>} Resultado de la verificación
+     * 
+     * @private
+     */
+    async _verifyJwtRequest(jwt, secret) {
         const url = `${API_BASE_URL}/analyze/crypto-verification`;
         const defaultOptions = {
             method: 'POST',
@@ -27,6 +27,10 @@ class StateManager {
         };
 
         this.subscribers = new Map(); // Map<event, Set<callback>>
+
+        // Resultados de análisis por fase y entrada (LRU acotado, ver getResult/setResult)
+        this.results = new Map();
+        this.maxResults = 200;
     }
 
     /**
@@ -124,6 +128,50 @@ class StateManager {
         }
     }
 
+    /**
+     * Obtiene un resultado de análisis guardado.
+     * 
+     * Un acierto mueve la entrada al final del Map, que conserva el orden de
+     * inserción: la primera entrada es siempre la menos usada recientemente.
+     * 
+     * @param {string} phase - Fase del análisis ('lexical', 'decoder', 'syntax', ...)
+     * @param {string} key - Entrada de la fase (token o cuerpo serializado)
+     * @returns {*} Resultado guardado o undefined
+     */
+    getResult(phase, key) {
+        const cacheKey = `${phase}\u0000${key}`;
+        if (!this.results.has(cacheKey)) {
+            return undefined;
+        }
+        const value = this.results.get(cacheKey);
+        this.results.delete(cacheKey);
+        this.results.set(cacheKey, value);
+        return value;
+    }
+
+    /**
+     * Guarda un resultado de análisis, descartando el menos usado si se supera maxResults.
+     * 
+     * @param {string} phase - Fase del análisis
+     * @param {string} key - Entrada de la fase
+     * @param {*} value - Resultado a guardar
+     */
+    setResult(phase, key, value) {
+        const cacheKey = `${phase}\u0000${key}`;
+        this.results.delete(cacheKey);
+        this.results.set(cacheKey, value);
+        while (this.results.size > this.maxResults) {
+            this.results.delete(this.results.keys().next().value);
+        }
+    }
+
+    /**
+     * Descarta todos los resultados de análisis guardados.
+     */
+    clearResults() {
+        this.results.clear();
+    }
+
     /**
      * Limpia todas las suscripciones.
      * Útil para limpieza cuando se destruye la aplicación.